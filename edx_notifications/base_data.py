@@ -13,6 +13,57 @@ import six
 import dateutil.parser
 from freezegun.api import FakeDatetime
 
+# optional, faster JSON backends
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+
+def _datetime_to_json(obj):
+    """
+    JSON serializer for objects not serializable by default json code.
+    For now, this means datetime objects.
+    """
+
+    if isinstance(obj, datetime):
+        serial = obj.isoformat()
+        return serial
+
+    raise TypeError(
+        "Could not provide JSON serializer for type {name}!".format(name=type(obj))
+    )
+
+
+def _json_dumps(data):
+    """
+    Serialize data to a compact JSON string, with orjson if it is installed
+    """
+
+    if orjson:
+        return orjson.dumps(data, default=_datetime_to_json, option=orjson.OPT_NON_STR_KEYS).decode('utf-8')
+
+    return json.dumps(data, default=_datetime_to_json, separators=(',', ':'))
+
+
+def _json_loads(value):
+    """
+    Deserialize a JSON string, with orjson or ujson if either is installed
+    """
+
+    if orjson:
+        return orjson.loads(value)
+
+    if ujson:
+        return ujson.loads(value)
+
+    return json.loads(value)
+
 
 class DateTimeWithDeltaCompare(datetime):
     """
@@ -87,9 +138,6 @@ class TypedField:
 
         self._assert_has_name()
 
-        if not hasattr(data_object, '_field_data'):
-            return self._default
-
         return data_object._field_data.get(self.__name__, self._default)  # pylint: disable=protected-access
 
     def __set__(self, data_object, value):
@@ -108,11 +156,13 @@ class TypedField:
                 ).format(expected=self._expected_types, got=value_type)
             )
 
-        if not hasattr(data_object, '_field_data'):
-            data_object._field_data = {}  # pylint: disable=protected-access
-
         data_object._field_data[self.__name__] = value  # pylint: disable=protected-access
 
+        # remember what has changed, if the data object is keeping track (see mark_clean())
+        dirty_fields = data_object._dirty_fields  # pylint: disable=protected-access
+        if dirty_fields is not None:
+            dirty_fields.add(self.__name__)
+
     def __delete__(self, data_object):
         """
         Descriptor delete
@@ -120,8 +170,7 @@ class TypedField:
 
         self._assert_has_name()
 
-        if hasattr(data_object, '_field_data') and self.__name__ in data_object._field_data:  # pylint: disable=protected-access
-            del data_object._field_data[self.__name__]  # pylint: disable=protected-access
+        data_object._field_data.pop(self.__name__, None)  # pylint: disable=protected-access
 
 
 class StringField(TypedField):
@@ -155,6 +204,9 @@ class DictField(TypedField):
 
     _expected_types = [dict]
 
+    # the version of the format which to_tagged_json() writes, see there
+    TAGGED_JSON_VERSION = 1
+
     @classmethod
     def to_json(cls, data):
         """
@@ -164,32 +216,57 @@ class DictField(TypedField):
         if not data:
             return None
 
-        def datetime_to_json(obj):
-            """
-            JSON serializer for objects not serializable by default json code.
-            For now, this means datetime objects.
-            """
+        return json.dumps(data, default=_datetime_to_json)
 
-            if isinstance(obj, datetime):
-                serial = obj.isoformat()
-                return serial
+    @classmethod
+    def to_tagged_json(cls, data):
+        """
+        Serialize to the versioned format that dicts are stored in, which is the JSON of
+        [TAGGED_JSON_VERSION, data, keys of data holding datetimes]. Tagging the datetimes
+        when writing means that from_json() does not have to guess which strings are
+        datetimes. Note that - like before - only top level datetimes are restored
+        """
 
-            raise TypeError(
-                "Could not provide JSON serializer for type {name}!".format(name=type(obj))
-            )
+        if not data:
+            return None
 
-        return json.dumps(data, default=datetime_to_json)
+        datetime_keys = [key for key, value in data.items() if isinstance(value, datetime) and isinstance(key, str)]
+        if datetime_keys:
+            data = dict(data)
+            for key in datetime_keys:
+                data[key] = data[key].isoformat()
+
+        return _json_dumps([cls.TAGGED_JSON_VERSION, data, datetime_keys])
 
     @classmethod
     def from_json(cls, _value):
         """
-        Deserialize from json
+        Deserialize from json, either what to_tagged_json() has written or
+        the plain JSON objects that to_json() writes (and dicts used to be stored as)
         """
 
         if not _value:
             return None
 
-        _dict = json.loads(_value)
+        value = _json_loads(_value)
+
+        if isinstance(value, list):
+            version, _dict, datetime_keys = value
+            if version != cls.TAGGED_JSON_VERSION:
+                raise ValueError(f"Unknown version {version} of tagged JSON")
+
+            for key in datetime_keys:
+                _dict[key] = datetime.fromisoformat(_dict[key])
+
+            return _dict
+
+        return cls._parse_datetimes(value)
+
+    @classmethod
+    def _parse_datetimes(cls, _dict):
+        """
+        Plain JSON does not tell us which of the strings are datetimes, so guess
+        """
 
         for key, value in _dict.items():
             if isinstance(value, str):
@@ -255,7 +332,15 @@ class BaseDataObjectMetaClass(type):
     A metaclass which adds the __name__ attribute to all TypedField descriptors. We
     need to do this because we store the values of the descriptors in a dictionary on
     the instance itself, therefore it needs to know the attribute name it is bound
-    to in the containing object
+    to in the containing object.
+
+    It also works out the schema of each class once, rather than every time an
+    instance gets built or inspected: _fields is the table of all TypedFields (by name)
+    and _schema is the set of all attribute names which instances may set.
+
+    Unless a class declares __slots__ itself - or has plain class attributes which
+    instances might override - it gets an empty __slots__, so that its instances don't
+    carry around a __dict__ on top of their field data
     """
     def __new__(mcs, name, bases, attrs):
         # Iterate over the TypedField attrs before they're bound to the class
@@ -264,19 +349,33 @@ class BaseDataObjectMetaClass(type):
             if isinstance(attr, TypedField):
                 attr.__name__ = attr_name
 
-        # Do the same with any other base classes
-        for base in bases:
-            for attr_name, attr in inspect.getmembers(base, lambda attr: isinstance(attr, TypedField)):
-                attr.__name__ = attr_name
+        has_plain_attributes = any(
+            not attr_name.startswith('_') and not callable(attr) and not hasattr(attr, '__get__')
+            for attr_name, attr in attrs.items()
+        )
+        if bases and '__slots__' not in attrs and not has_plain_attributes:
+            attrs['__slots__'] = ()
 
         return super().__new__(mcs, name, bases, attrs)
 
+    def __init__(cls, name, bases, attrs):
+        super().__init__(name, bases, attrs)
+
+        # this includes the TypedFields of all base classes, unless they've been overridden
+        cls._fields = dict(inspect.getmembers(cls, lambda attr: isinstance(attr, TypedField)))
+        for attr_name, attr in cls._fields.items():
+            attr.__name__ = attr_name
+
+        cls._schema = frozenset(dir(cls))
+
 
 class BaseDataObject(metaclass=BaseDataObjectMetaClass):
     """
     A base class for all Notification Data Objects
     """
 
+    __slots__ = ('_field_data', '_dirty_fields', '__weakref__')
+
     id = IntegerField(name='id', default=None)  # pylint: disable=invalid-name
 
     def __init__(self, **kwargs):
@@ -285,9 +384,14 @@ class BaseDataObject(metaclass=BaseDataObjectMetaClass):
         of attributes which have been explicitly declared in any subclass
         """
 
-        for key in kwargs:
-            value = kwargs[key]
-            if key in dir(self):
+        object.__setattr__(self, '_field_data', {})
+        object.__setattr__(self, '_dirty_fields', None)
+
+        fields = self._fields
+        for key, value in kwargs.items():
+            if key in fields:
+                fields[key].__set__(self, value)
+            elif key in self._schema:
                 setattr(self, key, value)
             else:
                 raise ValueError(
@@ -304,7 +408,7 @@ class BaseDataObject(metaclass=BaseDataObjectMetaClass):
         We want our data models to have a schema that is fixed as design time!!!
         """
 
-        if attribute != '_field_data' and attribute not in dir(self):
+        if attribute not in self._schema:
             raise ValueError(
                 (
                     "Attempting to add a new attribute '{name}' that was not part of "
@@ -314,6 +418,26 @@ class BaseDataObject(metaclass=BaseDataObjectMetaClass):
 
         super().__setattr__(attribute, value)
 
+    def __getstate__(self):
+        """
+        Pickle support, since our field data lives in slots
+        """
+
+        state = dict(getattr(self, '__dict__', {}))
+        state['_field_data'] = self._field_data
+        state['_dirty_fields'] = self._dirty_fields
+        return state
+
+    def __setstate__(self, state):
+        """
+        Unpickle support, which also accepts data objects that have been pickled
+        before they were keeping track of dirty fields
+        """
+
+        state.setdefault('_dirty_fields', None)
+        for attribute, value in state.items():
+            object.__setattr__(self, attribute, value)
+
     def __eq__(self, other):
         """
         Equality test - simply compare all of the fields
@@ -357,7 +481,7 @@ class BaseDataObject(metaclass=BaseDataObjectMetaClass):
         """
 
         instance = cls()
-        for attr_name, __ in inspect.getmembers(cls, lambda attr: isinstance(attr, TypedField)):
+        for attr_name in cls._fields:
             if hasattr(src, attr_name):
                 val = getattr(src, attr_name)
                 # when cloning a dict, make a copy
@@ -375,7 +499,7 @@ class BaseDataObject(metaclass=BaseDataObjectMetaClass):
         """
 
         _dict = {}
-        for attr_name, __ in inspect.getmembers(self.__class__, lambda attr: isinstance(attr, TypedField)):
+        for attr_name in self._fields:
             value = getattr(self, attr_name)
             if isinstance(value, BaseDataObject):
                 _dict[attr_name] = value.get_fields()
@@ -390,7 +514,7 @@ class BaseDataObject(metaclass=BaseDataObjectMetaClass):
         """
 
         _dict = {}
-        for attr_name, __ in inspect.getmembers(self.__class__, lambda attr: isinstance(attr, TypedField)):
+        for attr_name in self._fields:
             value = getattr(self, attr_name)
 
             if isinstance(value, BaseDataObject):
@@ -410,6 +534,31 @@ class BaseDataObject(metaclass=BaseDataObjectMetaClass):
                 _dict[attr_name] = value
         return _dict
 
+    def mark_clean(self):
+        """
+        Start keeping track of which fields get set from here on, typically because
+        we have just been read from - or written to - a store. Stores call this on
+        every data object they hand out (e.g. in the to_data_object() of the SQL models),
+        so that saving it again only needs to write what has changed since. See get_dirty_fields()
+        """
+
+        self._dirty_fields = set()  # pylint: disable=attribute-defined-outside-init
+
+    def get_dirty_fields(self):
+        """
+        Returns the set of names of the fields which have been set since mark_clean()
+        was last called, so that stores only need to write those. Dicts can be changed
+        in place, without us noticing, so fields holding a dict always count as dirty.
+
+        If mark_clean() has never been called, we can't tell what has changed
+        and None is returned
+        """
+
+        if self._dirty_fields is None:
+            return None
+
+        return self._dirty_fields | {name for name, value in self._field_data.items() if isinstance(value, dict)}
+
     def validate(self):
         """
         This should be overriden to do real validation.
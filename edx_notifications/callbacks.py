@@ -5,7 +5,9 @@ Any internal Timer callbacks
 
 
 import abc
+import json
 import logging
+import collections
 
 import six
 
@@ -17,6 +19,7 @@ from edx_notifications.lib.publisher import (
     publish_notification_to_user,
     bulk_publish_notification_to_users
 )
+from edx_notifications.channels.channel import get_notification_channel
 
 log = logging.getLogger(__name__)
 
@@ -73,6 +76,17 @@ class NotificationDispatchMessageCallback(NotificationCallbackTimerHandler):
             if scope='course_enrollments' then {'course_id'}
     """
 
+    def __init__(self, msgs=None):
+        """
+        Initializer
+
+        ARGS:
+            - msgs: optional dict of NotificationMessages by id, which have
+              already been fetched, e.g. by poll_and_execute_timers()
+        """
+
+        self.msgs = msgs if msgs else {}
+
     def notification_timer_callback(self, timer):
         num_dispatched = 0
         err_msgs = []
@@ -111,7 +125,9 @@ class NotificationDispatchMessageCallback(NotificationCallbackTimerHandler):
             preferred_channel = context.get('preferred_channel')
 
             try:
-                notification_msg = notification_store().get_notification_message_by_id(msg_id)
+                notification_msg = self.msgs.get(msg_id)
+                if not notification_msg:
+                    notification_msg = notification_store().get_notification_message_by_id(msg_id)
             except ItemNotFoundError:
                 err_msg = (
                     'Could not find msg_id {msg_id} associated '
@@ -147,6 +163,109 @@ class NotificationDispatchMessageCallback(NotificationCallbackTimerHandler):
 
         return result
 
+    @staticmethod
+    def get_coalescing_key(timer):
+        """
+        Timed notifications which go out to the same distribution scope - and over the same
+        channel - at the same time can be dispatched together by notification_timers_callback().
+        This returns what those timers have in common, or None if the timer has to be
+        dispatched on its own
+        """
+
+        context = timer.context if timer.context else {}
+        scope = context.get('distribution_scope')
+
+        if not isinstance(scope, dict) or 'msg_id' not in context or 'scope_context' not in scope:
+            return None
+
+        # there is no audience to resolve for a single user
+        if scope.get('scope_name') in (None, 'user'):
+            return None
+
+        return json.dumps(
+            [
+                scope['scope_name'],
+                scope['scope_context'],
+                context.get('preferred_channel'),
+                context.get('channel_context'),
+            ],
+            sort_keys=True,
+            default=str
+        )
+
+    def notification_timers_callback(self, timers):
+        """
+        Dispatch the timed notifications of several timers which share the same
+        get_coalescing_key(): the distribution scope is resolved once, and all of
+        the messages are fanned out in a single pass over its users
+
+        RETURNS: a list of the results of each of the timers, as per
+        notification_timer_callback()
+        """
+
+        results = [
+            {
+                'num_dispatched': 0,
+                'errors': [],
+                'reschedule_in_mins': None,
+            }
+            for timer in timers
+        ]
+
+        dispatched = []
+        msgs = []
+        for timer, result in zip(timers, results):
+            try:
+                msg_id = int(timer.context['msg_id'])
+                notification_msg = self.msgs.get(msg_id)
+                if not notification_msg:
+                    notification_msg = notification_store().get_notification_message_by_id(msg_id)
+
+                # an invalid message only fails its own timer
+                notification_msg.validate()
+            except Exception as ex:  # pylint: disable=broad-except
+                log.exception(ex)
+                result['errors'].append(str(ex))
+                continue
+
+            dispatched.append(result)
+            msgs.append(notification_msg)
+
+        if not msgs:
+            return results
+
+        context = timers[0].context
+        scope_name = context['distribution_scope']['scope_name']
+        scope_context = context['distribution_scope']['scope_context']
+
+        log.info(
+            'Firing %d timed Notifications to scope name "%s" and scope context %s with message_ids: %s',
+            len(msgs),
+            scope_name,
+            scope_context,
+            [msg.id for msg in msgs]
+        )
+
+        try:
+            nums_dispatched, errors = _bulk_send_to_scoped_users(
+                msgs,
+                scope_name,
+                scope_context,
+                preferred_channel=context.get('preferred_channel'),
+                channel_context=context.get('channel_context')
+            )
+
+            for result, num_dispatched, error in zip(dispatched, nums_dispatched, errors):
+                result['num_dispatched'] = num_dispatched
+                if error:
+                    result['errors'].append(error)
+        except Exception as ex:  # pylint: disable=broad-except
+            log.exception(ex)
+            for result in dispatched:
+                result['errors'].append(str(ex))
+
+        return results
+
 
 def _send_to_single_user(msg, scope_context, preferred_channel=None, channel_context=None):
     """
@@ -207,6 +326,72 @@ def _send_to_scoped_users(msg, scope_name, scope_context, preferred_channel=None
     return num_dispatched
 
 
+def _bulk_send_to_scoped_users(msgs, scope_name, scope_context, preferred_channel=None, channel_context=None):
+    """
+    Helper method to send several messages to the same scoped set of users, which
+    only gets resolved once. Messages which go out over the same channel are
+    dispatched together. A channel which fails only fails the messages that
+    went out over it, whereas a scope that can't be resolved fails them all
+
+    RETURNS: a tuple of two lists, with the number of users each msg was dispatched
+    to, and the error (or None) that each msg ran into
+    """
+
+    user_ids = resolve_user_scope(scope_name, scope_context)
+
+    if not user_ids:
+        err_msg = (
+            'Could not resolve distribution scope "{name}" with context {context}! '
+            'Message ids {ids} were not sent!'
+        ).format(name=scope_name, context=scope_context, ids=[msg.id for msg in msgs])
+
+        raise Exception(err_msg)
+
+    exclude_list = scope_context.get('exclude_user_ids')
+
+    nums_dispatched = [0] * len(msgs)
+    errors = [None] * len(msgs)
+
+    # msg indexes by channel name, as each msg_type can map to a different channel
+    channels = {}
+    msg_indexes = collections.OrderedDict()
+    for index, msg in enumerate(msgs):
+        try:
+            channel = get_notification_channel(None, msg.msg_type, preferred_channel=preferred_channel)
+        except Exception as ex:  # pylint: disable=broad-except
+            log.exception(ex)
+            errors[index] = str(ex)
+            continue
+
+        channels[channel.name] = channel
+        msg_indexes.setdefault(channel.name, []).append(index)
+
+    # we will be going through the users once for each channel
+    if len(channels) > 1:
+        user_ids = list(user_ids)
+
+    for channel_name, indexes in msg_indexes.items():
+        channel = channels[channel_name]
+
+        try:
+            nums = channel.bulk_dispatch_notifications(
+                user_ids,
+                [msgs[index].get_message_for_channel(channel_name) for index in indexes],
+                exclude_user_ids=exclude_list,
+                channel_context=channel_context
+            )
+        except Exception as ex:  # pylint: disable=broad-except
+            log.exception(ex)
+            for index in indexes:
+                errors[index] = str(ex)
+            continue
+
+        for index, num_dispatched in zip(indexes, nums):
+            nums_dispatched[index] = num_dispatched
+
+    return nums_dispatched, errors
+
+
 class PurgeNotificationsCallbackHandler(NotificationCallbackTimerHandler):
     """
         This is the callback class called by the NotificationTimer for purging old notifications.
@@ -219,7 +404,7 @@ class PurgeNotificationsCallbackHandler(NotificationCallbackTimerHandler):
     """
 
     def notification_timer_callback(self, timer):
-        purge_expired_notifications()
+        purge_expired_notifications(timer=timer)
 
         # Reschedule the timer to run again the next day.
         result = {
@@ -235,6 +235,28 @@ class BaseNotificationChannelProvider(metaclass=abc.ABCMeta):
         """
         raise NotImplementedError()
 
+    def bulk_dispatch_notifications(self, user_ids, msgs, exclude_user_ids=None, channel_context=None):
+        """
+        Perform a bulk dispatch of several notification messages to the same
+        user_ids. By default each message is dispatched on its own, channels
+        which can do all of them in one pass over user_ids should override this
+
+        RETURNS: a list of the number of users each msg was dispatched to
+        """
+
+        # we will be going through the user_ids once for each msg
+        user_ids = list(user_ids)
+
+        return [
+            self.bulk_dispatch_notification(
+                user_ids,
+                msg,
+                exclude_user_ids=exclude_user_ids,
+                channel_context=channel_context
+            )
+            for msg in msgs
+        ]
+
     @abc.abstractmethod
     def resolve_msg_link(self, msg, link_name, params, channel_context=None):
         """
@@ -10,14 +10,18 @@ import logging
 
 from edx_notifications import const
 from edx_notifications.data import UserNotification
+from edx_notifications.recipients import RecipientStream
 from edx_notifications.stores.store import notification_store
+from edx_notifications.pubsub import publish_notification_wakeups
 from edx_notifications.channels.channel import BaseNotificationChannelProvider
+from edx_notifications.channels.parallel import ParallelBulkDispatchMixin
 from edx_notifications.channels.link_resolvers import MsgTypeToUrlResolverMixin
 
 log = logging.getLogger(__name__)
 
 
-class BaseDurableNotificationChannel(MsgTypeToUrlResolverMixin, BaseNotificationChannelProvider):
+class BaseDurableNotificationChannel(MsgTypeToUrlResolverMixin, ParallelBulkDispatchMixin,
+                                     BaseNotificationChannelProvider):
     """
     A durable notification channel will save messages to
     the database. This can be subclassed by any specialized
@@ -29,7 +33,7 @@ class BaseDurableNotificationChannel(MsgTypeToUrlResolverMixin, BaseNotification
         """
         Send a notification to a user, which - in a durable Notification -
         is simply store it in the database, and - soon in the future -
-        raise some signal to a waiting client that a message is available
+        signal to any waiting client that a message is available
         """
 
         store = notification_store()
@@ -51,12 +55,10 @@ class BaseDurableNotificationChannel(MsgTypeToUrlResolverMixin, BaseNotification
 
         _user_msg = store.save_user_notification(user_msg)
 
-        #
-        # When we support in-broswer push notifications
-        # such as Comet/WebSockets, this is where we should
-        # signal the client to come fetch the
-        # notification that has just been dispatched
-        #
+        # signal any client that is waiting on the notification
+        # events endpoint to come fetch the notification that
+        # has just been dispatched
+        publish_notification_wakeups([user_id])
 
         #
         # Here is where we will tie into the Analytics pipeline
@@ -69,7 +71,9 @@ class BaseDurableNotificationChannel(MsgTypeToUrlResolverMixin, BaseNotification
         Perform a bulk dispatch of the notification message to
         all user_ids that will be enumerated over in user_ids.
 
-        NOTE: We will chunk together up to NOTIFICATION_BULK_PUBLISH_CHUNK_SIZE
+        NOTE: Recipients are streamed to the store provider, which will write
+        them to the database in large batches (see NOTIFICATION_BULK_INSERT_BATCH_SIZE).
+        This can be spread over multiple processes, see NOTIFICATION_BULK_PUBLISH_PARALLEL_WORKERS
 
         user_ids should be a list, a generator function, or a
         django.db.models.query.ValuesQuerySet/ValuesListQuerySet
@@ -84,31 +88,83 @@ class BaseDurableNotificationChannel(MsgTypeToUrlResolverMixin, BaseNotification
         # persist the message in our Store Provide
         _msg = store.save_notification_message(msg)
 
-        user_msgs = []
-
-        exclude_user_ids = exclude_user_ids if exclude_user_ids else []
-
-        cnt = 0
-        total = 0
-
-        # enumerate through the list of user_ids and chunk them
-        # up. Be sure not to include any user_id in the exclude list
-        for user_id in user_ids:
-            if user_id not in exclude_user_ids:
-                user_msgs.append(
-                    UserNotification(
-                        user_id=user_id,
-                        msg=_msg
-                    )
-                )
-                cnt = cnt + 1
-                total = total + 1
-                if cnt == const.NOTIFICATION_BULK_PUBLISH_CHUNK_SIZE:
-                    store.bulk_create_user_notification(user_msgs)
-                    user_msgs = []
-                    cnt = 0
-
-        if user_msgs:
-            store.bulk_create_user_notification(user_msgs)
-
-        return total
+        # enumerate through the list of user_ids lazily, be sure
+        # not to include any user_id in the exclude list nor
+        # any duplicates
+        recipients = RecipientStream(user_ids, exclude_user_ids=exclude_user_ids)
+
+        num_sent = self.dispatch_to_recipients(recipients, _msg, channel_context=channel_context)
+
+        recipients.log_stats(_msg)
+
+        return num_sent
+
+    def bulk_dispatch_notifications(self, user_ids, msgs, exclude_user_ids=None, channel_context=None):
+        """
+        Perform a bulk dispatch of several notification messages to the same user_ids,
+        in a single pass over the recipients: the UserNotifications of all msgs are
+        written in the same batches.
+
+        NOTE: Unlike bulk_dispatch_notification() this is not spread over multiple processes
+        """
+
+        store = notification_store()
+
+        # persist a copy of each msg with resolved links
+        _msgs = [store.save_notification_message(self._get_linked_resolved_msg(msg)) for msg in msgs]
+
+        recipients = RecipientStream(user_ids, exclude_user_ids=exclude_user_ids)
+
+        num_sent = self._dispatch_to_users(recipients, _msgs)
+
+        for _msg in _msgs:
+            recipients.log_stats(_msg)
+
+        return [num_sent] * len(_msgs)
+
+    def dispatch_to_users(self, user_ids, msg, channel_context=None):
+        """
+        Write out the UserNotifications for an already saved - and link resolved - msg
+        """
+
+        return self._dispatch_to_users(user_ids, [msg])
+
+    def _dispatch_to_users(self, user_ids, msgs):
+        """
+        Write out the UserNotifications of all of the already saved - and link
+        resolved - msgs for each of the user_ids
+
+        RETURNS: the number of users the msgs were dispatched to
+        """
+
+        # remember who to wake up as the recipients stream by, unless there are
+        # so many of them that we might as well wake up everyone
+        wakeup_user_ids = []
+
+        def _record_wakeups(user_ids):
+            """
+            Pass the user_ids through, noting them down as we go
+            """
+            for user_id in user_ids:
+                if len(wakeup_user_ids) <= const.NOTIFICATION_PUSH_MAX_TARGETED_USERS:
+                    wakeup_user_ids.append(user_id)
+                yield user_id
+
+        if len(msgs) == 1:
+            num_sent = notification_store().bulk_create_user_notifications_for_message(
+                msgs[0].id,
+                _record_wakeups(user_ids)
+            )
+        else:
+            num_created = notification_store().bulk_create_user_notifications_for_messages(
+                [msg.id for msg in msgs],
+                _record_wakeups(user_ids)
+            )
+            num_sent = num_created // len(msgs) if msgs else 0
+
+        if len(wakeup_user_ids) > const.NOTIFICATION_PUSH_MAX_TARGETED_USERS:
+            publish_notification_wakeups(None)
+        elif wakeup_user_ids:
+            publish_notification_wakeups(wakeup_user_ids)
+
+        return num_sent
@@ -0,0 +1,131 @@
+"""
+Support for NotificationChannels to spread a bulk dispatch over
+a pool of worker processes, each with their own database connection
+"""
+
+
+
+import os
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from django.db import connections, transaction
+
+from edx_notifications import const
+from edx_notifications.recipients import partition_user_ids
+from edx_notifications.stores.store import notification_store
+
+log = logging.getLogger(__name__)
+
+
+def get_parallel_executor(max_workers):
+    """
+    Returns the concurrent.futures executor to run the partitions on. We fork the
+    worker processes, so that they inherit the fully configured Django runtime
+    """
+
+    return ProcessPoolExecutor(
+        max_workers=max_workers,
+        mp_context=multiprocessing.get_context('fork')
+    )
+
+
+def _dispatch_partition(channel_name, user_ids, msg, channel_context):
+    """
+    Entry point in the worker process. Since the worker can't be handed the
+    channel instance itself, we look it back up by name
+    """
+
+    # avoid circular import
+    from edx_notifications.channels.channel import get_notification_channel
+
+    channel = get_notification_channel(None, msg.msg_type, preferred_channel=channel_name)
+
+    log.debug('Dispatching partition of %d users in process %d', len(user_ids), os.getpid())
+
+    return channel.dispatch_to_users(user_ids, msg, channel_context=channel_context)
+
+
+class ParallelBulkDispatchMixin:
+    """
+    Mixin for NotificationChannels whose bulk dispatch can be partitioned over
+    worker processes. Whether - and how - this happens is controlled by
+    NOTIFICATION_BULK_PUBLISH_PARALLEL_WORKERS and NOTIFICATION_BULK_PUBLISH_PARTITION_STRATEGY.
+
+    Channels must implement dispatch_to_users(), which is called with each
+    partition of the recipients.
+    """
+
+    def dispatch_to_users(self, user_ids, msg, channel_context=None):
+        """
+        Dispatch msg to the list of - already filtered and deduplicated - user_ids
+
+        RETURNS: the number of users the msg was dispatched to
+        """
+        raise NotImplementedError()
+
+    def _can_dispatch_in_parallel(self, num_workers):  # pylint: disable=no-self-use
+        """
+        Worker processes need to be able to see everything that the calling
+        process has written to the database, so we can't go parallel from within
+        a transaction
+        """
+
+        if num_workers <= 1:
+            return False
+
+        write_db = notification_store().get_write_database_alias()
+        if transaction.get_connection(using=write_db).in_atomic_block:
+            log.warning(
+                'Cannot dispatch in parallel from within a database transaction, '
+                'falling back to dispatching in the calling process'
+            )
+            return False
+
+        return True
+
+    def dispatch_to_recipients(self, recipients, msg, channel_context=None, num_workers=None, strategy=None):
+        """
+        Dispatch msg to all recipients, which typically is a RecipientStream. If so
+        configured - and there are enough recipients - the recipients are partitioned
+        and each partition is dispatched by a separate worker process.
+
+        RETURNS: the aggregated number of users the msg was dispatched to
+        """
+
+        num_workers = num_workers if num_workers else const.NOTIFICATION_BULK_PUBLISH_PARALLEL_WORKERS
+        strategy = strategy if strategy else const.NOTIFICATION_BULK_PUBLISH_PARTITION_STRATEGY
+
+        if not self._can_dispatch_in_parallel(num_workers):
+            return self.dispatch_to_users(recipients, msg, channel_context=channel_context)
+
+        user_ids = list(recipients)
+
+        if len(user_ids) < const.NOTIFICATION_BULK_PUBLISH_PARALLEL_MIN_USERS:
+            return self.dispatch_to_users(user_ids, msg, channel_context=channel_context)
+
+        partitions = partition_user_ids(user_ids, num_workers, strategy=strategy)
+
+        # the worker processes must not share our database connections,
+        # so close them before forking. Every worker - as well as the
+        # calling process - will then open their own
+        connections.close_all()
+
+        with get_parallel_executor(len(partitions)) as executor:
+            futures = [
+                executor.submit(_dispatch_partition, self.name, partition, msg, channel_context)
+                for partition in partitions
+            ]
+
+            num_sent = sum(future.result() for future in futures)
+
+        log.info(
+            'Dispatched msg_id %s to %d users in %d partitions (%s)',
+            msg.id,
+            num_sent,
+            len(partitions),
+            strategy
+        )
+
+        return num_sent
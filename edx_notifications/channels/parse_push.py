@@ -11,6 +11,7 @@ from parse_rest.connection import register
 from parse_rest.installation import Push
 
 from edx_notifications.data import NotificationType, NotificationMessage
+from edx_notifications.recipients import RecipientStream
 from edx_notifications.exceptions import ChannelError, ItemNotFoundError
 from edx_notifications.lib.publisher import (
     get_notification_type,
@@ -112,13 +113,13 @@ class ParsePushNotificationChannelProvider(BaseNotificationChannelProvider):
         be one element in the user_ids array
         """
 
-        cnt = 0
-        for user_id in user_ids:
-            if not exclude_user_ids or user_id not in exclude_user_ids:
-                self.dispatch_notification_to_user(user_id, msg, channel_context=channel_context)
-                cnt += 1
+        recipients = RecipientStream(user_ids, exclude_user_ids=exclude_user_ids)
+        for user_id in recipients:
+            self.dispatch_notification_to_user(user_id, msg, channel_context=channel_context)
 
-        return cnt
+        recipients.log_stats(msg)
+
+        return recipients.num_recipients
 
     def resolve_msg_link(self, msg, link_name, params, channel_context=None):
         """
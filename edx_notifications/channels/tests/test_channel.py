@@ -275,4 +275,7 @@ class ChannelTests(TestCase):
         self.assertIsNone(provider.dispatch_notification_to_user(None, None))
         self.assertEqual(provider.bulk_dispatch_notification(None, None), 0)
 
+        # several messages are dispatched one by one
+        self.assertEqual(provider.bulk_dispatch_notifications(iter([1, 2]), [None, None]), [0, 0])
+
         self.assertIsNone(provider.resolve_msg_link(None, None, None))
@@ -0,0 +1,164 @@
+"""
+Tests for dispatching bulk notifications from multiple worker processes
+"""
+
+
+from unittest import mock
+from concurrent.futures import Future, Executor
+
+from django.core import mail
+from django.test import TestCase, TransactionTestCase
+
+from edx_notifications import const, startup
+from edx_notifications.data import NotificationType, NotificationMessage
+from edx_notifications.scopes import register_user_scope_resolver
+from edx_notifications.lib.consumer import get_notifications_count_for_user
+from edx_notifications.lib.publisher import register_notification_type, bulk_publish_notification_to_users
+from edx_notifications.channels.tests.test_triggered_email import TestUserResolver
+
+
+class InProcessExecutor(Executor):
+    """
+    Runs each partition right away in the calling process, as the worker processes
+    would not be able to see the (in-memory) test database
+    """
+
+    def __init__(self, max_workers=None):  # pylint: disable=unused-argument
+        """
+        Initializer
+        """
+        self.num_submitted = 0
+
+    def submit(self, fn, *args, **kwargs):  # pylint: disable=arguments-differ
+        """
+        Call fn and wrap the result in a Future
+        """
+
+        self.num_submitted += 1
+
+        future = Future()
+        future.set_result(fn(*args, **kwargs))
+        return future
+
+
+@mock.patch.object(const, 'NOTIFICATION_BULK_PUBLISH_PARALLEL_MIN_USERS', 10)
+@mock.patch.object(const, 'NOTIFICATION_BULK_PUBLISH_PARALLEL_WORKERS', 4)
+class ParallelDispatchTestCases(TransactionTestCase):
+    """
+    Go through the parallel dispatch paths of the durable and triggered-email channels
+    """
+
+    def setUp(self):
+        """
+        Test setup
+        """
+
+        self.msg_type = NotificationType(
+            name='open-edx.edx_notifications.channels.tests.test_parallel',
+            renderer='edx_notifications.renderers.basic.JsonRenderer',
+        )
+        register_notification_type(self.msg_type)
+
+        self.msg = NotificationMessage(
+            namespace='test-runner',
+            msg_type=self.msg_type,
+            payload={
+                'foo': 'bar',
+                '_click_link': 'http://localhost',
+            }
+        )
+
+        self.executor = InProcessExecutor()
+
+    def test_durable_parallel_dispatch(self):
+        """
+        Make sure all partitions get dispatched and the counts aggregated
+        """
+
+        with mock.patch(
+            'edx_notifications.channels.parallel.get_parallel_executor',
+            return_value=self.executor
+        ) as get_executor:
+            num_sent = bulk_publish_notification_to_users(
+                list(range(1, 51)) + [1, 2, 3],
+                self.msg,
+                exclude_user_ids=[50]
+            )
+
+        get_executor.assert_called_once_with(4)
+        self.assertEqual(self.executor.num_submitted, 4)
+        self.assertEqual(num_sent, 49)
+
+        for user_id in range(1, 51):
+            self.assertEqual(get_notifications_count_for_user(user_id), 0 if user_id == 50 else 1)
+
+    @mock.patch.object(const, 'NOTIFICATION_BULK_PUBLISH_PARTITION_STRATEGY', 'range')
+    def test_range_partitions(self):
+        """
+        Make sure we get the same results with range partitioning
+        """
+
+        with mock.patch('edx_notifications.channels.parallel.get_parallel_executor', return_value=self.executor):
+            num_sent = bulk_publish_notification_to_users(list(range(1, 51)), self.msg)
+
+        self.assertEqual(self.executor.num_submitted, 4)
+        self.assertEqual(num_sent, 50)
+
+    def test_below_minimum(self):
+        """
+        Small dispatches don't get spread out
+        """
+
+        with mock.patch('edx_notifications.channels.parallel.get_parallel_executor') as get_executor:
+            num_sent = bulk_publish_notification_to_users(list(range(1, 6)), self.msg)
+
+        self.assertFalse(get_executor.called)
+        self.assertEqual(num_sent, 5)
+
+    def test_triggered_email_parallel_dispatch(self):
+        """
+        Make sure each user gets emailed exactly once
+        """
+
+        startup.initialize()
+        register_user_scope_resolver('user_email_resolver', TestUserResolver())
+
+        with mock.patch('edx_notifications.channels.parallel.get_parallel_executor', return_value=self.executor):
+            num_sent = bulk_publish_notification_to_users(
+                list(range(1, 21)),
+                self.msg,
+                preferred_channel='triggered-email'
+            )
+
+        self.assertEqual(self.executor.num_submitted, 4)
+        self.assertEqual(num_sent, 20)
+        # the TestUserResolver resolves each user to two email addresses
+        self.assertEqual(len(mail.outbox), 40)
+
+
+@mock.patch.object(const, 'NOTIFICATION_BULK_PUBLISH_PARALLEL_MIN_USERS', 10)
+@mock.patch.object(const, 'NOTIFICATION_BULK_PUBLISH_PARALLEL_WORKERS', 4)
+class ParallelDispatchInTransactionTestCases(TestCase):
+    """
+    Make sure we don't go parallel from within a transaction
+    """
+
+    def test_fallback(self):
+        """
+        TestCases run in a transaction, so this should all happen in the calling process
+        """
+
+        msg_type = NotificationType(
+            name='open-edx.edx_notifications.channels.tests.test_parallel',
+            renderer='edx_notifications.renderers.basic.JsonRenderer',
+        )
+        register_notification_type(msg_type)
+
+        with mock.patch('edx_notifications.channels.parallel.get_parallel_executor') as get_executor:
+            num_sent = bulk_publish_notification_to_users(
+                list(range(1, 51)),
+                NotificationMessage(namespace='test-runner', msg_type=msg_type, payload={'foo': 'bar'})
+            )
+
+        self.assertFalse(get_executor.called)
+        self.assertEqual(num_sent, 50)
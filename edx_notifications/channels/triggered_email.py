@@ -20,15 +20,18 @@ from django.template.loader import render_to_string
 from edx_notifications import const
 from edx_notifications.data import UserNotification
 from edx_notifications.scopes import resolve_user_scope
+from edx_notifications.recipients import RecipientStream
 from edx_notifications.digests import attach_image, with_inline_css, get_group_name_for_msg_type
 from edx_notifications.channels.channel import BaseNotificationChannelProvider
+from edx_notifications.channels.parallel import ParallelBulkDispatchMixin
 from edx_notifications.renderers.renderer import get_renderer_for_type
 from edx_notifications.channels.link_resolvers import MsgTypeToUrlResolverMixin
 
 log = logging.getLogger(__name__)
 
 
-class TriggeredEmailChannelProvider(MsgTypeToUrlResolverMixin, BaseNotificationChannelProvider):
+class TriggeredEmailChannelProvider(MsgTypeToUrlResolverMixin, ParallelBulkDispatchMixin,
+                                    BaseNotificationChannelProvider):
     """
     A TriggeredEmail notification channel will
     send email to the user.
@@ -133,14 +136,26 @@ class TriggeredEmailChannelProvider(MsgTypeToUrlResolverMixin, BaseNotificationC
         when directly feeding in a Django ORM queryset, where we select just the id column of the user
         """
 
-        total = 0
-
         # enumerate through the list of user_ids and call
-        # dispatch_notification_to_user method.
-        # make sure not to include any user_id in the exclude list
+        # dispatch_notification_to_user method - possibly from
+        # multiple processes. Make sure not to include any user_id
+        # in the exclude list and not to email the same user twice
+        recipients = RecipientStream(user_ids, exclude_user_ids=exclude_user_ids)
+
+        num_sent = self.dispatch_to_recipients(recipients, msg, channel_context=channel_context)
+
+        recipients.log_stats(msg)
+
+        return num_sent
+
+    def dispatch_to_users(self, user_ids, msg, channel_context=None):
+        """
+        Email msg to each one of user_ids
+        """
+
+        total = 0
         for user_id in user_ids:
-            if not exclude_user_ids or user_id not in exclude_user_ids:
-                total += 1
-                self.dispatch_notification_to_user(user_id, msg, channel_context)
+            self.dispatch_notification_to_user(user_id, msg, channel_context)
+            total += 1
 
         return total
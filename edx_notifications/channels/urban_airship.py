@@ -12,6 +12,7 @@ import requests
 from requests.auth import HTTPBasicAuth
 from requests.exceptions import RequestException
 
+from edx_notifications.recipients import RecipientStream
 from edx_notifications.channels.channel import BaseNotificationChannelProvider
 
 # system defined constants that only we should know about
@@ -114,11 +115,9 @@ class UrbanAirshipNotificationChannelProvider(BaseNotificationChannelProvider):
         elif 'send_to_all' in msg.payload and msg.payload['send_to_all'] is True:
             payload = self.create_all_user_payload(msg)
         else:
-            exclude_user_ids = exclude_user_ids if exclude_user_ids else []
-            actual_user_ids = []
-            for user_id in user_ids:
-                if user_id not in exclude_user_ids:
-                    actual_user_ids.append(user_id)
+            recipients = RecipientStream(user_ids, exclude_user_ids=exclude_user_ids)
+            actual_user_ids = list(recipients)
+            recipients.log_stats(msg)
             payload = self.create_bulk_user_payload(actual_user_ids, msg)
 
         self._add_type_in_payload(msg, payload)
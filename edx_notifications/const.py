@@ -26,11 +26,156 @@ RENDER_FORMAT_DIGEST = 'digest'
 RENDER_FORMAT_JSON = 'json'
 
 NOTIFICATION_BULK_PUBLISH_CHUNK_SIZE = getattr(settings, 'NOTIFICATION_BULK_PUBLISH_CHUNK_SIZE', 100)
+
+# how many worker processes the durable and triggered-email channels use to dispatch
+# a bulk notification. 1 (the default) means that everything is done in the calling process
+NOTIFICATION_BULK_PUBLISH_PARALLEL_WORKERS = getattr(settings, 'NOTIFICATION_BULK_PUBLISH_PARALLEL_WORKERS', 1)
+
+# how the recipients get divided up amongst the worker processes, either
+# 'modulo' (user_id % workers) or 'range' (contiguous ranges of sorted user_ids)
+NOTIFICATION_BULK_PUBLISH_PARTITION_STRATEGY = getattr(
+    settings,
+    'NOTIFICATION_BULK_PUBLISH_PARTITION_STRATEGY',
+    'modulo'
+)
+
+# bulk dispatches to fewer recipients than this are not worth spinning up worker processes for
+NOTIFICATION_BULK_PUBLISH_PARALLEL_MIN_USERS = getattr(settings, 'NOTIFICATION_BULK_PUBLISH_PARALLEL_MIN_USERS', 5000)
+
+# how many rows to put in a single multi-row INSERT when streaming a fan-out
+# straight into the database. The database backend might cap this further
+# (e.g. SQLite has a limit on the number of query parameters)
+NOTIFICATION_BULK_INSERT_BATCH_SIZE = getattr(settings, 'NOTIFICATION_BULK_INSERT_BATCH_SIZE', 1000)
+
+# whether bulk_publish_notification_to_scope() should - by default - enqueue a fan-out
+# job which is processed by the 'process_notification_fanout_jobs' management command,
+# rather than dispatching to the whole audience in the calling process
+NOTIFICATION_FANOUT_ASYNC = getattr(settings, 'NOTIFICATION_FANOUT_ASYNC', False)
+
+# how many recipients a fan-out worker dispatches - and checkpoints - at a time
+NOTIFICATION_FANOUT_JOB_SLICE_SIZE = getattr(settings, 'NOTIFICATION_FANOUT_JOB_SLICE_SIZE', 1000)
+
+# how long a worker holds on to a fan-out job before another worker can
+# presume it has crashed and take over the job from its last checkpoint
+NOTIFICATION_FANOUT_JOB_LEASE_SECS = getattr(settings, 'NOTIFICATION_FANOUT_JOB_LEASE_SECS', 300)
+
+# how many times we try to process a fan-out job before giving up on it
+NOTIFICATION_FANOUT_JOB_MAX_ATTEMPTS = getattr(settings, 'NOTIFICATION_FANOUT_JOB_MAX_ATTEMPTS', 3)
+
+NOTIFICATION_FANOUT_JOB_STATUS_PENDING = 'pending'
+NOTIFICATION_FANOUT_JOB_STATUS_RUNNING = 'running'
+NOTIFICATION_FANOUT_JOB_STATUS_COMPLETED = 'completed'
+NOTIFICATION_FANOUT_JOB_STATUS_FAILED = 'failed'
+
+# whether the SQL store keeps a per-user (and per-namespace) count of unread notifications,
+# so that polling for the unread count does not have to COUNT(*) all of a user's notifications.
+# If this is ever turned off and back on again, run the 'rebuild_unread_notification_counters'
+# management command
+NOTIFICATION_UNREAD_COUNTERS_ENABLED = getattr(settings, 'NOTIFICATION_UNREAD_COUNTERS_ENABLED', True)
+
+# how often subscribers to the notification events endpoint check the Notification Store for
+# changes, when they are not woken up. The default pub/sub provider can only wake up subscribers
+# within the same process, so this is how long it takes for e.g. a fan-out worker's notifications
+# to reach other processes' subscribers
+NOTIFICATION_PUSH_POLL_PERIOD_SECS = getattr(settings, 'NOTIFICATION_PUSH_POLL_PERIOD_SECS', 5)
+
+# how long a long-poll request to the notification events endpoint is held open at most
+NOTIFICATION_PUSH_LONG_POLL_TIMEOUT_SECS = getattr(settings, 'NOTIFICATION_PUSH_LONG_POLL_TIMEOUT_SECS', 30)
+
+# how long a Server-Sent Events stream is held open before the client has to reconnect,
+# so that connections (and whatever worker serves them) are recycled every so often
+NOTIFICATION_PUSH_STREAM_MAX_SECS = getattr(settings, 'NOTIFICATION_PUSH_STREAM_MAX_SECS', 300)
+
+# how often something is sent down an idle Server-Sent Events stream, to keep proxies
+# from timing out the connection
+NOTIFICATION_PUSH_HEARTBEAT_SECS = getattr(settings, 'NOTIFICATION_PUSH_HEARTBEAT_SECS', 15)
+
+# bulk dispatches to more users than this wake up every subscriber, rather
+# than publishing a wake-up for each and every recipient
+NOTIFICATION_PUSH_MAX_TARGETED_USERS = getattr(settings, 'NOTIFICATION_PUSH_MAX_TARGETED_USERS', 1000)
+
+# the Django cache which holds the version stamp of the process-wide registry of NotificationTypes,
+# which is how processes find out that another one has changed a NotificationType. This has to be
+# a cache which all processes share (e.g. memcached or Redis), rather than the per-process LocMemCache
+NOTIFICATION_TYPE_REGISTRY_CACHE_NAME = getattr(settings, 'NOTIFICATION_TYPE_REGISTRY_CACHE_NAME', 'default')
+
+# how often processes check on that version stamp
+NOTIFICATION_TYPE_REGISTRY_CHECK_SECS = getattr(settings, 'NOTIFICATION_TYPE_REGISTRY_CHECK_SECS', 60)
+
 NOTIFICATION_MINIMUM_PERIODICITY_MINS = getattr(settings, 'NOTIFICATION_MINIMUM_PERIODICITY_MINS', 60)  # hourly
 
+# how long a scheduler process holds on to a timer it is executing before another process can
+# presume it has crashed and execute the timer again, so this needs to be longer than any timer
+# callback (e.g. sending out the digests) takes
+NOTIFICATION_TIMER_LEASE_SECS = getattr(settings, 'NOTIFICATION_TIMER_LEASE_SECS', 3600)
+
+# how many due timers a scheduler process claims at a time
+NOTIFICATION_TIMER_CLAIM_BATCH_SIZE = getattr(settings, 'NOTIFICATION_TIMER_CLAIM_BATCH_SIZE', 10)
+
+# how many timers are read at a time when going through all of the active ones
+NOTIFICATION_TIMER_SCAN_BATCH_SIZE = getattr(settings, 'NOTIFICATION_TIMER_SCAN_BATCH_SIZE', 100)
+
+# how many timer callbacks a scheduler process runs at the same time, each on its own thread.
+# With 1, they are run one after the other on the scheduler's thread, so that callbacks which
+# aren't thread safe keep working
+NOTIFICATION_TIMER_MAX_WORKERS = getattr(settings, 'NOTIFICATION_TIMER_MAX_WORKERS', 1)
+
+# how many timers of a class_name a scheduler process runs at the same time at most,
+# classes which are not listed can use all of the workers
+NOTIFICATION_TIMER_CONCURRENCY = getattr(settings, 'NOTIFICATION_TIMER_CONCURRENCY', {
+    'edx_notifications.digests.NotificationDigestMessageCallback': 1,
+})
+
+# which timers are run first when more of them are due than there are workers, by class_name.
+# Higher goes first and classes which are not listed have a priority of 0
+NOTIFICATION_TIMER_PRIORITIES = getattr(settings, 'NOTIFICATION_TIMER_PRIORITIES', {
+    'edx_notifications.callbacks.NotificationDispatchMessageCallback': 10,
+    'edx_notifications.digests.NotificationDigestMessageCallback': -10,
+})
+
+# how long a scheduler process waits for a timer callback of a class_name (when run on a worker
+# thread) before recording it as timed out, rescheduling it and moving on. The callback itself
+# can't be interrupted, so it still runs to its end - and keeps taking up its thread, as well as
+# counting against NOTIFICATION_TIMER_CONCURRENCY - but its results are thrown away
+NOTIFICATION_TIMER_TIMEOUT_SECS = getattr(settings, 'NOTIFICATION_TIMER_TIMEOUT_SECS', {})
+
+# whether timed notifications which are due at the same time - i.e. claimed in the same batch,
+# see NOTIFICATION_TIMER_CLAIM_BATCH_SIZE - and go out to the same distribution scope are
+# dispatched together, resolving the scope only once
+NOTIFICATION_TIMER_COALESCE_DISPATCH = getattr(settings, 'NOTIFICATION_TIMER_COALESCE_DISPATCH', True)
+
+# how often the resident scheduler (see the run_notification_scheduler command) looks for
+# timers which have been changed since it last looked, when it isn't woken up before that
+NOTIFICATION_SCHEDULER_REFRESH_SECS = getattr(settings, 'NOTIFICATION_SCHEDULER_REFRESH_SECS', 10)
+
+# how far back those looks overlap, so that changes which were committed late - or
+# which were stamped by a server whose clock is behind - are not missed
+NOTIFICATION_SCHEDULER_LOOKBACK_SECS = getattr(settings, 'NOTIFICATION_SCHEDULER_LOOKBACK_SECS', 60)
+
+# how often the resident scheduler reloads all of the timers, e.g. to forget about deleted ones
+NOTIFICATION_SCHEDULER_RESYNC_SECS = getattr(settings, 'NOTIFICATION_SCHEDULER_RESYNC_SECS', 3600)
+
+# how often the resident scheduler logs how late it has been executing timers
+NOTIFICATION_SCHEDULER_REPORT_SECS = getattr(settings, 'NOTIFICATION_SCHEDULER_REPORT_SECS', 300)
+
 NOTIFICATION_PURGE_READ_OLDER_THAN_DAYS = getattr(settings, 'NOTIFICATION_PURGE_READ_OLDER_THAN_DAYS', None)
 NOTIFICATION_PURGE_UNREAD_OLDER_THAN_DAYS = getattr(settings, 'NOTIFICATION_PURGE_UNREAD_OLDER_THAN_DAYS', None)
 
+# purging goes through the expired notifications in batches of this many rows,
+# so that no single statement holds locks on the table for long
+NOTIFICATION_PURGE_BATCH_SIZE = getattr(settings, 'NOTIFICATION_PURGE_BATCH_SIZE', 1000)
+
+# and pauses for this many seconds between batches, to let other traffic through
+NOTIFICATION_PURGE_BATCH_PAUSE_SECS = getattr(settings, 'NOTIFICATION_PURGE_BATCH_PAUSE_SECS', 0.1)
+
+# purging also moves the timers which are done with - executed one-shot timers, and inactive
+# ones - into the timer archive, once they haven't been changed for this many days
+NOTIFICATION_TIMER_ARCHIVE_AFTER_DAYS = getattr(settings, 'NOTIFICATION_TIMER_ARCHIVE_AFTER_DAYS', None)
+
+# when the user notifications are partitioned by month (see the PARTITIONED_USER_NOTIFICATIONS
+# option of the SQL store provider), every purge makes sure there are partitions this many months ahead
+NOTIFICATION_PARTITION_MONTHS_AHEAD = getattr(settings, 'NOTIFICATION_PARTITION_MONTHS_AHEAD', 3)
+
 DAILY_DIGEST_TIMER_NAME = 'daily-digest-timer'
 WEEKLY_DIGEST_TIMER_NAME = 'weekly-digest-timer'
 
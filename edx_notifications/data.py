@@ -396,6 +396,68 @@ class NotificationCallbackTimer(BaseDataObject):
     # any stats the the callback handler returned
     results = DictField()
 
+    # which scheduler process is currently executing the timer, and until when
+    worker_id = StringField()
+    lease_expires_at = DateTimeField()
+
+    # timestamps
+    created = DateTimeField()
+    modified = DateTimeField()
+
+
+class NotificationFanoutJob(BaseDataObject):
+    """
+    A request to dispatch an already persisted NotificationMessage to
+    everyone in a UserScope. Fan-out jobs are processed by workers
+    outside of the request/response cycle, in slices of recipients.
+    After each slice the worker checkpoints how far into the recipient
+    stream it has gotten, so that - should the worker die - another
+    worker can pick up the job where it was left off
+    """
+
+    # the id of the NotificationMessage to dispatch
+    msg_id = IntegerField()
+
+    # the UserScope to resolve the recipients with
+    scope_name = StringField()
+    scope_context = DictField()
+
+    # any additional dispatch parameters, e.g. 'exclude_user_ids',
+    # 'preferred_channel' and 'channel_context'
+    context = DictField()
+
+    status = EnumField(
+        allowed_values=[
+            const.NOTIFICATION_FANOUT_JOB_STATUS_PENDING,
+            const.NOTIFICATION_FANOUT_JOB_STATUS_RUNNING,
+            const.NOTIFICATION_FANOUT_JOB_STATUS_COMPLETED,
+            const.NOTIFICATION_FANOUT_JOB_STATUS_FAILED,
+        ],
+        default=const.NOTIFICATION_FANOUT_JOB_STATUS_PENDING
+    )
+
+    # which worker currently holds the job, and until when
+    worker_id = StringField()
+    lease_expires_at = DateTimeField()
+
+    # how many times a worker has picked up this job
+    attempts = IntegerField(default=0)
+
+    # the checkpoint: the recipients are processed in ascending order of their
+    # user_id, and everyone up to (and including) last_user_id has been processed
+    last_user_id = IntegerField()
+
+    # how many recipients have been processed already
+    num_processed = IntegerField(default=0)
+
+    # how many notifications the channel actually dispatched
+    num_dispatched = IntegerField(default=0)
+
+    # the last error, if any
+    err_msg = StringField()
+
+    completed_at = DateTimeField()
+
     # timestamps
     created = DateTimeField()
     modified = DateTimeField()
@@ -385,6 +385,7 @@ def _send_user_digest(namespace_info, from_timestamp, to_timestamp, user_id,
         },
         options={
             'select_related': True,  # make sure we do JOINs on the initial query
+            'analytics': True,  # this is a batch job, so read from the analytics replica (if any)
         }
     )
 
@@ -38,3 +38,10 @@ class ChannelError(Exception):
     """
     Thrown when there has been a problem in the NotificationChannel
     """
+
+
+class FanoutJobLeaseExpired(Exception):
+    """
+    Thrown when a worker tries to checkpoint a fan-out job which it
+    no longer holds the lease on, i.e. another worker has taken it over
+    """
@@ -0,0 +1,350 @@
+"""
+Asynchronous fan-out of NotificationMessages to (potentially very large) UserScopes.
+
+Rather than resolving a scope and dispatching to everyone in it in the calling
+process - say a web request - publishers can enqueue a NotificationFanoutJob and
+return immediately. Workers (see the 'process_notification_fanout_jobs' management
+command) then claim jobs and work through the recipients in slices, checkpointing
+after each one, so that a crashed worker's job can be resumed where it was left off.
+
+The queue itself is pluggable via the NOTIFICATION_FANOUT_QUEUE_PROVIDER setting. The
+default implementation keeps the queue in the Notification Store, so no message
+broker is required.
+"""
+
+
+
+import abc
+import logging
+from datetime import datetime
+from itertools import islice
+from importlib import import_module
+
+import pytz
+from django.conf import settings
+from django.db import transaction
+from django.db.models.query import QuerySet
+from django.core.exceptions import ImproperlyConfigured
+
+from edx_notifications import const
+from edx_notifications.data import NotificationFanoutJob
+from edx_notifications.utils import get_worker_id
+from edx_notifications.scopes import resolve_user_scope
+from edx_notifications.exceptions import FanoutJobLeaseExpired
+from edx_notifications.recipients import RecipientStream
+from edx_notifications.stores.store import notification_store
+from edx_notifications.channels.channel import get_notification_channel
+
+log = logging.getLogger(__name__)
+
+DEFAULT_FANOUT_QUEUE_PROVIDER = {
+    'class': 'edx_notifications.fanout.StoreNotificationFanoutQueue',
+    'options': {}
+}
+
+# Cached instance of a fan-out queue
+_FANOUT_QUEUE = None
+
+
+def notification_fanout_queue():
+    """
+    Returns the singleton instance of the fan-out queue that has been
+    configured for this runtime. The class path can be set in
+    NOTIFICATION_FANOUT_QUEUE_PROVIDER in the settings file, otherwise
+    we'll queue up jobs in the Notification Store
+    """
+
+    global _FANOUT_QUEUE  # pylint: disable=global-statement
+
+    if not _FANOUT_QUEUE:
+        config = getattr(settings, 'NOTIFICATION_FANOUT_QUEUE_PROVIDER', DEFAULT_FANOUT_QUEUE_PROVIDER)
+
+        if not config or 'class' not in config or 'options' not in config:
+            msg = (
+                "Misconfigured NOTIFICATION_FANOUT_QUEUE_PROVIDER settings, "
+                "must have both 'class' and 'options' keys."
+            )
+            raise ImproperlyConfigured(msg)
+
+        module_path, _, name = config['class'].rpartition('.')
+        class_ = getattr(import_module(module_path), name)
+
+        _FANOUT_QUEUE = class_(**config['options'])
+
+    return _FANOUT_QUEUE
+
+
+def reset_notification_fanout_queue():
+    """
+    Tears down any cached configuration. This is useful for testing.
+    """
+
+    global _FANOUT_QUEUE  # pylint: disable=global-statement
+
+    _FANOUT_QUEUE = None
+
+
+class BaseNotificationFanoutQueue(metaclass=abc.ABCMeta):
+    """
+    The abstract interface that all fan-out queues must implement
+
+    IMPORTANT: Fan-out queues are assumed to be singletons, therefore there must be
+    no state stored in the instance of the queue class.
+    """
+
+    @abc.abstractmethod
+    def enqueue(self, job):
+        """
+        Put a new NotificationFanoutJob on the queue
+
+        RETURNS: the enqueued NotificationFanoutJob
+        """
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    def claim(self, worker_id):
+        """
+        Hand out the next NotificationFanoutJob that worker_id should process,
+        making sure that no other worker will be handed the same job while
+        worker_id is still working on it
+
+        RETURNS: type NotificationFanoutJob, or None if the queue is empty
+        """
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    def checkpoint(self, job):
+        """
+        Record how far a worker has gotten in processing a NotificationFanoutJob,
+        which also signals that the worker is still alive. Must raise
+        FanoutJobLeaseExpired if the worker no longer holds the job
+
+        RETURNS: the updated NotificationFanoutJob
+        """
+        raise NotImplementedError()
+
+
+class StoreNotificationFanoutQueue(BaseNotificationFanoutQueue):
+    """
+    Default fan-out queue, which keeps the jobs in the Notification Store
+    """
+
+    def __init__(self, **kwargs):
+        """
+        Initializer
+
+        ARGS: kwargs
+            - LEASE_SECS: how long a worker holds on to a job between checkpoints
+              before another worker may take it over
+        """
+
+        self.lease_secs = kwargs.get('LEASE_SECS', const.NOTIFICATION_FANOUT_JOB_LEASE_SECS)
+
+    def enqueue(self, job):
+        """
+        Save the job in the Notification Store
+        """
+
+        return notification_store().save_notification_fanout_job(job)
+
+    def claim(self, worker_id):
+        """
+        Ask the Notification Store for the next claimable job
+        """
+
+        return notification_store().claim_notification_fanout_job(worker_id, self.lease_secs)
+
+    def checkpoint(self, job):
+        """
+        Save progress on the job, which will extend the worker's lease
+        """
+
+        return notification_store().checkpoint_notification_fanout_job(job, self.lease_secs)
+
+
+def enqueue_fanout_job(msg, scope_name, scope_context, exclude_user_ids=None,
+                       preferred_channel=None, channel_context=None):
+    """
+    Persist the NotificationMessage and put a NotificationFanoutJob on the
+    fan-out queue to dispatch it to everyone in the scope
+
+    NOTE: everything that is passed in here has to be JSON serializable
+    as it will have to be picked up by another process
+
+    RETURNS: type NotificationFanoutJob
+    """
+
+    # persist the message, so that the worker can load it back up
+    msg = notification_store().save_notification_message(msg)
+
+    if exclude_user_ids is not None:
+        exclude_user_ids = list(exclude_user_ids)
+
+    job = NotificationFanoutJob(
+        msg_id=msg.id,
+        scope_name=scope_name,
+        scope_context=scope_context,
+        context={
+            'exclude_user_ids': exclude_user_ids,
+            'preferred_channel': preferred_channel,
+            'channel_context': channel_context,
+        }
+    )
+
+    job = notification_fanout_queue().enqueue(job)
+
+    log.info('Enqueued fan-out job %s of msg_id %s to scope "%s"', job.id, msg.id, scope_name)
+
+    return job
+
+
+def process_fanout_job(job, queue=None, slice_size=None):
+    """
+    Dispatch the job's NotificationMessage to all recipients in the job's scope,
+    starting right after the last checkpoint.
+
+    The recipients are dispatched in slices of NOTIFICATION_FANOUT_JOB_SLICE_SIZE. For each
+    slice the dispatch and the checkpoint are committed in the same database transaction,
+    so for durable channels a crashed worker never leaves behind a half-sent slice, nor does
+    a resumed job send anything twice. Non-transactional channels (e.g. email) can send
+    at most one slice twice.
+
+    The recipients are dispatched in ascending order of their user_id, and the checkpoint is
+    the last user_id dispatched to, so that a resumed job carries on with whoever is in the
+    scope by then, even if it has changed in the meantime. ORM resultsets get ordered by the
+    database, whereas lists and generators are sorted in memory
+
+    RETURNS: the updated NotificationFanoutJob
+    """
+
+    queue = queue if queue else notification_fanout_queue()
+    slice_size = slice_size if slice_size else const.NOTIFICATION_FANOUT_JOB_SLICE_SIZE
+
+    store = notification_store()
+    msg = store.get_notification_message_by_id(job.msg_id)
+
+    context = job.context if job.context else {}
+    channel_context = context.get('channel_context')
+
+    channel = get_notification_channel(None, msg.msg_type, preferred_channel=context.get('preferred_channel'))
+    msg = msg.get_message_for_channel(channel.name)
+
+    user_ids = resolve_user_scope(job.scope_name, job.scope_context)
+
+    # skip over everyone that has been committed in a previous run
+    if job.last_user_id is not None:
+        log.info('Resuming fan-out job %s after user_id %d', job.id, job.last_user_id)
+
+    recipients = iter(
+        RecipientStream(
+            _get_ordered_user_ids(user_ids if user_ids else [], after=job.last_user_id),
+            exclude_user_ids=context.get('exclude_user_ids')
+        )
+    )
+
+    while True:
+        user_ids_slice = list(islice(recipients, slice_size))
+        if not user_ids_slice:
+            break
+
+        last_checkpoint = (job.last_user_id, job.num_processed, job.num_dispatched)
+
+        try:
+            # the slice and the checkpoint need to be in the same transaction as the
+            # store's writes, which don't necessarily go to the default database
+            with transaction.atomic(using=notification_store().get_write_database_alias()):
+                num_sent = channel.bulk_dispatch_notification(
+                    user_ids_slice,
+                    msg,
+                    channel_context=channel_context
+                )
+
+                job.last_user_id = user_ids_slice[-1]
+                job.num_processed += len(user_ids_slice)
+                job.num_dispatched += num_sent if num_sent else 0
+                job = queue.checkpoint(job)
+        except Exception:
+            # the slice was rolled back, so the job's progress should be as well
+            job.last_user_id, job.num_processed, job.num_dispatched = last_checkpoint
+            raise
+
+    job.status = const.NOTIFICATION_FANOUT_JOB_STATUS_COMPLETED
+    job.completed_at = datetime.now(pytz.UTC)
+    job = queue.checkpoint(job)
+
+    log.info(
+        'Completed fan-out job %s: %d recipients, %d dispatched',
+        job.id,
+        job.num_processed,
+        job.num_dispatched
+    )
+
+    return job
+
+
+def _get_ordered_user_ids(user_ids, after=None):
+    """
+    Returns the user_ids - a list, a generator or a flat ORM resultset of user_ids - in
+    ascending order, leaving out everyone up to (and including) the user_id after
+    """
+
+    if isinstance(user_ids, QuerySet) and len(user_ids.query.values_select) == 1:
+        field_name = user_ids.query.values_select[0]
+        if after is not None:
+            user_ids = user_ids.filter(**{f'{field_name}__gt': after})
+        return user_ids.order_by(field_name).iterator()
+
+    return sorted(user_id for user_id in user_ids if after is None or user_id > after)
+
+
+def get_fanout_worker_id():
+    """
+    Generate an id that is unique to this worker
+    """
+
+    return get_worker_id()
+
+
+def process_fanout_jobs(worker_id=None, max_jobs=None):
+    """
+    Worker entry point: keep claiming and processing fan-out jobs
+    until the queue is empty (or max_jobs have been processed)
+
+    A job that raises an exception is retried - from its last checkpoint - once
+    its lease runs out, unless it has been attempted NOTIFICATION_FANOUT_JOB_MAX_ATTEMPTS
+    times, in which case it is marked as failed
+
+    RETURNS: the number of jobs that were processed
+    """
+
+    queue = notification_fanout_queue()
+    worker_id = worker_id if worker_id else get_fanout_worker_id()
+
+    num_jobs = 0
+    while max_jobs is None or num_jobs < max_jobs:
+        job = queue.claim(worker_id)
+        if not job:
+            break
+
+        num_jobs += 1
+
+        try:
+            process_fanout_job(job, queue=queue)
+        except FanoutJobLeaseExpired as ex:
+            # someone else has taken over this job, so leave it be
+            log.warning(str(ex))
+        except Exception as ex:  # pylint: disable=broad-except
+            log.exception(ex)
+
+            # keep hold of the job until the lease runs out, at which point it
+            # will be picked up again, unless we've run out of attempts
+            job.err_msg = str(ex)
+            if job.attempts >= const.NOTIFICATION_FANOUT_JOB_MAX_ATTEMPTS:
+                job.status = const.NOTIFICATION_FANOUT_JOB_STATUS_FAILED
+
+            try:
+                queue.checkpoint(job)
+            except FanoutJobLeaseExpired as lease_ex:
+                log.warning(str(lease_ex))
+
+    return num_jobs
@@ -10,12 +10,11 @@ any new methods here will also be exposed to xBlocks!!!!
 
 
 
-from datetime import datetime
-
-import pytz
 from contracts import contract
 
+from edx_notifications import const
 from edx_notifications.data import UserNotificationPreferences
+from edx_notifications.utils import encode_notification_cursor
 from edx_notifications.stores.store import notification_store
 
 
@@ -43,6 +42,17 @@ def get_notifications_count_for_user(user_id, filters=None):
     )
 
 
+@contract(user_id='int,>0')
+def get_notifications_change_token_for_user(user_id):
+    """
+    Returns an opaque string which changes whenever any of the user's
+    notifications change. Clients can use this to find out whether
+    anything has changed since they last asked, e.g. via an ETag
+    """
+
+    return notification_store().get_notifications_change_token(user_id)
+
+
 @contract(user_id='int,>0', msg_id='int,>0')
 def get_notification_for_user(user_id, msg_id):
     """
@@ -69,6 +79,8 @@ def get_notifications_for_user(user_id, filters=None, options=None):
         - options: a dict containing some optional parameters
             - limit: max number to return (up to some system defined max)
             - offset: offset into the list, to implement paging
+            - before: cursor to page from, use get_next_notifications_cursor()
+              on the previous page to get it
     """
 
     # make sure user_id is an integer
@@ -82,6 +94,43 @@ def get_notifications_for_user(user_id, filters=None, options=None):
     )
 
 
+@contract(user_id='int,>0')
+def get_notification_dicts_for_user(user_id, filters=None, options=None):
+    """
+    Same as get_notifications_for_user(), but returns the fields of each
+    UserNotification as a (JSON-ready) dict - as returned by get_fields() - which
+    is cheaper for the store to produce when the notifications are only sent on
+
+    ARGS: see get_notifications_for_user()
+    """
+
+    # make sure user_id is an integer
+    if not isinstance(user_id, int):
+        raise TypeError("user_id must be an integer")
+
+    return notification_store().get_notification_dicts_for_user(
+        user_id,
+        filters=filters,
+        options=options
+    )
+
+
+def get_next_notifications_cursor(user_msgs, limit=None):
+    """
+    Given a page of UserNotifications - as returned by get_notifications_for_user()
+    or get_notification_dicts_for_user() - return
+    the cursor to pass in as the 'before' option to get the next page. Returns None if this
+    was the last page
+    """
+
+    limit = limit if limit else const.NOTIFICATION_MAX_LIST_SIZE
+
+    if not user_msgs or len(user_msgs) < limit:
+        return None
+
+    return encode_notification_cursor(user_msgs[-1])
+
+
 @contract(user_id='int,>0', msg_id='int,>0', read=bool)
 def mark_notification_read(user_id, msg_id, read=True):
     """
@@ -97,16 +146,33 @@ def mark_notification_read(user_id, msg_id, read=True):
     """
 
     store = notification_store()
-    user_msg = store.get_notification_for_user(user_id, msg_id)
 
-    if read:
-        # marking as read
-        user_msg.read_at = datetime.now(pytz.UTC)
-    else:
-        # marking as unread
-        user_msg.read_at = None
+    num_changed = store.mark_user_notifications_read_by_msg_ids(user_id, [msg_id], read=read)
+
+    if not num_changed:
+        # either it already was in that state, or it does not exist,
+        # in which case this raises the ItemNotFoundError
+        store.get_notification_for_user(user_id, msg_id)
+
+
+@contract(user_id='int,>0', msg_ids='list(int,>0)', read=bool)
+def mark_notifications_read(user_id, msg_ids, read=True):
+    """
+    Will mark all of the user's notifications for msg_ids as 'read' (or 'unread' if
+    read is False) in one go. msg_ids the user does not have a notification for are ignored
+
+    ARGS:
+        - user_id: The user that wishes to mark the msgs as read/unread
+        - msg_ids: The corresponding messages that are being marked
+        - read: (Optional) indicate whether messages should be marked as read or unread
+
+    RETURNS: the number of notifications whose read state changed
+
+    NOTE: This will raise a BulkOperationTooLarge if there are more than
+    NOTIFICATION_MAX_LIST_SIZE msg_ids
+    """
 
-    store.save_user_notification(user_msg)
+    return notification_store().mark_user_notifications_read_by_msg_ids(user_id, msg_ids, read=read)
 
 
 @contract(user_id='int,>0')
@@ -20,6 +20,8 @@ from django.db.models.query import QuerySet
 
 from edx_notifications import const
 from edx_notifications.data import NotificationType, NotificationMessage, NotificationCallbackTimer
+from edx_notifications.fanout import enqueue_fanout_job
+from edx_notifications.pubsub import publish_timer_wakeup
 from edx_notifications.scopes import resolve_user_scope, has_user_scope_resolver
 from edx_notifications.exceptions import ItemNotFoundError
 from edx_notifications.stores.store import notification_store
@@ -181,15 +183,15 @@ def bulk_publish_notification_to_users(user_ids, msg, exclude_user_ids=None,
 
 @contract(msg=NotificationMessage)
 def bulk_publish_notification_to_scope(scope_name, scope_context, msg, exclude_user_ids=None,
-                                       preferred_channel=None, channel_context=None):
+                                       preferred_channel=None, channel_context=None, run_async=None):
     """
     This top level API method will publish a notification
     to a UserScope (potentially large). Basically this is a convenience method
     which simple resolves the scope and then called into
     bulk_publish_notifications_to_scope()
 
-    IMPORTANT: In general one will want to call into this method behind a
-    Celery task
+    IMPORTANT: Unless run asynchronously, in general one will want to call
+    into this method behind a Celery task
 
     For built in Scope Resolvers ('course_group', 'course_enrollments')
 
@@ -197,6 +199,13 @@ def bulk_publish_notification_to_scope(scope_name, scope_context, msg, exclude_u
             if scope='course_group' then context = {'course_id': xxxx, 'group_id': xxxxx}
             if scope='course_enrollments' then context = {'course_id'}
 
+    If run_async is True - or if it is not passed in and NOTIFICATION_FANOUT_ASYNC is set - then
+    the fan-out is not done in the calling process. Rather a NotificationFanoutJob is put on the
+    fan-out queue, to be processed by the 'process_notification_fanout_jobs' management command.
+    In that case scope_context, exclude_user_ids and channel_context must be JSON serializable.
+
+    RETURNS: the number of notifications that were dispatched, or - when run
+    asynchronously - the NotificationFanoutJob that was enqueued
     """
     log_msg = (
         'Publishing scoped Notification to scope name "{scope_name}" and scope '
@@ -204,6 +213,30 @@ def bulk_publish_notification_to_scope(scope_name, scope_context, msg, exclude_u
     ).format(scope_name=scope_name, scope_context=scope_context, msg=msg)
     log.info(log_msg)
 
+    if run_async is None:
+        run_async = const.NOTIFICATION_FANOUT_ASYNC
+
+    if run_async:
+        # validate the msg, this will raise a ValidationError if there
+        # is something malformatted or missing in the NotificationMessage
+        msg.validate()
+
+        # make sure we can resolve the scope_name, as the worker will have to
+        if not has_user_scope_resolver(scope_name):
+            err_msg = (
+                'There is no registered scope resolver for scope_name "{name}"'
+            ).format(name=scope_name)
+            raise ValueError(err_msg)
+
+        return enqueue_fanout_job(
+            msg,
+            scope_name,
+            scope_context,
+            exclude_user_ids=exclude_user_ids,
+            preferred_channel=preferred_channel,
+            channel_context=channel_context
+        )
+
     user_ids = resolve_user_scope(scope_name, scope_context)
 
     if not user_ids:
@@ -299,6 +332,9 @@ def publish_timed_notification(msg, send_at, scope_name, scope_context, timer_na
 
     saved_timer = store.save_notification_timer(timer)
 
+    # so that a resident scheduler doesn't have to wait for its next look at the timers
+    publish_timer_wakeup()
+
     return saved_timer
 
 
@@ -329,25 +365,66 @@ def cancel_timed_notification(timer_name, exception_on_not_found=True):
         log.error(err_msg)
 
 
-def purge_expired_notifications():
+def purge_expired_notifications(timer=None):
     """
     This method reads from the configuration how long (in days) old notifications (read and unread separately)
     can remain in the system before being purged. Lack of configuration (or None) means "don't purge ever"
     and calls into the store provider's purge_expired_notifications() method.
+
+    If the purge timer is passed in, the progress of the purge is checkpointed in its context, so
+    that a purge which gets interrupted picks up where it left off the next time around
+
+    If NOTIFICATION_TIMER_ARCHIVE_AFTER_DAYS is set, the timers which are done with get archived as well
     """
 
     store = notification_store()
     now = datetime.datetime.now(pytz.UTC)
 
-    purge_read_older_than = None
-    if const.NOTIFICATION_PURGE_READ_OLDER_THAN_DAYS:
-        purge_read_older_than = now - datetime.timedelta(days=const.NOTIFICATION_PURGE_READ_OLDER_THAN_DAYS)
-
-    purge_unread_older_than = None
-    if const.NOTIFICATION_PURGE_UNREAD_OLDER_THAN_DAYS:
-        purge_unread_older_than = now - datetime.timedelta(days=const.NOTIFICATION_PURGE_UNREAD_OLDER_THAN_DAYS)
+    checkpoint = timer.context.get('purge_checkpoint') if timer and timer.context else None
+
+    if checkpoint:
+        # finish the purge that got interrupted first, with the same cut-offs
+        log.info('Resuming the purge of expired notifications from %s', str(checkpoint))
+        purge_read_older_than = checkpoint['read_older_than']
+        purge_unread_older_than = checkpoint['unread_older_than']
+    else:
+        purge_read_older_than = None
+        if const.NOTIFICATION_PURGE_READ_OLDER_THAN_DAYS:
+            purge_read_older_than = now - datetime.timedelta(days=const.NOTIFICATION_PURGE_READ_OLDER_THAN_DAYS)
+
+        purge_unread_older_than = None
+        if const.NOTIFICATION_PURGE_UNREAD_OLDER_THAN_DAYS:
+            purge_unread_older_than = now - datetime.timedelta(days=const.NOTIFICATION_PURGE_UNREAD_OLDER_THAN_DAYS)
+
+    def _on_checkpoint(progress):
+        """
+        Save the progress in the timer
+        """
+
+        timer.context = timer.context if timer.context else {}
+        timer.context['purge_checkpoint'] = {
+            'read_older_than': purge_read_older_than,
+            'unread_older_than': purge_unread_older_than,
+            'progress': progress,
+        }
+        store.save_notification_timer(timer)
 
     store.purge_expired_notifications(
         purge_read_messages_older_than=purge_read_older_than,
-        purge_unread_messages_older_than=purge_unread_older_than
+        purge_unread_messages_older_than=purge_unread_older_than,
+        options={
+            'checkpoint': checkpoint['progress'] if checkpoint else None,
+            'on_checkpoint': _on_checkpoint if timer else None,
+        }
     )
+
+    # all done, so the next purge starts from scratch
+    if timer and timer.context and 'purge_checkpoint' in timer.context:
+        del timer.context['purge_checkpoint']
+        store.save_notification_timer(timer)
+
+    if const.NOTIFICATION_TIMER_ARCHIVE_AFTER_DAYS:
+        num_archived = store.archive_notification_timers(
+            now - datetime.timedelta(days=const.NOTIFICATION_TIMER_ARCHIVE_AFTER_DAYS)
+        )
+        log.info('Archived %d timers', num_archived)
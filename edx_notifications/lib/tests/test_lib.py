@@ -10,11 +10,14 @@ from django.contrib.auth.models import User
 
 from edx_notifications import const
 from edx_notifications.data import NotificationType, UserNotification, NotificationMessage
+from edx_notifications.fanout import process_fanout_jobs
 from edx_notifications.scopes import register_user_scope_resolver
 from edx_notifications.exceptions import ItemNotFoundError
 from edx_notifications.lib.consumer import (
     mark_notification_read,
     get_notifications_for_user,
+    get_next_notifications_cursor,
+    get_notification_dicts_for_user,
     get_notifications_count_for_user,
     mark_all_user_notification_as_read
 )
@@ -105,6 +108,20 @@ class TestPublisherLibrary(TestCase):
         self.assertEqual(read_user_msg, sent_user_msg)
         self.assertEqual(read_user_msg.msg, sent_user_msg.msg)
 
+        # the same, as dicts
+        with self.assertRaises(ContractNotRespected):
+            get_notification_dicts_for_user('bad-id')
+
+        notification_dicts = get_notification_dicts_for_user(self.test_user_id)
+        self.assertEqual(notification_dicts, [read_user_msg.get_fields()])
+
+        # both can be paged through with a cursor
+        self.assertIsNone(get_next_notifications_cursor(notification_dicts))
+        self.assertEqual(
+            get_next_notifications_cursor(notification_dicts, limit=1),
+            get_next_notifications_cursor(notifications, limit=1)
+        )
+
     def test_publish_multipayloads(self):
         """
         Go through and set up a multi-payload notification and publish it
@@ -300,6 +317,31 @@ class TestPublisherLibrary(TestCase):
             if user_id not in exclude_user_ids:
                 self.assertTrue(isinstance(notifications[0], UserNotification))
 
+    def test_bulk_publish_list_duplicates(self):
+        """
+        Make sure that duplicate user_ids in a bulk publish
+        only result in a single notification per user
+        """
+
+        msg = NotificationMessage(
+            namespace='test-runner',
+            msg_type=self.msg_type,
+            payload={
+                'foo': 'bar'
+            }
+        )
+
+        num_sent = bulk_publish_notification_to_users(
+            [1, 2, 2, 3, 3, 3],
+            msg,
+            exclude_user_ids=set([3])
+        )
+
+        self.assertEqual(num_sent, 2)
+        for user_id in [1, 2]:
+            self.assertEqual(len(get_notifications_for_user(user_id)), 1)
+        self.assertEqual(len(get_notifications_for_user(3)), 0)
+
     def test_bulk_publish_generator(self):
         """
         Make sure we can bulk publish to a number of users
@@ -422,6 +464,47 @@ class TestPublisherLibrary(TestCase):
             self.assertEqual(len(notifications), 1)
             self.assertTrue(isinstance(notifications[0], UserNotification))
 
+    def test_publish_to_scope_async(self):
+        """
+        Make sure that publishing to a scope asynchronously only enqueues
+        a fan-out job, which then gets processed by a worker
+        """
+
+        register_user_scope_resolver("list_scope", TestListScopeResolver())
+
+        msg = NotificationMessage(
+            namespace='test-runner',
+            msg_type=self.msg_type,
+            payload={
+                'foo': 'bar'
+            }
+        )
+
+        job = bulk_publish_notification_to_scope(
+            scope_name="list_scope",
+            scope_context={"range": 5},
+            msg=msg,
+            exclude_user_ids=[2],
+            run_async=True
+        )
+
+        self.assertIsNotNone(job.id)
+        self.assertEqual(job.status, const.NOTIFICATION_FANOUT_JOB_STATUS_PENDING)
+        self.assertEqual(get_notifications_count_for_user(1), 0)
+
+        self.assertEqual(process_fanout_jobs(), 1)
+
+        for user_id in range(1, 5):
+            self.assertEqual(get_notifications_count_for_user(user_id), 0 if user_id == 2 else 1)
+
+        with self.assertRaises(ValueError):
+            bulk_publish_notification_to_scope(
+                scope_name="bad-scope",
+                scope_context={"range": 5},
+                msg=msg,
+                run_async=True
+            )
+
     def test_publish_to_bad_scope(self):
         """
         Assert that we can't publish to a scope which can not be resolved
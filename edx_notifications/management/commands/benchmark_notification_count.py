@@ -0,0 +1,181 @@
+"""
+Django management command to benchmark how long it takes to poll for a user's unread
+notification count (as the counter icon does) as the number of notifications the user
+has grows, comparing a COUNT(*) over the user's notifications with reading their
+denormalized unread counter.
+
+IMPORTANT: This writes to - and then cleans up after itself - the database that
+is configured for the Notification Store. Do not run this against a production
+database.
+"""
+
+
+
+import time
+import logging
+
+from django.core.management.base import BaseCommand, CommandError
+
+from edx_notifications.data import NotificationType
+from edx_notifications.stores.store import notification_store
+from edx_notifications.stores.sql.models import SQLUserNotification, SQLNotificationMessage
+from edx_notifications.stores.sql.store_provider import SQLNotificationStoreProvider
+from edx_notifications.management.commands.benchmark_notification_fanout import (
+    _cleanup,
+    BENCHMARK_MSG_TYPE_NAME,
+    BENCHMARK_USER_ID_OFFSET
+)
+
+log = logging.getLogger(__file__)
+
+BENCHMARK_NAMESPACE = 'benchmark'
+
+# how many rows to insert at a time while setting up the benchmark
+SETUP_BATCH_SIZE = 1000
+
+
+def _add_notifications(user_id, num_notifications):
+    """
+    Give the user num_notifications more unread notifications, each for a message of its own
+    """
+
+    for start in range(0, num_notifications, SETUP_BATCH_SIZE):
+        batch_size = min(SETUP_BATCH_SIZE, num_notifications - start)
+
+        msgs = SQLNotificationMessage.objects.bulk_create([
+            SQLNotificationMessage(
+                namespace=BENCHMARK_NAMESPACE,
+                msg_type_id=BENCHMARK_MSG_TYPE_NAME,
+                payload='{}'
+            )
+            for __ in range(batch_size)
+        ])
+
+        # not all databases hand back the primary keys of bulk created rows
+        if msgs[0].id is None:
+            msg_ids = SQLNotificationMessage.objects.filter(
+                msg_type_id=BENCHMARK_MSG_TYPE_NAME
+            ).order_by('-id').values_list('id', flat=True)[:batch_size]
+        else:
+            msg_ids = [msg.id for msg in msgs]
+
+        SQLUserNotification.objects.bulk_create([
+            SQLUserNotification(user_id=user_id, msg_id=msg_id, namespace=BENCHMARK_NAMESPACE)
+            for msg_id in msg_ids
+        ])
+
+
+def _count_with_join(store, user_id):  # pylint: disable=unused-argument
+    """
+    How unread notifications were counted before namespace was denormalized
+    onto the user notifications: a COUNT(*) which joins on the messages
+    """
+
+    return SQLUserNotification.objects.filter(
+        user_id=user_id,
+        read_at__isnull=True,
+        msg__namespace=BENCHMARK_NAMESPACE
+    ).count()
+
+
+def _count(store, user_id):
+    """
+    A COUNT(*) over the user's unread notifications in the namespace
+    """
+
+    return store._get_prepaged_notifications(  # pylint: disable=protected-access
+        user_id,
+        filters={'read': False, 'namespace': BENCHMARK_NAMESPACE}
+    ).count()
+
+
+def _counter(store, user_id):
+    """
+    Read the user's unread counter for the namespace
+    """
+
+    return store.get_num_notifications_for_user(
+        user_id,
+        filters={'read': False, 'namespace': BENCHMARK_NAMESPACE}
+    )
+
+
+COUNT_STRATEGIES = [
+    ('count-join', _count_with_join),
+    ('count', _count),
+    ('counter', _counter),
+]
+
+
+class Command(BaseCommand):
+    """
+    Django Management command to benchmark polling for the unread notification count
+    """
+
+    help = 'Benchmarks the latency of polling for the unread notification count'
+
+    def add_arguments(self, parser):
+        """
+        Command line arguments
+        """
+
+        parser.add_argument(
+            '--sizes',
+            default='1000,10000,100000',
+            help='Comma separated list of how many notifications the user has when polling'
+        )
+
+        parser.add_argument(
+            '--polls',
+            type=int,
+            default=100,
+            help='How many times to poll for each size, the reported latency is the average'
+        )
+
+    def handle(self, *args, **options):
+        """
+        Management command entry point
+        """
+
+        sizes = sorted(int(size) for size in options.get('sizes', '1000,10000,100000').split(',') if size)
+        num_polls = options.get('polls', 100)
+
+        store = notification_store()
+        if not isinstance(store, SQLNotificationStoreProvider):
+            raise CommandError('This benchmark requires the SQLNotificationStoreProvider')
+
+        log.info("Running management command to benchmark polling for the unread count...")
+
+        store.save_notification_type(
+            NotificationType(
+                name=BENCHMARK_MSG_TYPE_NAME,
+                renderer='edx_notifications.renderers.basic.JsonRenderer',
+            )
+        )
+
+        user_id = BENCHMARK_USER_ID_OFFSET
+        num_notifications = 0
+
+        try:
+            for size in sizes:
+                # grow the user's notifications up to the next size
+                _add_notifications(user_id, size - num_notifications)
+                num_notifications = size
+                store.rebuild_unread_notification_counters(user_ids=[user_id])
+
+                for name, count in COUNT_STRATEGIES:
+                    start = time.time()
+                    for __ in range(num_polls):
+                        unread_count = count(store, user_id)
+                    elapsed = time.time() - start
+
+                    self.stdout.write(
+                        '{name}-{size}: {count} unread, {latency:.3f} ms/poll'.format(
+                            name=name,
+                            size=size,
+                            count=unread_count,
+                            latency=elapsed * 1000 / num_polls
+                        )
+                    )
+        finally:
+            _cleanup()
@@ -0,0 +1,219 @@
+"""
+Django management command to benchmark how fast a single NotificationMessage
+can be fanned out to a large number of (synthetic) users in the configured
+database.
+
+IMPORTANT: This writes to - and then cleans up after itself - the database that
+is configured for the Notification Store. Do not run this against a production
+database.
+
+NOTE: SQLite serializes all writers, so to get meaningful numbers for the
+parallel (--workers) fan-out, point this at a MySQL or PostgreSQL database.
+"""
+
+
+
+import time
+import logging
+
+from django.db import connection
+from django.core.management.base import BaseCommand, CommandError
+
+from edx_notifications import const
+from edx_notifications.data import NotificationType, UserNotification, NotificationMessage
+from edx_notifications.stores.store import notification_store
+from edx_notifications.channels.channel import get_notification_channel
+from edx_notifications.channels.parallel import ParallelBulkDispatchMixin
+from edx_notifications.stores.sql.models import (
+    SQLNotificationType,
+    SQLUserNotification,
+    SQLNotificationMessage,
+    SQLUserNotificationCounter
+)
+
+log = logging.getLogger(__file__)
+
+BENCHMARK_MSG_TYPE_NAME = 'open-edx.edx_notifications.benchmark'
+
+# synthetic user_ids start way above anything that we'd expect
+# to be in a test database
+BENCHMARK_USER_ID_OFFSET = 1000000000
+
+
+def _legacy_fanout(store, msg, user_ids):
+    """
+    The pre-existing fan-out path: build a UserNotification per recipient
+    and bulk create them in chunks of NOTIFICATION_BULK_PUBLISH_CHUNK_SIZE
+    """
+
+    total = 0
+    user_msgs = []
+    for user_id in user_ids:
+        user_msgs.append(UserNotification(user_id=user_id, msg=msg))
+        if len(user_msgs) == const.NOTIFICATION_BULK_PUBLISH_CHUNK_SIZE:
+            store.bulk_create_user_notification(user_msgs)
+            total += len(user_msgs)
+            user_msgs = []
+
+    if user_msgs:
+        store.bulk_create_user_notification(user_msgs)
+        total += len(user_msgs)
+
+    return total
+
+
+def _streaming_fanout(store, msg, user_ids):
+    """
+    The streaming fan-out path, which only sends (user_id, msg_id) tuples
+    to the database
+    """
+
+    return store.bulk_create_user_notifications_for_message(msg.id, user_ids)
+
+
+def _get_parallel_fanout(num_workers, strategy):
+    """
+    The fan-out path of the channel that the benchmark type maps to,
+    spread out over num_workers processes
+    """
+
+    def _parallel_fanout(store, msg, user_ids):  # pylint: disable=unused-argument
+        """
+        Dispatch through the channel
+        """
+
+        channel = get_notification_channel(None, msg.msg_type)
+        if not isinstance(channel, ParallelBulkDispatchMixin):
+            raise CommandError(
+                "Channel '{name}' does not support parallel dispatch".format(name=channel.name)
+            )
+
+        return channel.dispatch_to_recipients(user_ids, msg, num_workers=num_workers, strategy=strategy)
+
+    return _parallel_fanout
+
+
+def _cleanup():
+    """
+    Remove everything that the benchmark has written. We go straight to SQL for the
+    UserNotifications, as we don't want the pre_delete signal to archive any of these
+    synthetic rows
+    """
+
+    msg_ids = list(
+        SQLNotificationMessage.objects.filter(
+            msg_type_id=BENCHMARK_MSG_TYPE_NAME
+        ).values_list('id', flat=True)
+    )
+
+    if msg_ids:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'DELETE FROM {table} WHERE msg_id IN ({placeholders})'.format(
+                    table=connection.ops.quote_name(SQLUserNotification._meta.db_table),  # pylint: disable=protected-access
+                    placeholders=', '.join(['%s'] * len(msg_ids))
+                ),
+                msg_ids
+            )
+
+    SQLNotificationMessage.objects.filter(msg_type_id=BENCHMARK_MSG_TYPE_NAME).delete()
+    SQLNotificationType.objects.filter(name=BENCHMARK_MSG_TYPE_NAME).delete()
+    SQLUserNotificationCounter.objects.filter(user_id__gte=BENCHMARK_USER_ID_OFFSET).delete()
+
+
+FANOUT_STRATEGIES = [
+    ('legacy', _legacy_fanout),
+    ('streaming', _streaming_fanout),
+]
+
+
+class Command(BaseCommand):
+    """
+    Django Management command to benchmark the fan-out of notifications
+    """
+
+    help = 'Benchmarks the rows/second of the different notification fan-out paths'
+
+    def add_arguments(self, parser):
+        """
+        Command line arguments
+        """
+
+        parser.add_argument(
+            '--num-users',
+            type=int,
+            default=10000,
+            help='How many synthetic users to fan out a message to'
+        )
+
+        parser.add_argument(
+            '--workers',
+            default='1,2,4,8',
+            help='Comma separated list of worker process counts to benchmark the parallel fan-out with'
+        )
+
+        parser.add_argument(
+            '--partition-strategy',
+            default=const.NOTIFICATION_BULK_PUBLISH_PARTITION_STRATEGY,
+            choices=['modulo', 'range'],
+            help='How to divide up the users amongst the worker processes'
+        )
+
+    def handle(self, *args, **options):
+        """
+        Management command entry point
+        """
+
+        num_users = options.get('num_users', 10000)
+        strategy = options.get('partition_strategy', const.NOTIFICATION_BULK_PUBLISH_PARTITION_STRATEGY)
+        workers = [
+            int(num_workers) for num_workers in options.get('workers', '1,2,4,8').split(',') if num_workers
+        ]
+
+        fanout_strategies = FANOUT_STRATEGIES + [
+            (
+                'parallel-{num_workers}'.format(num_workers=num_workers),
+                _get_parallel_fanout(num_workers, strategy)
+            )
+            for num_workers in workers
+        ]
+
+        log.info("Running management command to benchmark fan-out to %d users...", num_users)
+
+        store = notification_store()
+
+        msg_type = store.save_notification_type(
+            NotificationType(
+                name=BENCHMARK_MSG_TYPE_NAME,
+                renderer='edx_notifications.renderers.basic.JsonRenderer',
+            )
+        )
+
+        try:
+            for name, fanout in fanout_strategies:
+                msg = store.save_notification_message(
+                    NotificationMessage(
+                        namespace='benchmark',
+                        msg_type=msg_type,
+                        payload={'subject': 'benchmark', 'body': 'benchmark'},
+                    )
+                )
+
+                user_ids = range(BENCHMARK_USER_ID_OFFSET, BENCHMARK_USER_ID_OFFSET + num_users)
+
+                start = time.time()
+                num_created = fanout(store, msg, user_ids)
+                elapsed = time.time() - start
+
+                rows_per_sec = num_created / elapsed if elapsed else float('inf')
+
+                self.stdout.write(
+                    '{name}: {num} rows in {elapsed:.3f} secs ({rate:.0f} rows/sec)'.format(
+                        name=name,
+                        num=num_created,
+                        elapsed=elapsed,
+                        rate=rows_per_sec
+                    )
+                )
+        finally:
+            _cleanup()
@@ -0,0 +1,123 @@
+"""
+Django management command to benchmark how long it takes to decode the JSON which
+notification payloads are stored as, for a batch of (synthetic) discussion forum
+notifications. This compares the plain JSON that payloads used to be stored as,
+whose datetimes have to be guessed at, with the tagged JSON format.
+
+This does not touch the database.
+"""
+
+
+
+import time
+import random
+import logging
+from datetime import datetime, timedelta
+
+import pytz
+from django.core.management.base import BaseCommand, CommandError
+
+from edx_notifications import base_data
+from edx_notifications.base_data import DictField
+
+log = logging.getLogger(__file__)
+
+EXCERPT = (
+    'Four score and seven years ago our fathers brought forth on this continent, a new nation, '
+    'conceived in Liberty, and dedicated to the proposition that all men are created equal.'
+)
+
+
+def _get_forum_payload(idx):
+    """
+    A payload like the ones of the open-edx.lms.discussions.* notification types
+    """
+
+    payload = {
+        '_schema_version': 1,
+        '_click_link': f'/courses/course-v1:edX+DemoX+Demo_Course/discussion/forum/topic/threads/{idx:024x}',
+        'original_poster_id': random.randint(1, 100000),
+        'action_user_id': random.randint(1, 100000),
+        'action_username': f'learner{idx}',
+        'thread_title': f'Question about problem set {idx % 10} in week {idx % 7}',
+        'excerpt': EXCERPT[:random.randint(20, len(EXCERPT))],
+        'course_id': 'course-v1:edX+DemoX+Demo_Course',
+        'num_upvotes': random.randint(0, 50),
+    }
+
+    # some of the notifications also say when the post was made
+    if idx % 2:
+        payload['created_at'] = datetime.now(pytz.UTC) - timedelta(minutes=idx)
+
+    return payload
+
+
+def _get_json_backend():
+    """
+    The name of the JSON backend that we're running with
+    """
+
+    if base_data.orjson:
+        return 'orjson'
+
+    if base_data.ujson:
+        return 'ujson'
+
+    return 'json'
+
+
+class Command(BaseCommand):
+    """
+    Django Management command to benchmark decoding stored notification payloads
+    """
+
+    help = 'Benchmarks decoding stored notification payloads'
+
+    def add_arguments(self, parser):
+        """
+        Command line arguments
+        """
+
+        parser.add_argument(
+            '--num_payloads',
+            type=int,
+            default=10000,
+            help='How many payloads to decode'
+        )
+
+    def handle(self, *args, **options):
+        """
+        Management command entry point
+        """
+
+        num_payloads = options.get('num_payloads', 10000)
+
+        log.info("Running management command to benchmark decoding notification payloads...")
+
+        payloads = [_get_forum_payload(idx) for idx in range(num_payloads)]
+
+        encodings = [
+            ('plain', DictField.to_json),
+            ('tagged', DictField.to_tagged_json),
+        ]
+
+        self.stdout.write(f'backend: {_get_json_backend()}')
+
+        for name, encode in encodings:
+            encoded = [encode(payload) for payload in payloads]
+
+            start = time.time()
+            decoded = [DictField.from_json(value) for value in encoded]
+            elapsed = time.time() - start
+
+            if decoded != payloads:
+                raise CommandError(f'Decoding {name} JSON did not give back the original payloads')
+
+            self.stdout.write(
+                '{name}: {count} payloads, {elapsed:.1f} ms, {latency:.1f} us/payload'.format(
+                    name=name,
+                    count=len(decoded),
+                    elapsed=elapsed * 1000,
+                    latency=elapsed * 1000000 / num_payloads
+                )
+            )
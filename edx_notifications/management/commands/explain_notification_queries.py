@@ -0,0 +1,123 @@
+"""
+Django management command which prints out the database's query plan (EXPLAIN) for
+each of the hot queries that the SQL Notification Store runs against the user notification
+table, e.g. to verify that they are served by the composite indexes on that table.
+"""
+
+
+
+import logging
+from datetime import datetime
+
+import pytz
+from django.core.management.base import BaseCommand, CommandError
+
+from edx_notifications.data import UserNotification
+from edx_notifications.utils import encode_notification_cursor
+from edx_notifications.stores.store import notification_store
+from edx_notifications.stores.sql.store_provider import SQLNotificationStoreProvider
+
+log = logging.getLogger(__file__)
+
+
+def get_notification_queries(provider, user_id, namespace):
+    """
+    Returns a list of (description, QuerySet) tuples of the queries the store
+    runs when listing, counting and marking a user's notifications as read
+    """
+
+    # pylint: disable=protected-access
+
+    # a cursor pointing just past a hypothetical notification, so that we
+    # can explain the query for any page after the first one
+    cursor = encode_notification_cursor(UserNotification(id=1, created=datetime.now(pytz.UTC)))
+
+    # NOTE: counts and updates are not sorted, so we don't sort when explaining them either
+    return [
+        (
+            'Count of all notifications',
+            provider._get_prepaged_notifications(user_id).order_by()
+        ),
+        (
+            'Count of unread notifications (and mark all as read)',
+            provider._get_prepaged_notifications(user_id, filters={'read': False}).order_by()
+        ),
+        (
+            'Count of unread notifications in a namespace (and mark all as read)',
+            provider._get_prepaged_notifications(user_id, filters={'read': False, 'namespace': namespace}).order_by()
+        ),
+        (
+            'First page of notifications',
+            provider._get_notifications_for_user(user_id, options={'select_related': True})
+        ),
+        (
+            'Next page of notifications (cursor)',
+            provider._get_notifications_for_user(user_id, options={'select_related': True, 'before': cursor})
+        ),
+        (
+            'First page of unread notifications',
+            provider._get_notifications_for_user(
+                user_id,
+                filters={'read': False},
+                options={'select_related': True}
+            )
+        ),
+        (
+            'First page of unread notifications in a namespace',
+            provider._get_notifications_for_user(
+                user_id,
+                filters={'read': False, 'namespace': namespace},
+                options={'select_related': True}
+            )
+        ),
+    ]
+
+
+class Command(BaseCommand):
+    """
+    Django Management command to EXPLAIN the hot user notification queries
+    """
+
+    help = "Prints the database's query plan for each of the hot user notification queries"
+
+    def add_arguments(self, parser):
+        """
+        Command line arguments
+        """
+
+        parser.add_argument(
+            '--user-id',
+            type=int,
+            default=1,
+            help='The user_id to run the queries for'
+        )
+
+        parser.add_argument(
+            '--namespace',
+            default='namespace',
+            help='The namespace to run the namespaced queries for'
+        )
+
+        parser.add_argument(
+            '--format',
+            default=None,
+            help='Output format of the query plan, if the database backend supports any (e.g. JSON)'
+        )
+
+    def handle(self, *args, **options):
+        """
+        Management command entry point
+        """
+
+        provider = notification_store()
+        if not isinstance(provider, SQLNotificationStoreProvider):
+            raise CommandError('Query plans are only available for the SQLNotificationStoreProvider')
+
+        queries = get_notification_queries(provider, options['user_id'], options['namespace'])
+
+        for description, query in queries:
+            self.stdout.write(f'=== {description} ===')
+            self.stdout.write(str(query.query))
+            self.stdout.write('--- plan ---')
+            self.stdout.write(query.explain(format=options.get('format')))
+            self.stdout.write('')
@@ -4,6 +4,9 @@ To enable this feature, the following variables have to be defined in settings:
 NOTIFICATION_PURGE_READ_OLDER_THAN_DAYS
 NOTIFICATION_PURGE_UNREAD_OLDER_THAN_DAYS
 Optionally, the NOTIFICATION_ARCHIVE_ENABLED flag can be set to archive the purged notifications.
+Timers which are done with get archived as well if NOTIFICATION_TIMER_ARCHIVE_AFTER_DAYS is set.
+
+If a purge by the purge timer got interrupted, this finishes it first.
 """
 
 
@@ -12,6 +15,9 @@ import logging
 
 from django.core.management.base import BaseCommand
 
+from edx_notifications.timer import PURGE_NOTIFICATIONS_TIMER_NAME
+from edx_notifications.exceptions import ItemNotFoundError
+from edx_notifications.stores.store import notification_store
 from edx_notifications.lib.publisher import purge_expired_notifications
 
 log = logging.getLogger(__file__)
@@ -28,4 +34,11 @@ class Command(BaseCommand):
         """
 
         log.info("Running management command to force purge old notifications...")
-        purge_expired_notifications()
+
+        # checkpoint in the purge timer, just like when the timer fires
+        try:
+            timer = notification_store().get_notification_timer(PURGE_NOTIFICATIONS_TIMER_NAME)
+        except ItemNotFoundError:
+            timer = None
+
+        purge_expired_notifications(timer=timer)
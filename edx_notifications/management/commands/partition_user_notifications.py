@@ -0,0 +1,82 @@
+"""
+Django management command to partition the user notification table by month (on MySQL or
+PostgreSQL), so that purging can drop the partitions of expired notifications as a whole.
+See edx_notifications/stores/sql/partitions.py for the layout.
+
+--convert moves the existing table over: it rewrites all of the table, so schedule downtime
+for it. Afterwards, set the PARTITIONED_USER_NOTIFICATIONS option of the SQL store provider.
+Without --convert, this adds the partitions for the months ahead, which purging does as well.
+"""
+
+
+
+import logging
+from datetime import datetime
+
+import pytz
+from django.db.models import Min
+from django.core.management.base import BaseCommand
+
+from edx_notifications import const
+from edx_notifications.stores.sql.models import SQLUserNotification
+from edx_notifications.stores.sql.partitions import add_months, get_month, get_user_notification_partitions
+
+log = logging.getLogger(__file__)
+
+
+class Command(BaseCommand):
+    """
+    Django Management command to partition the user notifications
+    """
+
+    help = 'Partitions the user notification table by month, or adds partitions for the months ahead'
+
+    def add_arguments(self, parser):
+        """
+        Command line arguments
+        """
+
+        parser.add_argument(
+            '--convert',
+            action='store_true',
+            default=False,
+            help='Convert the unpartitioned table, moving all existing rows into their partitions'
+        )
+        parser.add_argument(
+            '--months-ahead',
+            type=int,
+            default=const.NOTIFICATION_PARTITION_MONTHS_AHEAD,
+            help='How many months ahead to create partitions for'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            default=False,
+            help='Print the statements rather than running them'
+        )
+
+    def handle(self, *args, **options):
+        """
+        Management command entry point
+        """
+
+        partitions = get_user_notification_partitions(dry_run=options['dry_run'])
+
+        this_month = get_month(datetime.now(pytz.UTC))
+        last_month = add_months(this_month, options['months_ahead'])
+
+        if options['convert']:
+            log.info("Running management command to partition the user notifications...")
+
+            oldest = SQLUserNotification.objects.aggregate(oldest=Min('created'))['oldest']
+            statements = partitions.convert(get_month(oldest) if oldest else this_month, last_month)
+        else:
+            log.info("Running management command to add user notification partitions...")
+
+            statements = partitions.add_partitions(last_month)
+
+        if options['dry_run']:
+            for statement in statements:
+                self.stdout.write(statement + ';')
+
+        log.info("Completed partition_user_notifications, %d statements.", len(statements))
@@ -0,0 +1,55 @@
+"""
+Django management command to work off the queue of asynchronous
+notification fan-out jobs. This is meant to be run periodically (e.g. via cron)
+or by a process supervisor. Any number of these can run concurrently.
+"""
+
+
+
+import logging
+
+from django.core.management.base import BaseCommand
+
+from edx_notifications.fanout import process_fanout_jobs
+
+log = logging.getLogger(__file__)
+
+
+class Command(BaseCommand):
+    """
+    Django Management command to process all pending notification fan-out jobs
+    """
+
+    help = 'Processes pending notification fan-out jobs, resuming any jobs whose worker has died'
+
+    def add_arguments(self, parser):
+        """
+        Command line arguments
+        """
+
+        parser.add_argument(
+            '--max-jobs',
+            type=int,
+            default=None,
+            help='Stop after processing this many jobs, rather than when the queue is empty'
+        )
+
+        parser.add_argument(
+            '--worker-id',
+            default=None,
+            help='Identifies this worker in the queue, defaults to <hostname>:<pid>:<random>'
+        )
+
+    def handle(self, *args, **options):
+        """
+        Management command entry point
+        """
+
+        log.info("Running management command to process notification fan-out jobs...")
+
+        num_jobs = process_fanout_jobs(
+            worker_id=options.get('worker_id'),
+            max_jobs=options.get('max_jobs')
+        )
+
+        log.info("Completed process_notification_fanout_jobs, %d jobs processed.", num_jobs)
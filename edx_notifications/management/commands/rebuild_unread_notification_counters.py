@@ -0,0 +1,49 @@
+"""
+Django management command to reconcile the denormalized per-user unread notification
+counters with the user notifications themselves, e.g. after the counters were
+disabled for a while or messages were deleted from the database directly.
+"""
+
+
+
+import logging
+
+from django.core.management.base import BaseCommand
+
+from edx_notifications.stores.store import notification_store
+
+log = logging.getLogger(__file__)
+
+
+class Command(BaseCommand):
+    """
+    Django Management command to rebuild the unread notification counters
+    """
+
+    help = 'Recomputes the per-user unread notification counters from the user notifications'
+
+    def add_arguments(self, parser):
+        """
+        Command line arguments
+        """
+
+        parser.add_argument(
+            '--user-ids',
+            default=None,
+            help='Comma separated list of user_ids to rebuild the counters of, defaults to all users'
+        )
+
+    def handle(self, *args, **options):
+        """
+        Management command entry point
+        """
+
+        user_ids = options.get('user_ids')
+        if user_ids:
+            user_ids = [int(user_id) for user_id in user_ids.split(',') if user_id]
+
+        log.info("Running management command to rebuild unread notification counters...")
+
+        num_counters = notification_store().rebuild_unread_notification_counters(user_ids=user_ids)
+
+        log.info("Completed rebuild_unread_notification_counters, %d counters written.", num_counters)
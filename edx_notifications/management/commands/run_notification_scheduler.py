@@ -0,0 +1,77 @@
+"""
+Django management command to run a resident timer scheduler, which executes the
+NotificationCallbackTimers as they come due rather than when cron next runs
+'background_notification_check'. Run it under a process supervisor. It shuts down
+gracefully on SIGTERM or SIGINT, after finishing the timers it is executing.
+
+Note that this only runs the timers, not any other receivers of the
+'perform_notification_scan' signal.
+"""
+
+
+
+import signal
+import logging
+import threading
+
+from django.core.management.base import BaseCommand
+
+from edx_notifications.scheduler import NotificationTimerScheduler
+
+log = logging.getLogger(__file__)
+
+
+class Command(BaseCommand):
+    """
+    Django Management command to execute notification timers as they come due
+    """
+
+    help = 'Executes notification timers as they come due, until terminated'
+
+    def add_arguments(self, parser):
+        """
+        Command line arguments
+        """
+
+        parser.add_argument(
+            '--worker-id',
+            default=None,
+            help='Identifies this scheduler in the timers it claims, defaults to <hostname>:<pid>:<random>'
+        )
+
+        parser.add_argument(
+            '--max-secs',
+            type=int,
+            default=None,
+            help='Stop after this many seconds, e.g. to have the process supervisor recycle the process'
+        )
+
+    def handle(self, *args, **options):
+        """
+        Management command entry point
+        """
+
+        log.info("Running management command to schedule notification timers...")
+
+        scheduler = NotificationTimerScheduler(worker_id=options.get('worker_id'))
+
+        def _on_signal(signum, frame):  # pylint: disable=unused-argument
+            """
+            Shut down gracefully
+            """
+            log.info('Received signal %d, stopping the notification scheduler...', signum)
+            scheduler.stop()
+
+        # signal handlers can only be installed in the main thread
+        handlers = {}
+        if threading.current_thread() is threading.main_thread():
+            for signum in (signal.SIGTERM, signal.SIGINT):
+                handlers[signum] = signal.signal(signum, _on_signal)
+
+        try:
+            scheduler.run(max_secs=options.get('max_secs'))
+        finally:
+            for signum, handler in handlers.items():
+                signal.signal(signum, handler)
+
+        log.info("Completed run_notification_scheduler.")
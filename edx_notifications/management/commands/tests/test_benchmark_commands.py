@@ -0,0 +1,88 @@
+"""
+Tests for the benchmarking Django management commands
+"""
+
+
+
+from io import StringIO
+
+from django.test import TestCase
+from django.core.management import call_command
+
+from edx_notifications.stores.sql.models import (
+    SQLNotificationType,
+    SQLUserNotification,
+    SQLNotificationMessage,
+    SQLUserNotificationCounter
+)
+
+
+class BenchmarkNotificationFanoutCommandTest(TestCase):
+    """
+    Test suite for the benchmark_notification_fanout management command
+    """
+
+    def test_fanout_benchmark(self):
+        """
+        Run the benchmark with a small number of users and make sure
+        it reports on all fan-out paths and cleans up after itself
+        """
+
+        out = StringIO()
+        call_command('benchmark_notification_fanout', num_users=250, stdout=out)
+
+        output = out.getvalue()
+        self.assertIn('legacy: 250 rows', output)
+        self.assertIn('streaming: 250 rows', output)
+        self.assertIn('parallel-1: 250 rows', output)
+        self.assertIn('parallel-8: 250 rows', output)
+
+        self.assertEqual(SQLUserNotification.objects.count(), 0)
+        self.assertEqual(SQLNotificationMessage.objects.count(), 0)
+        self.assertEqual(SQLNotificationType.objects.count(), 0)
+        self.assertEqual(SQLUserNotificationCounter.objects.count(), 0)
+
+
+class BenchmarkNotificationCountCommandTest(TestCase):
+    """
+    Test suite for the benchmark_notification_count management command
+    """
+
+    def test_count_benchmark(self):
+        """
+        Run the benchmark with a small number of notifications and make sure
+        it reports on all ways of counting and cleans up after itself
+        """
+
+        out = StringIO()
+        call_command('benchmark_notification_count', sizes='10,1500', polls=2, stdout=out)
+
+        output = out.getvalue()
+        for name in ('count-join', 'count', 'counter'):
+            self.assertIn(f'{name}-10: 10 unread', output)
+            self.assertIn(f'{name}-1500: 1500 unread', output)
+
+        self.assertEqual(SQLUserNotification.objects.count(), 0)
+        self.assertEqual(SQLNotificationMessage.objects.count(), 0)
+        self.assertEqual(SQLNotificationType.objects.count(), 0)
+        self.assertEqual(SQLUserNotificationCounter.objects.count(), 0)
+
+
+class BenchmarkNotificationPayloadsCommandTest(TestCase):
+    """
+    Test suite for the benchmark_notification_payloads management command
+    """
+
+    def test_payloads_benchmark(self):
+        """
+        Run the benchmark with a small number of payloads and make sure
+        it reports on both formats
+        """
+
+        out = StringIO()
+        call_command('benchmark_notification_payloads', num_payloads=100, stdout=out)
+
+        output = out.getvalue()
+        self.assertIn('backend: ', output)
+        self.assertIn('plain: 100 payloads', output)
+        self.assertIn('tagged: 100 payloads', output)
@@ -0,0 +1,71 @@
+"""
+Tests for the rebuild_unread_notification_counters management command
+"""
+
+
+
+from django.test import TestCase
+from django.core.management import call_command
+
+from edx_notifications.data import NotificationType, UserNotification, NotificationMessage
+from edx_notifications.stores.store import notification_store
+from edx_notifications.stores.sql.models import SQLUserNotificationCounter
+
+
+class RebuildUnreadNotificationCountersCommandTest(TestCase):
+    """
+    Test suite for the management command
+    """
+
+    def setUp(self):
+        """
+        Give a couple of users a couple of notifications
+        """
+
+        self.store = notification_store()
+
+        msg_type = self.store.save_notification_type(
+            NotificationType(
+                name='open-edx.edx_notifications.management.tests.test_counters',
+                renderer='edx_notifications.renderers.basic.JsonRenderer',
+            )
+        )
+
+        for namespace in ('namespace1', 'namespace2'):
+            msg = self.store.save_notification_message(
+                NotificationMessage(msg_type=msg_type, namespace=namespace, payload={'foo': 'bar'})
+            )
+            for user_id in (1, 2):
+                self.store.save_user_notification(UserNotification(user_id=user_id, msg=msg))
+
+    def test_rebuild(self):
+        """
+        Throw the counters out of whack and make sure the command restores them
+        """
+
+        SQLUserNotificationCounter.objects.filter(user_id=1).update(unread_count=10)
+        SQLUserNotificationCounter.objects.filter(user_id=2).delete()
+        SQLUserNotificationCounter.objects.create(user_id=3, unread_count=5)
+
+        call_command('rebuild_unread_notification_counters', user_ids='1')
+
+        self.assertEqual(self.store.get_num_notifications_for_user(1, filters={'read': False}), 2)
+        self.assertEqual(self.store.get_num_notifications_for_user(2, filters={'read': False}), 0)
+
+        call_command('rebuild_unread_notification_counters')
+
+        for user_id in (1, 2):
+            self.assertEqual(self.store.get_num_notifications_for_user(user_id, filters={'read': False}), 2)
+            self.assertEqual(
+                self.store.get_num_notifications_for_user(
+                    user_id,
+                    filters={'read': False, 'namespace': 'namespace2'}
+                ),
+                1
+            )
+
+        self.assertEqual(self.store.get_num_notifications_for_user(3, filters={'read': False}), 0)
+
+        # the stale counter is zeroed rather than deleted, as it holds the version of the user's notifications
+        self.assertEqual(SQLUserNotificationCounter.objects.count(), 7)
+        self.assertEqual(SQLUserNotificationCounter.objects.get(user_id=3).unread_count, 0)
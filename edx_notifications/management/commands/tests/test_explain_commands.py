@@ -0,0 +1,59 @@
+"""
+Tests for the explain_notification_queries management command
+"""
+
+
+
+from io import StringIO
+
+from django.test import TestCase
+from django.test.utils import override_settings
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+from edx_notifications.stores.store import reset_notification_store
+
+
+class ExplainNotificationQueriesCommandTest(TestCase):
+    """
+    Test suite for the management command
+    """
+
+    def setUp(self):
+        """
+        Harnessing
+        """
+
+        reset_notification_store()
+
+    def tearDown(self):
+        """
+        Don't leave a misconfigured store behind
+        """
+
+        reset_notification_store()
+
+    def test_explain(self):
+        """
+        Make sure we print out a query plan for all hot queries
+        """
+
+        out = StringIO()
+        call_command('explain_notification_queries', user_id=2, namespace='foo', stdout=out)
+
+        output = out.getvalue()
+        self.assertEqual(output.count('--- plan ---'), 7)
+        self.assertIn('Count of unread notifications in a namespace', output)
+        self.assertIn('usernotif_user_ns_read_created', output)
+
+    @override_settings(NOTIFICATION_STORE_PROVIDER={
+        'class': 'edx_notifications.stores.tests.test_store.BadImplementationStoreProvider',
+        'options': {}
+    })
+    def test_non_sql_store(self):
+        """
+        Other stores don't have query plans
+        """
+
+        with self.assertRaises(CommandError):
+            call_command('explain_notification_queries')
@@ -0,0 +1,56 @@
+"""
+Tests for the process_notification_fanout_jobs management command
+"""
+
+
+
+from django.test import TestCase
+from django.core.management import call_command
+
+from edx_notifications import const
+from edx_notifications.data import NotificationType, NotificationMessage
+from edx_notifications.fanout import enqueue_fanout_job
+from edx_notifications.scopes import register_user_scope_resolver
+from edx_notifications.lib.publisher import register_notification_type
+from edx_notifications.stores.store import notification_store
+from edx_notifications.tests.test_scopes import TestListScopeResolver
+
+
+class ProcessNotificationFanoutJobsCommandTest(TestCase):
+    """
+    Test suite for the management command
+    """
+
+    def test_process_jobs(self):
+        """
+        Invoke the Management Command and make sure all jobs get processed
+        """
+
+        register_user_scope_resolver('list_scope', TestListScopeResolver())
+
+        msg_type = NotificationType(
+            name='open-edx.edx_notifications.management.tests.test_fanout',
+            renderer='edx_notifications.renderers.basic.JsonRenderer',
+        )
+        register_notification_type(msg_type)
+
+        jobs = [
+            enqueue_fanout_job(
+                NotificationMessage(msg_type=msg_type, namespace='test-runner', payload={'foo': 'bar'}),
+                'list_scope',
+                {'range': 10}
+            )
+            for __ in range(3)
+        ]
+
+        call_command('process_notification_fanout_jobs', max_jobs=2, worker_id='test-worker')
+
+        statuses = [notification_store().get_notification_fanout_job(job.id).status for job in jobs]
+        self.assertEqual(statuses.count(const.NOTIFICATION_FANOUT_JOB_STATUS_COMPLETED), 2)
+
+        call_command('process_notification_fanout_jobs')
+
+        for job in jobs:
+            job = notification_store().get_notification_fanout_job(job.id)
+            self.assertEqual(job.status, const.NOTIFICATION_FANOUT_JOB_STATUS_COMPLETED)
+            self.assertEqual(job.num_dispatched, 10)
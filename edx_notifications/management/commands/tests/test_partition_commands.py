@@ -0,0 +1,49 @@
+"""
+Tests for the partition_user_notifications management command
+"""
+
+
+
+from io import StringIO
+from unittest import mock
+
+from django.test import TestCase
+from django.core.management import call_command
+from django.core.exceptions import ImproperlyConfigured
+
+
+class PartitionUserNotificationsCommandTest(TestCase):
+    """
+    Test suite for the management command
+    """
+
+    def test_unsupported_backend(self):
+        """
+        The tests run on sqlite, which can't partition
+        """
+
+        with self.assertRaises(ImproperlyConfigured):
+            call_command('partition_user_notifications')
+
+    @mock.patch('edx_notifications.management.commands.partition_user_notifications.get_user_notification_partitions')
+    def test_dry_run(self, mock_get_partitions):
+        """
+        Make sure the statements are printed on a dry run
+        """
+
+        partitions = mock_get_partitions.return_value
+        partitions.convert.return_value = ['ALTER TABLE foo']
+        partitions.add_partitions.return_value = ['ALTER TABLE bar']
+
+        out = StringIO()
+        call_command('partition_user_notifications', convert=True, dry_run=True, stdout=out)
+
+        mock_get_partitions.assert_called_once_with(dry_run=True)
+        self.assertTrue(partitions.convert.called)
+        self.assertEqual(out.getvalue(), 'ALTER TABLE foo;\n')
+
+        out = StringIO()
+        call_command('partition_user_notifications', months_ahead=1, stdout=out)
+
+        self.assertTrue(partitions.add_partitions.called)
+        self.assertEqual(out.getvalue(), '')
@@ -0,0 +1,45 @@
+"""
+Tests for the run_notification_scheduler management command
+"""
+
+
+
+import signal
+from datetime import datetime, timedelta
+
+import pytz
+from django.test import TestCase
+from django.core.management import call_command
+
+from edx_notifications.data import NotificationCallbackTimer
+from edx_notifications.stores.store import notification_store
+
+
+class RunNotificationSchedulerCommandTest(TestCase):
+    """
+    Test suite for the management command
+    """
+
+    def test_run(self):
+        """
+        Invoke the Management Command and make sure due timers get executed
+        """
+
+        timer = notification_store().save_notification_timer(
+            NotificationCallbackTimer(
+                name='foo',
+                class_name='edx_notifications.tests.test_timer.NullNotificationCallbackTimerHandler',
+                callback_at=datetime.now(pytz.UTC) - timedelta(minutes=1),
+                context={},
+                is_active=True,
+            )
+        )
+
+        handler = signal.getsignal(signal.SIGTERM)
+
+        call_command('run_notification_scheduler', max_secs=0, worker_id='test-scheduler')
+
+        self.assertIsNotNone(notification_store().get_notification_timer(timer.name).executed_at)
+
+        # the signal handlers are put back in place
+        self.assertEqual(signal.getsignal(signal.SIGTERM), handler)
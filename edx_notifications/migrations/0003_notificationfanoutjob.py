@@ -0,0 +1,39 @@
+# Generated by Django 2.2.17 on 2026-10-18 19:04
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import model_utils.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('edx_notifications', '0002_auto_20170221_0255'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SQLNotificationFanoutJob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', model_utils.fields.AutoCreatedField(default=django.utils.timezone.now, editable=False, verbose_name='created')),
+                ('modified', model_utils.fields.AutoLastModifiedField(default=django.utils.timezone.now, editable=False, verbose_name='modified')),
+                ('scope_name', models.CharField(max_length=255)),
+                ('scope_context', models.TextField(null=True)),
+                ('context', models.TextField(null=True)),
+                ('status', models.CharField(db_index=True, default='pending', max_length=16)),
+                ('worker_id', models.CharField(max_length=255, null=True)),
+                ('lease_expires_at', models.DateTimeField(null=True)),
+                ('attempts', models.IntegerField(default=0)),
+                ('num_processed', models.IntegerField(default=0)),
+                ('num_dispatched', models.IntegerField(default=0)),
+                ('err_msg', models.TextField(null=True)),
+                ('completed_at', models.DateTimeField(null=True)),
+                ('msg', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='edx_notifications.SQLNotificationMessage')),
+            ],
+            options={
+                'db_table': 'edx_notifications_notificationfanoutjob',
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 2.2.17 on 2026-10-18 19:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('edx_notifications', '0004_usernotification_keyset_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sqlusernotification',
+            name='namespace',
+            field=models.CharField(max_length=128, null=True),
+        ),
+        migrations.AddField(
+            model_name='sqlusernotificationarchive',
+            name='namespace',
+            field=models.CharField(max_length=128, null=True),
+        ),
+    ]
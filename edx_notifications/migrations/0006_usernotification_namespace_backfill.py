@@ -0,0 +1,43 @@
+# Generated by Django 2.2.17 on 2026-10-18 19:15
+
+from django.db import migrations
+from django.db.models import Max, OuterRef, Subquery
+
+# backfill in ranges of ids, so we don't hold locks on the whole table at once
+BACKFILL_BATCH_SIZE = 10000
+
+
+def backfill_namespace(apps, schema_editor):
+    """
+    Copy the namespace of each message onto the existing user notifications
+    """
+
+    for model_name in ('SQLUserNotification', 'SQLUserNotificationArchive'):
+        model = apps.get_model('edx_notifications', model_name)
+        message_model = apps.get_model('edx_notifications', 'SQLNotificationMessage')
+
+        namespace = Subquery(
+            message_model.objects.filter(id=OuterRef('msg_id')).values('namespace')[:1]
+        )
+
+        max_id = model.objects.aggregate(max_id=Max('id'))['max_id'] or 0
+        for start in range(0, max_id + 1, BACKFILL_BATCH_SIZE):
+            model.objects.filter(
+                id__gte=start,
+                id__lt=start + BACKFILL_BATCH_SIZE
+            ).update(namespace=namespace)
+
+
+class Migration(migrations.Migration):
+
+    # each range of ids gets committed on its own, rather than the whole
+    # backfill running in (and locking the tables for) a single transaction
+    atomic = False
+
+    dependencies = [
+        ('edx_notifications', '0005_usernotification_namespace'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_namespace, migrations.RunPython.noop),
+    ]
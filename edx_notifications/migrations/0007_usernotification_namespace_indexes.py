@@ -0,0 +1,26 @@
+# Generated by Django 2.2.17 on 2026-10-18 19:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('edx_notifications', '0006_usernotification_namespace_backfill'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='sqlusernotification',
+            name='user_id',
+            field=models.IntegerField(),
+        ),
+        migrations.AddIndex(
+            model_name='sqlusernotification',
+            index=models.Index(fields=['user_id', 'read_at', 'created'], name='usernotif_user_read_created'),
+        ),
+        migrations.AddIndex(
+            model_name='sqlusernotification',
+            index=models.Index(fields=['user_id', 'namespace', 'read_at', 'created'], name='usernotif_user_ns_read_created'),
+        ),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 2.2.17 on 2026-10-18 19:18
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+# how many counters to insert at a time
+BACKFILL_BATCH_SIZE = 1000
+
+
+def backfill_counters(apps, schema_editor):
+    """
+    Count all existing unread notifications, across all namespaces as well as per namespace
+    """
+
+    user_notification_model = apps.get_model('edx_notifications', 'SQLUserNotification')
+    counter_model = apps.get_model('edx_notifications', 'SQLUserNotificationCounter')
+
+    unread = user_notification_model.objects.filter(read_at__isnull=True).order_by()
+
+    groupings = [
+        unread.values('user_id').annotate(unread_count=Count('id')),
+        # notifications without a namespace only count towards the counter across all
+        # namespaces, which is keyed by the empty namespace itself
+        unread.exclude(
+            Q(namespace=None) | Q(namespace='')
+        ).values('user_id', 'namespace').annotate(unread_count=Count('id')),
+    ]
+
+    for grouping in groupings:
+        counters = []
+        for row in grouping.iterator():
+            counters.append(
+                counter_model(
+                    user_id=row['user_id'],
+                    namespace=row.get('namespace', ''),
+                    unread_count=row['unread_count']
+                )
+            )
+
+            if len(counters) == BACKFILL_BATCH_SIZE:
+                counter_model.objects.bulk_create(counters)
+                counters = []
+
+        if counters:
+            counter_model.objects.bulk_create(counters)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('edx_notifications', '0007_usernotification_namespace_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SQLUserNotificationCounter',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('user_id', models.IntegerField()),
+                ('namespace', models.CharField(default='', max_length=128)),
+                ('unread_count', models.IntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'edx_notifications_usernotificationcounter',
+                'unique_together': {('user_id', 'namespace')},
+            },
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
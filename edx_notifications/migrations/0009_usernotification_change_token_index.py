@@ -0,0 +1,17 @@
+# Generated by Django 2.2.17 on 2026-10-18 19:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('edx_notifications', '0008_usernotificationcounter'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='sqlusernotification',
+            index=models.Index(fields=['user_id', 'modified', 'read_at'], name='usernotif_user_modified_read'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 2.2.17 on 2026-10-18 20:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('edx_notifications', '0009_usernotification_change_token_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sqlnotificationcallbacktimer',
+            name='lease_expires_at',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.AddField(
+            model_name='sqlnotificationcallbacktimer',
+            name='worker_id',
+            field=models.CharField(max_length=255, null=True),
+        ),
+    ]
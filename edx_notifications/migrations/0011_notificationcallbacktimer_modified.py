@@ -0,0 +1,17 @@
+# Generated by Django 2.2.17 on 2026-10-18 20:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('edx_notifications', '0010_notificationcallbacktimer_lease'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='sqlnotificationcallbacktimer',
+            index=models.Index(fields=['modified'], name='timer_modified'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 2.2.17 on 2026-10-18 20:28
+
+from django.db import migrations, models
+import django.utils.timezone
+import model_utils.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('edx_notifications', '0011_notificationcallbacktimer_modified'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SQLNotificationCallbackTimerArchive',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', model_utils.fields.AutoCreatedField(default=django.utils.timezone.now, editable=False, verbose_name='created')),
+                ('modified', model_utils.fields.AutoLastModifiedField(default=django.utils.timezone.now, editable=False, verbose_name='modified')),
+                ('name', models.CharField(db_index=True, max_length=255)),
+                ('callback_at', models.DateTimeField()),
+                ('class_name', models.CharField(max_length=255)),
+                ('context', models.TextField(null=True)),
+                ('is_active', models.BooleanField(default=True)),
+                ('periodicity_min', models.IntegerField(null=True)),
+                ('executed_at', models.DateTimeField(null=True)),
+                ('err_msg', models.TextField(null=True)),
+                ('results', models.TextField(null=True)),
+            ],
+            options={
+                'db_table': 'edx_notifications_notificationcallbacktimerarchive',
+            },
+        ),
+        migrations.AlterField(
+            model_name='sqlnotificationcallbacktimer',
+            name='is_active',
+            field=models.BooleanField(default=True),
+        ),
+        migrations.AddIndex(
+            model_name='sqlnotificationcallbacktimer',
+            index=models.Index(fields=['is_active', 'executed_at', 'callback_at'], name='timer_active_executed_cb'),
+        ),
+        migrations.AddIndex(
+            model_name='sqlnotificationcallbacktimer',
+            index=models.Index(fields=['is_active', 'lease_expires_at'], name='timer_active_lease'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.17 on 2026-10-18 20:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('edx_notifications', '0012_notificationcallbacktimer_scan_archive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sqlnotificationfanoutjob',
+            name='last_user_id',
+            field=models.IntegerField(null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.17 on 2026-10-18 21:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('edx_notifications', '0013_notificationfanoutjob_last_user_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sqlusernotificationcounter',
+            name='version',
+            field=models.IntegerField(default=0),
+        ),
+    ]
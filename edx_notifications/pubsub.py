@@ -0,0 +1,403 @@
+"""
+Server-push of "your notifications have changed" wake-ups to clients which hold a
+connection open to the notification events endpoint (Server-Sent Events, or long-poll),
+so that they don't have to short-poll the count endpoint.
+
+Whenever notifications are dispatched, the recipients are published on a pluggable
+pub/sub provider - set in the NOTIFICATION_PUBSUB_PROVIDER setting - which wakes up
+any subscriber that is waiting on one of those users. A woken subscriber compares the
+user's change token (see get_notifications_change_token()) with the last one it has
+seen, so wake-ups never carry any data and spurious ones are harmless.
+
+The resident timer scheduler subscribes to TIMER_WAKEUP_KEY rather than to a user, and
+gets woken up whenever a timed notification is published.
+
+The default provider can only wake up subscribers within the same process, so it
+also falls back to checking the change token every POLL_PERIOD_SECS. The Redis provider
+(which works with any server that speaks the Redis protocol) wakes up subscribers in
+all processes.
+"""
+
+
+
+import os
+import abc
+import math
+import time
+import logging
+import threading
+import collections
+from importlib import import_module
+
+from django.conf import settings
+from django.db import transaction
+from django.core.exceptions import ImproperlyConfigured
+
+from edx_notifications import const
+from edx_notifications.stores.store import notification_store
+
+log = logging.getLogger(__name__)
+
+DEFAULT_PUBSUB_PROVIDER = {
+    'class': 'edx_notifications.pubsub.PollingNotificationPubSub',
+    'options': {}
+}
+
+# what the timer scheduler subscribes to, in place of a user id
+TIMER_WAKEUP_KEY = 'timers'
+
+# Cached instance of a pub/sub provider
+_PUBSUB_PROVIDER = None
+
+
+def notification_pubsub():
+    """
+    Returns the singleton instance of the pub/sub provider that has been
+    configured for this runtime. The class path can be set in
+    NOTIFICATION_PUBSUB_PROVIDER in the settings file, otherwise we'll
+    wake up subscribers in-process and poll the Notification Store
+    """
+
+    global _PUBSUB_PROVIDER  # pylint: disable=global-statement
+
+    if not _PUBSUB_PROVIDER:
+        config = getattr(settings, 'NOTIFICATION_PUBSUB_PROVIDER', DEFAULT_PUBSUB_PROVIDER)
+
+        if not config or 'class' not in config or 'options' not in config:
+            msg = (
+                "Misconfigured NOTIFICATION_PUBSUB_PROVIDER settings, "
+                "must have both 'class' and 'options' keys."
+            )
+            raise ImproperlyConfigured(msg)
+
+        module_path, _, name = config['class'].rpartition('.')
+        class_ = getattr(import_module(module_path), name)
+
+        _PUBSUB_PROVIDER = class_(**config['options'])
+
+    return _PUBSUB_PROVIDER
+
+
+def reset_notification_pubsub():
+    """
+    Tears down any cached configuration. This is useful for testing.
+    """
+
+    global _PUBSUB_PROVIDER  # pylint: disable=global-statement
+
+    _PUBSUB_PROVIDER = None
+
+
+class BaseNotificationPubSub(metaclass=abc.ABCMeta):
+    """
+    The abstract interface that all pub/sub providers must implement
+    """
+
+    @abc.abstractmethod
+    def publish(self, user_ids):
+        """
+        Wake up all subscribers of any of the user_ids. If user_ids is None,
+        all subscribers are woken up
+        """
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    def subscribe(self, user_id):
+        """
+        Start listening for wake-ups for user_id. Any wake-up that is published
+        after this returns will be seen by the subscription.
+
+        RETURNS: a NotificationSubscription, which must be closed when done
+        """
+        raise NotImplementedError()
+
+
+class NotificationSubscription:
+    """
+    A subscription to the wake-ups of a single user, within this process
+    """
+
+    def __init__(self, provider, user_id, poll_period_secs):
+        """
+        Initializer
+        """
+
+        self.provider = provider
+        self.user_id = user_id
+        self.poll_period_secs = poll_period_secs
+        self.event = threading.Event()
+
+    def wait(self, timeout):
+        """
+        Block until the user has been woken up, or until timeout seconds - but no more than
+        the poll period - have passed. Either way, callers should then check the store
+        for what - if anything - has changed
+
+        RETURNS: whether a wake-up was received
+        """
+
+        woken = self.event.wait(min(timeout, self.poll_period_secs))
+        self.event.clear()
+        return woken
+
+    def close(self):
+        """
+        Stop listening for wake-ups
+        """
+
+        self.provider.unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class PollingNotificationPubSub(BaseNotificationPubSub):
+    """
+    Default pub/sub provider, which wakes up subscribers within the same process right
+    away. Subscribers in other processes - e.g. when a notification was published in a
+    fan-out worker - find out when they next poll, every POLL_PERIOD_SECS
+    """
+
+    def __init__(self, **kwargs):
+        """
+        Initializer
+
+        ARGS: kwargs
+            - POLL_PERIOD_SECS: how often subscribers check for changes without being woken up
+        """
+
+        self.poll_period_secs = kwargs.get('POLL_PERIOD_SECS', const.NOTIFICATION_PUSH_POLL_PERIOD_SECS)
+
+        self._lock = threading.Lock()
+        self._subscriptions = collections.defaultdict(set)
+
+    def publish(self, user_ids):
+        """
+        Wake up the subscribers in this process
+        """
+
+        self._wake_up(user_ids)
+
+    def subscribe(self, user_id):
+        """
+        Register a new subscription for user_id
+        """
+
+        subscription = NotificationSubscription(self, user_id, self.poll_period_secs)
+
+        with self._lock:
+            self._subscriptions[user_id].add(subscription)
+
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """
+        Remove a subscription which has been closed
+        """
+
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.user_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.user_id]
+
+    def _wake_up(self, user_ids):
+        """
+        Signal all subscriptions of user_ids - or all subscriptions if user_ids is None
+        """
+
+        with self._lock:
+            if user_ids is None:
+                subscriptions = [
+                    subscription
+                    for user_subscriptions in self._subscriptions.values()
+                    for subscription in user_subscriptions
+                ]
+            else:
+                subscriptions = [
+                    subscription
+                    for user_id in set(user_ids)
+                    for subscription in self._subscriptions.get(user_id, ())
+                ]
+
+        for subscription in subscriptions:
+            subscription.event.set()
+
+
+class RedisNotificationPubSub(PollingNotificationPubSub):
+    """
+    Pub/sub provider which publishes wake-ups on a Redis server, so that subscribers
+    in every process are woken up. Each process runs a single listener thread, which
+    hands the wake-ups on to the subscribers in that process.
+
+    This requires the 'redis' package
+    """
+
+    # the channel name suffix which wakes up all subscribers
+    BROADCAST = 'all'
+
+    def __init__(self, **kwargs):
+        """
+        Initializer
+
+        ARGS: kwargs
+            - URL: the URL of the Redis server, e.g. redis://localhost:6379/0
+            - CHANNEL_PREFIX: the prefix of all channel names that we publish on
+            - PUBLISH_BATCH_SIZE: how many wake-ups are sent to the server at a time
+            - POLL_PERIOD_SECS: how often subscribers check for changes without being woken
+              up, which is only a safety net in case wake-ups get lost
+        """
+
+        try:
+            import redis  # pylint: disable=import-outside-toplevel
+        except ImportError as ex:
+            raise ImproperlyConfigured('RedisNotificationPubSub requires the redis package') from ex
+
+        kwargs.setdefault('POLL_PERIOD_SECS', const.NOTIFICATION_PUSH_STREAM_MAX_SECS)
+        super().__init__(**kwargs)
+
+        self.client = redis.Redis.from_url(kwargs.get('URL', 'redis://localhost:6379/0'))
+        self.channel_prefix = kwargs.get('CHANNEL_PREFIX', 'edx_notifications')
+        self.publish_batch_size = kwargs.get('PUBLISH_BATCH_SIZE', 1000)
+
+        self._listener = None
+        self._listener_pid = None
+
+    def _get_channel(self, suffix):
+        """
+        Returns the name of the channel to publish on
+        """
+
+        return f'{self.channel_prefix}.{suffix}'
+
+    def publish(self, user_ids):
+        """
+        Publish a wake-up per user - or a single broadcast - on the Redis server
+        """
+
+        if user_ids is None:
+            self.client.publish(self._get_channel(self.BROADCAST), '')
+            return
+
+        user_ids = list(user_ids)
+        for start in range(0, len(user_ids), self.publish_batch_size):
+            pipeline = self.client.pipeline(transaction=False)
+            for user_id in user_ids[start:start + self.publish_batch_size]:
+                pipeline.publish(self._get_channel(user_id), '')
+            pipeline.execute()
+
+    def subscribe(self, user_id):
+        """
+        Make sure this process is listening, before registering the subscription
+        """
+
+        self._ensure_listener()
+        return super().subscribe(user_id)
+
+    def _ensure_listener(self):
+        """
+        Start the listener thread, unless it is already running in this
+        process. Forked processes have to start their own
+        """
+
+        with self._lock:
+            if self._listener is not None and self._listener_pid == os.getpid():
+                return
+
+            pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+            pubsub.psubscribe(**{self._get_channel('*'): self._on_message})
+
+            self._listener = pubsub.run_in_thread(sleep_time=1.0, daemon=True)
+            self._listener_pid = os.getpid()
+
+    def _on_message(self, message):
+        """
+        Called in the listener thread for every wake-up that was published
+        """
+
+        channel = message['channel']
+        if isinstance(channel, bytes):
+            channel = channel.decode('utf-8')
+
+        suffix = channel[len(self.channel_prefix) + 1:]
+        if suffix == self.BROADCAST:
+            self._wake_up(None)
+        elif suffix == TIMER_WAKEUP_KEY:
+            self._wake_up([TIMER_WAKEUP_KEY])
+        else:
+            try:
+                self._wake_up([int(suffix)])
+            except ValueError:
+                log.warning('Ignoring wake-up on unexpected channel %s', channel)
+
+
+def publish_notification_wakeups(user_ids):
+    """
+    Wake up the subscribers of user_ids - or everyone if user_ids is None - once
+    the current database transaction (if any) has been committed, so that they
+    will see the changes when they are woken up.
+
+    Since subscribers always fall back to polling, failing to publish is not fatal
+    """
+
+    def _publish():
+        """
+        Publish on the configured pub/sub provider
+        """
+        try:
+            notification_pubsub().publish(user_ids)
+        except Exception:  # pylint: disable=broad-except
+            log.exception('Could not publish notification wake-ups')
+
+    # the changes have been written through the Notification Store
+    transaction.on_commit(_publish, using=notification_store().get_write_database_alias())
+
+
+def publish_timer_wakeup():
+    """
+    Wake up the timer scheduler, as a timer has been scheduled
+    """
+
+    publish_notification_wakeups([TIMER_WAKEUP_KEY])
+
+
+def watch_notifications_change_token(user_id, change_token, max_secs, heartbeat_secs):
+    """
+    Generator which yields the user's change token whenever it no longer matches
+    change_token (the last one that the client has seen, if any), or None if nothing
+    has changed for heartbeat_secs. It stops after max_secs have passed
+    """
+
+    # whatever gets passed in, we have to stop eventually. Neither of the
+    # checks below would ever be True with NaN, or a negative heartbeat
+    max_secs = max(max_secs, 0) if math.isfinite(max_secs) else 0
+    heartbeat_secs = max(heartbeat_secs, 0) if math.isfinite(heartbeat_secs) else max_secs
+
+    store = notification_store()
+    deadline = time.time() + max_secs
+
+    # subscribe before looking at the store, so that we can't miss a wake-up in between
+    with notification_pubsub().subscribe(user_id) as subscription:
+        last_yield = time.time()
+
+        while True:
+            token = store.get_notifications_change_token(user_id)
+            now = time.time()
+
+            if token != change_token:
+                change_token = token
+                last_yield = now
+                yield token
+            elif now - last_yield >= heartbeat_secs:
+                last_yield = now
+                yield None
+
+            now = time.time()
+            if now >= deadline:
+                return
+
+            subscription.wait(min(deadline - now, last_yield + heartbeat_secs - now))
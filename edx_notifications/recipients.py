@@ -0,0 +1,146 @@
+"""
+Helpers to normalize the collections of user_ids that are passed into the
+various bulk fan-out entry points
+"""
+
+
+
+import logging
+
+from django.db.models.query import QuerySet
+
+log = logging.getLogger(__name__)
+
+
+def _iterate_user_ids(user_ids):
+    """
+    Enumerate over a list, generator function or ValuesQuerySet/ValuesListQuerySet
+    of user_ids. ORM resultsets are streamed from the database rather than
+    being loaded into memory all at once
+    """
+
+    if isinstance(user_ids, QuerySet):
+        return user_ids.iterator()
+
+    return iter(user_ids)
+
+
+def _as_set(user_ids):
+    """
+    Convert any collection of user_ids into a set, so that
+    membership tests are O(1)
+    """
+
+    if user_ids is None:
+        return frozenset()
+
+    if isinstance(user_ids, (set, frozenset)):
+        return user_ids
+
+    return frozenset(_iterate_user_ids(user_ids))
+
+
+class RecipientStream:
+    """
+    A single pass iterator over all recipients of a bulk fan-out. This will
+    drop any user_id that is in the exclusion list as well as any user_id that
+    was already emitted, so that the same user never gets the same message twice
+    (which would otherwise violate the (user_id, msg) uniqueness in the store)
+
+    user_ids and exclude_user_ids can each be a list, a set, a generator
+    function, or a django.db.models.query.ValuesQuerySet/ValuesListQuerySet
+    where just the id column of the user has been selected.
+
+    After - or while - iterating, num_recipients, num_excluded and num_duplicates
+    report on what has been emitted and what has been dropped.
+    """
+
+    def __init__(self, user_ids, exclude_user_ids=None):
+        """
+        Initializer
+        """
+
+        self._user_ids = user_ids
+        self._exclude_user_ids = _as_set(exclude_user_ids)
+
+        self.num_recipients = 0
+        self.num_excluded = 0
+        self.num_duplicates = 0
+
+    def __iter__(self):
+        """
+        Enumerate over all distinct, non-excluded user_ids
+        """
+
+        seen = set()
+        exclude_user_ids = self._exclude_user_ids
+
+        for user_id in _iterate_user_ids(self._user_ids):
+            if user_id in exclude_user_ids:
+                self.num_excluded += 1
+                continue
+
+            if user_id in seen:
+                self.num_duplicates += 1
+                continue
+
+            seen.add(user_id)
+            self.num_recipients += 1
+
+            yield user_id
+
+    def log_stats(self, msg):
+        """
+        Write out how many recipients were emitted/dropped for a given message
+        """
+
+        log.info(
+            'Fan-out of msg_id %s: %d recipients, %d excluded, %d duplicates dropped',
+            msg.id,
+            self.num_recipients,
+            self.num_excluded,
+            self.num_duplicates
+        )
+
+
+PARTITION_STRATEGY_MODULO = 'modulo'
+PARTITION_STRATEGY_RANGE = 'range'
+
+
+def partition_user_ids(user_ids, num_partitions, strategy=PARTITION_STRATEGY_MODULO):
+    """
+    Divide up user_ids into num_partitions disjoint lists, either by user_id modulo
+    num_partitions ('modulo') or into contiguous ranges of sorted user_ids ('range').
+    Empty partitions are dropped, so fewer than num_partitions lists might be returned.
+
+    NOTE: This does not filter out duplicates, so callers will typically pass in
+    a RecipientStream
+    """
+
+    if num_partitions < 1:
+        raise ValueError('num_partitions must be at least 1')
+
+    if strategy == PARTITION_STRATEGY_MODULO:
+        partitions = [[] for __ in range(num_partitions)]
+        for user_id in _iterate_user_ids(user_ids):
+            partitions[user_id % num_partitions].append(user_id)
+    elif strategy == PARTITION_STRATEGY_RANGE:
+        sorted_user_ids = sorted(_iterate_user_ids(user_ids))
+        partition_size, remainder = divmod(len(sorted_user_ids), num_partitions)
+
+        partitions = []
+        start = 0
+        for idx in range(num_partitions):
+            # spread the remainder over the first partitions
+            end = start + partition_size + (1 if idx < remainder else 0)
+            partitions.append(sorted_user_ids[start:end])
+            start = end
+    else:
+        raise ValueError(
+            "Unknown partition strategy '{strategy}'. Allowed values are: '{allowed}'.".format(
+                strategy=strategy,
+                allowed=str([PARTITION_STRATEGY_MODULO, PARTITION_STRATEGY_RANGE])
+            )
+        )
+
+    return [partition for partition in partitions if partition]
@@ -0,0 +1,234 @@
+"""
+A resident scheduler for the NotificationCallbackTimers (see the 'run_notification_scheduler'
+management command), as an alternative to running 'background_notification_check' from cron.
+
+The scheduler keeps a min-heap of when each timer is next due, and sleeps until the earliest
+of those. Rather than scanning all timers every time, it only asks the Notification Store for
+the timers which have been modified since it last looked - every NOTIFICATION_SCHEDULER_REFRESH_SECS,
+or right away when it is woken up on the pub/sub provider because a timed notification has
+been published. Timers are claimed with leases (see poll_and_execute_timers()), so several
+schedulers - or a scheduler and the cron job - can run side by side.
+"""
+
+
+
+import time
+import heapq
+import logging
+import threading
+from datetime import datetime, timedelta
+
+import pytz
+from django.db import close_old_connections
+
+from edx_notifications import const
+from edx_notifications.timer import poll_and_execute_timers
+from edx_notifications.utils import get_worker_id
+from edx_notifications.pubsub import TIMER_WAKEUP_KEY, notification_pubsub
+from edx_notifications.stores.store import notification_store
+
+log = logging.getLogger(__name__)
+
+
+class NotificationTimerScheduler:
+    """
+    Executes the timers as they come due, until it is stopped
+    """
+
+    def __init__(self, worker_id=None, refresh_secs=None):
+        """
+        Initializer
+        """
+
+        self.worker_id = worker_id if worker_id else get_worker_id()
+        self.refresh_secs = refresh_secs if refresh_secs is not None else const.NOTIFICATION_SCHEDULER_REFRESH_SECS
+
+        # when each timer is next due, by name, along with a heap of (due_at, name). The heap
+        # may hold outdated entries, which are skipped if they don't match the dict
+        self._due = {}
+        self._heap = []
+
+        self._refreshed_at = None
+        self._resynced_at = None
+
+        self._stopping = threading.Event()
+        self._subscription = None
+
+        self._reset_stats()
+
+    def stop(self):
+        """
+        Have run() return as soon as it is done with the timers it is executing right now.
+        This is safe to call from a signal handler or another thread
+        """
+
+        self._stopping.set()
+
+        if self._subscription:
+            self._subscription.event.set()
+
+    def get_next_due(self):
+        """
+        Returns when the next timer is due, or None if there are no timers
+        """
+
+        while self._heap and self._due.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+
+        return self._heap[0][0] if self._heap else None
+
+    def refresh(self):
+        """
+        Picks up the timers which have been changed since we last looked - or all of
+        them, once every NOTIFICATION_SCHEDULER_RESYNC_SECS
+        """
+
+        now = datetime.now(pytz.UTC)
+        store = notification_store()
+
+        if self._resynced_at is None or time.time() - self._resynced_at >= const.NOTIFICATION_SCHEDULER_RESYNC_SECS:
+            self._due = {}
+            self._heap = []
+            self._resynced_at = time.time()
+            schedule = store.get_notification_timer_schedule()
+        else:
+            lookback = timedelta(seconds=const.NOTIFICATION_SCHEDULER_LOOKBACK_SECS)
+            schedule = store.get_notification_timer_schedule(modified_since=self._refreshed_at - lookback)
+
+        self._refreshed_at = now
+
+        for name, due_at in schedule.items():
+            if due_at is None:
+                self._due.pop(name, None)
+            elif self._due.get(name) != due_at:
+                self._due[name] = due_at
+                heapq.heappush(self._heap, (due_at, name))
+
+        # don't let outdated entries pile up in between resyncs
+        if len(self._heap) > 2 * len(self._due) + 1000:
+            self._heap = [(due_at, name) for name, due_at in self._due.items()]
+            heapq.heapify(self._heap)
+
+    def run_due_timers(self):
+        """
+        Executes the timers which are due, if any
+
+        RETURNS: the number of timers executed
+        """
+
+        now = datetime.now(pytz.UTC)
+        next_due = self.get_next_due()
+        if next_due is None or next_due > now:
+            return 0
+
+        lags = poll_and_execute_timers(worker_id=self.worker_id, should_stop=self._stopping.is_set)
+
+        # whatever was due has been executed, by us or by someone else, and when these timers are
+        # next due (if at all) is going to be picked up by the refresh which follows
+        while self._heap and self._heap[0][0] <= now:
+            due_at, name = heapq.heappop(self._heap)
+            if self._due.get(name) == due_at:
+                del self._due[name]
+
+        self._num_executed += len(lags)
+        self._total_lag_secs += sum(lags)
+        self._max_lag_secs = max([self._max_lag_secs] + lags)
+
+        return len(lags)
+
+    def report(self):
+        """
+        Logs how many timers have been executed since the last report and how late
+        they were, and starts over
+
+        RETURNS: dict of those numbers
+        """
+
+        stats = {
+            'num_executed': self._num_executed,
+            'avg_lag_secs': self._total_lag_secs / self._num_executed if self._num_executed else 0.0,
+            'max_lag_secs': self._max_lag_secs,
+            'num_scheduled': len(self._due),
+        }
+
+        log.info(
+            'Notification scheduler %s executed %d timers in the last %d secs, lagging %.3f secs on '
+            'average and %.3f secs at most. %d timers are scheduled.',
+            self.worker_id,
+            stats['num_executed'],
+            time.time() - self._reported_at,
+            stats['avg_lag_secs'],
+            stats['max_lag_secs'],
+            stats['num_scheduled']
+        )
+
+        self._reset_stats()
+        return stats
+
+    def _reset_stats(self):
+        """
+        Starts a new reporting period
+        """
+
+        self._reported_at = time.time()
+        self._num_executed = 0
+        self._total_lag_secs = 0.0
+        self._max_lag_secs = 0.0
+
+    def run(self, max_secs=None):
+        """
+        Executes the timers as they come due, until stop() is called, or
+        max_secs (if passed in) have passed
+        """
+
+        log.info('Starting notification scheduler %s...', self.worker_id)
+
+        deadline = time.time() + max_secs if max_secs is not None else None
+        refresh_at = time.time()
+        woken = False
+
+        # subscribe before looking at the timers, so that we can't miss a wake-up in between
+        with notification_pubsub().subscribe(TIMER_WAKEUP_KEY) as subscription:
+            self._subscription = subscription
+
+            while not self._stopping.is_set():
+                # like in between requests, drop connections which have gone bad or are too old
+                close_old_connections()
+
+                try:
+                    if woken or time.time() >= refresh_at:
+                        self.refresh()
+                        refresh_at = time.time() + self.refresh_secs
+
+                    next_due = self.get_next_due()
+                    if next_due is not None and next_due <= datetime.now(pytz.UTC):
+                        self.run_due_timers()
+
+                        # pick up where the timers have been rescheduled to
+                        self.refresh()
+                except Exception:  # pylint: disable=broad-except
+                    # e.g. the database went away, so keep going after a while
+                    log.exception('Notification scheduler %s failed to run the timers', self.worker_id)
+                    refresh_at = time.time() + self.refresh_secs
+
+                if time.time() - self._reported_at >= const.NOTIFICATION_SCHEDULER_REPORT_SECS:
+                    self.report()
+
+                wait_until = refresh_at
+                next_due = self.get_next_due()
+                if next_due is not None:
+                    wait_until = min(wait_until, time.time() + (next_due - datetime.now(pytz.UTC)).total_seconds())
+                if deadline is not None:
+                    if time.time() >= deadline:
+                        break
+                    wait_until = min(wait_until, deadline)
+
+                if wait_until > time.time():
+                    woken = subscription.wait(wait_until - time.time())
+                else:
+                    woken = False
+
+            self._subscription = None
+
+        self.report()
+        log.info('Stopped notification scheduler %s.', self.worker_id)
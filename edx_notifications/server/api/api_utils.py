@@ -4,12 +4,32 @@ Helpers for the HTTP APIs
 
 
 
+import json
+
 import six
 from rest_framework.views import APIView
+from rest_framework.renderers import BaseRenderer
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.authentication import SessionAuthentication
 
 
+class EventStreamRenderer(BaseRenderer):
+    """
+    Lets views accept requests for text/event-stream (Server-Sent Events). Views
+    stream the events themselves, this only renders e.g. errors as a single event
+    """
+    media_type = 'text/event-stream'
+    format = 'sse'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        """
+        Render data as a single 'error' event
+        """
+
+        return 'event: error\ndata: {data}\n\n'.format(data=json.dumps(data)).encode(self.charset)
+
+
 class AuthenticatedAPIView(APIView):
     """
     Returns the number of notifications for the logged in user
@@ -32,7 +52,7 @@ class AuthenticatedAPIView(APIView):
 
             # check parameter value
             allowed_values = self._allowed_post_parameters[key]
-            if value not in allowed_values and allowed_values != '*':
+            if allowed_values != '*' and value not in allowed_values:
                 return False
 
         return True
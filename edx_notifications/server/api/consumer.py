@@ -4,29 +4,39 @@ Notification Consumer HTTP-based API enpoints
 
 
 
+import json
+import math
+import hashlib
 import logging
 
 import six
-from django.http import Http404
+from django.http import Http404, StreamingHttpResponse
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
 from rest_framework import status
 from rest_framework.response import Response
+from rest_framework.renderers import JSONRenderer
 
 from edx_notifications import const
-from edx_notifications.exceptions import ItemNotFoundError
+from edx_notifications.pubsub import watch_notifications_change_token
+from edx_notifications.exceptions import ItemNotFoundError, BulkOperationTooLarge
 from edx_notifications.lib.consumer import (
     get_user_preferences,
     mark_notification_read,
+    mark_notifications_read,
     get_notification_for_user,
-    get_notifications_for_user,
     get_user_preference_by_name,
     get_notification_preferences,
+    get_next_notifications_cursor,
+    get_notification_dicts_for_user,
     get_notifications_count_for_user,
     set_user_notification_preference,
+    get_notifications_change_token_for_user,
     mark_all_user_notification_as_read
 )
 from edx_notifications.renderers.renderer import get_all_renderers
 
-from .api_utils import AuthenticatedAPIView
+from .api_utils import EventStreamRenderer, AuthenticatedAPIView
 
 LOG = logging.getLogger("api")
 
@@ -40,8 +50,12 @@ FILTER_PARAMETER_NAMES = [
 OPTIONS_PARAMETER_NAMES = [
     ('offset', int),
     ('limit', int),
+    ('before', str),
 ]
 
+# response header which carries the cursor for the next page of notifications
+NEXT_CURSOR_HEADER_NAME = 'X-Notifications-Next-Cursor'
+
 BOOLEAN_TRUE_STRINGS = [
     'True',
     'true',
@@ -101,11 +115,30 @@ def _get_filter_and_options(request):
     return filters, options
 
 
+def _get_notifications_etag(request):
+    """
+    The ETag of the count and list endpoints, so clients can do conditional
+    GETs (If-None-Match) and get a 304 back if nothing has changed. This
+    only depends on the user's change token and the query parameters
+    """
+
+    token = get_notifications_change_token_for_user(int(request.user.id))
+
+    raw = '{user_id}|{token}|{params}'.format(
+        user_id=request.user.id,
+        token=token,
+        params=request.GET.urlencode()
+    )
+
+    return hashlib.md5(raw.encode('utf-8')).hexdigest()
+
+
 class NotificationCount(AuthenticatedAPIView):
     """
     Returns the number of notifications for the logged in user
     """
 
+    @method_decorator(condition(etag_func=_get_notifications_etag))
     def get(self, request):
         """
         HTTP GET Handler
@@ -132,8 +165,13 @@ class NotificationCount(AuthenticatedAPIView):
 class NotificationsList(AuthenticatedAPIView):
     """
     GET returns list of notifications
+
+    Paging can be done either via 'offset' and 'limit' or - which is cheaper
+    for deep pages - by passing the value of the X-Notifications-Next-Cursor
+    response header as the 'before' parameter of the next request
     """
 
+    @method_decorator(condition(etag_func=_get_notifications_etag))
     def get(self, request):
         """
         HTTP GET Handler
@@ -141,18 +179,113 @@ class NotificationsList(AuthenticatedAPIView):
 
         try:
             filters, options = _get_filter_and_options(request)
+
+            # we only send the notifications on, so skip building data objects
+            resultset = get_notification_dicts_for_user(
+                int(request.user.id),
+                filters=filters,
+                options=options,
+            )
         except ValueError:
             return Response({}, status.HTTP_400_BAD_REQUEST)
 
-        user_msgs = get_notifications_for_user(
-            int(request.user.id),
-            filters=filters,
-            options=options,
+        response = Response(resultset, status.HTTP_200_OK)
+
+        next_cursor = get_next_notifications_cursor(resultset, limit=options.get('limit'))
+        if next_cursor:
+            response[NEXT_CURSOR_HEADER_NAME] = next_cursor
+
+        return response
+
+
+class NotificationEvents(AuthenticatedAPIView):
+    """
+    Holds the connection open until the logged in user's notifications change, so that
+    clients don't have to keep polling the count endpoint.
+
+    Clients which accept text/event-stream (i.e. an EventSource) get a Server-Sent Events
+    stream with a 'notifications' event whenever the notifications change. Every other
+    GET is a long-poll, which returns {'token': ..., 'changed': ...} as soon as the
+    notifications no longer match the 'token' parameter, or after 'timeout' seconds
+    """
+
+    renderer_classes = (JSONRenderer, EventStreamRenderer)
+
+    def get(self, request):
+        """
+        HTTP GET Handler
+        """
+
+        user_id = int(request.user.id)
+
+        if request.accepted_renderer.format == EventStreamRenderer.format:
+            return self._get_event_stream(request, user_id)
+
+        change_token = request.GET.get('token')
+
+        try:
+            timeout = float(request.GET.get('timeout', const.NOTIFICATION_PUSH_LONG_POLL_TIMEOUT_SECS))
+        except ValueError:
+            return Response({}, status.HTTP_400_BAD_REQUEST)
+
+        # NaN would get past any clamping, and never time out
+        if not math.isfinite(timeout):
+            return Response({}, status.HTTP_400_BAD_REQUEST)
+
+        timeout = max(min(timeout, const.NOTIFICATION_PUSH_LONG_POLL_TIMEOUT_SECS), 0)
+
+        tokens = watch_notifications_change_token(user_id, change_token, timeout, timeout)
+        try:
+            token = next(tokens, None)
+        finally:
+            tokens.close()
+
+        return Response(
+            {
+                'token': token if token is not None else change_token,
+                'changed': token is not None,
+            },
+            status=status.HTTP_200_OK
+        )
+
+    def _get_event_stream(self, request, user_id):  # pylint: disable=no-self-use
+        """
+        Stream an event every time the notifications change, using the change token as the
+        event id, so that an EventSource which reconnects (after NOTIFICATION_PUSH_STREAM_MAX_SECS
+        or a dropped connection) only gets an event if something has changed in the meantime
+        """
+
+        tokens = watch_notifications_change_token(
+            user_id,
+            request.META.get('HTTP_LAST_EVENT_ID'),
+            const.NOTIFICATION_PUSH_STREAM_MAX_SECS,
+            const.NOTIFICATION_PUSH_HEARTBEAT_SECS
         )
 
-        resultset = [user_msg.get_fields() for user_msg in user_msgs]
+        def _events():
+            """
+            Turn the change tokens into Server-Sent Events
+            """
+
+            # how long the EventSource waits before reconnecting
+            yield 'retry: {}\n\n'.format(const.NOTIFICATION_PUSH_POLL_PERIOD_SECS * 1000)
+
+            for token in tokens:
+                if token is None:
+                    yield ': heartbeat\n\n'
+                else:
+                    yield 'id: {token}\nevent: notifications\ndata: {data}\n\n'.format(
+                        token=token,
+                        data=json.dumps({'token': token})
+                    )
+
+        response = StreamingHttpResponse(_events(), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+
+        # don't let nginx buffer the stream
+        response['X-Accel-Buffering'] = 'no'
 
-        return Response(resultset, status.HTTP_200_OK)
+        return response
 
 
 def _find_notification_by_id(user_id, msg_id):
@@ -237,6 +370,57 @@ class MarkNotificationsAsRead(AuthenticatedAPIView):
         return Response([], status.HTTP_200_OK)
 
 
+def _get_msg_ids(request):
+    """
+    Helper to read the 'msg_ids' POST parameter, which can be a list or a
+    comma separated string of msg_ids. Raises a ValueError if it is not valid
+    """
+
+    msg_ids = request.data.get('msg_ids', '')
+    if not isinstance(msg_ids, list):
+        msg_ids = str(msg_ids).split(',')
+
+    msg_ids = [int(msg_id) for msg_id in msg_ids if str(msg_id).strip()]
+    if not msg_ids or min(msg_ids) <= 0:
+        raise ValueError('msg_ids must be a list of positive integers')
+
+    return msg_ids
+
+
+class MarkNotificationsByIds(AuthenticatedAPIView):
+    """
+    Mark the user notifications for a list of msg_ids as read or unread in one go,
+    e.g. all of the notifications that are visible in the notification pane
+    """
+
+    _allowed_post_parameters = {
+        'msg_ids': '*',
+        'mark_as': ['read', 'unread'],
+    }
+
+    def post(self, request):
+        """
+        HTTP POST Handler which takes a list of 'msg_ids' and - optionally - 'mark_as'
+        """
+
+        # make sure we only have expected parameter names and values
+        if not self.validate_post_parameters(request):
+            return Response({}, status.HTTP_400_BAD_REQUEST)
+
+        try:
+            msg_ids = _get_msg_ids(request)
+
+            num_changed = mark_notifications_read(
+                int(request.user.id),
+                msg_ids,
+                read=request.data.get('mark_as', 'read') == 'read'
+            )
+        except (ValueError, BulkOperationTooLarge):
+            return Response({}, status.HTTP_400_BAD_REQUEST)
+
+        return Response({'num_changed': num_changed}, status.HTTP_200_OK)
+
+
 class NotificationPreferenceList(AuthenticatedAPIView):
     """
     GET returns a list of all possible notification preferences that the user could set.
@@ -9,6 +9,7 @@ All tests for the test_consumer.py
 
 
 import json
+from unittest import mock
 
 from django.test.client import Client
 from django.urls import NoReverseMatch, reverse
@@ -326,6 +327,168 @@ class ConsumerAPITests(LoggedInTestCase):
         self._compare_user_msg_to_result(user_msg2, results[0])
         self._compare_user_msg_to_result(user_msg1, results[1])
 
+    def test_notifications_cursor_paging(self):
+        """
+        Make sure we can page through notifications by following the next cursor
+        """
+
+        user_msgs = [
+            publish_notification_to_user(
+                self.user.id,
+                NotificationMessage(namespace='test-runner', msg_type=self.msg_type, payload={'idx': idx})
+            )
+            for idx in range(5)
+        ]
+
+        results = []
+        params = {'limit': 2}
+        while True:
+            response = self.client.get(reverse('edx_notifications.consumer.notifications'), params)
+            self.assertEqual(response.status_code, 200)
+
+            results.extend(json.loads(response.content.decode('utf-8')))
+
+            if not response.has_header('X-Notifications-Next-Cursor'):
+                break
+
+            params = {'limit': 2, 'before': response['X-Notifications-Next-Cursor']}
+
+        self.assertEqual(len(results), 5)
+        for user_msg, result in zip(reversed(user_msgs), results):
+            self._compare_user_msg_to_result(user_msg, result)
+
+        response = self.client.get(reverse('edx_notifications.consumer.notifications'), {'before': 'garbage'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_long_poll(self):
+        """
+        Make sure the events endpoint answers long-polls with the change token
+        """
+
+        url = reverse('edx_notifications.consumer.notifications.events')
+
+        # without a token, we are told the current one right away
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        results = json.loads(response.content.decode('utf-8'))
+        self.assertTrue(results['changed'])
+        token = results['token']
+
+        # nothing changes before we time out
+        response = self.client.get(url, {'token': token, 'timeout': '0.01'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content.decode('utf-8')), {'token': token, 'changed': False})
+
+        publish_notification_to_user(
+            self.user.id,
+            NotificationMessage(namespace='test-runner', msg_type=self.msg_type, payload={'foo': 'bar'})
+        )
+
+        response = self.client.get(url, {'token': token, 'timeout': '0.01'})
+        results = json.loads(response.content.decode('utf-8'))
+        self.assertTrue(results['changed'])
+        self.assertNotEqual(results['token'], token)
+
+        response = self.client.get(url, {'timeout': 'foo'})
+        self.assertEqual(response.status_code, 400)
+
+        # which would never time out
+        for timeout in ('nan', 'inf', '-inf'):
+            response = self.client.get(url, {'token': token, 'timeout': timeout})
+            self.assertEqual(response.status_code, 400)
+
+        # a negative timeout returns right away
+        response = self.client.get(url, {'token': results['token'], 'timeout': '-10'})
+        self.assertEqual(json.loads(response.content.decode('utf-8'))['changed'], False)
+
+    def test_event_stream(self):
+        """
+        Make sure the events endpoint streams Server-Sent Events
+        """
+
+        url = reverse('edx_notifications.consumer.notifications.events')
+
+        with mock.patch.object(const, 'NOTIFICATION_PUSH_STREAM_MAX_SECS', 0.05):
+            with mock.patch.object(const, 'NOTIFICATION_PUSH_HEARTBEAT_SECS', 0.01):
+                response = self.client.get(url, HTTP_ACCEPT='text/event-stream')
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response['Content-Type'], 'text/event-stream')
+
+                events = b''.join(response.streaming_content).decode('utf-8').split('\n\n')
+
+                self.assertTrue(events[0].startswith('retry: '))
+                self.assertTrue(events[1].startswith('id: '))
+                self.assertIn('event: notifications', events[1])
+                self.assertIn(': heartbeat', events[2:])
+
+                # reconnecting with the last event id doesn't get us the same event again
+                token = events[1].split('\n')[0][len('id: '):]
+                response = self.client.get(url, HTTP_ACCEPT='text/event-stream', HTTP_LAST_EVENT_ID=token)
+                events = b''.join(response.streaming_content).decode('utf-8')
+                self.assertNotIn('event: notifications', events)
+
+    def test_event_stream_anonymous(self):
+        """
+        Make sure anonymous users get an error event
+        """
+
+        self.client.logout()
+
+        response = self.client.get(
+            reverse('edx_notifications.consumer.notifications.events'),
+            HTTP_ACCEPT='text/event-stream'
+        )
+        self.assertEqual(response.status_code, 403)
+        self.assertTrue(response.content.startswith(b'event: error'))
+
+    def test_conditional_get(self):
+        """
+        Make sure the count and list endpoints answer with a 304 if nothing
+        has changed since the ETag that the client sends back
+        """
+
+        user_msg = publish_notification_to_user(
+            self.user.id,
+            NotificationMessage(namespace='test-runner', msg_type=self.msg_type, payload={'foo': 'bar'})
+        )
+
+        for url_name in ('edx_notifications.consumer.notifications.count', 'edx_notifications.consumer.notifications'):
+            url = reverse(url_name)
+
+            response = self.client.get(url, {'read': False})
+            self.assertEqual(response.status_code, 200)
+            etag = response['ETag']
+
+            response = self.client.get(url, {'read': False}, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(response.content, b'')
+
+            # different parameters, different ETag
+            response = self.client.get(url, {'read': True}, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+
+        count_url = reverse('edx_notifications.consumer.notifications.count')
+        etag = self.client.get(count_url)['ETag']
+
+        # new notifications, marking them as read and marking all as read change the ETag
+        publish_notification_to_user(
+            self.user.id,
+            NotificationMessage(namespace='test-runner', msg_type=self.msg_type, payload={'foo': 'baz'})
+        )
+        response = self.client.get(count_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+
+        self._mark_notification_as_read(user_msg)
+        response = self.client.get(count_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+
+        self._mark_user_notifications_as_read()
+        response = self.client.get(count_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content.decode('utf-8'))['count'], 2)
+
     def _mark_user_notifications_as_read(self, namespace=None):
         """
         Helper method to call API to mark users notifications as read
@@ -447,6 +610,43 @@ class ConsumerAPITests(LoggedInTestCase):
         self._assert_expected_counts(0, read_filter=True)
         self._assert_expected_counts(1, read_filter=False)
 
+    def test_mark_notifications_by_ids(self):
+        """
+        Mark a list of notifications as read and back to unread in one request
+        """
+
+        user_msgs = [self._publish_test_notification() for __ in range(5)]
+        msg_ids = [user_msg.msg.id for user_msg in user_msgs]
+
+        url = reverse('edx_notifications.consumer.notifications.mark_notifications_by_ids')
+
+        response = self.client.post(url, {'msg_ids': ','.join(str(msg_id) for msg_id in msg_ids[:3])})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content.decode('utf-8')), {'num_changed': 3})
+
+        self._assert_expected_counts(3, read_filter=True)
+        self._assert_expected_counts(2, read_filter=False)
+
+        response = self.client.post(
+            url,
+            json.dumps({'msg_ids': msg_ids[1:], 'mark_as': 'unread'}),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content.decode('utf-8')), {'num_changed': 2})
+
+        self._assert_expected_counts(1, read_filter=True)
+        self._assert_expected_counts(4, read_filter=False)
+
+        # bad requests
+        for data in [{}, {'msg_ids': 'foo'}, {'msg_ids': '0'}, {'msg_ids': '1', 'mark_as': 'foo'}, {'foo': 'bar'}]:
+            response = self.client.post(url, data)
+            self.assertEqual(response.status_code, 400)
+
+        with mock.patch.object(const, 'NOTIFICATION_MAX_LIST_SIZE', 2):
+            response = self.client.post(url, {'msg_ids': '1,2,3'})
+            self.assertEqual(response.status_code, 400)
+
     def test_get_notifications_bad_request(self):
         """
         Test Case for retrieving multiple notifications
@@ -6,6 +6,10 @@ CONSUMER_NOTIFICATIONS_COUNT_REGEX = r'edx_notifications/v1/consumer/notificatio
 CONSUMER_NOTIFICATION_DETAIL_REGEX = r'edx_notifications/v1/consumer/notifications/(?P<msg_id>[0-9]+)$'
 CONSUMER_NOTIFICATION_DETAIL_NO_PARAM_REGEX = r'edx_notifications/v1/consumer/notifications/$'
 CONSUMER_NOTIFICATIONS_MARK_NOTIFICATIONS_REGEX = r'edx_notifications/v1/consumer/notifications/mark_notifications$'
+CONSUMER_NOTIFICATIONS_MARK_NOTIFICATIONS_BY_IDS_REGEX = (
+    r'edx_notifications/v1/consumer/notifications/mark_notifications_by_ids$'
+)
+CONSUMER_NOTIFICATIONS_EVENTS_REGEX = r'edx_notifications/v1/consumer/notifications/events$'
 CONSUMER_NOTIFICATIONS_REGEX = r'edx_notifications/v1/consumer/notifications$'
 CONSUMER_NOTIFICATIONS_PREFERENCES_REGEX = r'edx_notifications/v1/consumer/notification_preferences$'
 CONSUMER_USER_PREFERENCES_REGEX = r'edx_notifications/v1/consumer/user_preferences$'
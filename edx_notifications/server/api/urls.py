@@ -13,11 +13,13 @@ from .url_regex import (
     CONSUMER_USER_PREFERENCES_REGEX,
     CONSUMER_NOTIFICATION_DETAIL_REGEX,
     CONSUMER_NOTIFICATIONS_COUNT_REGEX,
+    CONSUMER_NOTIFICATIONS_EVENTS_REGEX,
     CONSUMER_RENDERERS_TEMPLATES_REGEX,
     CONSUMER_USER_PREFERENCES_DETAIL_REGEX,
     CONSUMER_NOTIFICATIONS_PREFERENCES_REGEX,
     CONSUMER_NOTIFICATION_DETAIL_NO_PARAM_REGEX,
     CONSUMER_NOTIFICATIONS_MARK_NOTIFICATIONS_REGEX,
+    CONSUMER_NOTIFICATIONS_MARK_NOTIFICATIONS_BY_IDS_REGEX,
     CONSUMER_USER_PREFERENCES_DETAIL_NO_PARAM_REGEX
 )
 
@@ -27,6 +29,11 @@ urlpatterns = [  # pylint: disable=invalid-name
         consumer_views.NotificationCount.as_view(),
         name='edx_notifications.consumer.notifications.count'
     ),
+    re_path(
+        CONSUMER_NOTIFICATIONS_EVENTS_REGEX,
+        consumer_views.NotificationEvents.as_view(),
+        name='edx_notifications.consumer.notifications.events'
+    ),
     re_path(
         CONSUMER_NOTIFICATION_DETAIL_REGEX,
         consumer_views.NotificationDetail.as_view(),
@@ -42,6 +49,11 @@ urlpatterns = [  # pylint: disable=invalid-name
         consumer_views.MarkNotificationsAsRead.as_view(),
         name='edx_notifications.consumer.notifications.mark_notifications_as_read'
     ),
+    re_path(
+        CONSUMER_NOTIFICATIONS_MARK_NOTIFICATIONS_BY_IDS_REGEX,
+        consumer_views.MarkNotificationsByIds.as_view(),
+        name='edx_notifications.consumer.notifications.mark_notifications_by_ids'
+    ),
     re_path(
         CONSUMER_NOTIFICATIONS_REGEX,
         consumer_views.NotificationsList.as_view(),
@@ -13,11 +13,13 @@ from .url_regex import (
     CONSUMER_USER_PREFERENCES_REGEX,
     CONSUMER_NOTIFICATION_DETAIL_REGEX,
     CONSUMER_NOTIFICATIONS_COUNT_REGEX,
+    CONSUMER_NOTIFICATIONS_EVENTS_REGEX,
     CONSUMER_RENDERERS_TEMPLATES_REGEX,
     CONSUMER_USER_PREFERENCES_DETAIL_REGEX,
     CONSUMER_NOTIFICATIONS_PREFERENCES_REGEX,
     CONSUMER_NOTIFICATION_DETAIL_NO_PARAM_REGEX,
     CONSUMER_NOTIFICATIONS_MARK_NOTIFICATIONS_REGEX,
+    CONSUMER_NOTIFICATIONS_MARK_NOTIFICATIONS_BY_IDS_REGEX,
     CONSUMER_USER_PREFERENCES_DETAIL_NO_PARAM_REGEX
 )
 
@@ -35,6 +37,11 @@ urlpatterns = [  # pylint: disable=invalid-name
         mock_handler,
         name='edx_notifications.consumer.notifications.count'
     ),
+    re_path(
+        CONSUMER_NOTIFICATIONS_EVENTS_REGEX,
+        mock_handler,
+        name='edx_notifications.consumer.notifications.events'
+    ),
     re_path(
         CONSUMER_NOTIFICATION_DETAIL_REGEX,
         mock_handler,
@@ -50,6 +57,11 @@ urlpatterns = [  # pylint: disable=invalid-name
         mock_handler,
         name='edx_notifications.consumer.notifications.mark_notifications_as_read'
     ),
+    re_path(
+        CONSUMER_NOTIFICATIONS_MARK_NOTIFICATIONS_BY_IDS_REGEX,
+        mock_handler,
+        name='edx_notifications.consumer.notifications.mark_notifications_by_ids'
+    ),
     re_path(
         CONSUMER_NOTIFICATIONS_REGEX,
         mock_handler,
@@ -1,4 +1,44 @@
 var UserNotificationCollection = Backbone.Collection.extend({
     /* model for a collection of UserNotifications */
-    model: UserNotificationModel
+    model: UserNotificationModel,
+
+    /* the last response per url, as the panes share this collection */
+    /* and switch it between urls */
+    responses: null,
+
+    initialize: function() {
+        this.responses = {};
+    },
+
+    fetch: function(options) {
+        options = options ? _.clone(options) : {};
+
+        /* only GETs (i.e. not the mark as read POSTs) are conditional, */
+        /* so that the server can answer with a 304 if nothing has changed */
+        if (!options.type || options.type.toUpperCase() === 'GET') {
+            options.ifModified = true;
+        }
+        return Backbone.Collection.prototype.fetch.call(this, options);
+    },
+
+    _getResponseKey: function(options) {
+        var data = options && options.data ? options.data : '';
+        if (typeof data !== 'string') {
+            data = $.param(data);
+        }
+        return _.result(this, 'url') + '|' + data;
+    },
+
+    parse: function(resp, options) {
+        var key = this._getResponseKey(options);
+
+        /* on a 304 there's no response, so we fall back to the last one */
+        /* rather than emptying the collection */
+        if (resp === undefined) {
+            return this.responses[key];
+        }
+
+        this.responses[key] = resp;
+        return resp;
+    }
 });
@@ -3,5 +3,28 @@ var CounterIconModel = Backbone.Model.extend({
     defaults: {
         /* start with unknown number of unread notifications */
         'count': null
+    },
+
+    /* the last response per url, shared by all instances as the */
+    /* short-poll refresh creates a new model every time it polls */
+    responses: {},
+
+    fetch: function(options) {
+        /* send If-None-Match along, so that the server can answer */
+        /* with a 304 (and no body) if the count has not changed */
+        options = _.extend({ifModified: true}, options);
+        return Backbone.Model.prototype.fetch.call(this, options);
+    },
+
+    parse: function(resp, options) {
+        var url = _.result(this, 'url');
+
+        /* on a 304 there's no response, so we fall back to the last one */
+        if (resp === undefined) {
+            return this.responses[url];
+        }
+
+        this.responses[url] = resp;
+        return resp;
     }
 });
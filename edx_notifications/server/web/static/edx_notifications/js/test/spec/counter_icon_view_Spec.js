@@ -144,4 +144,37 @@ describe("CounterIconView", function(){
         expect(autoRefreshSpy).toHaveBeenCalled();
     });
 
+    it("long-polls the notification events endpoint if refresh_watcher name is server-push", function(){
+        var autoRefreshSpy  = spyOn(CounterIconView.prototype, 'autoRefreshNotifications');
+        var protoView = new CounterIconView({
+            el: $(".xns-icon"),
+            count_el: $(".xns-counter"),
+            endpoints: {
+                unread_notification_count: "/unread/count/?read=False&unread=True",
+                notification_events: "/notifications/events"
+            },
+            refresh_watcher: {
+                name: "server-push",
+                args: {
+                    transport: "long-poll",
+                    retry_secs: 10
+                }
+            }
+        });
+        var requests = _.filter(this.server.requests, function(request) {
+            return request.url.indexOf('/notifications/events') === 0;
+        });
+        expect(requests.length).toBe(1);
+
+        /* the first answer only tells us the current token */
+        requests[0].respond(200, {"Content-Type": "application/json"}, '{"token": "1", "changed": true}');
+        expect(autoRefreshSpy).not.toHaveBeenCalled();
+
+        var next_request = this.server.requests[this.server.requests.length - 1];
+        expect(next_request.url).toContain('token=1');
+
+        next_request.respond(200, {"Content-Type": "application/json"}, '{"token": "2", "changed": true}');
+        expect(autoRefreshSpy).toHaveBeenCalled();
+    });
+
 });
\ No newline at end of file
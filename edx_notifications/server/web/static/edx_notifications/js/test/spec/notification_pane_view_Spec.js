@@ -69,7 +69,8 @@ describe("NotificationPaneView", function(){
                 user_notifications_all:"/all/notifications/?read=True&unread=True",
                 user_notifications_unread_only: "unread/notifications/?read=False&unread=True",
                 renderer_templates_urls: "/renderer/templates",
-                user_notification_mark_read: "read/notifications"
+                user_notification_mark_read: "read/notifications",
+                mark_notifications_by_ids: "/mark/by/ids"
             },
             global_variables: {
                 app_name: "none"
@@ -216,6 +217,26 @@ describe("NotificationPaneView", function(){
         expect(this.empty_list_target.html()).toContain('You have no unread notifications');
     });
 
+    it("coalesces read state changes into a single request", function(){
+        jasmine.clock().install();
+
+        var num_requests = this.server.requests.length;
+        this.notification_pane.queueReadState(1, true);
+        this.notification_pane.queueReadState(2, false);
+        this.notification_pane.queueReadState(2, true);
+        expect(this.server.requests.length).toBe(num_requests);
+
+        jasmine.clock().tick(this.notification_pane.read_state_flush_ms + 1);
+
+        var requests = this.server.requests.slice(num_requests);
+        expect(requests.length).toBe(1);
+        expect(requests[0].url).toBe('/mark/by/ids');
+        expect(requests[0].requestBody).toContain('msg_ids=1%2C2');
+        expect(requests[0].requestBody).toContain('mark_as=read');
+
+        jasmine.clock().uninstall();
+    });
+
     it("calls preventHidingWhenClickedInside function on clicking .xns-content", function(){
         var preventHidingWhenClickedInsideSpy = spyOn(this.notification_pane, 'preventHidingWhenClickedInside');
         this.notification_pane.delegateEvents();
@@ -41,6 +41,48 @@ var CounterIconView = Backbone.View.extend({
           var self = this;
           notification_refresher = setInterval(function() { self.autoRefreshNotifications(self); }, period * 1000);
       }
+
+      /* adding server-push capabilities, where the server holds a connection open */
+      /* and lets us know when there are changes, rather than us asking every so often */
+      if(this.refresh_watcher.name == 'server-push'){
+          this.startServerPush();
+      }
+  },
+
+  startServerPush: function() {
+      var self = this;
+      var url = this.endpoints.notification_events;
+
+      if (this.refresh_watcher.args.transport != 'long-poll' && typeof window.EventSource != 'undefined') {
+          /* Server-Sent Events, the browser takes care of reconnecting */
+          var event_source = new EventSource(url);
+          event_source.addEventListener('notifications', function() {
+              self.autoRefreshNotifications(self);
+          });
+      } else {
+          this.longPoll(url, null);
+      }
+  },
+
+  longPoll: function(url, token) {
+      var self = this;
+      var retry_secs = this.refresh_watcher.args.retry_secs || 10;
+
+      $.ajax({
+          url: url,
+          data: token ? {token: token} : {},
+          dataType: 'json'
+      }).done(function(resp) {
+          /* the first request only tells us where we are at */
+          if (token && resp.changed) {
+              self.autoRefreshNotifications(self);
+          }
+          self.longPoll(url, resp.token);
+      }).fail(function(response) {
+          if (response.status !== 403) {
+              setTimeout(function() { self.longPoll(url, token); }, retry_secs * 1000);
+          }
+      });
   },
 
 
@@ -29,6 +29,11 @@ var NotificationPaneView = Backbone.View.extend({
         this.all_msgs_endpoint = options.endpoints.user_notifications_all;
         this.mark_all_read_endpoint = options.endpoints.mark_all_user_notifications_read;
         this.mark_notification_read_endpoint = options.endpoints.user_notification_mark_read;
+        this.mark_notifications_by_ids_endpoint = options.endpoints.mark_notifications_by_ids;
+
+        /* read state changes which have not been sent to the server yet, by msg_id */
+        this.pending_read_states = {};
+        this.read_state_timer = null;
 
         this.renderer_templates_url_endpoint = options.endpoints.renderer_templates_urls;
 
@@ -52,6 +57,9 @@ var NotificationPaneView = Backbone.View.extend({
         /* re-render if the model changes */
         this.listenTo(this.collection, 'change', this.collectionChanged);
 
+        /* don't lose any read state changes which are still held back */
+        $(window).on('beforeunload', function() { self.flushReadStates(); });
+
 
         this.hydrate();
     },
@@ -499,35 +507,82 @@ var NotificationPaneView = Backbone.View.extend({
         }
         return cookieValue;
     },
+    /* read state changes are held back for this long, so that e.g. closing a */
+    /* few notifications in a row only takes a single request to the server */
+    read_state_flush_ms: 500,
+
+    queueReadState: function(msg_id, read) {
+        var self = this;
+
+        /* the last change to a notification wins */
+        this.pending_read_states[msg_id] = read;
+
+        if (this.read_state_timer) {
+            clearTimeout(this.read_state_timer);
+        }
+        this.read_state_timer = setTimeout(function() { self.flushReadStates(); }, this.read_state_flush_ms);
+    },
+    flushReadStates: function() {
+        var self = this;
+        var pending = this.pending_read_states;
+        var msg_ids = {read: [], unread: []};
+        var requests = [];
+
+        if (this.read_state_timer) {
+            clearTimeout(this.read_state_timer);
+            this.read_state_timer = null;
+        }
+        this.pending_read_states = {};
+
+        _.each(pending, function(read, msg_id) {
+            msg_ids[read ? 'read' : 'unread'].push(msg_id);
+        });
+
+        _.each(msg_ids, function(ids, mark_as) {
+            if (ids.length === 0) {
+                return;
+            }
+
+            /* fall back to one request per notification, if we were not given the bulk endpoint */
+            var batches = self.mark_notifications_by_ids_endpoint ? [ids] : _.map(ids, function(id) { return [id]; });
+
+            _.each(batches, function(batch) {
+                requests.push($.ajax({
+                    url: self.mark_notifications_by_ids_endpoint ?
+                        self.mark_notifications_by_ids_endpoint : self.mark_notification_read_endpoint + batch[0],
+                    type: 'POST',
+                    data: self.mark_notifications_by_ids_endpoint ?
+                        {msg_ids: batch.join(','), mark_as: mark_as} : {mark_as: mark_as},
+                    beforeSend: function(xhr) {
+                        xhr.setRequestHeader('X-CSRFToken', self.getCSRFToken());
+                    }
+                }));
+            });
+        });
+
+        return $.when.apply($, requests).done(function() {
+            if (requests.length > 0) {
+                // fetch the latest notification count
+                self.counter_icon_view.refresh();
+            }
+        });
+    },
     visitNotification: function(e) {
         var messageId = $(e.currentTarget).find('span').data('msg-id');
         var clickLink = $(e.currentTarget).find('span').data('click-link');
 
         if (this.selected_pane === "unread") {
-            this.collection.url = this.mark_notification_read_endpoint + messageId;
-
             var self = this;
-            var csrf_token = this.getCSRFToken();
-            self.collection.fetch(
-                {
-                    beforeSend: function(xhr) {
-                        xhr.setRequestHeader('X-CSRFToken', csrf_token);
-                    },
-                    data: {
-                      "mark_as": "read"
-                    },
-                    type: 'POST',
-                    success: function () {
-                        if (clickLink) {
-                            window.location.href = clickLink;
-                        } else {
-                            self.unreadNotificationsClicked(e);
-                            // fetch the latest notification count
-                            self.counter_icon_view.refresh();
-                        }
-                    }
+
+            // send this - along with anything else pending - right away, as we might be leaving the page
+            this.queueReadState(messageId, true);
+            this.flushReadStates().done(function() {
+                if (clickLink) {
+                    window.location.href = clickLink;
+                } else {
+                    self.unreadNotificationsClicked(e);
                 }
-            );
+            });
         } else if (clickLink){
             window.location.href = clickLink;
         }
@@ -536,34 +591,22 @@ var NotificationPaneView = Backbone.View.extend({
         var messageId = $(e.currentTarget).data('msg-id');
 
         if (this.selected_pane === "unread") {
-            this.collection.url = this.mark_notification_read_endpoint + messageId;
-
             var self = this;
-            self.collection.fetch(
-                {
-                    beforeSend: function(xhr) {
-                        xhr.setRequestHeader('X-CSRFToken', self.getCSRFToken());
-                    },
-                    data: {
-                      "mark_as": "read"
-                    },
-                    type: 'POST',
-                    success: function () {
-                        if ($(".xns-items li").length > 1) {
-                            if(!($('#'+messageId).next().is( "li" )) && $('#'+messageId).prev().is( "h3" )){
-                                $('#'+messageId).prev().remove();
-                            }
-                            $('#'+messageId).remove();
-                            self.counter_icon_view.refresh();
-                        }
-                        else {
-                            self.unreadNotificationsClicked(e);
-                            // fetch the latest notification count
-                            self.counter_icon_view.refresh();
-                        }
-                    }
+
+            this.queueReadState(messageId, true);
+
+            if ($(".xns-items li").length > 1) {
+                if(!($('#'+messageId).next().is( "li" )) && $('#'+messageId).prev().is( "h3" )){
+                    $('#'+messageId).prev().remove();
                 }
-            );
+                $('#'+messageId).remove();
+            }
+            else {
+                // that was the last one, so reload the (now empty) list once the server knows
+                this.flushReadStates().done(function() {
+                    self.unreadNotificationsClicked(e);
+                });
+            }
             e.preventDefault();
             e.stopPropagation();
         }
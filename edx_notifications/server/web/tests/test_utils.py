@@ -32,6 +32,8 @@ class TestUtils(TestCase):
 
         endpoints = render_context['endpoints']
         self.assertIn('unread_notification_count', endpoints)
+        self.assertIn('notification_events', endpoints)
+        self.assertIn('mark_notifications_by_ids', endpoints)
         self.assertIn('user_notifications_all', endpoints)
         self.assertIn('renderer_templates_urls', endpoints)
         self.assertIn('ok', render_context['test_settings'])
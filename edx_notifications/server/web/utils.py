@@ -78,6 +78,9 @@ def get_notifications_widget_context(override_context=None):
             'unread_notification_count': (
                 '{base_url}?read=False&unread=True'
             ). format(base_url=reverse('edx_notifications.consumer.notifications.count')),
+            'notification_events': (
+                '{base_url}'
+            ). format(base_url=reverse('edx_notifications.consumer.notifications.events')),
             'mark_all_user_notifications_read': (
                 '{base_url}'
             ). format(base_url=reverse('edx_notifications.consumer.notifications.mark_notifications_as_read')),
@@ -90,6 +93,9 @@ def get_notifications_widget_context(override_context=None):
             'user_notification_mark_read': (
                 '{base_url}'
             ). format(base_url=reverse('edx_notifications.consumer.notifications.detail.no_param')),
+            'mark_notifications_by_ids': (
+                '{base_url}'
+            ). format(base_url=reverse('edx_notifications.consumer.notifications.mark_notifications_by_ids')),
             'user_notification_preferences': (
                 '{base_url}'
             ). format(base_url=reverse('edx_notifications.consumer.user_preferences')),
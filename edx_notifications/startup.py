@@ -15,6 +15,10 @@ from edx_notifications.digests import (  # isort:skip  pylint: disable=unused-im
 # in their signal receivers
 from edx_notifications.openedx import notification_type_registration  # pylint: disable=unused-import
 from edx_notifications.signals import perform_type_registrations, perform_timer_registrations
+from edx_notifications.type_registry import (
+    load_notification_type_registry,
+    check_notification_type_registry_cache
+)
 from edx_notifications.namespaces import DefaultNotificationNamespaceResolver, register_namespace_resolver
 
 # This is unfortunate, but to have the standard Open edX
@@ -28,6 +32,12 @@ def initialize(namespace_resolver=None, register_system_types=True):
     Startup entry point for the Notification subsystem
     """
 
+    # load all known notification types in one go. Registering a type which hasn't
+    # changed then costs a single read of its row, rather than a write and every
+    # process reloading its registry
+    check_notification_type_registry_cache()
+    load_notification_type_registry()
+
     # alert the application tiers that they should register their
     # notification types, but this optional (default=True)
     if register_system_types:
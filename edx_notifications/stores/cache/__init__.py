@@ -0,0 +1,4 @@
+"""
+Directory where the caching Notification Store, which wraps
+another Notification Store, lives
+"""
@@ -0,0 +1,591 @@
+"""
+A Notification Store which wraps another Notification Store and caches the answers
+to the queries that clients poll for - a user's notification counts and the first page
+of their notifications - in Django's cache framework.
+
+To use it, wrap the actual store in the settings:
+
+    NOTIFICATION_STORE_PROVIDER = {
+        "class": "edx_notifications.stores.cache.store_provider.CachedNotificationStoreProvider",
+        "options": {
+            "STORE_PROVIDER": {
+                "class": "edx_notifications.stores.sql.store_provider.SQLNotificationStoreProvider",
+                "options": {}
+            },
+            "CACHE_NAME": "default",
+            "TIMEOUT": 60,
+        }
+    }
+
+Cached entries are keyed by a per-user version, which the write paths invalidate. Bulk
+fan-outs don't touch every recipient's version, instead they are recorded as a
+(global) fan-out generation. When a user next polls after one or more fan-outs,
+we check whether they were amongst the recipients and only then invalidate.
+
+Invalidations and fan-out generations are only recorded once the caller's transaction
+commits, as otherwise a concurrent poll could validate - and cache - what it reads before
+the writes become visible to it.
+"""
+
+
+
+import uuid
+import random
+import hashlib
+from importlib import import_module
+
+from django.db import transaction
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+
+from edx_notifications.exceptions import ItemNotFoundError
+from edx_notifications.stores.store import BaseNotificationStoreProvider
+
+# how long to cache counts and lists for, by default
+DEFAULT_TIMEOUT = 60
+
+# after this many fan-outs since a user was last validated, we don't bother
+# to check which ones the user got, we just invalidate
+DEFAULT_MAX_PENDING_FANOUTS = 10
+
+KEY_PREFIX = 'edx_notifications.store'
+
+
+class CachedNotificationStoreProvider(BaseNotificationStoreProvider):
+    """
+    Read-through caching wrapper around another BaseNotificationStoreProvider
+    """
+
+    def __init__(self, **kwargs):
+        """
+        Initializer
+
+        ARGS: kwargs
+            - STORE_PROVIDER: the 'class' and 'options' of the store to wrap
+            - CACHE_NAME: which of the CACHES in the settings to use
+            - TIMEOUT: how many seconds to cache counts and lists for
+            - MAX_PENDING_FANOUTS: see DEFAULT_MAX_PENDING_FANOUTS
+        """
+
+        config = kwargs.get('STORE_PROVIDER')
+        if not config or 'class' not in config or 'options' not in config:
+            msg = (
+                "Misconfigured CachedNotificationStoreProvider, STORE_PROVIDER "
+                "must have both 'class' and 'options' keys."
+            )
+            raise ImproperlyConfigured(msg)
+
+        module_path, _, name = config['class'].rpartition('.')
+        class_ = getattr(import_module(module_path), name)
+
+        self.store = class_(**config['options'])
+        self.cache_name = kwargs.get('CACHE_NAME', 'default')
+        self.timeout = kwargs.get('TIMEOUT', DEFAULT_TIMEOUT)
+        self.max_pending_fanouts = kwargs.get('MAX_PENDING_FANOUTS', DEFAULT_MAX_PENDING_FANOUTS)
+
+    @property
+    def cache(self):
+        """
+        The Django cache to use. Look this up on every access, as caches are per thread
+        """
+
+        return caches[self.cache_name]
+
+    def get_write_database_alias(self):
+        """
+        Writes go to the wrapped store
+        """
+
+        return self.store.get_write_database_alias()
+
+    @staticmethod
+    def _get_user_key(user_id):
+        """
+        The key of the user's (version, fan-out generation) tuple
+        """
+
+        return f'{KEY_PREFIX}.user.{user_id}'
+
+    @staticmethod
+    def _get_fanout_key(generation):
+        """
+        The key of the msg_id which was fanned out in the given generation
+        """
+
+        return f'{KEY_PREFIX}.fanout.{generation}'
+
+    def _get_counter(self, key, value):
+        """
+        Return a counter that was fetched from the cache, initializing it if it
+        doesn't exist (yet). Counters start out at a random value, so that cached
+        entries are not resurrected if a counter ever gets evicted
+        """
+
+        if value is not None:
+            return value
+
+        self.cache.add(key, random.randint(0, 2 ** 30), timeout=None)
+        return self.cache.get(key)
+
+    def _incr_counter(self, key):
+        """
+        Increment a counter in the cache
+
+        RETURNS: the incremented value
+        """
+
+        try:
+            return self.cache.incr(key)
+        except ValueError:
+            self._get_counter(key, None)
+            return self.cache.incr(key)
+
+    def _has_pending_fanouts(self, user_id, since_generation, generation):
+        """
+        Whether any of the fan-outs since since_generation went out to user_id
+        """
+
+        num_pending = generation - since_generation
+        if not 0 < num_pending <= self.max_pending_fanouts:
+            return True
+
+        keys = [self._get_fanout_key(pending) for pending in range(since_generation + 1, generation + 1)]
+        msg_ids = self.cache.get_many(keys)
+
+        # some have expired, so we can't tell
+        if len(msg_ids) != len(keys):
+            return True
+
+        for msg_id in set(msg_ids.values()):
+            try:
+                self.store.get_notification_for_user(user_id, msg_id)
+                return True
+            except ItemNotFoundError:
+                pass
+
+        return False
+
+    def _get_cache_key(self, user_id, kind, params):
+        """
+        Returns the key that the answer to a query of the passed in kind/params is cached
+        under, which is only valid until the user's version is invalidated
+        """
+
+        epoch_key = f'{KEY_PREFIX}.epoch'
+        generation_key = f'{KEY_PREFIX}.fanout'
+        user_key = self._get_user_key(user_id)
+
+        values = self.cache.get_many([epoch_key, generation_key, user_key])
+
+        epoch = self._get_counter(epoch_key, values.get(epoch_key))
+        generation = self._get_counter(generation_key, values.get(generation_key))
+
+        state = values.get(user_key)
+        version = None
+        if state:
+            version, validated_generation = state
+            if validated_generation != generation and self._has_pending_fanouts(
+                    user_id, validated_generation, generation):
+                version = None
+
+        if not version:
+            version = uuid.uuid4().hex[:12]
+
+        if state != (version, generation):
+            self.cache.set(user_key, (version, generation), timeout=self.timeout)
+
+        digest = hashlib.md5(repr(params).encode('utf-8')).hexdigest()
+
+        return f'{KEY_PREFIX}.user.{user_id}.{epoch}.{version}.{kind}.{digest}'
+
+    def _on_commit(self, func):
+        """
+        Call func once the transaction on the wrapped store's write database commits,
+        or right away if there is no transaction
+        """
+
+        transaction.on_commit(func, using=self.get_write_database_alias())
+
+    def _invalidate_users(self, user_ids):
+        """
+        Drop everything that is cached for the passed in user_ids
+        """
+
+        keys = [self._get_user_key(user_id) for user_id in set(user_ids)]
+        self._on_commit(lambda: self.cache.delete_many(keys))
+
+    def _invalidate_all(self):
+        """
+        Drop everything that is cached for all users
+        """
+
+        self._on_commit(lambda: self._incr_counter(f'{KEY_PREFIX}.epoch'))
+
+    def _record_fanout(self, msg_id):
+        """
+        Record a new fan-out generation, which the recipients of msg_id find out about
+        when they next poll
+        """
+
+        def _record():
+            generation = self._incr_counter(f'{KEY_PREFIX}.fanout')
+            self.cache.set(self._get_fanout_key(generation), msg_id, timeout=self.timeout)
+
+        self._on_commit(_record)
+
+    def get_num_notifications_for_user(self, user_id, filters=None):
+        """
+        Returns the - possibly cached - count of the user's notifications
+        """
+
+        params = sorted(filters.items()) if filters else []
+        key = self._get_cache_key(user_id, 'count', params)
+
+        count = self.cache.get(key)
+        if count is None:
+            count = self.store.get_num_notifications_for_user(user_id, filters=filters)
+            self.cache.set(key, count, timeout=self.timeout)
+
+        return count
+
+    def _get_cached_page(self, kind, get_page, user_id, filters=None, options=None):
+        """
+        Returns the page of the user's notifications which get_page() reads from the
+        wrapped store. Only the first page is cached
+        """
+
+        _options = options if options else {}
+        if _options.get('offset') or _options.get('before'):
+            return get_page(user_id, filters=filters, options=options)
+
+        params = (
+            sorted(filters.items()) if filters else [],
+            sorted(_options.items()),
+        )
+        key = self._get_cache_key(user_id, kind, params)
+
+        result_set = self.cache.get(key)
+        if result_set is None:
+            result_set = get_page(user_id, filters=filters, options=options)
+            self.cache.set(key, result_set, timeout=self.timeout)
+
+        return result_set
+
+    def get_notifications_for_user(self, user_id, filters=None, options=None):
+        """
+        Returns the user's notifications, the first page of which is cached
+        """
+
+        return self._get_cached_page('list', self.store.get_notifications_for_user, user_id, filters, options)
+
+    def get_notification_dicts_for_user(self, user_id, filters=None, options=None):
+        """
+        Returns the user's notifications as dicts, the first page of which is cached
+        """
+
+        return self._get_cached_page('dicts', self.store.get_notification_dicts_for_user, user_id, filters, options)
+
+    def get_notifications_change_token(self, user_id):
+        """
+        Returns the - possibly cached - change token, which is invalidated
+        just like the counts and lists are
+        """
+
+        key = self._get_cache_key(user_id, 'token', None)
+
+        token = self.cache.get(key)
+        if token is None:
+            token = self.store.get_notifications_change_token(user_id)
+            self.cache.set(key, token, timeout=self.timeout)
+
+        return token
+
+    def save_user_notification(self, user_msg):
+        """
+        Save the user notification and invalidate the user's cached entries
+        """
+
+        result = self.store.save_user_notification(user_msg)
+        self._invalidate_users([result.user_id])
+        return result
+
+    def bulk_create_user_notification(self, user_msgs):
+        """
+        Create the user notifications and invalidate the cached entries of all
+        affected users. This is called with chunks of NOTIFICATION_BULK_PUBLISH_CHUNK_SIZE
+        """
+
+        self.store.bulk_create_user_notification(user_msgs)
+        self._invalidate_users([user_msg.user_id for user_msg in user_msgs])
+
+    def bulk_create_user_notifications_for_message(self, msg_id, user_ids):
+        """
+        Fan-out the message and record this as a new fan-out generation, rather than
+        invalidating the cached entries of each recipient
+        """
+
+        num_created = self.store.bulk_create_user_notifications_for_message(msg_id, user_ids)
+
+        if num_created:
+            self._record_fanout(msg_id)
+
+        return num_created
+
+    def bulk_create_user_notifications_for_messages(self, msg_ids, user_ids):
+        """
+        Fan-out the messages as a single fan-out generation. All messages went out to
+        the same users, so one of them is enough to tell who those were
+        """
+
+        num_created = self.store.bulk_create_user_notifications_for_messages(msg_ids, user_ids)
+
+        if num_created:
+            self._record_fanout(msg_ids[0])
+
+        return num_created
+
+    def mark_user_notifications_read(self, user_id, filters=None):
+        """
+        Mark the notifications as read and invalidate the user's cached entries
+        """
+
+        self.store.mark_user_notifications_read(user_id, filters=filters)
+        self._invalidate_users([user_id])
+
+    def mark_user_notifications_read_by_msg_ids(self, user_id, msg_ids, read=True):
+        """
+        Mark the notifications as read (or unread) and invalidate the user's cached entries
+        """
+
+        num_changed = self.store.mark_user_notifications_read_by_msg_ids(user_id, msg_ids, read=read)
+        if num_changed:
+            self._invalidate_users([user_id])
+
+        return num_changed
+
+    def purge_expired_notifications(self, purge_read_messages_older_than, purge_unread_messages_older_than,
+                                    options=None):
+        """
+        Purge the notifications. As this affects any number of users, invalidate everything
+        """
+
+        self.store.purge_expired_notifications(
+            purge_read_messages_older_than=purge_read_messages_older_than,
+            purge_unread_messages_older_than=purge_unread_messages_older_than,
+            options=options
+        )
+        self._invalidate_all()
+
+    def rebuild_unread_notification_counters(self, user_ids=None):
+        """
+        Rebuild the counters, which might change the counts of the users
+        """
+
+        num_counters = self.store.rebuild_unread_notification_counters(user_ids=user_ids)
+
+        if user_ids is not None:
+            self._invalidate_users(user_ids)
+        else:
+            self._invalidate_all()
+
+        return num_counters
+
+    # Everything below is not cached and is simply passed on to the wrapped store
+
+    def get_notification_message_by_id(self, msg_id, options=None):
+        """
+        Pass through to the wrapped store
+        """
+
+        return self.store.get_notification_message_by_id(msg_id, options=options)
+
+    def get_notification_messages_by_ids(self, msg_ids, options=None):
+        """
+        Pass through to the wrapped store
+        """
+
+        return self.store.get_notification_messages_by_ids(msg_ids, options=options)
+
+    def save_notification_message(self, msg):
+        """
+        Pass through to the wrapped store.
+
+        NOTE: Updates to a message which has already been sent out might
+        take up to TIMEOUT seconds to show up in cached lists
+        """
+
+        return self.store.save_notification_message(msg)
+
+    def get_notification_type(self, name):
+        """
+        Pass through to the wrapped store
+        """
+
+        return self.store.get_notification_type(name)
+
+    def get_all_notification_types(self):
+        """
+        Pass through to the wrapped store
+        """
+
+        return self.store.get_all_notification_types()
+
+    def save_notification_type(self, msg_type):
+        """
+        Pass through to the wrapped store
+        """
+
+        return self.store.save_notification_type(msg_type)
+
+    def get_notification_for_user(self, user_id, msg_id):
+        """
+        Pass through to the wrapped store
+        """
+
+        return self.store.get_notification_for_user(user_id, msg_id)
+
+    def save_notification_timer(self, timer):
+        """
+        Pass through to the wrapped store
+        """
+
+        return self.store.save_notification_timer(timer)
+
+    def get_notification_timer(self, name):
+        """
+        Pass through to the wrapped store
+        """
+
+        return self.store.get_notification_timer(name)
+
+    def get_all_active_timers(self, until_time=None, include_executed=False):
+        """
+        Pass through to the wrapped store
+        """
+
+        return self.store.get_all_active_timers(until_time=until_time, include_executed=include_executed)
+
+    def iter_active_timers(self, until_time=None, include_executed=False, after=None, batch_size=None):
+        """
+        Pass through to the wrapped store
+        """
+
+        return self.store.iter_active_timers(
+            until_time=until_time,
+            include_executed=include_executed,
+            after=after,
+            batch_size=batch_size
+        )
+
+    def archive_notification_timers(self, older_than):
+        """
+        Pass through to the wrapped store
+        """
+
+        return self.store.archive_notification_timers(older_than)
+
+    def claim_due_notification_timers(self, worker_id, lease_secs, until_time=None, max_timers=None,
+                                      exclude_class_names=None, priorities=None):
+        """
+        Pass through to the wrapped store
+        """
+
+        return self.store.claim_due_notification_timers(
+            worker_id,
+            lease_secs,
+            until_time=until_time,
+            max_timers=max_timers,
+            exclude_class_names=exclude_class_names,
+            priorities=priorities
+        )
+
+    def get_notification_timer_schedule(self, modified_since=None):
+        """
+        Pass through to the wrapped store
+        """
+
+        return self.store.get_notification_timer_schedule(modified_since=modified_since)
+
+    def save_notification_fanout_job(self, job):
+        """
+        Pass through to the wrapped store
+        """
+
+        return self.store.save_notification_fanout_job(job)
+
+    def get_notification_fanout_job(self, job_id):
+        """
+        Pass through to the wrapped store
+        """
+
+        return self.store.get_notification_fanout_job(job_id)
+
+    def claim_notification_fanout_job(self, worker_id, lease_secs):
+        """
+        Pass through to the wrapped store
+        """
+
+        return self.store.claim_notification_fanout_job(worker_id, lease_secs)
+
+    def checkpoint_notification_fanout_job(self, job, lease_secs):
+        """
+        Pass through to the wrapped store
+        """
+
+        return self.store.checkpoint_notification_fanout_job(job, lease_secs)
+
+    def get_notification_preference(self, name):
+        """
+        Pass through to the wrapped store
+        """
+
+        return self.store.get_notification_preference(name)
+
+    def save_notification_preference(self, notification_preference):
+        """
+        Pass through to the wrapped store
+        """
+
+        return self.store.save_notification_preference(notification_preference)
+
+    def get_all_notification_preferences(self):
+        """
+        Pass through to the wrapped store
+        """
+
+        return self.store.get_all_notification_preferences()
+
+    def get_user_preference(self, user_id, name):
+        """
+        Pass through to the wrapped store
+        """
+
+        return self.store.get_user_preference(user_id, name)
+
+    def set_user_preference(self, user_preference):
+        """
+        Pass through to the wrapped store
+        """
+
+        return self.store.set_user_preference(user_preference)
+
+    def get_all_user_preferences_for_user(self, user_id):
+        """
+        Pass through to the wrapped store
+        """
+
+        return self.store.get_all_user_preferences_for_user(user_id)
+
+    def get_all_user_preferences_with_name(self, name, value, offset=0, size=None):
+        """
+        Pass through to the wrapped store
+        """
+
+        return self.store.get_all_user_preferences_with_name(name, value, offset=offset, size=size)
+
+    def get_all_namespaces(self, start_datetime=None, end_datetime=None):
+        """
+        Pass through to the wrapped store
+        """
+
+        return self.store.get_all_namespaces(start_datetime=start_datetime, end_datetime=end_datetime)
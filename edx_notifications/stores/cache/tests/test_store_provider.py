@@ -0,0 +1,311 @@
+"""
+Tests which exercise the caching Notification Store
+"""
+
+
+
+from datetime import datetime, timedelta
+from unittest import mock
+
+import pytz
+from django.db import transaction
+from django.core.cache import cache
+from django.test import TestCase, TransactionTestCase
+from django.core.exceptions import ImproperlyConfigured
+
+from edx_notifications.data import NotificationType, UserNotification, NotificationMessage
+from edx_notifications.exceptions import ItemNotFoundError
+from edx_notifications.stores.cache.store_provider import CachedNotificationStoreProvider
+
+TEST_STORE_PROVIDER = {
+    'class': 'edx_notifications.stores.sql.store_provider.SQLNotificationStoreProvider',
+    'options': {}
+}
+
+
+class TestCachedStoreProvider(TestCase):
+    """
+    Exercise the caching of counts and lists, as well as their invalidation
+    """
+
+    def setUp(self):
+        """
+        Harnessing
+        """
+
+        cache.clear()
+
+        # the test's transaction never commits, so have the invalidations go through right away
+        on_commit = mock.patch(
+            'edx_notifications.stores.cache.store_provider.transaction.on_commit',
+            side_effect=lambda func, using=None: func()
+        )
+        on_commit.start()
+        self.addCleanup(on_commit.stop)
+
+        self.provider = CachedNotificationStoreProvider(STORE_PROVIDER=TEST_STORE_PROVIDER, TIMEOUT=60)
+
+        self.msg_type = self.provider.save_notification_type(
+            NotificationType(
+                name='foo.bar.baz',
+                renderer='foo.renderer',
+            )
+        )
+
+    def _save_msg(self, namespace='namespace1'):
+        """
+        Helper to save a new message
+        """
+
+        return self.provider.save_notification_message(NotificationMessage(
+            namespace=namespace,
+            msg_type=self.msg_type,
+            payload={
+                'foo': 'bar'
+            }
+        ))
+
+    def _assert_cached(self, user_id, count, filters=None):
+        """
+        Make sure that the user's count and first page of notifications match
+        and are served from the cache
+        """
+
+        self.assertEqual(self.provider.get_num_notifications_for_user(user_id, filters=filters), count)
+        self.assertEqual(len(self.provider.get_notifications_for_user(user_id, filters=filters)), count)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.provider.get_num_notifications_for_user(user_id, filters=filters), count)
+            self.assertEqual(len(self.provider.get_notifications_for_user(user_id, filters=filters)), count)
+
+    def test_bad_config(self):
+        """
+        Make sure we are throwing exceptions on poor configuration
+        """
+
+        with self.assertRaises(ImproperlyConfigured):
+            CachedNotificationStoreProvider()
+
+        with self.assertRaises(ImproperlyConfigured):
+            CachedNotificationStoreProvider(STORE_PROVIDER={'class': 'foo'})
+
+    def test_invalidation(self):
+        """
+        Go through the write paths and make sure cached entries get invalidated
+        """
+
+        msg = self._save_msg()
+        user_msg = self.provider.save_user_notification(UserNotification(user_id=1, msg=msg))
+
+        self._assert_cached(1, 1)
+        self._assert_cached(1, 1, filters={'read': False})
+        self._assert_cached(1, 0, filters={'namespace': 'namespace2'})
+
+        # the cached objects come back in one piece
+        self.assertEqual(self.provider.get_notifications_for_user(1)[0].msg, msg)
+
+        self.provider.save_user_notification(UserNotification(user_id=1, msg=self._save_msg()))
+        self._assert_cached(1, 2)
+
+        self.provider.bulk_create_user_notification([UserNotification(user_id=1, msg=self._save_msg())])
+        self._assert_cached(1, 3)
+
+        user_msg.read_at = datetime.now(pytz.UTC)
+        self.provider.save_user_notification(user_msg)
+        self._assert_cached(1, 2, filters={'read': False})
+
+        self.provider.mark_user_notifications_read_by_msg_ids(1, [msg.id], read=False)
+        self._assert_cached(1, 3, filters={'read': False})
+
+        self.provider.mark_user_notifications_read(1)
+        self._assert_cached(1, 0, filters={'read': False})
+
+        self.provider.purge_expired_notifications(
+            purge_read_messages_older_than=datetime.now(pytz.UTC) + timedelta(days=1),
+            purge_unread_messages_older_than=None
+        )
+        self._assert_cached(1, 0)
+
+    def test_change_token(self):
+        """
+        Make sure the change token is cached and invalidated along with counts and lists
+        """
+
+        token = self.provider.get_notifications_change_token(1)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.provider.get_notifications_change_token(1), token)
+
+        self.provider.save_user_notification(UserNotification(user_id=1, msg=self._save_msg()))
+        self.assertNotEqual(self.provider.get_notifications_change_token(1), token)
+
+    def test_notification_dicts(self):
+        """
+        The first page of notification dicts is cached and invalidated just like the data objects
+        """
+
+        self.provider.save_user_notification(UserNotification(user_id=1, msg=self._save_msg()))
+
+        result = self.provider.get_notification_dicts_for_user(1)
+        self.assertEqual(result, [user_msg.get_fields() for user_msg in self.provider.get_notifications_for_user(1)])
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.provider.get_notification_dicts_for_user(1), result)
+
+        self.provider.save_user_notification(UserNotification(user_id=1, msg=self._save_msg()))
+        self.assertEqual(len(self.provider.get_notification_dicts_for_user(1)), 2)
+
+        with self.assertNumQueries(1):
+            self.provider.get_notification_dicts_for_user(1, options={'offset': 1})
+
+    def test_later_pages_are_not_cached(self):
+        """
+        Only the first page is cached
+        """
+
+        self.provider.save_user_notification(UserNotification(user_id=1, msg=self._save_msg()))
+
+        self.provider.get_notifications_for_user(1, options={'offset': 1})
+        with self.assertNumQueries(1):
+            self.provider.get_notifications_for_user(1, options={'offset': 1})
+
+    def test_lazy_fanout_invalidation(self):
+        """
+        A fan-out does not touch every recipient, instead the recipients
+        are found out about when they next poll
+        """
+
+        self._assert_cached(1, 0)
+        self._assert_cached(2, 0)
+
+        self.provider.bulk_create_user_notifications_for_message(self._save_msg().id, [1])
+
+        # user 2 is checked against the fan-out, then cached entries are valid again
+        with self.assertNumQueries(1):
+            self.assertEqual(self.provider.get_num_notifications_for_user(2), 0)
+
+        self._assert_cached(2, 0)
+
+        # whereas user 1's entries get invalidated
+        self._assert_cached(1, 1)
+
+    def test_lazy_multi_message_fanout_invalidation(self):
+        """
+        A fan-out of several messages counts as one
+        """
+
+        self._assert_cached(1, 0)
+        self._assert_cached(2, 0)
+
+        self.provider.bulk_create_user_notifications_for_messages([self._save_msg().id, self._save_msg().id], [1])
+
+        with self.assertNumQueries(1):
+            self.assertEqual(self.provider.get_num_notifications_for_user(2), 0)
+
+        self._assert_cached(2, 0)
+        self._assert_cached(1, 2)
+
+    def test_too_many_pending_fanouts(self):
+        """
+        Users which have been idle through too many fan-outs are simply invalidated
+        """
+
+        provider = CachedNotificationStoreProvider(STORE_PROVIDER=TEST_STORE_PROVIDER, MAX_PENDING_FANOUTS=1)
+        provider.get_num_notifications_for_user(2)
+
+        for __ in range(2):
+            provider.bulk_create_user_notifications_for_message(self._save_msg().id, [1])
+
+        # we don't check on the fan-outs, but recount
+        with self.assertNumQueries(1):
+            self.assertEqual(provider.get_num_notifications_for_user(2), 0)
+
+    def test_rebuild_counters(self):
+        """
+        Make sure rebuilding the unread counters invalidates counts
+        """
+
+        self.provider.save_user_notification(UserNotification(user_id=1, msg=self._save_msg()))
+        self._assert_cached(1, 1, filters={'read': False})
+
+        self.assertEqual(self.provider.rebuild_unread_notification_counters(user_ids=[1]), 2)
+        self._assert_cached(1, 1, filters={'read': False})
+
+        self.assertEqual(self.provider.rebuild_unread_notification_counters(), 2)
+        self._assert_cached(1, 1, filters={'read': False})
+
+    def test_pass_through(self):
+        """
+        Everything else goes straight to the wrapped store
+        """
+
+        msg = self._save_msg()
+        self.assertEqual(self.provider.get_notification_message_by_id(msg.id), msg)
+        self.assertEqual(self.provider.get_notification_messages_by_ids([msg.id]), {msg.id: msg})
+        self.assertEqual(self.provider.get_notification_type(self.msg_type.name), self.msg_type)
+        self.assertEqual(len(self.provider.get_all_notification_types()), 1)
+        self.assertEqual(list(self.provider.get_all_namespaces()), ['namespace1'])
+        self.assertEqual(self.provider.get_all_active_timers(), [])
+        self.assertEqual(self.provider.get_all_notification_preferences(), [])
+        self.assertEqual(self.provider.get_all_user_preferences_for_user(1), [])
+        self.assertEqual(self.provider.get_all_user_preferences_with_name('foo', 'bar', size=10), [])
+
+
+class TestCachedStoreProviderTransactions(TransactionTestCase):
+    """
+    Make sure that invalidations wait for the writes to be committed
+    """
+
+    def setUp(self):
+        """
+        Harnessing
+        """
+
+        cache.clear()
+
+        self.provider = CachedNotificationStoreProvider(STORE_PROVIDER=TEST_STORE_PROVIDER, TIMEOUT=60)
+
+        self.msg = self.provider.save_notification_message(NotificationMessage(
+            namespace='namespace1',
+            msg_type=self.provider.save_notification_type(
+                NotificationType(
+                    name='foo.bar.baz',
+                    renderer='foo.renderer',
+                )
+            ),
+            payload={
+                'foo': 'bar'
+            }
+        ))
+
+    def test_fanout_in_transaction(self):
+        """
+        A poll while the fan-out has yet to be committed must not validate the
+        cached entries against it
+        """
+
+        self.assertEqual(self.provider.get_num_notifications_for_user(1), 0)
+
+        with transaction.atomic():
+            self.provider.bulk_create_user_notifications_for_message(self.msg.id, [1])
+
+            # a poll on another connection does not see the uncommitted notification yet
+            with mock.patch.object(
+                self.provider.store, 'get_notification_for_user', side_effect=ItemNotFoundError()
+            ):
+                self.assertEqual(self.provider.get_num_notifications_for_user(1), 0)
+
+        self.assertEqual(self.provider.get_num_notifications_for_user(1), 1)
+
+    def test_invalidation_in_transaction(self):
+        """
+        The user's cached entries are dropped once the write is committed
+        """
+
+        self.assertEqual(self.provider.get_num_notifications_for_user(1), 0)
+
+        with transaction.atomic():
+            self.provider.save_user_notification(UserNotification(user_id=1, msg=self.msg))
+            with mock.patch.object(self.provider.store, 'get_num_notifications_for_user', return_value=0):
+                self.assertEqual(self.provider.get_num_notifications_for_user(1), 0)
+
+        self.assertEqual(self.provider.get_num_notifications_for_user(1), 1)
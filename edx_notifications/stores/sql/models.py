@@ -14,11 +14,13 @@ from edx_notifications.data import (
     NotificationType,
     UserNotification,
     NotificationMessage,
+    NotificationFanoutJob,
     NotificationPreference,
     NotificationCallbackTimer,
     UserNotificationPreferences
 )
 from edx_notifications.base_data import DictField
+from edx_notifications.type_registry import get_registered_notification_type
 
 
 class SQLNotificationType(models.Model):
@@ -70,7 +72,7 @@ class SQLNotificationType(models.Model):
 
         self.name = msg_type.name  # pylint: disable=attribute-defined-outside-init
         self.renderer = msg_type.renderer
-        self.renderer_context = DictField.to_json(msg_type.renderer_context)
+        self.renderer_context = DictField.to_tagged_json(msg_type.renderer_context)
 
 
 class SQLNotificationMessage(TimeStampedModel):
@@ -110,6 +112,18 @@ class SQLNotificationMessage(TimeStampedModel):
         db_table = 'edx_notifications_notificationmessage'
         ordering = ['-created']  # default order is last one first
 
+    def _get_msg_type_data_object(self):
+        """
+        Return the NotificationType of this message, preferably the one in the
+        process-wide registry, so that we don't build a new one for every row
+        """
+
+        msg_type = get_registered_notification_type(self.msg_type_id)
+        if msg_type is None:
+            msg_type = self.msg_type.to_data_object()
+
+        return msg_type
+
     def to_data_object(self, options=None):  # pylint: disable=unused-argument
         """
         Return a Notification Message data object
@@ -118,7 +132,7 @@ class SQLNotificationMessage(TimeStampedModel):
         msg = NotificationMessage(
             id=self.id,
             namespace=self.namespace,
-            msg_type=self.msg_type.to_data_object(),
+            msg_type=self._get_msg_type_data_object(),
             from_user_id=self.from_user_id,
             deliver_no_earlier_than=self.deliver_no_earlier_than,
             expires_at=self.expires_at,
@@ -158,8 +172,8 @@ class SQLNotificationMessage(TimeStampedModel):
         self.deliver_no_earlier_than = msg.deliver_no_earlier_than
         self.expires_at = msg.expires_at
         self.expires_secs_after_read = msg.expires_secs_after_read
-        self.payload = DictField.to_json(msg.payload)
-        self.resolve_links = DictField.to_json(msg.resolve_links)
+        self.payload = DictField.to_tagged_json(msg.payload)
+        self.resolve_links = DictField.to_tagged_json(msg.resolve_links)
         self.object_id = msg.object_id
 
 
@@ -177,6 +191,8 @@ class SQLUserNotificationArchive(TimeStampedModel):
 
     user_context = models.TextField(null=True)
 
+    namespace = models.CharField(max_length=128, null=True)
+
     class Meta:
         """
         ORM metadata about this class
@@ -192,7 +208,8 @@ class SQLUserNotification(TimeStampedModel):
     Information about how a Notification is tied to a targeted user, and related state (e.g. read/unread)
     """
 
-    user_id = models.IntegerField(db_index=True)
+    # all lookups are by user_id, which are covered by the composite indexes below
+    user_id = models.IntegerField()
 
     msg = models.ForeignKey(SQLNotificationMessage, db_index=True, on_delete=models.CASCADE)
 
@@ -200,6 +217,9 @@ class SQLUserNotification(TimeStampedModel):
 
     user_context = models.TextField(null=True)
 
+    # denormalized from msg, so that filtering on namespace does not require a join
+    namespace = models.CharField(max_length=128, null=True)
+
     class Meta:
         """
         ORM metadata about this class
@@ -208,13 +228,23 @@ class SQLUserNotification(TimeStampedModel):
         db_table = 'edx_notifications_usernotification'
         unique_together = (('user_id', 'msg'),)  # same user should not get the same notification twice
         ordering = ['-created']  # default order is most recent one should be read first
+        indexes = [
+            # supports keyset paging through a user's notifications, most recent first
+            models.Index(fields=['user_id', 'created', 'id'], name='usernotif_user_created_id'),
+            # supports unread counts, listing unread notifications and marking them as read
+            models.Index(fields=['user_id', 'read_at', 'created'], name='usernotif_user_read_created'),
+            # same as above, but scoped to a namespace
+            models.Index(fields=['user_id', 'namespace', 'read_at', 'created'], name='usernotif_user_ns_read_created'),
+            # covers the aggregates of the change token which clients can do conditional GETs with
+            models.Index(fields=['user_id', 'modified', 'read_at'], name='usernotif_user_modified_read'),
+        ]
 
     def to_data_object(self, options=None):  # pylint: disable=unused-argument
         """
         Generate a NotificationType data object
         """
 
-        return UserNotification(
+        user_msg = UserNotification(
             id=self.id,
             user_id=self.user_id,
             msg=self.msg.to_data_object(),  # pylint: disable=no-member
@@ -223,6 +253,9 @@ class SQLUserNotification(TimeStampedModel):
             created=self.created
         )
 
+        user_msg.mark_clean()
+        return user_msg
+
     @classmethod
     def from_data_object(cls, user_msg):
         """
@@ -240,9 +273,42 @@ class SQLUserNotification(TimeStampedModel):
 
         self.id = user_msg.id  # pylint: disable=attribute-defined-outside-init
         self.user_id = user_msg.user_id
-        self.msg = SQLNotificationMessage.from_data_object(user_msg.msg)
+        self.msg_id = user_msg.msg.id
+        self.namespace = user_msg.msg.namespace
         self.read_at = user_msg.read_at
-        self.user_context = DictField.to_json(user_msg.user_context)
+        self.user_context = DictField.to_tagged_json(user_msg.user_context)
+
+
+class SQLUserNotificationCounter(models.Model):
+    """
+    Denormalized count of a user's unread notifications, so that polling for the
+    unread count only has to read a single row. There is one row across all namespaces
+    (where namespace is ALL_NAMESPACES) plus one per namespace the user has notifications in.
+
+    These are maintained incrementally by the SQLNotificationStoreProvider. Should they ever
+    get out of sync with SQLUserNotification (e.g. after messages got deleted) the
+    'rebuild_unread_notification_counters' management command will recompute them.
+    """
+
+    ALL_NAMESPACES = ''
+
+    user_id = models.IntegerField()
+
+    namespace = models.CharField(max_length=128, default=ALL_NAMESPACES)
+
+    unread_count = models.IntegerField(default=0)
+
+    # bumped whenever any of the user's notifications change, which is what
+    # the change token is made of. Only kept up to date across all namespaces
+    version = models.IntegerField(default=0)
+
+    class Meta:
+        """
+        ORM metadata about this class
+        """
+        app_label = 'edx_notifications'  # since we have this models.py file not in the root app directory
+        db_table = 'edx_notifications_usernotificationcounter'
+        unique_together = (('user_id', 'namespace'),)
 
 
 class SQLNotificationChannel(models.Model):
@@ -284,13 +350,16 @@ class SQLNotificationPreference(models.Model):
         Generate a NotificationPreference data object
         """
 
-        return NotificationPreference(
+        notification_preference = NotificationPreference(
             name=self.name,
             display_name=self.display_name,
             display_description=self.display_description,
             default_value=self.default_value
         )
 
+        notification_preference.mark_clean()
+        return notification_preference
+
     @classmethod
     def from_data_object(cls, notification_preference):
         """
@@ -337,12 +406,15 @@ class SQLUserNotificationPreferences(TimeStampedModel):
         Generate a UserNotificationPreferences data object
         """
 
-        return UserNotificationPreferences(
+        user_preference = UserNotificationPreferences(
             user_id=self.user_id,
             preference=self.preference.to_data_object(),  # pylint: disable=no-member,
             value=self.value
         )
 
+        user_preference.mark_clean()
+        return user_preference
+
     @classmethod
     def from_data_object(cls, user_notification_preferences):
         """
@@ -373,6 +445,14 @@ class SQLNotificationCallbackTimer(TimeStampedModel):
         """
         app_label = 'edx_notifications'  # since we have this models.py file not in the root app directory
         db_table = 'edx_notifications_notificationcallbacktimer'
+        indexes = [
+            # lets the scheduler pick up what has changed since it last looked
+            models.Index(fields=['modified'], name='timer_modified'),
+            # covers the scan for the due timers, in the order they are due
+            models.Index(fields=['is_active', 'executed_at', 'callback_at'], name='timer_active_executed_cb'),
+            # and for the ones whose lease has expired
+            models.Index(fields=['is_active', 'lease_expires_at'], name='timer_active_lease'),
+        ]
 
     # the internal name is the primary key
     name = models.CharField(primary_key=True, max_length=255)
@@ -380,18 +460,22 @@ class SQLNotificationCallbackTimer(TimeStampedModel):
     callback_at = models.DateTimeField(db_index=True)
     class_name = models.CharField(max_length=255)
     context = models.TextField(null=True)
-    is_active = models.BooleanField(db_index=True, default=True)
+    is_active = models.BooleanField(default=True)
     periodicity_min = models.IntegerField(null=True)
     executed_at = models.DateTimeField(null=True)
     err_msg = models.TextField(null=True)
     results = models.TextField(null=True)
 
+    # which worker currently holds the timer, and until when
+    worker_id = models.CharField(max_length=255, null=True)
+    lease_expires_at = models.DateTimeField(null=True)
+
     def to_data_object(self, options=None):  # pylint: disable=unused-argument
         """
         Generate a NotificationType data object
         """
 
-        return NotificationCallbackTimer(
+        timer = NotificationCallbackTimer(
             name=self.name,
             callback_at=self.callback_at,
             class_name=self.class_name,
@@ -402,9 +486,14 @@ class SQLNotificationCallbackTimer(TimeStampedModel):
             err_msg=self.err_msg,
             created=self.created,
             modified=self.modified,
-            results=DictField.from_json(self.results)
+            results=DictField.from_json(self.results),
+            worker_id=self.worker_id,
+            lease_expires_at=self.lease_expires_at
         )
 
+        timer.mark_clean()
+        return timer
+
     @classmethod
     def from_data_object(cls, notification_timer):
         """
@@ -423,12 +512,127 @@ class SQLNotificationCallbackTimer(TimeStampedModel):
         self.name = notification_timer.name  # pylint: disable=attribute-defined-outside-init
         self.callback_at = notification_timer.callback_at
         self.class_name = notification_timer.class_name
-        self.context = DictField.to_json(notification_timer.context)
+        self.context = DictField.to_tagged_json(notification_timer.context)
         self.is_active = notification_timer.is_active
         self.periodicity_min = notification_timer.periodicity_min
         self.executed_at = notification_timer.executed_at
         self.err_msg = notification_timer.err_msg
-        self.results = DictField.to_json(notification_timer.results)
+        self.results = DictField.to_tagged_json(notification_timer.results)
+        self.worker_id = notification_timer.worker_id
+        self.lease_expires_at = notification_timer.lease_expires_at
+
+
+class SQLNotificationCallbackTimerArchive(TimeStampedModel):
+    """
+    Timers which are done with (i.e. executed one-shot and inactive timers) get moved here,
+    so that they don't weigh on the timer table. The created and modified stamps are the
+    ones of the timer
+    """
+
+    class Meta:
+        """
+        ORM metadata about this class
+        """
+        app_label = 'edx_notifications'  # since we have this models.py file not in the root app directory
+        db_table = 'edx_notifications_notificationcallbacktimerarchive'
+
+    # names can get reused once a timer has been archived
+    name = models.CharField(max_length=255, db_index=True)
+
+    callback_at = models.DateTimeField()
+    class_name = models.CharField(max_length=255)
+    context = models.TextField(null=True)
+    is_active = models.BooleanField(default=True)
+    periodicity_min = models.IntegerField(null=True)
+    executed_at = models.DateTimeField(null=True)
+    err_msg = models.TextField(null=True)
+    results = models.TextField(null=True)
+
+
+class SQLNotificationFanoutJob(TimeStampedModel):
+    """
+    SQL implementation for NotificationFanoutJob, which also serves as the
+    default - broker-less - queue of fan-out jobs
+    """
+
+    class Meta:
+        """
+        ORM metadata about this class
+        """
+        app_label = 'edx_notifications'  # since we have this models.py file not in the root app directory
+        db_table = 'edx_notifications_notificationfanoutjob'
+
+    msg = models.ForeignKey(SQLNotificationMessage, db_index=True, on_delete=models.CASCADE)
+    scope_name = models.CharField(max_length=255)
+    scope_context = models.TextField(null=True)
+    context = models.TextField(null=True)
+    status = models.CharField(
+        max_length=16,
+        db_index=True,
+        default=const.NOTIFICATION_FANOUT_JOB_STATUS_PENDING
+    )
+    worker_id = models.CharField(max_length=255, null=True)
+    lease_expires_at = models.DateTimeField(null=True)
+    attempts = models.IntegerField(default=0)
+    last_user_id = models.IntegerField(null=True)
+    num_processed = models.IntegerField(default=0)
+    num_dispatched = models.IntegerField(default=0)
+    err_msg = models.TextField(null=True)
+    completed_at = models.DateTimeField(null=True)
+
+    def to_data_object(self, options=None):  # pylint: disable=unused-argument
+        """
+        Generate a NotificationFanoutJob data object
+        """
+
+        return NotificationFanoutJob(
+            id=self.id,
+            msg_id=self.msg_id,
+            scope_name=self.scope_name,
+            scope_context=DictField.from_json(self.scope_context),  # special case, dict<-->JSON string
+            context=DictField.from_json(self.context),
+            status=self.status,
+            worker_id=self.worker_id,
+            lease_expires_at=self.lease_expires_at,
+            attempts=self.attempts,
+            last_user_id=self.last_user_id,
+            num_processed=self.num_processed,
+            num_dispatched=self.num_dispatched,
+            err_msg=self.err_msg,
+            completed_at=self.completed_at,
+            created=self.created,
+            modified=self.modified
+        )
+
+    @classmethod
+    def from_data_object(cls, job):
+        """
+        create a ORM model object from a NotificationFanoutJob
+        """
+
+        obj = SQLNotificationFanoutJob()
+        obj.load_from_data_object(job)
+        return obj
+
+    def load_from_data_object(self, job):
+        """
+        Hydrate ourselves from a passed in NotificationFanoutJob
+        """
+
+        self.id = job.id  # pylint: disable=attribute-defined-outside-init
+        self.msg_id = job.msg_id
+        self.scope_name = job.scope_name
+        self.scope_context = DictField.to_tagged_json(job.scope_context)
+        self.context = DictField.to_tagged_json(job.context)
+        self.status = job.status
+        self.worker_id = job.worker_id
+        self.lease_expires_at = job.lease_expires_at
+        self.attempts = job.attempts
+        self.last_user_id = job.last_user_id
+        self.num_processed = job.num_processed
+        self.num_dispatched = job.num_dispatched
+        self.err_msg = job.err_msg
+        self.completed_at = job.completed_at
 
 
 @receiver(pre_delete, sender=SQLUserNotification)
@@ -439,4 +643,4 @@ def archive_deleted_user_notification(sender, instance, *args, **kwargs):  # pyl
     if const.NOTIFICATION_ARCHIVE_ENABLED:
         notification_archive_obj = SQLUserNotificationArchive()
         notification_archive_obj.__dict__.update(instance.__dict__)
-        notification_archive_obj.save()
+        notification_archive_obj.save(using=kwargs.get('using'))
@@ -0,0 +1,394 @@
+"""
+Optional time-partitioned storage of the user notifications of the SQL Notification Store.
+
+With the PARTITIONED_USER_NOTIFICATIONS option of the SQL store provider, the user notification
+table is expected to be partitioned by the database itself, into monthly partitions on its
+"created" column. The partition_user_notifications management command converts the table (which
+moves all existing rows into their partitions) and adds partitions for the months to come.
+
+As far as Django is concerned, this is still the same table, so all queries stay as they
+are. The database only looks at the partitions which overlap with the date range of a query,
+e.g. the start_date/end_date filters or the cursor when paging. Purging, however, drops the
+partitions which only hold expired notifications as a whole, rather than deleting their rows.
+
+Native partitioning requires the partition key to be part of every unique key of the table, so
+the primary key becomes (id, created) and the one notification per user and message constraint
+becomes (user_id, msg_id, created). On MySQL, partitioned tables can't have foreign keys either.
+
+Supported on MySQL and PostgreSQL. The default, single table layout works on any database.
+"""
+
+
+
+import abc
+import logging
+import collections
+from datetime import datetime
+
+import pytz
+from django.db import connection
+from django.core.exceptions import ImproperlyConfigured
+
+from edx_notifications.stores.sql.models import SQLUserNotification, SQLNotificationMessage
+
+log = logging.getLogger(__name__)
+
+# a partition of the user notifications, with the notifications created from start (None
+# meaning since forever) until - but not including - end (None meaning from then on)
+UserNotificationPartition = collections.namedtuple('UserNotificationPartition', ['name', 'start', 'end'])
+
+
+def get_month(when):
+    """
+    Returns the start of the (UTC) month of when
+    """
+
+    return when.astimezone(pytz.UTC).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(month, num_months):
+    """
+    Returns the start of the month which is num_months after month
+    """
+
+    years, month_idx = divmod(month.month - 1 + num_months, 12)
+    return month.replace(year=month.year + years, month=month_idx + 1)
+
+
+def get_months(first_month, last_month):
+    """
+    Returns the starts of all months from first_month up to and including last_month
+    """
+
+    months = []
+    month = get_month(first_month)
+    while month <= last_month:
+        months.append(month)
+        month = add_months(month, 1)
+
+    return months
+
+
+class UserNotificationPartitions(metaclass=abc.ABCMeta):
+    """
+    The monthly partitions of the user notification table of a database backend
+    """
+
+    def __init__(self, db_connection=None, dry_run=False):
+        """
+        Initializer
+
+        ARGS:
+            - db_connection: the database connection, defaults to the default one
+            - dry_run: log the statements which would change the table, rather than running them
+        """
+
+        self.connection = db_connection if db_connection else connection
+        self.dry_run = dry_run
+        self.table = SQLUserNotification._meta.db_table  # pylint: disable=protected-access
+
+    def quote_name(self, name):
+        """
+        Quote a table, column or index name
+        """
+
+        return self.connection.ops.quote_name(name)
+
+    def execute(self, cursor, sql):
+        """
+        Run a statement which changes the table
+
+        RETURNS: the statement
+        """
+
+        log.info(sql)
+        if not self.dry_run:
+            cursor.execute(sql)
+
+        return sql
+
+    @abc.abstractmethod
+    def get_partitions(self):
+        """
+        Returns the UserNotificationPartitions of the table, oldest first
+        """
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    def convert(self, first_month, last_month):
+        """
+        Convert the unpartitioned table into one with a partition for every month from
+        first_month up to and including last_month, moving all existing rows into them
+
+        RETURNS: the statements
+        """
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    def add_partitions(self, last_month):
+        """
+        Make sure there are partitions for all months up to and including last_month
+
+        RETURNS: the statements
+        """
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    def drop_partition(self, partition):
+        """
+        Drop a partition, along with all of its rows
+
+        RETURNS: the statement
+        """
+        raise NotImplementedError()
+
+
+class MySQLUserNotificationPartitions(UserNotificationPartitions):
+    """
+    The table is partitioned BY RANGE on TO_DAYS(created), in partitions named p<YYYYMM> and
+    one for everything from then on (pfuture). The oldest partition also holds everything before
+    """
+
+    FUTURE_PARTITION = 'pfuture'
+
+    @staticmethod
+    def _get_partition_sql(month):
+        """
+        The definition of the partition for month
+        """
+
+        return "PARTITION p{month:%Y%m} VALUES LESS THAN (TO_DAYS('{end:%Y-%m-%d}'))".format(
+            month=month,
+            end=add_months(month, 1)
+        )
+
+    def _get_future_partition_sql(self):
+        """
+        The definition of the partition for everything from the last month on
+        """
+
+        return f'PARTITION {self.FUTURE_PARTITION} VALUES LESS THAN MAXVALUE'
+
+    def get_partitions(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT partition_name FROM information_schema.partitions '
+                'WHERE table_schema = DATABASE() AND table_name = %s AND partition_name IS NOT NULL '
+                'ORDER BY partition_ordinal_position',
+                [self.table]
+            )
+            names = [row[0] for row in cursor.fetchall()]
+
+        partitions = []
+        for idx, name in enumerate(names):
+            if name == self.FUTURE_PARTITION:
+                start = partitions[-1].end if partitions else None
+                partitions.append(UserNotificationPartition(name, start, None))
+            else:
+                month = datetime.strptime(name[1:], '%Y%m').replace(tzinfo=pytz.UTC)
+                partitions.append(UserNotificationPartition(name, month if idx else None, add_months(month, 1)))
+
+        return partitions
+
+    def convert(self, first_month, last_month):
+        table = self.quote_name(self.table)
+        statements = []
+
+        with self.connection.cursor() as cursor:
+            constraints = self.connection.introspection.get_constraints(cursor, self.table)
+
+            # partitioned tables can't have foreign keys, and all unique keys have to include "created"
+            for name, constraint in sorted(constraints.items()):
+                if constraint['foreign_key']:
+                    statements.append(self.execute(cursor, f'ALTER TABLE {table} DROP FOREIGN KEY {self.quote_name(name)}'))
+
+            for name, constraint in sorted(constraints.items()):
+                if constraint['unique'] and not constraint['primary_key']:
+                    statements.append(self.execute(cursor, f'ALTER TABLE {table} DROP INDEX {self.quote_name(name)}'))
+
+            statements.append(self.execute(
+                cursor,
+                f'ALTER TABLE {table} DROP PRIMARY KEY, ADD PRIMARY KEY (id, created), '
+                f'ADD UNIQUE KEY usernotif_user_msg_created (user_id, msg_id, created)'
+            ))
+
+            partitions = [self._get_partition_sql(month) for month in get_months(first_month, last_month)]
+            partitions.append(self._get_future_partition_sql())
+            statements.append(self.execute(
+                cursor,
+                'ALTER TABLE {table} PARTITION BY RANGE (TO_DAYS(created)) ({partitions})'.format(
+                    table=table,
+                    partitions=', '.join(partitions)
+                )
+            ))
+
+        return statements
+
+    def add_partitions(self, last_month):
+        partitions = self.get_partitions()
+        first_month = partitions[-2].end if len(partitions) > 1 else get_month(datetime.now(pytz.UTC))
+
+        months = get_months(first_month, last_month)
+        if not months:
+            return []
+
+        with self.connection.cursor() as cursor:
+            return [self.execute(
+                cursor,
+                'ALTER TABLE {table} REORGANIZE PARTITION {future} INTO ({partitions})'.format(
+                    table=self.quote_name(self.table),
+                    future=self.FUTURE_PARTITION,
+                    partitions=', '.join(
+                        [self._get_partition_sql(month) for month in months] + [self._get_future_partition_sql()]
+                    )
+                )
+            )]
+
+    def drop_partition(self, partition):
+        with self.connection.cursor() as cursor:
+            return self.execute(cursor, f'ALTER TABLE {self.quote_name(self.table)} DROP PARTITION {partition.name}')
+
+
+class PostgreSQLUserNotificationPartitions(UserNotificationPartitions):
+    """
+    The table is partitioned BY RANGE on created, into tables named <table>_<YYYYMM>,
+    and a default partition (<table>_default) for anything else
+    """
+
+    def _get_partition_name(self, month):
+        """
+        The name of the partition for month
+        """
+
+        return f'{self.table}_{month:%Y%m}'
+
+    def _get_partition_sql(self, month):
+        """
+        The statement which creates the partition for month
+        """
+
+        return (
+            "CREATE TABLE IF NOT EXISTS {partition} PARTITION OF {table} "
+            "FOR VALUES FROM ('{start:%Y-%m-%d} 00:00:00+00') TO ('{end:%Y-%m-%d} 00:00:00+00')"
+        ).format(
+            partition=self.quote_name(self._get_partition_name(month)),
+            table=self.quote_name(self.table),
+            start=month,
+            end=add_months(month, 1)
+        )
+
+    def get_partitions(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT child.relname FROM pg_inherits '
+                'JOIN pg_class child ON child.oid = pg_inherits.inhrelid '
+                'WHERE pg_inherits.inhparent = %s::regclass',
+                [self.table]
+            )
+            names = [row[0] for row in cursor.fetchall()]
+
+        partitions = []
+        for name in names:
+            suffix = name[len(self.table) + 1:]
+            if suffix.isdigit():
+                month = datetime.strptime(suffix, '%Y%m').replace(tzinfo=pytz.UTC)
+                partitions.append(UserNotificationPartition(name, month, add_months(month, 1)))
+
+        # the default partition holds anything that doesn't fit
+        # elsewhere, which we never drop
+        partitions.sort(key=lambda partition: partition.start)
+        return partitions
+
+    def convert(self, first_month, last_month):
+        table = self.quote_name(self.table)
+        old_table = self.quote_name(f'{self.table}_unpartitioned')
+        msg_table = self.quote_name(SQLNotificationMessage._meta.db_table)  # pylint: disable=protected-access
+        statements = []
+
+        with self.connection.cursor() as cursor:
+            # the indexes which don't have to do with uniqueness get recreated as they are
+            cursor.execute(
+                'SELECT indexdef FROM pg_indexes WHERE tablename = %s AND indexname NOT IN ('
+                '    SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass'
+                ')',
+                [self.table, self.table]
+            )
+            index_sqls = [
+                row[0].replace(' UNIQUE ', ' ')
+                for row in cursor.fetchall()
+            ]
+            cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [self.table])
+            sequence = cursor.fetchone()[0]
+
+            statements.append(self.execute(cursor, f'ALTER TABLE {table} RENAME TO {old_table}'))
+            statements.append(self.execute(
+                cursor,
+                f'CREATE TABLE {table} (LIKE {old_table} INCLUDING DEFAULTS) PARTITION BY RANGE (created)'
+            ))
+
+            for month in get_months(first_month, last_month):
+                statements.append(self.execute(cursor, self._get_partition_sql(month)))
+
+            statements.append(self.execute(
+                cursor,
+                'CREATE TABLE {partition} PARTITION OF {table} DEFAULT'.format(
+                    partition=self.quote_name(f'{self.table}_default'),
+                    table=table
+                )
+            ))
+
+            # move all existing rows into their partitions
+            statements.append(self.execute(cursor, f'INSERT INTO {table} SELECT * FROM {old_table}'))
+            if sequence:
+                statements.append(self.execute(cursor, f'ALTER SEQUENCE {sequence} OWNED BY {table}.id'))
+            statements.append(self.execute(cursor, f'DROP TABLE {old_table}'))
+
+            statements.append(self.execute(
+                cursor,
+                f'ALTER TABLE {table} ADD PRIMARY KEY (id, created), '
+                f'ADD CONSTRAINT usernotif_user_msg_created UNIQUE (user_id, msg_id, created), '
+                f'ADD CONSTRAINT usernotif_msg_fk FOREIGN KEY (msg_id) '
+                f'REFERENCES {msg_table} (id) '
+                f'DEFERRABLE INITIALLY DEFERRED'
+            ))
+
+            for index_sql in index_sqls:
+                statements.append(self.execute(cursor, index_sql))
+
+        return statements
+
+    def add_partitions(self, last_month):
+        partitions = self.get_partitions()
+        first_month = partitions[-1].end if partitions else get_month(datetime.now(pytz.UTC))
+
+        with self.connection.cursor() as cursor:
+            return [
+                self.execute(cursor, self._get_partition_sql(month))
+                for month in get_months(first_month, last_month)
+            ]
+
+    def drop_partition(self, partition):
+        with self.connection.cursor() as cursor:
+            return self.execute(cursor, f'DROP TABLE {self.quote_name(partition.name)}')
+
+
+PARTITIONS_BY_VENDOR = {
+    'mysql': MySQLUserNotificationPartitions,
+    'postgresql': PostgreSQLUserNotificationPartitions,
+}
+
+
+def get_user_notification_partitions(db_connection=None, dry_run=False):
+    """
+    Returns the UserNotificationPartitions for the database backend
+    """
+
+    db_connection = db_connection if db_connection else connection
+
+    if db_connection.vendor not in PARTITIONS_BY_VENDOR:
+        msg = (
+            'The user notifications can only be partitioned on {vendors}, not on {vendor}'
+        ).format(vendors=', '.join(sorted(PARTITIONS_BY_VENDOR)), vendor=db_connection.vendor)
+        raise ImproperlyConfigured(msg)
+
+    return PARTITIONS_BY_VENDOR[db_connection.vendor](db_connection=db_connection, dry_run=dry_run)
@@ -5,26 +5,113 @@ Concrete MySQL implementation of the data provider interface
 
 
 import copy
-from datetime import datetime
+import time
+import threading
+import collections
+from datetime import datetime, timedelta
 
 import pytz
 import pylru
-from django.db import IntegrityError
-from django.core.exceptions import ObjectDoesNotExist
+from django.dispatch import receiver
+from django.core.cache import caches
+from django.db.models.functions import Greatest
+from django.core.signals import request_started, request_finished
+from django.db.models import F, Q, Max, Min, Case, When, Count, Value, Exists, OuterRef, IntegerField
+from django.core.exceptions import ImproperlyConfigured, ObjectDoesNotExist
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, connections, transaction
 
 from edx_notifications import const
-from edx_notifications.exceptions import ItemNotFoundError, BulkOperationTooLarge
+from edx_notifications.utils import decode_notification_cursor
+from edx_notifications.base_data import DictField
+from edx_notifications.data import NotificationMessage
+from edx_notifications.exceptions import ItemNotFoundError, BulkOperationTooLarge, FanoutJobLeaseExpired
 from edx_notifications.stores.store import BaseNotificationStoreProvider
+from edx_notifications.stores.sql.partitions import add_months, get_month, get_user_notification_partitions
+from edx_notifications.type_registry import (
+    notification_type_saved,
+    is_same_notification_type,
+    load_notification_type_registry,
+    get_registered_notification_type,
+    is_notification_type_registry_loaded
+)
 from edx_notifications.stores.sql.models import (
     SQLNotificationType,
     SQLUserNotification,
     SQLNotificationMessage,
+    SQLNotificationFanoutJob,
     SQLNotificationPreference,
     SQLNotificationCallbackTimer,
-    SQLUserNotificationPreferences
+    SQLUserNotificationCounter,
+    SQLUserNotificationArchive,
+    SQLUserNotificationPreferences,
+    SQLNotificationCallbackTimerArchive
+)
+
+# how many users we touch the unread counters of in a single statement
+UNREAD_COUNTERS_BATCH_SIZE = 500
+
+# the cache key which pins a user's reads to the write database, see READ_YOUR_WRITES_SECS
+READ_YOUR_WRITES_KEY = 'edx_notifications.sql.read_your_writes.{user_id}'
+
+# the users whose reads are pinned to the write database for the rest of the current request
+_REQUEST_PINS = threading.local()
+
+# the columns which each of the writable fields of the data objects are stored in,
+# so that updates only need to write the ones whose fields have been changed
+USER_NOTIFICATION_COLUMNS = {
+    'read_at': ['read_at'],
+    'user_context': ['user_context'],
+}
+
+NOTIFICATION_TIMER_COLUMNS = {
+    field_name: [field_name]
+    for field_name in [
+        'callback_at', 'class_name', 'context', 'is_active',
+        'periodicity_min', 'executed_at', 'err_msg', 'results',
+        'worker_id', 'lease_expires_at'
+    ]
+}
+
+NOTIFICATION_PREFERENCE_COLUMNS = {
+    field_name: [field_name]
+    for field_name in ['display_name', 'display_description', 'default_value']
+}
+
+USER_PREFERENCE_COLUMNS = {
+    'value': ['value'],
+}
+
+# what get_notification_dicts_for_user() reads of each notification (and its message),
+# which is everything that SQLUserNotification.to_data_object() uses but the notification type
+USER_NOTIFICATION_PROJECTION = (
+    'id', 'user_id', 'read_at', 'user_context', 'created',
+    'msg_id', 'msg__namespace', 'msg__msg_type_id', 'msg__from_user_id', 'msg__payload',
+    'msg__deliver_no_earlier_than', 'msg__expires_at', 'msg__expires_secs_after_read',
+    'msg__created', 'msg__resolve_links', 'msg__object_id',
 )
 
 
+def _get_request_pinned_user_ids():
+    """
+    The set of user_ids pinned in the current request (i.e. thread)
+    """
+
+    if not hasattr(_REQUEST_PINS, 'user_ids'):
+        _REQUEST_PINS.user_ids = set()
+
+    return _REQUEST_PINS.user_ids
+
+
+@receiver(request_started)
+@receiver(request_finished)
+def reset_request_pinned_user_ids(**kwargs):  # pylint: disable=unused-argument
+    """
+    Pins are per request, so start every request with a clean slate
+    """
+
+    _REQUEST_PINS.user_ids = set()
+
+
 class SQLNotificationStoreProvider(BaseNotificationStoreProvider):
     """
     Concrete MySQL implementation of the abstract base class (interface)
@@ -35,12 +122,126 @@ class SQLNotificationStoreProvider(BaseNotificationStoreProvider):
         Initializer
 
         ARGS: kwargs
-            - MAX_MSG_TYPE_CACHE_SIZE: Maximum size of the LRU cache around
-              msg_types
+            - MAX_MSG_TYPE_CACHE_SIZE: no longer used, as NotificationTypes are
+              served from the process-wide registry (see type_registry.py)
+            - MAX_MSG_CACHE_SIZE: Maximum size of the LRU cache around messages,
+              which never change once they have been published. Off by default
+            - PARTITIONED_USER_NOTIFICATIONS: whether the user notification table has been
+              partitioned by month (see partitions.py), so that purging can drop whole
+              partitions. Off by default
+            - WRITE_DATABASE: the database alias to write to, defaults to 'default'
+            - READ_DATABASE: the database alias (e.g. a replica) to read from, defaults
+              to WRITE_DATABASE. Reads of a user's data go to WRITE_DATABASE for the rest of
+              the request - and for READ_YOUR_WRITES_SECS after - once the user has changed
+              any of it, so that they never see their own changes undone by replication lag
+            - ANALYTICS_DATABASE: the database alias which batch readers - the digests and the
+              timer scan - read from, defaults to READ_DATABASE
+            - READ_YOUR_WRITES_SECS: for how long after a user's write their reads are
+              pinned to WRITE_DATABASE, across requests and processes. Defaults to 5
+            - READ_YOUR_WRITES_CACHE_NAME: the Django cache to keep track of those
+              pins in, defaults to 'default'
+        """
+
+        _msg_cache_size = kwargs.get('MAX_MSG_CACHE_SIZE', 0)
+        self._msg_cache = pylru.lrucache(_msg_cache_size) if _msg_cache_size else None
+        self._msg_cache_lock = threading.Lock()
+
+        self._write_db = kwargs.get('WRITE_DATABASE', DEFAULT_DB_ALIAS)
+        self._read_db = kwargs.get('READ_DATABASE', self._write_db)
+        self._analytics_db = kwargs.get('ANALYTICS_DATABASE', self._read_db)
+
+        for alias in (self._write_db, self._read_db, self._analytics_db):
+            if alias not in connections.databases:
+                msg = (
+                    'The database alias "{alias}" of the SQL Notification Store is not '
+                    'defined in DATABASES'
+                ).format(alias=alias)
+                raise ImproperlyConfigured(msg)
+
+        self._read_your_writes_secs = kwargs.get('READ_YOUR_WRITES_SECS', 5)
+        self._read_your_writes_cache_name = kwargs.get('READ_YOUR_WRITES_CACHE_NAME', 'default')
+
+        self._partitions = (
+            get_user_notification_partitions(db_connection=connections[self._write_db])
+            if kwargs.get('PARTITIONED_USER_NOTIFICATIONS') else None
+        )
+
+    def get_write_database_alias(self):
+        """
+        Returns WRITE_DATABASE
+        """
+
+        return self._write_db
+
+    def _get_read_db(self, user_id=None, options=None):
         """
+        Returns the database alias to read from: the analytics one if the options ask for it
+        ('analytics': True), the write one if the user's reads are pinned to it, or else the read one
+        """
+
+        if options and options.get('analytics'):
+            return self._analytics_db
+
+        if self._read_db == self._write_db:
+            return self._write_db
+
+        if user_id is not None and self._is_user_pinned(user_id):
+            return self._write_db
+
+        return self._read_db
+
+    def _pin_user(self, user_id):
+        """
+        Make sure that user_id gets to read their own writes, by pinning their reads to the
+        write database for the rest of the request, and for READ_YOUR_WRITES_SECS after
+        """
+
+        if self._read_db == self._write_db or user_id is None:
+            return
+
+        _get_request_pinned_user_ids().add(user_id)
+
+        if self._read_your_writes_secs:
+            caches[self._read_your_writes_cache_name].set(
+                READ_YOUR_WRITES_KEY.format(user_id=user_id),
+                True,
+                timeout=self._read_your_writes_secs
+            )
+
+    def _is_user_pinned(self, user_id):
+        """
+        Whether the reads of user_id are pinned to the write database
+        """
+
+        if user_id in _get_request_pinned_user_ids():
+            return True
+
+        if not self._read_your_writes_secs:
+            return False
 
-        _msg_type_cache_size = kwargs.get('MAX_MSG_TYPE_CACHE_SIZE', 1024)
-        self._msg_type_cache = pylru.lrucache(_msg_type_cache_size)
+        return bool(caches[self._read_your_writes_cache_name].get(READ_YOUR_WRITES_KEY.format(user_id=user_id)))
+
+    @staticmethod
+    def _get_update_values(model_class, data_object, columns_by_field):
+        """
+        Returns the column values to UPDATE the row of data_object with. If the data
+        object has been read from the store, this is limited to the fields which
+        have been changed since (see BaseDataObject.get_dirty_fields())
+        """
+
+        dirty_fields = data_object.get_dirty_fields()
+        columns = [
+            column
+            for field_name, field_columns in columns_by_field.items()
+            if dirty_fields is None or field_name in dirty_fields
+            for column in field_columns
+        ]
+
+        if not columns:
+            return {}
+
+        obj = model_class.from_data_object(data_object)
+        return {column: getattr(obj, column) for column in columns}
 
     def _get_notification_by_id(self, msg_id, options=None):
         """
@@ -52,10 +253,16 @@ class SQLNotificationStoreProvider(BaseNotificationStoreProvider):
         select_related = _options.get('select_related', True)
 
         try:
-            query = SQLNotificationMessage.objects
+            query = SQLNotificationMessage.objects.using(self._get_read_db(options=options))
             if select_related:
                 query = query.select_related()
-            obj = query.get(id=msg_id)
+            try:
+                obj = query.get(id=msg_id)
+            except ObjectDoesNotExist:
+                if query.db == self._write_db:
+                    raise
+                # it might just not have made it to the replica yet
+                obj = query.using(self._write_db).get(id=msg_id)
         except ObjectDoesNotExist:
             raise ItemNotFoundError()
 
@@ -66,8 +273,58 @@ class SQLNotificationStoreProvider(BaseNotificationStoreProvider):
         For the given message id return the corresponding NotificationMessage data object
         """
 
+        if self._msg_cache is not None and not options:
+            msgs = self.get_notification_messages_by_ids([msg_id])
+            if msg_id not in msgs:
+                raise ItemNotFoundError()
+            return msgs[msg_id]
+
         return self._get_notification_by_id(msg_id, options=options)
 
+    def get_notification_messages_by_ids(self, msg_ids, options=None):
+        """
+        For the given message ids return the corresponding NotificationMessage data
+        objects, by id. Messages which we have cached don't need another round trip
+        """
+
+        _options = options if options else {}
+        select_related = _options.get('select_related', True)
+
+        result = {}
+        msg_ids = set(msg_ids)
+
+        if self._msg_cache is not None:
+            with self._msg_cache_lock:
+                for msg_id in msg_ids:
+                    if msg_id in self._msg_cache:
+                        # hand out copies, so that callers can't change what we have cached
+                        result[msg_id] = NotificationMessage.clone(self._msg_cache[msg_id])
+
+        missing_msg_ids = msg_ids - set(result)
+        if missing_msg_ids:
+            query = SQLNotificationMessage.objects.using(self._get_read_db(options=options)).filter(
+                id__in=missing_msg_ids
+            )
+            if select_related:
+                query = query.select_related()
+
+            msgs = [obj.to_data_object(options=options) for obj in query]
+
+            # messages never change once they have been published, so the only thing
+            # a replica can be behind on is the ones which have just been published
+            if len(msgs) < len(missing_msg_ids) and query.db != self._write_db:
+                query = query.using(self._write_db).filter(id__in=missing_msg_ids - {msg.id for msg in msgs})
+                msgs.extend(obj.to_data_object(options=options) for obj in query)
+
+            if self._msg_cache is not None:
+                with self._msg_cache_lock:
+                    for msg in msgs:
+                        self._msg_cache[msg.id] = NotificationMessage.clone(msg)
+
+            result.update((msg.id, msg) for msg in msgs)
+
+        return result
+
     def save_notification_message(self, msg):
         """
         Saves a passed in NotificationMsg data object. If 'id' is set by the caller
@@ -79,51 +336,67 @@ class SQLNotificationStoreProvider(BaseNotificationStoreProvider):
 
         if msg.id:
             try:
-                obj = SQLNotificationMessage.objects.get(id=msg.id)
+                obj = SQLNotificationMessage.objects.using(self._write_db).get(id=msg.id)
+                old_namespace = obj.namespace
                 obj.load_from_data_object(msg)
             except ObjectDoesNotExist:
                 msg = f"Could not SQLNotificationMessage with ID {msg.id}"
                 raise ItemNotFoundError()
+
+            if obj.namespace != old_namespace:
+                # keep the denormalized namespace on the user notifications in sync
+                SQLUserNotification.objects.using(self._write_db).filter(msg_id=obj.id).update(
+                    namespace=obj.namespace
+                )
+
+            if self._msg_cache is not None:
+                with self._msg_cache_lock:
+                    if obj.id in self._msg_cache:
+                        del self._msg_cache[obj.id]
         else:
             obj = SQLNotificationMessage.from_data_object(msg)
 
-        obj.save()
+        obj.save(using=self._write_db)
         return obj.to_data_object()
 
-    def get_notification_type(self, name):  # pylint: disable=no-self-use
+    def get_notification_type(self, name):
         """
         This returns a NotificationType object.
         NOTE: NotificationTypes are supposed to be immutable during the
-        process lifetime. New Types can be added, but not updated.
-        Therefore we can memoize this function
+        process lifetime, so these are served from the process-wide
+        registry, which gets loaded on first use. If it doesn't know about
+        the type, we only look up that one row, so that asking for types
+        which don't exist stays cheap, and reload the registry if the type
+        does exist after all
         """
 
-        data_object = None
-        # pull from the cache, if we have it
-        if name in self._msg_type_cache:
-            data_object = self._msg_type_cache[name]
+        if not is_notification_type_registry_loaded():
+            load_notification_type_registry()
+
+        data_object = get_registered_notification_type(name)
+        if data_object is not None:
             return data_object
 
         try:
-            obj = SQLNotificationType.objects.get(name=name)
-        except ObjectDoesNotExist:
-            raise ItemNotFoundError()
+            obj = SQLNotificationType.objects.using(self._write_db).get(name=name)
+        except ObjectDoesNotExist as ex:
+            raise ItemNotFoundError() from ex
 
-        data_object = obj.to_data_object()
+        load_notification_type_registry()
+        data_object = get_registered_notification_type(name)
 
-        # refresh the cache
-        self._msg_type_cache[name] = data_object
-        return data_object
+        return data_object if data_object is not None else obj.to_data_object()
 
-    def get_all_notification_types(self):  # pylint: disable=no-self-use
+    def get_all_notification_types(self):
         """
         This returns a NotificationType object.
         NOTE: NotificationTypes are supposed to be immutable during the
         process lifetime. New Types can be added, but not updated.
-        Therefore we can memoize this function
+        Therefore we can memoize this function. This is read from the write
+        database, as the registry gets reloaded right after a type is saved
         """
 
-        query = SQLNotificationType.objects.all()
+        query = SQLNotificationType.objects.using(self._write_db).all()
 
         result_set = [item.to_data_object() for item in query]
 
@@ -135,32 +408,38 @@ class SQLNotificationStoreProvider(BaseNotificationStoreProvider):
         """
 
         try:
-            obj = SQLNotificationType.objects.get(name=msg_type.name)
-            obj.load_from_data_object(msg_type)
+            obj = SQLNotificationType.objects.using(self._write_db).get(name=msg_type.name)
         except ObjectDoesNotExist:
             obj = SQLNotificationType.from_data_object(msg_type)
+        else:
+            if is_same_notification_type(obj.to_data_object(), msg_type):
+                # nothing to write, which is the common case when
+                # all processes re-register their types on startup
+                return msg_type
+
+            obj.load_from_data_object(msg_type)
 
         try:
-            obj.save()
+            obj.save(using=self._write_db)
         except IntegrityError:  # pylint: disable=catching-non-exception
             # there could be some concurrency between multiple processes
             # on startup, so try again
             try:
-                obj.save()
+                obj.save(using=self._write_db)
             except IntegrityError:  # pylint: disable=catching-non-exception
                 pass
 
-        # remove cached entry
-        if msg_type.name in self._msg_type_cache:
-            del self._msg_type_cache[msg_type.name]
+        notification_type_saved(obj.to_data_object())
         return msg_type
 
-    def _get_prepaged_notifications(self, user_id, filters=None, options=None):
+    def _get_prepaged_notifications(self, user_id, filters=None, options=None, using=None):
         """
         Helper to set up the notifications query before paging
         is applied. WARNING: This should be used with care and to not
         iterate over this returned results set. Typically this
         will just be used to get a count()
+
+        The query reads from the user's read database, unless told which one to use
         """
 
         _filters = filters if filters else {}
@@ -178,13 +457,16 @@ class SQLNotificationStoreProvider(BaseNotificationStoreProvider):
         if not read and not unread:
             raise ValueError('Bad arg combination either read or unread must be set to True')
 
-        query = SQLUserNotification.objects.filter(user_id=user_id)
+        query = SQLUserNotification.objects.using(
+            using if using else self._get_read_db(user_id, options=_options)
+        ).filter(user_id=user_id)
 
         if select_related:
             query = query.select_related()
 
         if namespace:
-            query = query.filter(msg__namespace=namespace)
+            # use the denormalized column, so we don't have to join on the message
+            query = query.filter(namespace=namespace)
 
         if not (read and unread):
             if read:
@@ -221,12 +503,25 @@ class SQLNotificationStoreProvider(BaseNotificationStoreProvider):
 
         limit = _options.get('limit', const.NOTIFICATION_MAX_LIST_SIZE)
         offset = _options.get('offset', 0)
+        before = _options.get('before')
 
         # make sure passed in limit is allowed
         # as we don't want to blow up the query too large here
         if limit > const.NOTIFICATION_MAX_LIST_SIZE:
             raise ValueError(f'Max limit is {limit}')
 
+        # break ties on the id, so that the order is stable
+        query = query.order_by('-created', '-id')
+
+        if before:
+            if offset:
+                raise ValueError('Cannot page with both an offset and a cursor')
+
+            # seek straight to the page after the cursor (using the (user_id, created, id)
+            # index) rather than have the database count past all prior rows
+            created, _id = decode_notification_cursor(before)
+            query = query.filter(Q(created__lt=created) | Q(created=created, id__lt=_id))
+
         return query[offset:offset + limit]
 
     def get_num_notifications_for_user(self, user_id, filters=None):
@@ -246,17 +541,219 @@ class SQLNotificationStoreProvider(BaseNotificationStoreProvider):
         RETURNS: integer
         """
 
+        if self._can_use_unread_counters(filters):
+            return self._get_unread_count(user_id, filters.get('namespace'))
+
         return self._get_prepaged_notifications(
             user_id,
             filters=filters,
         ).count()
 
+    @staticmethod
+    def _can_use_unread_counters(filters):
+        """
+        Whether a count with these filters can be read straight from SQLUserNotificationCounter,
+        which is only the case for unread notifications, optionally in a namespace
+        """
+
+        if not const.NOTIFICATION_UNREAD_COUNTERS_ENABLED or not filters:
+            return False
+
+        return (
+            not filters.get('read', True) and
+            filters.get('unread', True) and
+            not filters.get('type_name') and
+            not filters.get('start_date') and
+            not filters.get('end_date')
+        )
+
+    def _get_unread_count(self, user_id, namespace=None):
+        """
+        Read the number of unread notifications for the user from SQLUserNotificationCounter
+        """
+
+        unread_count = SQLUserNotificationCounter.objects.using(self._get_read_db(user_id)).filter(
+            user_id=user_id,
+            namespace=namespace if namespace else SQLUserNotificationCounter.ALL_NAMESPACES
+        ).values_list('unread_count', flat=True).first()
+
+        return unread_count if unread_count else 0
+
+    def _adjust_unread_counters(self, user_ids, namespace, delta):
+        """
+        Add delta to the unread counters of all user_ids, both the one across
+        all namespaces as well as the one for the namespace (if any), and bump
+        the version of their notifications along with it.
+
+        NOTE: each user_id must only be passed in once
+        """
+
+        if not const.NOTIFICATION_UNREAD_COUNTERS_ENABLED or not delta:
+            return
+
+        namespaces = [SQLUserNotificationCounter.ALL_NAMESPACES]
+        if namespace:
+            namespaces.append(namespace)
+
+        # never let a counter that was out of sync go negative
+        unread_count = F('unread_count') + delta if delta > 0 else Greatest(F('unread_count') + delta, 0)
+
+        user_ids = list(user_ids)
+        for idx in range(0, len(user_ids), UNREAD_COUNTERS_BATCH_SIZE):
+            batch = user_ids[idx:idx + UNREAD_COUNTERS_BATCH_SIZE]
+
+            if delta > 0:
+                # make sure all counters exist, in a way that is safe against concurrent writers
+                SQLUserNotificationCounter.objects.using(self._write_db).bulk_create(
+                    [
+                        SQLUserNotificationCounter(user_id=user_id, namespace=_namespace)
+                        for user_id in batch
+                        for _namespace in namespaces
+                    ],
+                    ignore_conflicts=True
+                )
+
+            SQLUserNotificationCounter.objects.using(self._write_db).filter(
+                user_id__in=batch,
+                namespace__in=namespaces
+            ).update(unread_count=unread_count, version=F('version') + 1)
+
+    def _bump_notifications_versions(self, user_ids):
+        """
+        Bump the version of the user_ids' notifications - which is kept on their counters across
+        all namespaces - for changes which leave the unread counts alone. The change token is
+        made up of it, see get_notifications_change_token()
+        """
+
+        if not const.NOTIFICATION_UNREAD_COUNTERS_ENABLED:
+            return
+
+        user_ids = list(set(user_ids))
+        for idx in range(0, len(user_ids), UNREAD_COUNTERS_BATCH_SIZE):
+            batch = user_ids[idx:idx + UNREAD_COUNTERS_BATCH_SIZE]
+
+            num_updated = SQLUserNotificationCounter.objects.using(self._write_db).filter(
+                user_id__in=batch,
+                namespace=SQLUserNotificationCounter.ALL_NAMESPACES
+            ).update(version=F('version') + 1)
+
+            # only users without any counter yet have been missed, which start out at the first version
+            if num_updated < len(batch):
+                SQLUserNotificationCounter.objects.using(self._write_db).bulk_create(
+                    [
+                        SQLUserNotificationCounter(
+                            user_id=user_id,
+                            namespace=SQLUserNotificationCounter.ALL_NAMESPACES,
+                            version=1
+                        )
+                        for user_id in batch
+                    ],
+                    ignore_conflicts=True
+                )
+
+    def _rebuild_unread_counters(self, **user_filter):
+        """
+        Recompute the unread counters of all users matching user_filter
+        from SQLUserNotification. The counters across all namespaces are kept
+        for everyone who had one, with the version of their notifications bumped,
+        so that the change tokens never go back to a value they had before
+
+        RETURNS: the number of counters that were written
+        """
+
+        # NOTE: clear the default ordering, as it would end up in the GROUP BY
+        unread = SQLUserNotification.objects.using(self._write_db).filter(
+            read_at__isnull=True,
+            **user_filter
+        ).order_by()
+
+        unread_counts = {
+            row['user_id']: row['unread_count']
+            for row in unread.values('user_id').annotate(unread_count=Count('id'))
+        }
+
+        counters = [
+            SQLUserNotificationCounter(
+                user_id=row['user_id'],
+                namespace=row['namespace'],
+                unread_count=row['unread_count']
+            )
+            # like in _adjust_unread_counters(), notifications without a namespace
+            # only count towards the counter across all namespaces
+            for row in unread.exclude(
+                Q(namespace=None) | Q(namespace=SQLUserNotificationCounter.ALL_NAMESPACES)
+            ).values('user_id', 'namespace').annotate(unread_count=Count('id'))
+        ]
+
+        with transaction.atomic(using=self._write_db):
+            versions = dict(
+                SQLUserNotificationCounter.objects.using(self._write_db).filter(
+                    namespace=SQLUserNotificationCounter.ALL_NAMESPACES,
+                    **user_filter
+                ).values_list('user_id', 'version')
+            )
+
+            counters.extend([
+                SQLUserNotificationCounter(
+                    user_id=user_id,
+                    namespace=SQLUserNotificationCounter.ALL_NAMESPACES,
+                    unread_count=unread_counts.get(user_id, 0),
+                    version=versions.get(user_id, 0) + 1
+                )
+                for user_id in set(unread_counts) | set(versions)
+            ])
+
+            SQLUserNotificationCounter.objects.using(self._write_db).filter(**user_filter).delete()
+            SQLUserNotificationCounter.objects.using(self._write_db).bulk_create(counters)
+
+        return len(counters)
+
+    def rebuild_unread_notification_counters(self, user_ids=None):
+        """
+        Recompute the unread counters from SQLUserNotification, either for the passed
+        in user_ids or - in ranges of user_ids - for all users
+        """
+
+        num_counters = 0
+
+        if user_ids is not None:
+            user_ids = list(user_ids)
+            for idx in range(0, len(user_ids), UNREAD_COUNTERS_BATCH_SIZE):
+                num_counters += self._rebuild_unread_counters(
+                    user_id__in=user_ids[idx:idx + UNREAD_COUNTERS_BATCH_SIZE]
+                )
+
+            return num_counters
+
+        # cover both users with notifications as well as users which
+        # only have (stale) counters left
+        bounds = [
+            model.objects.using(self._write_db).aggregate(min_id=Min('user_id'), max_id=Max('user_id'))
+            for model in (SQLUserNotification, SQLUserNotificationCounter)
+        ]
+        min_ids = [bound['min_id'] for bound in bounds if bound['min_id'] is not None]
+        max_ids = [bound['max_id'] for bound in bounds if bound['max_id'] is not None]
+
+        if not min_ids:
+            return 0
+
+        for start in range(min(min_ids), max(max_ids) + 1, UNREAD_COUNTERS_BATCH_SIZE):
+            num_counters += self._rebuild_unread_counters(
+                user_id__gte=start,
+                user_id__lt=start + UNREAD_COUNTERS_BATCH_SIZE
+            )
+
+        return num_counters
+
     def get_notification_for_user(self, user_id, msg_id):
         """
         Get a single UserNotification for the user_id/msg_id pair
         """
         try:
-            item = SQLUserNotification.objects.select_related().get(user_id=user_id, msg_id=msg_id)
+            item = SQLUserNotification.objects.using(self._get_read_db(user_id)).select_related().get(
+                user_id=user_id,
+                msg_id=msg_id
+            )
             return item.to_data_object()
         except ObjectDoesNotExist:
             msg = (
@@ -281,6 +778,9 @@ class SQLNotificationStoreProvider(BaseNotificationStoreProvider):
             - options: a dict containing some optional parameters
                 - limit: max number to return (up to some system defined max)
                 - offset: offset into the list, to implement paging
+                - before: a cursor (see encode_notification_cursor) to only return
+                          notifications that come after it, to implement paging
+                          which does not get more expensive the deeper the page is
 
         RETURNS: list   i.e. []
         """
@@ -298,6 +798,91 @@ class SQLNotificationStoreProvider(BaseNotificationStoreProvider):
 
         return result_set
 
+    def get_notification_dicts_for_user(self, user_id, filters=None, options=None):
+        """
+        Reads just the columns that make up the notifications - rather than whole rows -
+        and puts together what get_fields() would return for each of them, without any
+        data objects in between. The notification types are filled in from our cache
+        of them, rather than being joined in
+        """
+
+        query = self._get_notifications_for_user(
+            user_id,
+            filters=filters,
+            options=options
+        )
+
+        msg_types = {}
+        result_set = []
+
+        for (_id, _user_id, read_at, user_context, created,
+             msg_id, namespace, msg_type_name, from_user_id, payload,
+             deliver_no_earlier_than, expires_at, expires_secs_after_read,
+             msg_created, resolve_links, object_id) in query.values_list(*USER_NOTIFICATION_PROJECTION):
+
+            msg_type = msg_types.get(msg_type_name)
+            if msg_type is None:
+                msg_type = msg_types[msg_type_name] = self.get_notification_type(msg_type_name).get_fields()
+
+            result_set.append({
+                'id': _id,
+                'user_id': _user_id,
+                'msg': {
+                    'id': msg_id,
+                    'namespace': namespace,
+                    'msg_type': msg_type,
+                    'from_user_id': from_user_id,
+                    'payload': DictField.from_json(payload),
+                    'deliver_no_earlier_than': deliver_no_earlier_than,
+                    'expires_at': expires_at,
+                    'expires_secs_after_read': expires_secs_after_read,
+                    # like to_data_object(), which doesn't read the priority either
+                    'priority': const.NOTIFICATION_PRIORITY_NONE,
+                    'created': msg_created,
+                    'resolve_links': DictField.from_json(resolve_links),
+                    'object_id': object_id,
+                },
+                'read_at': read_at,
+                'user_context': DictField.from_json(user_context),
+                'created': created,
+            })
+
+        return result_set
+
+    def get_notifications_change_token(self, user_id):
+        """
+        The token is the version of the user's notifications, which is kept on their
+        unread counter across all namespaces, so this only reads a single row.
+
+        Without the unread counters, the token is made up of the number of the user's
+        notifications, how many of those have been read and when any of them were last
+        modified. All of which can be answered from the (user_id, modified, read_at) index alone
+        """
+
+        if const.NOTIFICATION_UNREAD_COUNTERS_ENABLED:
+            version = SQLUserNotificationCounter.objects.using(self._get_read_db(user_id)).filter(
+                user_id=user_id,
+                namespace=SQLUserNotificationCounter.ALL_NAMESPACES
+            ).values_list('version', flat=True).first()
+
+            return str(version if version else 0)
+
+        result = SQLUserNotification.objects.using(self._get_read_db(user_id)).filter(
+            user_id=user_id
+        ).order_by().aggregate(
+            num_total=Count('id'),
+            num_read=Count('read_at'),
+            last_modified=Max('modified')
+        )
+
+        last_modified = result['last_modified']
+
+        return '{num_total}.{num_read}.{last_modified}'.format(
+            num_total=result['num_total'],
+            num_read=result['num_read'],
+            last_modified=last_modified.strftime('%Y%m%d%H%M%S%f') if last_modified else ''
+        )
+
     def mark_user_notifications_read(self, user_id, filters=None):
         """
         This should mark all the user notifications as read
@@ -314,19 +899,96 @@ class SQLNotificationStoreProvider(BaseNotificationStoreProvider):
 
         query = self._get_prepaged_notifications(
             user_id,
-            filters=_filters
+            filters=_filters,
+            using=self._write_db
+        )
+
+        self._pin_user(user_id)
+        read_at = datetime.now(pytz.UTC)
+
+        # an update() does not touch the modified timestamp by itself, but
+        # we need it to change for get_notifications_change_token()
+        if not const.NOTIFICATION_UNREAD_COUNTERS_ENABLED:
+            query.update(read_at=read_at, modified=read_at)
+            return
+
+        # update one namespace at a time, so we know exactly
+        # by how much to decrement each unread counter
+        namespaces = list(query.order_by().values_list('namespace', flat=True).distinct())
+        for namespace in namespaces:
+            num_read = query.filter(namespace=namespace).update(read_at=read_at, modified=read_at)
+            self._adjust_unread_counters([user_id], namespace, -num_read)
+
+    def mark_user_notifications_read_by_msg_ids(self, user_id, msg_ids, read=True):
+        """
+        Flip the read state of the user's notifications with a single UPDATE, which
+        leaves out the ones that already are in the requested state
+        """
+
+        msg_ids = set(msg_ids)
+
+        if len(msg_ids) > const.NOTIFICATION_MAX_LIST_SIZE:
+            msg = (
+                'You have passed in a msg_ids list of size {length} but the size '
+                'limit is {max}.'.format(length=len(msg_ids), max=const.NOTIFICATION_MAX_LIST_SIZE)
+            )
+            raise BulkOperationTooLarge(msg)
+
+        if not msg_ids:
+            return 0
+
+        self._pin_user(user_id)
+        query = SQLUserNotification.objects.using(self._write_db).filter(
+            user_id=user_id,
+            msg_id__in=msg_ids,
+            read_at__isnull=read
         )
 
-        query.update(read_at=datetime.now(pytz.UTC))
+        now = datetime.now(pytz.UTC)
+        values = {
+            'read_at': now if read else None,
+            'modified': now,
+        }
+
+        if not const.NOTIFICATION_UNREAD_COUNTERS_ENABLED:
+            return query.update(**values)
+
+        # find out by how much each of the unread counters will change up front,
+        # so that we can still flip all of the notifications in a single UPDATE
+        num_by_namespace = dict(query.order_by().values_list('namespace').annotate(num=Count('id')))
+        if not num_by_namespace:
+            return 0
+
+        num_changed = query.update(**values)
+
+        if num_changed == sum(num_by_namespace.values()):
+            for namespace, num in num_by_namespace.items():
+                self._adjust_unread_counters([user_id], namespace, -num if read else num)
+        else:
+            # someone else got to some of the notifications in between, so recount
+            self._rebuild_unread_counters(user_id=user_id)
+
+        return num_changed
 
     def save_user_notification(self, user_msg):
         """
         Create or Update the mapping of a user to a notification.
         """
 
+        if user_msg.id:
+            # the user has changed their notification, e.g. marked it as read
+            self._pin_user(user_msg.user_id)
+
+        dirty_fields = user_msg.get_dirty_fields()
+        if user_msg.id and dirty_fields is not None and dirty_fields <= set(USER_NOTIFICATION_COLUMNS):
+            return self._update_user_notification(user_msg)
+
+        was_unread = False
+
         if user_msg.id:
             try:
-                obj = SQLUserNotification.objects.get(id=user_msg.id)
+                obj = SQLUserNotification.objects.using(self._write_db).get(id=user_msg.id)
+                was_unread = obj.read_at is None
                 obj.load_from_data_object(user_msg)
             except ObjectDoesNotExist:
                 msg = f"Could not find SQLUserNotification with ID {user_msg.id}"
@@ -334,9 +996,52 @@ class SQLNotificationStoreProvider(BaseNotificationStoreProvider):
         else:
             obj = SQLUserNotification.from_data_object(user_msg)
 
-        obj.save()
+        obj.save(using=self._write_db)
 
-        return obj.to_data_object()
+        is_unread = obj.read_at is None
+        if is_unread != was_unread:
+            self._adjust_unread_counters([obj.user_id], obj.namespace, 1 if is_unread else -1)
+        else:
+            self._bump_notifications_versions([obj.user_id])
+
+        # we already have the message, so don't have the ORM read it back
+        result = user_msg.clone(user_msg)
+        result.id = obj.id
+        result.created = obj.created
+        result.mark_clean()
+        return result
+
+    def _update_user_notification(self, user_msg):
+        """
+        Write only the columns which have changed since user_msg was read from
+        the store, without reading the row first
+        """
+
+        values = self._get_update_values(SQLUserNotification, user_msg, USER_NOTIFICATION_COLUMNS)
+        if not values:
+            return user_msg
+
+        values['modified'] = datetime.now(pytz.UTC)
+        query = SQLUserNotification.objects.using(self._write_db).filter(id=user_msg.id)
+
+        num_updated = 0
+        if 'read_at' in values and const.NOTIFICATION_UNREAD_COUNTERS_ENABLED:
+            # only match the row if its read state flips, so that we find
+            # out whether the unread counters need to be adjusted
+            is_unread = user_msg.read_at is None
+            num_updated = query.filter(read_at__isnull=not is_unread).update(**values)
+            if num_updated:
+                self._adjust_unread_counters([user_msg.user_id], user_msg.msg.namespace, 1 if is_unread else -1)
+
+        if not num_updated:
+            if not query.update(**values):
+                msg = f"Could not find SQLUserNotification with ID {user_msg.id}"
+                raise ItemNotFoundError(msg)
+
+            self._bump_notifications_versions([user_msg.user_id])
+
+        user_msg.mark_clean()
+        return user_msg
 
     def bulk_create_user_notification(self, user_msgs):
         """
@@ -363,7 +1068,126 @@ class SQLNotificationStoreProvider(BaseNotificationStoreProvider):
         for user_msg in user_msgs:
             objs.append(SQLUserNotification.from_data_object(user_msg))
 
-        SQLUserNotification.objects.bulk_create(objs, batch_size=const.NOTIFICATION_BULK_PUBLISH_CHUNK_SIZE)
+        SQLUserNotification.objects.using(self._write_db).bulk_create(
+            objs,
+            batch_size=const.NOTIFICATION_BULK_PUBLISH_CHUNK_SIZE
+        )
+
+        # group the users by how many unread notifications they got in each namespace,
+        # so we can bump all of their counters at once
+        num_unread = collections.Counter(
+            (obj.user_id, obj.namespace) for obj in objs if obj.read_at is None
+        )
+
+        user_ids_by_delta = collections.defaultdict(list)
+        for (user_id, namespace), delta in num_unread.items():
+            user_ids_by_delta[(namespace, delta)].append(user_id)
+
+        for (namespace, delta), user_ids in user_ids_by_delta.items():
+            self._adjust_unread_counters(user_ids, namespace, delta)
+
+        # the users which only got read notifications
+        self._bump_notifications_versions(
+            {obj.user_id for obj in objs} - {user_id for user_id, __ in num_unread}
+        )
+
+    def bulk_create_user_notifications_for_message(self, msg_id, user_ids):
+        """
+        Streaming fan-out of an already saved message to all user_ids. We bypass
+        the data object and ORM layers entirely and only send
+        (user_id, msg_id, namespace, created, modified) tuples to the database as
+        multi-row INSERT statements (or executemany() if the database backend does
+        not support multi-row inserts).
+
+        user_ids can be a list, a generator or a Django ORM resultset. They are
+        consumed lazily, so we never hold more than a batch worth of rows in memory.
+
+        RETURNS: the number of UserNotifications that were created
+        """
+
+        return self.bulk_create_user_notifications_for_messages([msg_id], user_ids)
+
+    def bulk_create_user_notifications_for_messages(self, msg_ids, user_ids):
+        """
+        Streaming fan-out of several already saved messages to all user_ids, see
+        bulk_create_user_notifications_for_message(). The rows of all messages
+        go into the same multi-row INSERT statements
+
+        RETURNS: the number of UserNotifications that were created
+        """
+
+        meta = SQLUserNotification._meta  # pylint: disable=protected-access
+        fields = [meta.get_field(name) for name in ('user_id', 'msg', 'namespace', 'created', 'modified')]
+        connection = connections[self._write_db]
+        ops = connection.ops
+
+        # let the database backend cap our batch size, e.g. SQLite only
+        # allows for a limited number of query parameters per statement
+        batch_size = min(
+            const.NOTIFICATION_BULK_INSERT_BATCH_SIZE,
+            ops.bulk_batch_size(fields, range(const.NOTIFICATION_BULK_INSERT_BATCH_SIZE))
+        )
+
+        insert_sql = 'INSERT INTO {table} ({columns}) '.format(
+            table=ops.quote_name(meta.db_table),
+            columns=', '.join(ops.quote_name(field.column) for field in fields)
+        )
+
+        # all rows in the same fan-out share the same timestamps
+        now = ops.adapt_datetimefield_value(datetime.now(pytz.UTC))
+
+        def _write_batch(cursor, rows):
+            """
+            Send one batch of rows to the database
+            """
+            if connection.features.has_bulk_insert:
+                placeholder_rows = [['%s'] * len(fields)] * len(rows)
+                params = [param for row in rows for param in row]
+                cursor.execute(insert_sql + ops.bulk_insert_sql(fields, placeholder_rows), params)
+            else:
+                placeholders = ', '.join(['%s'] * len(fields))
+                cursor.executemany(insert_sql + f'VALUES ({placeholders})', rows)
+
+            # all of these notifications are unread. A user can get several of them in
+            # the same namespace, so adjust the counters by how many each user got
+            num_unread = collections.Counter((row[0], row[2]) for row in rows)
+            user_ids_by_delta = collections.defaultdict(list)
+            for (user_id, _namespace), delta in num_unread.items():
+                user_ids_by_delta[(_namespace, delta)].append(user_id)
+
+            for (_namespace, delta), _user_ids in user_ids_by_delta.items():
+                self._adjust_unread_counters(_user_ids, _namespace, delta)
+
+        namespaces = None
+
+        total = 0
+        rows = []
+        with connection.cursor() as cursor:
+            for user_id in user_ids:
+                if namespaces is None:
+                    # only look up the messages' namespaces once we know there is someone to send them to
+                    namespaces = dict(
+                        SQLNotificationMessage.objects.using(self._write_db).filter(
+                            id__in=msg_ids
+                        ).order_by().values_list('id', 'namespace')
+                    )
+
+                    missing_ids = set(msg_ids) - set(namespaces)
+                    if missing_ids:
+                        raise ItemNotFoundError(f'Could not find msg_ids {sorted(missing_ids)}')
+
+                for msg_id in msg_ids:
+                    rows.append((user_id, msg_id, namespaces[msg_id], now, now))
+                    if len(rows) == batch_size:
+                        _write_batch(cursor, rows)
+                        total += len(rows)
+                        rows = []
+
+            if rows:
+                _write_batch(cursor, rows)
+                total += len(rows)
+
+        return total
 
     def save_notification_timer(self, timer):
         """
@@ -371,18 +1195,32 @@ class SQLNotificationStoreProvider(BaseNotificationStoreProvider):
         StorageProvider
         """
 
+        # timers which have been read from the store - e.g. when polling for the ones
+        # which are due - only need the columns which have been changed since written
+        if timer.name and timer.get_dirty_fields() is not None:
+            values = self._get_update_values(SQLNotificationCallbackTimer, timer, NOTIFICATION_TIMER_COLUMNS)
+            if not values:
+                return timer
+
+            now = datetime.now(pytz.UTC)
+            query = SQLNotificationCallbackTimer.objects.using(self._write_db).filter(name=timer.name)
+            if query.update(modified=now, **values):
+                timer.modified = now
+                timer.mark_clean()
+                return timer
+
         obj = None
         if timer.name:
             # see if it exists
             try:
-                obj = SQLNotificationCallbackTimer.objects.get(name=timer.name)
+                obj = SQLNotificationCallbackTimer.objects.using(self._write_db).get(name=timer.name)
                 obj.load_from_data_object(timer)
             except ObjectDoesNotExist:
                 pass
         if not obj:
             obj = SQLNotificationCallbackTimer.from_data_object(timer)
 
-        obj.save()
+        obj.save(using=self._write_db)
         return obj.to_data_object()
 
     def get_notification_timer(self, name):
@@ -390,7 +1228,7 @@ class SQLNotificationStoreProvider(BaseNotificationStoreProvider):
         Will return a single NotificationCallbackTimer
         """
         try:
-            obj = SQLNotificationCallbackTimer.objects.get(name=name)
+            obj = SQLNotificationCallbackTimer.objects.using(self._write_db).get(name=name)
         except ObjectDoesNotExist:
             raise ItemNotFoundError()
 
@@ -404,7 +1242,17 @@ class SQLNotificationStoreProvider(BaseNotificationStoreProvider):
         current system time
         """
 
-        objs = SQLNotificationCallbackTimer.objects.filter(
+        return list(self.iter_active_timers(until_time=until_time, include_executed=include_executed))
+
+    def iter_active_timers(self, until_time=None, include_executed=False, after=None, batch_size=None):
+        """
+        Pages through the active timers with a keyset on (callback_at, name), which
+        the timer_active_executed_cb index can serve in order
+        """
+
+        batch_size = batch_size if batch_size else const.NOTIFICATION_TIMER_SCAN_BATCH_SIZE
+
+        objs = SQLNotificationCallbackTimer.objects.using(self._write_db).filter(
             callback_at__lte=until_time if until_time else datetime.now(pytz.UTC),
             is_active=True
         )
@@ -412,7 +1260,249 @@ class SQLNotificationStoreProvider(BaseNotificationStoreProvider):
         if not include_executed:
             objs = objs.filter(executed_at__isnull=True)
 
-        return [obj.to_data_object() for obj in objs]
+        objs = objs.order_by('callback_at', 'name')
+
+        while True:
+            batch = objs
+            if after:
+                callback_at, name = after
+                batch = batch.filter(Q(callback_at__gt=callback_at) | Q(callback_at=callback_at, name__gt=name))
+
+            timers = [obj.to_data_object() for obj in batch[:batch_size]]
+            yield from timers
+
+            if len(timers) < batch_size:
+                return
+
+            after = (timers[-1].callback_at, timers[-1].name)
+
+    def archive_notification_timers(self, older_than):
+        """
+        Moves the timers over to the archive in batches, with one INSERT ... SELECT
+        and one DELETE per batch, like purging does with the user notifications
+        """
+
+        # timers which are being executed right now are left alone, even if inactive
+        timers = SQLNotificationCallbackTimer.objects.using(self._write_db).filter(
+            Q(is_active=False) | Q(executed_at__isnull=False, periodicity_min__isnull=True) |
+            Q(executed_at__isnull=False, periodicity_min=0),
+            modified__lt=older_than,
+            lease_expires_at__isnull=True
+        )
+
+        return self._purge_in_batches('timers', timers, self._archive_notification_timers, {}, None, key='name')
+
+    def _archive_notification_timers(self, names):
+        """
+        Archive and delete a batch of timers
+        """
+
+        connection = connections[self._write_db]
+        ops = connection.ops
+        placeholders = ', '.join(['%s'] * len(names))
+        table = ops.quote_name(SQLNotificationCallbackTimer._meta.db_table)  # pylint: disable=protected-access
+
+        archive_meta = SQLNotificationCallbackTimerArchive._meta  # pylint: disable=protected-access
+        columns = ', '.join(
+            ops.quote_name(field.column) for field in archive_meta.concrete_fields if not field.primary_key
+        )
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {ops.quote_name(archive_meta.db_table)} ({columns}) '
+                f'SELECT {columns} FROM {table} WHERE name IN ({placeholders})',
+                names
+            )
+            cursor.execute(f'DELETE FROM {table} WHERE name IN ({placeholders})', names)
+
+    def claim_due_notification_timers(self, worker_id, lease_secs, until_time=None, max_timers=None,
+                                      exclude_class_names=None, priorities=None):
+        """
+        Atomically hand out the due timers to worker_id. Where the database supports it, we lock
+        the candidates with SELECT ... FOR UPDATE SKIP LOCKED, so that concurrent workers each
+        get different ones. Otherwise we try to flip each candidate over to us with a conditional
+        UPDATE, like claim_notification_fanout_job() does
+        """
+
+        now = datetime.now(pytz.UTC)
+        max_timers = max_timers if max_timers else const.NOTIFICATION_TIMER_CLAIM_BATCH_SIZE
+
+        claimable = Q(is_active=True, callback_at__lte=until_time if until_time else now) & (
+            Q(executed_at__isnull=True, lease_expires_at__isnull=True) | Q(lease_expires_at__lt=now)
+        )
+        values = {
+            'worker_id': worker_id,
+            'lease_expires_at': now + timedelta(seconds=lease_secs),
+            'executed_at': now,
+            'modified': now,
+        }
+
+        timers = SQLNotificationCallbackTimer.objects.using(self._write_db)
+
+        candidates = timers.filter(claimable)
+        if exclude_class_names:
+            candidates = candidates.exclude(class_name__in=exclude_class_names)
+
+        ordering = ['callback_at']
+        if priorities:
+            candidates = candidates.annotate(
+                priority=Case(
+                    *[When(class_name=class_name, then=Value(priority)) for class_name, priority in priorities.items()],
+                    default=Value(0),
+                    output_field=IntegerField()
+                )
+            )
+            ordering = ['-priority', 'callback_at']
+
+        if connections[self._write_db].features.has_select_for_update_skip_locked:
+            with transaction.atomic(using=self._write_db):
+                claimed_names = list(
+                    candidates.select_for_update(skip_locked=True).order_by(
+                        *ordering
+                    ).values_list('name', flat=True)[:max_timers]
+                )
+                if claimed_names:
+                    timers.filter(name__in=claimed_names).update(**values)
+        else:
+            candidate_names = list(candidates.order_by(*ordering).values_list('name', flat=True)[:max_timers])
+            claimed_names = [
+                name
+                for name in candidate_names
+                if timers.filter(claimable, name=name).update(**values)
+            ]
+
+        if not claimed_names:
+            return []
+
+        objs = {obj.name: obj for obj in timers.filter(name__in=claimed_names, worker_id=worker_id)}
+        return [objs[name].to_data_object() for name in claimed_names if name in objs]
+
+    def get_notification_timer_schedule(self, modified_since=None):
+        """
+        Returns when each timer is next claimable, by name. This only reads a few
+        columns, so that the scheduler can keep tabs on a large number of timers
+        """
+
+        objs = SQLNotificationCallbackTimer.objects.using(self._write_db)
+        if modified_since:
+            objs = objs.filter(modified__gte=modified_since)
+        else:
+            objs = objs.filter(Q(executed_at__isnull=True) | Q(lease_expires_at__isnull=False), is_active=True)
+
+        schedule = {}
+        for name, is_active, callback_at, executed_at, lease_expires_at in objs.values_list(
+                'name', 'is_active', 'callback_at', 'executed_at', 'lease_expires_at'):
+            if not is_active:
+                schedule[name] = None
+            elif lease_expires_at:
+                schedule[name] = max(callback_at, lease_expires_at)
+            else:
+                schedule[name] = None if executed_at else callback_at
+
+        return schedule
+
+    def save_notification_fanout_job(self, job):
+        """
+        Will save (create or update) a NotificationFanoutJob in the
+        StorageProvider
+        """
+
+        obj = None
+        if job.id:
+            try:
+                obj = SQLNotificationFanoutJob.objects.using(self._write_db).get(id=job.id)
+                obj.load_from_data_object(job)
+            except ObjectDoesNotExist:
+                raise ItemNotFoundError()
+        else:
+            obj = SQLNotificationFanoutJob.from_data_object(job)
+
+        obj.save(using=self._write_db)
+        return obj.to_data_object()
+
+    def get_notification_fanout_job(self, job_id):
+        """
+        Will return a single NotificationFanoutJob
+        """
+        try:
+            obj = SQLNotificationFanoutJob.objects.using(self._write_db).get(id=job_id)
+        except ObjectDoesNotExist:
+            raise ItemNotFoundError()
+
+        return obj.to_data_object()
+
+    def claim_notification_fanout_job(self, worker_id, lease_secs):
+        """
+        Atomically hand out the oldest claimable NotificationFanoutJob to worker_id.
+
+        We don't rely on SELECT ... FOR UPDATE (which not all backends support),
+        rather we look up a few candidates and then try to flip each one over
+        to us with a conditional UPDATE. If another worker got to it first, the
+        UPDATE will not match any rows and we move on to the next candidate
+        """
+
+        now = datetime.now(pytz.UTC)
+
+        claimable = (
+            Q(status=const.NOTIFICATION_FANOUT_JOB_STATUS_PENDING) |
+            Q(status=const.NOTIFICATION_FANOUT_JOB_STATUS_RUNNING, lease_expires_at__lt=now)
+        )
+
+        jobs = SQLNotificationFanoutJob.objects.using(self._write_db)
+        candidate_ids = list(jobs.filter(claimable).order_by('id').values_list('id', flat=True)[:10])
+
+        for job_id in candidate_ids:
+            num_claimed = jobs.filter(claimable, id=job_id).update(
+                status=const.NOTIFICATION_FANOUT_JOB_STATUS_RUNNING,
+                worker_id=worker_id,
+                lease_expires_at=now + timedelta(seconds=lease_secs),
+                attempts=F('attempts') + 1,
+                modified=now
+            )
+
+            if num_claimed:
+                return self.get_notification_fanout_job(job_id)
+
+        return None
+
+    def checkpoint_notification_fanout_job(self, job, lease_secs):
+        """
+        Persist the progress of a NotificationFanoutJob, as long as job.worker_id
+        still holds the lease on it
+        """
+
+        now = datetime.now(pytz.UTC)
+
+        lease_expires_at = None
+        if job.status == const.NOTIFICATION_FANOUT_JOB_STATUS_RUNNING:
+            lease_expires_at = now + timedelta(seconds=lease_secs)
+
+        num_updated = SQLNotificationFanoutJob.objects.using(self._write_db).filter(
+            id=job.id,
+            worker_id=job.worker_id,
+            status=const.NOTIFICATION_FANOUT_JOB_STATUS_RUNNING
+        ).update(
+            status=job.status,
+            lease_expires_at=lease_expires_at,
+            last_user_id=job.last_user_id,
+            num_processed=job.num_processed,
+            num_dispatched=job.num_dispatched,
+            err_msg=job.err_msg,
+            completed_at=job.completed_at,
+            modified=now
+        )
+
+        if not num_updated:
+            raise FanoutJobLeaseExpired(
+                'Worker "{worker_id}" no longer holds the lease on fan-out job {job_id}'.format(
+                    worker_id=job.worker_id,
+                    job_id=job.id
+                )
+            )
+
+        job.lease_expires_at = lease_expires_at
+        job.modified = now
+        return job
 
     def get_notification_preference(self, name):
         """
@@ -420,7 +1510,7 @@ class SQLNotificationStoreProvider(BaseNotificationStoreProvider):
         else raises exception ItemNotFoundError
         """
         try:
-            obj = SQLNotificationPreference.objects.get(name=name)
+            obj = SQLNotificationPreference.objects.using(self._get_read_db()).get(name=name)
         except ObjectDoesNotExist:
             raise ItemNotFoundError()
 
@@ -431,25 +1521,31 @@ class SQLNotificationStoreProvider(BaseNotificationStoreProvider):
         Will save (create or update) a NotificationPreference in the
         StorageProvider
         """
-        obj = None
+
         if notification_preference.name:
-            # see if it exists
-            try:
-                obj = SQLNotificationPreference.objects.get(name=notification_preference.name)
-                obj.load_from_data_object(notification_preference)
-            except ObjectDoesNotExist:
-                pass
-        if not obj:
-            obj = SQLNotificationPreference.from_data_object(notification_preference)
+            values = self._get_update_values(
+                SQLNotificationPreference,
+                notification_preference,
+                NOTIFICATION_PREFERENCE_COLUMNS
+            )
+            if not values:
+                return notification_preference
 
-        obj.save()
+            # try to update an existing preference first, which doesn't need to read it
+            query = SQLNotificationPreference.objects.using(self._write_db).filter(name=notification_preference.name)
+            if query.update(**values):
+                notification_preference.mark_clean()
+                return notification_preference
+
+        obj = SQLNotificationPreference.from_data_object(notification_preference)
+        obj.save(using=self._write_db, force_insert=True)
         return obj.to_data_object()
 
     def get_all_notification_preferences(self):
         """
         This returns list of all registered NotificationPreference.
         """
-        query = SQLNotificationPreference.objects.all()
+        query = SQLNotificationPreference.objects.using(self._get_read_db()).all()
 
         result_set = [item.to_data_object() for item in query]
 
@@ -461,7 +1557,10 @@ class SQLNotificationStoreProvider(BaseNotificationStoreProvider):
         else raises exception ItemNotFoundError
         """
         try:
-            obj = SQLUserNotificationPreferences.objects.get(user_id=user_id, preference__name=name)
+            obj = SQLUserNotificationPreferences.objects.using(self._get_read_db(user_id)).get(
+                user_id=user_id,
+                preference__name=name
+            )
         except ObjectDoesNotExist:
             raise ItemNotFoundError()
 
@@ -472,28 +1571,32 @@ class SQLNotificationStoreProvider(BaseNotificationStoreProvider):
         Will save (create or update) a UserNotificationPreference in the
         StorageProvider
         """
-        obj = None
+
+        self._pin_user(user_preference.user_id)
+
         if user_preference.user_id:
-            # see if it exists
-            try:
-                obj = SQLUserNotificationPreferences.objects.get(
-                    user_id=user_preference.user_id,
-                    preference__name=user_preference.preference.name
-                )
-                obj.load_from_data_object(user_preference)
-            except ObjectDoesNotExist:
-                pass
-        if not obj:
-            obj = SQLUserNotificationPreferences.from_data_object(user_preference)
+            values = self._get_update_values(SQLUserNotificationPreferences, user_preference, USER_PREFERENCE_COLUMNS)
+            if not values:
+                return user_preference
+
+            # try to update an existing preference first, which doesn't need to read it
+            query = SQLUserNotificationPreferences.objects.using(self._write_db).filter(
+                user_id=user_preference.user_id,
+                preference_id=user_preference.preference.name
+            )
+            if query.update(modified=datetime.now(pytz.UTC), **values):
+                user_preference.mark_clean()
+                return user_preference
 
-        obj.save()
+        obj = SQLUserNotificationPreferences.from_data_object(user_preference)
+        obj.save(using=self._write_db, force_insert=True)
         return obj.to_data_object()
 
     def get_all_user_preferences_for_user(self, user_id):
         """
         This returns list of all UserNotificationPreference.
         """
-        query = SQLUserNotificationPreferences.objects.filter(user_id=user_id)
+        query = SQLUserNotificationPreferences.objects.using(self._get_read_db(user_id)).filter(user_id=user_id)
 
         result_set = [item.to_data_object() for item in query]
 
@@ -514,7 +1617,10 @@ class SQLNotificationStoreProvider(BaseNotificationStoreProvider):
         if size is None:
             size = const.USER_PREFERENCE_MAX_LIST_SIZE
 
-        query = SQLUserNotificationPreferences.objects.filter(preference__name=name, value=value)
+        query = SQLUserNotificationPreferences.objects.using(self._get_read_db()).filter(
+            preference__name=name,
+            value=value
+        )
 
         query = query[offset:offset + size]
 
@@ -522,7 +1628,8 @@ class SQLNotificationStoreProvider(BaseNotificationStoreProvider):
 
         return result_set
 
-    def purge_expired_notifications(self, purge_read_messages_older_than=None, purge_unread_messages_older_than=None):
+    def purge_expired_notifications(self, purge_read_messages_older_than=None, purge_unread_messages_older_than=None,
+                                    options=None):
         """
         Will purge all the unread and read messages that is in the
         db for a period of time.
@@ -534,23 +1641,324 @@ class SQLNotificationStoreProvider(BaseNotificationStoreProvider):
         purge_read_messages_older_than will compare against the "read_at" column
 
         where as purge_unread_messages_older_than will compare against the "created" column.
+
+        Rows are deleted in batches of NOTIFICATION_PURGE_BATCH_SIZE primary keys, with a pause
+        of NOTIFICATION_PURGE_BATCH_PAUSE_SECS in between. Purged notifications are archived with
+        one INSERT ... SELECT per batch (if NOTIFICATION_ARCHIVE_ENABLED), rather than through the
+        pre_delete signal. Finally, fan-out jobs which have completed or failed - and messages which
+        no one has been sent (any more) - are deleted as well.
+
+        If the user notifications are partitioned, the partitions which only hold expired
+        notifications get dropped first, so that only the rest are left to be deleted row by row.
         """
 
+        _options = options if options else {}
+        checkpoint = dict(_options.get('checkpoint') or {})
+        on_checkpoint = _options.get('on_checkpoint')
+
+        if self._partitions is not None:
+            self._purge_expired_partitions(purge_read_messages_older_than, purge_unread_messages_older_than)
+
         if purge_read_messages_older_than is not None:
-            SQLUserNotification.objects.filter(
-                read_at__lte=purge_read_messages_older_than).delete()
+            self._purge_in_batches(
+                'read',
+                SQLUserNotification.objects.using(self._write_db).filter(read_at__lte=purge_read_messages_older_than),
+                self._purge_user_notifications,
+                checkpoint,
+                on_checkpoint
+            )
 
         if purge_unread_messages_older_than is not None:
-            SQLUserNotification.objects.filter(
-                created__lte=purge_unread_messages_older_than,
-                read_at__isnull=True
-            ).delete()
+            self._purge_in_batches(
+                'unread',
+                SQLUserNotification.objects.using(self._write_db).filter(
+                    created__lte=purge_unread_messages_older_than,
+                    read_at__isnull=True
+                ),
+                self._purge_unread_user_notifications,
+                checkpoint,
+                on_checkpoint
+            )
+
+        purged_older_than = [
+            older_than
+            for older_than in (purge_read_messages_older_than, purge_unread_messages_older_than)
+            if older_than is not None
+        ]
+        if purged_older_than:
+            # finished fan-out jobs would otherwise keep their messages around forever
+            self._purge_in_batches(
+                'fanout_jobs',
+                SQLNotificationFanoutJob.objects.using(self._write_db).filter(
+                    status__in=[
+                        const.NOTIFICATION_FANOUT_JOB_STATUS_COMPLETED,
+                        const.NOTIFICATION_FANOUT_JOB_STATUS_FAILED,
+                    ],
+                    modified__lte=min(purged_older_than)
+                ),
+                self._purge_fanout_jobs,
+                checkpoint,
+                on_checkpoint
+            )
+
+            self._purge_in_batches(
+                'orphans',
+                self._get_orphaned_notification_messages(min(purged_older_than)),
+                self._purge_notification_messages,
+                checkpoint,
+                on_checkpoint
+            )
+
+    def _purge_expired_partitions(self, purge_read_messages_older_than, purge_unread_messages_older_than):
+        """
+        Adds the partitions for the months ahead, and drops every past partition of the user
+        notifications which nothing would be left of after purging it row by row
+
+        RETURNS: the number of partitions dropped
+        """
+
+        self._partitions.add_partitions(
+            add_months(get_month(datetime.now(pytz.UTC)), const.NOTIFICATION_PARTITION_MONTHS_AHEAD)
+        )
+
+        older_than = [
+            cutoff
+            for cutoff in (purge_read_messages_older_than, purge_unread_messages_older_than)
+            if cutoff is not None
+        ]
+        if not older_than:
+            return 0
+
+        num_dropped = 0
+        for partition in self._partitions.get_partitions():
+            # leave the partitions alone which notifications might still be written to
+            if partition.end is None or partition.end > min(older_than):
+                continue
+
+            user_msgs = SQLUserNotification.objects.using(self._write_db).filter(created__lt=partition.end)
+            if partition.start is not None:
+                user_msgs = user_msgs.filter(created__gte=partition.start)
+
+            survivors = user_msgs
+            if purge_read_messages_older_than is not None:
+                survivors = survivors.exclude(read_at__lte=purge_read_messages_older_than)
+            if purge_unread_messages_older_than is not None:
+                survivors = survivors.exclude(read_at__isnull=True, created__lte=purge_unread_messages_older_than)
+
+            if survivors.exists():
+                continue
+
+            self._drop_user_notification_partition(partition, user_msgs)
+            num_dropped += 1
+
+        return num_dropped
+
+    def _drop_user_notification_partition(self, partition, user_msgs):
+        """
+        Archive (if enabled) the user notifications of a partition, drop it and recount
+        the unread notifications of everyone affected. The archiving skips whatever has
+        been archived already, so that this can be run again if it gets interrupted
+        """
+
+        # everyone loses notifications, so the recount bumps the versions of all of them
+        user_ids = []
+        if const.NOTIFICATION_UNREAD_COUNTERS_ENABLED:
+            user_ids = list(user_msgs.order_by().values_list('user_id', flat=True).distinct())
+
+        if const.NOTIFICATION_ARCHIVE_ENABLED:
+            connection = connections[self._write_db]
+            ops = connection.ops
+            table = ops.quote_name(SQLUserNotification._meta.db_table)  # pylint: disable=protected-access
+            archive_meta = SQLUserNotificationArchive._meta  # pylint: disable=protected-access
+            archive_table = ops.quote_name(archive_meta.db_table)
+            columns = ', '.join(ops.quote_name(field.column) for field in archive_meta.concrete_fields)
+            source_columns = ', '.join(
+                f'{table}.{ops.quote_name(field.column)}' for field in archive_meta.concrete_fields
+            )
+
+            where = [f'{table}.created < %s']
+            params = [ops.adapt_datetimefield_value(partition.end)]
+            if partition.start is not None:
+                where.append(f'{table}.created >= %s')
+                params.append(ops.adapt_datetimefield_value(partition.start))
+
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'INSERT INTO {archive_table} ({columns}) '
+                    f'SELECT {source_columns} FROM {table} WHERE {" AND ".join(where)} AND NOT EXISTS ('
+                    f'SELECT 1 FROM {archive_table} WHERE {archive_table}.user_id = {table}.user_id '
+                    f'AND {archive_table}.msg_id = {table}.msg_id)',
+                    params
+                )
+
+        self._partitions.drop_partition(partition)
+
+        if user_ids:
+            self.rebuild_unread_notification_counters(user_ids)
+
+    def _purge_in_batches(self, name, query, purge_batch, checkpoint, on_checkpoint,
+                          key='id'):  # pylint: disable=too-many-arguments
+        """
+        Calls purge_batch() with the ids (or whatever other key) of the rows in query, in batches of
+        ascending ids. The last id of every batch gets recorded in checkpoint[name], which is passed to
+        on_checkpoint(), so that a purge which gets interrupted can pick up where it left off
+
+        RETURNS: the number of rows purged
+        """
+
+        batch_size = const.NOTIFICATION_PURGE_BATCH_SIZE
+        last_id = checkpoint.get(name)
+        total = 0
+
+        while True:
+            batch = query if last_id is None else query.filter(**{f'{key}__gt': last_id})
+            ids = list(batch.order_by(key).values_list(key, flat=True)[:batch_size])
+            if not ids:
+                break
+
+            with transaction.atomic(using=self._write_db):
+                purge_batch(ids)
+
+            total += len(ids)
+            last_id = ids[-1]
+
+            checkpoint[name] = last_id
+            if on_checkpoint:
+                on_checkpoint(dict(checkpoint))
+
+            if len(ids) < batch_size:
+                break
+
+            if const.NOTIFICATION_PURGE_BATCH_PAUSE_SECS:
+                time.sleep(const.NOTIFICATION_PURGE_BATCH_PAUSE_SECS)
+
+        return total
+
+    def _purge_user_notifications(self, ids):
+        """
+        Archive (if enabled) and delete a batch of user notifications. Both are single set-based
+        statements, so this bypasses the pre_delete signal of SQLUserNotification
+
+        RETURNS: the user_ids whose notifications were purged, if the unread counters are enabled
+        """
+
+        user_ids = []
+        if const.NOTIFICATION_UNREAD_COUNTERS_ENABLED:
+            user_ids = list(
+                SQLUserNotification.objects.using(self._write_db).filter(
+                    id__in=ids
+                ).order_by().values_list('user_id', flat=True).distinct()
+            )
+
+        connection = connections[self._write_db]
+        ops = connection.ops
+        placeholders = ', '.join(['%s'] * len(ids))
+        table = ops.quote_name(SQLUserNotification._meta.db_table)  # pylint: disable=protected-access
+
+        with connection.cursor() as cursor:
+            if const.NOTIFICATION_ARCHIVE_ENABLED:
+                archive_meta = SQLUserNotificationArchive._meta  # pylint: disable=protected-access
+                columns = ', '.join(ops.quote_name(field.column) for field in archive_meta.concrete_fields)
+
+                cursor.execute(
+                    f'INSERT INTO {ops.quote_name(archive_meta.db_table)} ({columns}) '
+                    f'SELECT {columns} FROM {table} WHERE id IN ({placeholders})',
+                    ids
+                )
+
+            cursor.execute(f'DELETE FROM {table} WHERE id IN ({placeholders})', ids)
+
+        self._bump_notifications_versions(user_ids)
+        return user_ids
+
+    def _purge_unread_user_notifications(self, ids):
+        """
+        Purge a batch of unread user notifications, and recount the unread
+        notifications of everyone affected
+        """
+
+        user_ids = self._purge_user_notifications(ids)
+
+        if user_ids:
+            self.rebuild_unread_notification_counters(user_ids)
+
+    def _get_orphaned_notification_messages(self, older_than):
+        """
+        Returns the query for all messages created before older_than which no one has been sent, or
+        will be sent: they have no user notifications (archived or not) or fan-outs, and they
+        aren't timed notifications which are still to be delivered - either because they are not
+        due yet, or because their timer has yet to fire (or is firing right now)
+        """
+
+        return SQLNotificationMessage.objects.using(self._write_db).filter(
+            Q(deliver_no_earlier_than__isnull=True) | Q(deliver_no_earlier_than__lte=datetime.now(pytz.UTC)),
+            created__lte=older_than,
+        ).exclude(
+            id__in=self._get_pending_timed_msg_ids()
+        ).annotate(
+            has_user_notifications=Exists(SQLUserNotification.objects.filter(msg_id=OuterRef('id'))),
+            has_archived_user_notifications=Exists(SQLUserNotificationArchive.objects.filter(msg_id=OuterRef('id'))),
+            has_fanout_jobs=Exists(SQLNotificationFanoutJob.objects.filter(msg_id=OuterRef('id'))),
+        ).filter(
+            has_user_notifications=False,
+            has_archived_user_notifications=False,
+            has_fanout_jobs=False
+        )
+
+    def _get_pending_timed_msg_ids(self):
+        """
+        Returns the msg_ids of the timed notifications whose timers are active, and either
+        haven't been executed yet, or are being executed (i.e. are leased) right now
+        """
+
+        contexts = SQLNotificationCallbackTimer.objects.using(self._write_db).filter(
+            Q(executed_at__isnull=True) | Q(lease_expires_at__isnull=False),
+            is_active=True,
+            context__contains='msg_id'
+        ).values_list('context', flat=True)
+
+        msg_ids = set()
+        for context in contexts.iterator():
+            context = DictField.from_json(context)
+            try:
+                msg_ids.add(int(context['msg_id']))
+            except (TypeError, KeyError, ValueError):
+                pass
+
+        return msg_ids
+
+    def _purge_fanout_jobs(self, ids):
+        """
+        Delete a batch of fan-out jobs
+        """
+
+        SQLNotificationFanoutJob.objects.using(self._write_db).filter(id__in=ids).delete()
+
+    def _purge_notification_messages(self, ids):
+        """
+        Delete a batch of messages
+        """
+
+        connection = connections[self._write_db]
+        ops = connection.ops
+        placeholders = ', '.join(['%s'] * len(ids))
+        table = ops.quote_name(SQLNotificationMessage._meta.db_table)  # pylint: disable=protected-access
+
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {table} WHERE id IN ({placeholders})', ids)
+
+        if self._msg_cache is not None:
+            with self._msg_cache_lock:
+                for msg_id in ids:
+                    if msg_id in self._msg_cache:
+                        del self._msg_cache[msg_id]
 
     def get_all_namespaces(self, start_datetime=None, end_datetime=None):
         """
-        This will return all unique namespaces that have been used
+        This will return all unique namespaces that have been used. This scans all
+        messages (in the time range), so it is read from the analytics database
         """
-        result_set = SQLNotificationMessage.objects.all()
+        result_set = SQLNotificationMessage.objects.using(self._analytics_db).all()
         if start_datetime and end_datetime:
             result_set = result_set.filter(created__gte=start_datetime, created__lte=end_datetime)
         result_set = result_set.values_list('namespace', flat=True).order_by('namespace').distinct()
@@ -0,0 +1,188 @@
+"""
+Tests for the monthly partitions of the user notifications
+"""
+
+
+
+from datetime import datetime
+from unittest import mock
+
+import pytz
+from django.test import TestCase
+from django.core.exceptions import ImproperlyConfigured
+
+from edx_notifications.stores.sql.partitions import (
+    UserNotificationPartition,
+    get_month,
+    add_months,
+    get_months,
+    get_user_notification_partitions
+)
+
+
+def _get_connection(vendor, rows=None):
+    """
+    A stand-in for a database connection of vendor, whose queries all return rows
+    """
+
+    db_connection = mock.MagicMock(vendor=vendor)
+    db_connection.ops.quote_name.side_effect = lambda name: f'`{name}`'
+    db_connection.introspection.get_constraints.return_value = {
+        'PRIMARY': {'primary_key': True, 'unique': True, 'foreign_key': None},
+        'user_msg_uniq': {'primary_key': False, 'unique': True, 'foreign_key': None},
+        'msg_fk': {'primary_key': False, 'unique': False, 'foreign_key': ('msg', 'id')},
+        'user_created_idx': {'primary_key': False, 'unique': False, 'foreign_key': None},
+    }
+
+    cursor = db_connection.cursor.return_value.__enter__.return_value
+    cursor.fetchall.return_value = rows if rows else []
+    cursor.fetchone.return_value = ['usernotification_id_seq']
+
+    return db_connection
+
+
+class TestUserNotificationPartitions(TestCase):
+    """
+    Make sure the partitions are laid out, added and dropped as expected
+    """
+
+    def test_months(self):
+        """
+        Month arithmetic
+        """
+
+        self.assertEqual(
+            get_month(datetime(2026, 12, 31, 23, 59, tzinfo=pytz.UTC)),
+            datetime(2026, 12, 1, tzinfo=pytz.UTC)
+        )
+        self.assertEqual(add_months(datetime(2026, 12, 1, tzinfo=pytz.UTC), 1), datetime(2027, 1, 1, tzinfo=pytz.UTC))
+        self.assertEqual(add_months(datetime(2026, 1, 1, tzinfo=pytz.UTC), -1), datetime(2025, 12, 1, tzinfo=pytz.UTC))
+        self.assertEqual(
+            get_months(datetime(2026, 11, 15, tzinfo=pytz.UTC), datetime(2027, 1, 1, tzinfo=pytz.UTC)),
+            [
+                datetime(2026, 11, 1, tzinfo=pytz.UTC),
+                datetime(2026, 12, 1, tzinfo=pytz.UTC),
+                datetime(2027, 1, 1, tzinfo=pytz.UTC),
+            ]
+        )
+
+    def test_unsupported_backend(self):
+        """
+        The tests run on sqlite, which can't partition
+        """
+
+        with self.assertRaises(ImproperlyConfigured):
+            get_user_notification_partitions()
+
+    def test_mysql(self):
+        """
+        Go through the MySQL statements
+        """
+
+        db_connection = _get_connection('mysql', rows=[('p202609',), ('p202610',), ('pfuture',)])
+        partitions = get_user_notification_partitions(db_connection=db_connection)
+
+        self.assertEqual(partitions.get_partitions(), [
+            UserNotificationPartition('p202609', None, datetime(2026, 10, 1, tzinfo=pytz.UTC)),
+            UserNotificationPartition(
+                'p202610', datetime(2026, 10, 1, tzinfo=pytz.UTC), datetime(2026, 11, 1, tzinfo=pytz.UTC)
+            ),
+            UserNotificationPartition('pfuture', datetime(2026, 11, 1, tzinfo=pytz.UTC), None),
+        ])
+
+        statements = partitions.convert(datetime(2026, 9, 1, tzinfo=pytz.UTC), datetime(2026, 10, 1, tzinfo=pytz.UTC))
+        self.assertEqual(statements[0], 'ALTER TABLE `edx_notifications_usernotification` DROP FOREIGN KEY `msg_fk`')
+        self.assertEqual(statements[1], 'ALTER TABLE `edx_notifications_usernotification` DROP INDEX `user_msg_uniq`')
+        self.assertIn('ADD PRIMARY KEY (id, created)', statements[2])
+        self.assertEqual(
+            statements[3],
+            'ALTER TABLE `edx_notifications_usernotification` PARTITION BY RANGE (TO_DAYS(created)) ('
+            "PARTITION p202609 VALUES LESS THAN (TO_DAYS('2026-10-01')), "
+            "PARTITION p202610 VALUES LESS THAN (TO_DAYS('2026-11-01')), "
+            'PARTITION pfuture VALUES LESS THAN MAXVALUE)'
+        )
+
+        # only the months which don't have a partition yet get split off the future one
+        self.assertEqual(partitions.add_partitions(datetime(2026, 10, 1, tzinfo=pytz.UTC)), [])
+        self.assertEqual(
+            partitions.add_partitions(datetime(2026, 11, 1, tzinfo=pytz.UTC)),
+            [
+                'ALTER TABLE `edx_notifications_usernotification` REORGANIZE PARTITION pfuture INTO ('
+                "PARTITION p202611 VALUES LESS THAN (TO_DAYS('2026-12-01')), "
+                'PARTITION pfuture VALUES LESS THAN MAXVALUE)'
+            ]
+        )
+
+        self.assertEqual(
+            partitions.drop_partition(partitions.get_partitions()[0]),
+            'ALTER TABLE `edx_notifications_usernotification` DROP PARTITION p202609'
+        )
+
+    def test_postgresql(self):
+        """
+        Go through the PostgreSQL statements
+        """
+
+        db_connection = _get_connection(
+            'postgresql',
+            rows=[
+                ('edx_notifications_usernotification_202610',),
+                ('edx_notifications_usernotification_default',),
+                ('edx_notifications_usernotification_202609',),
+            ]
+        )
+        partitions = get_user_notification_partitions(db_connection=db_connection)
+
+        self.assertEqual(
+            [(partition.name, partition.start) for partition in partitions.get_partitions()],
+            [
+                ('edx_notifications_usernotification_202609', datetime(2026, 9, 1, tzinfo=pytz.UTC)),
+                ('edx_notifications_usernotification_202610', datetime(2026, 10, 1, tzinfo=pytz.UTC)),
+            ]
+        )
+
+        statements = partitions.convert(datetime(2026, 9, 1, tzinfo=pytz.UTC), datetime(2026, 10, 1, tzinfo=pytz.UTC))
+        self.assertEqual(
+            statements[:2],
+            [
+                'ALTER TABLE `edx_notifications_usernotification` '
+                'RENAME TO `edx_notifications_usernotification_unpartitioned`',
+                'CREATE TABLE `edx_notifications_usernotification` '
+                '(LIKE `edx_notifications_usernotification_unpartitioned` INCLUDING DEFAULTS) '
+                'PARTITION BY RANGE (created)',
+            ]
+        )
+        self.assertIn(
+            'CREATE TABLE IF NOT EXISTS `edx_notifications_usernotification_202609` '
+            'PARTITION OF `edx_notifications_usernotification` '
+            "FOR VALUES FROM ('2026-09-01 00:00:00+00') TO ('2026-10-01 00:00:00+00')",
+            statements
+        )
+        self.assertIn(
+            'INSERT INTO `edx_notifications_usernotification` '
+            'SELECT * FROM `edx_notifications_usernotification_unpartitioned`',
+            statements
+        )
+
+        self.assertEqual(len(partitions.add_partitions(datetime(2026, 12, 1, tzinfo=pytz.UTC))), 2)
+
+        self.assertEqual(
+            partitions.drop_partition(partitions.get_partitions()[0]),
+            'DROP TABLE `edx_notifications_usernotification_202609`'
+        )
+
+    def test_dry_run(self):
+        """
+        A dry run does not change anything
+        """
+
+        db_connection = _get_connection('mysql', rows=[('pfuture',)])
+        partitions = get_user_notification_partitions(db_connection=db_connection, dry_run=True)
+
+        cursor = db_connection.cursor.return_value.__enter__.return_value
+        cursor.execute.reset_mock()
+
+        self.assertEqual(len(partitions.add_partitions(add_months(get_month(datetime.now(pytz.UTC)), 1))), 1)
+
+        # only the partitions have been looked up
+        self.assertEqual(cursor.execute.call_count, 1)
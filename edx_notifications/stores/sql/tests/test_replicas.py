@@ -0,0 +1,175 @@
+"""
+Tests for the read/write splitting of the SQL Notification Store. The 'replica' database of the
+test settings never gets anything replicated to it, which makes it a replica that is lagging behind
+"""
+
+
+
+from unittest import mock
+from datetime import datetime, timedelta
+
+import pytz
+from django.test import TestCase
+from django.db import connections, transaction
+from django.core.cache import cache
+from django.core.signals import request_finished
+from django.test.utils import CaptureQueriesContext
+from django.core.exceptions import ImproperlyConfigured
+
+from edx_notifications.data import NotificationType, UserNotification, NotificationMessage
+from edx_notifications.pubsub import publish_notification_wakeups
+from edx_notifications.channels.parallel import ParallelBulkDispatchMixin
+from edx_notifications.type_registry import reset_notification_type_registry
+from edx_notifications.stores.sql.store_provider import SQLNotificationStoreProvider
+
+
+class TestReadReplicas(TestCase):
+    """
+    Make sure reads go where they are supposed to
+    """
+
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        """
+        Harnessing
+        """
+
+        cache.clear()
+        reset_notification_type_registry()
+        request_finished.send(sender=self.__class__)
+
+        self.provider = SQLNotificationStoreProvider(READ_DATABASE='replica')
+        self.test_user_id = 1
+
+        msg_type = self.provider.save_notification_type(
+            NotificationType(
+                name='open-edx.edx_notifications.stores.sql.tests.test_replicas',
+                renderer='edx_notifications.renderers.basic.JsonRenderer',
+            )
+        )
+        self.msg = self.provider.save_notification_message(
+            NotificationMessage(msg_type=msg_type, namespace='namespace1', payload={'foo': 'bar'})
+        )
+        self.user_msg = self.provider.save_user_notification(UserNotification(user_id=self.test_user_id, msg=self.msg))
+
+    def test_bad_config(self):
+        """
+        All aliases need to exist
+        """
+
+        with self.assertRaises(ImproperlyConfigured):
+            SQLNotificationStoreProvider(READ_DATABASE='foo')
+
+        with self.assertRaises(ImproperlyConfigured):
+            SQLNotificationStoreProvider(ANALYTICS_DATABASE='foo')
+
+    def test_reads_from_replica(self):
+        """
+        Reads go to the replica, which has yet to catch up
+        """
+
+        with CaptureQueriesContext(connections['replica']) as queries:
+            self.assertEqual(self.provider.get_num_notifications_for_user(self.test_user_id), 0)
+            self.assertEqual(self.provider.get_notifications_for_user(self.test_user_id), [])
+            self.assertEqual(self.provider.get_all_user_preferences_for_user(self.test_user_id), [])
+
+        self.assertEqual(len(queries), 3)
+
+        # whereas other users and the default configuration don't touch the replica
+        self.assertEqual(SQLNotificationStoreProvider().get_num_notifications_for_user(self.test_user_id), 1)
+
+    def test_read_your_writes(self):
+        """
+        Once a user has changed their notifications, they read from the write database,
+        both for the rest of the request as well as in the next one
+        """
+
+        self.provider.mark_user_notifications_read(self.test_user_id)
+
+        self.assertEqual(
+            self.provider.get_num_notifications_for_user(self.test_user_id, filters={'unread': False}),
+            1
+        )
+
+        # the next request still sees the write
+        request_finished.send(sender=self.__class__)
+        self.assertEqual(
+            self.provider.get_num_notifications_for_user(self.test_user_id, filters={'unread': False}),
+            1
+        )
+
+        # but other users don't
+        self.assertEqual(self.provider.get_num_notifications_for_user(2), 0)
+
+        # and neither does the user once the pin has expired
+        provider = SQLNotificationStoreProvider(READ_DATABASE='replica', READ_YOUR_WRITES_SECS=0)
+        request_finished.send(sender=self.__class__)
+        self.assertEqual(provider.get_num_notifications_for_user(self.test_user_id), 0)
+
+        provider.save_user_notification(self.user_msg)
+        self.assertEqual(provider.get_num_notifications_for_user(self.test_user_id), 1)
+
+        request_finished.send(sender=self.__class__)
+        self.assertEqual(provider.get_num_notifications_for_user(self.test_user_id), 0)
+
+    def test_messages_fall_back_to_writer(self):
+        """
+        Messages which have not made it to the replica yet are read from the write database
+        """
+
+        self.assertEqual(self.provider.get_notification_message_by_id(self.msg.id), self.msg)
+        self.assertEqual(self.provider.get_notification_messages_by_ids([self.msg.id]), {self.msg.id: self.msg})
+
+    def test_analytics(self):
+        """
+        Batch readers read from the analytics database
+        """
+
+        provider = SQLNotificationStoreProvider(ANALYTICS_DATABASE='replica')
+
+        with CaptureQueriesContext(connections['replica']) as queries:
+            self.assertEqual(
+                list(
+                    provider.get_all_namespaces(
+                        datetime.now(pytz.UTC) - timedelta(days=1),
+                        datetime.now(pytz.UTC) + timedelta(days=1)
+                    )
+                ),
+                []
+            )
+            self.assertEqual(
+                provider.get_notifications_for_user(self.test_user_id, options={'analytics': True}),
+                []
+            )
+
+        self.assertEqual(len(queries), 2)
+
+        # everything else still goes to the default database
+        self.assertEqual(len(provider.get_notifications_for_user(self.test_user_id)), 1)
+
+    def test_write_database_alias(self):
+        """
+        Transactions and on_commit() hooks around the store's writes go to the write database
+        """
+
+        provider = SQLNotificationStoreProvider(WRITE_DATABASE='replica')
+        self.assertEqual(provider.get_write_database_alias(), 'replica')
+        self.assertEqual(SQLNotificationStoreProvider().get_write_database_alias(), 'default')
+
+        with mock.patch('edx_notifications.pubsub.notification_store', return_value=provider):
+            with mock.patch('edx_notifications.pubsub.transaction.on_commit') as mock_on_commit:
+                publish_notification_wakeups([1])
+
+        self.assertEqual(mock_on_commit.call_args[1], {'using': 'replica'})
+
+        # it is a transaction on the write database which keeps us from going parallel
+        with mock.patch('edx_notifications.channels.parallel.notification_store', return_value=provider):
+            with mock.patch(
+                'edx_notifications.channels.parallel.transaction.get_connection',
+                wraps=transaction.get_connection
+            ) as mock_get_connection:
+                # pylint: disable=protected-access
+                self.assertFalse(ParallelBulkDispatchMixin()._can_dispatch_in_parallel(2))
+
+        mock_get_connection.assert_called_once_with(using='replica')
@@ -9,19 +9,32 @@ from datetime import datetime, timedelta
 from unittest import mock
 import pytz
 from freezegun import freeze_time
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
 from edx_notifications import const
 from edx_notifications.data import (
     NotificationType,
     UserNotification,
     NotificationMessage,
+    NotificationFanoutJob,
     NotificationPreference,
     NotificationCallbackTimer,
     UserNotificationPreferences
 )
-from edx_notifications.exceptions import ItemNotFoundError, BulkOperationTooLarge
-from edx_notifications.stores.sql.models import SQLUserNotification, SQLUserNotificationArchive
+from edx_notifications.utils import encode_notification_cursor
+from edx_notifications.exceptions import ItemNotFoundError, BulkOperationTooLarge, FanoutJobLeaseExpired
+from edx_notifications.stores.sql.models import (
+    SQLUserNotification,
+    SQLNotificationType,
+    SQLNotificationMessage,
+    SQLUserNotificationArchive,
+    SQLNotificationCallbackTimer,
+    SQLNotificationCallbackTimerArchive
+)
+from edx_notifications.type_registry import reset_notification_type_registry, load_notification_type_registry
+from edx_notifications.stores.sql.partitions import UserNotificationPartition, add_months, get_month
 from edx_notifications.stores.sql.store_provider import SQLNotificationStoreProvider
 
 
@@ -35,6 +48,8 @@ class TestSQLStoreProvider(TestCase):
         """
         Setup the test case
         """
+        reset_notification_type_registry()
+
         self.provider = SQLNotificationStoreProvider()
         self.test_user_id = 1
 
@@ -77,7 +92,7 @@ class TestSQLStoreProvider(TestCase):
         self.assertEqual(len(result_set), 1)
         self.assertEqual(result_set[0], notification_type)
 
-        # re-getting notification type should pull from cache
+        # re-getting notification type should pull from the registry
         # so there should be no round-trips to SQL
         with self.assertNumQueries(0):
             result = self.provider.get_notification_type(notification_type.name)
@@ -85,13 +100,11 @@ class TestSQLStoreProvider(TestCase):
         self.assertIsNotNone(result)
         self.assertEqual(result, notification_type)
 
-        # re-save and make sure the cache entry got invalidated
-        with self.assertNumQueries(2):
+        # re-saving an unchanged type does not write anything
+        with self.assertNumQueries(1):
             notification_type = self._save_notification_type()
 
-        # since we invalidated the cached entry on the last save
-        # when we re-query we'll hit another SQL round trip
-        with self.assertNumQueries(1):
+        with self.assertNumQueries(0):
             result = self.provider.get_notification_type(notification_type.name)
 
         self.assertIsNotNone(result)
@@ -213,6 +226,252 @@ class TestSQLStoreProvider(TestCase):
             0
         )
 
+    def test_denormalized_namespace(self):
+        """
+        Make sure the message's namespace is kept on the user notifications
+        on all write paths, so that filtering on it does not require a join
+        """
+
+        msg_type = self._save_notification_type()
+
+        msg = self.provider.save_notification_message(NotificationMessage(
+            namespace='namespace1',
+            msg_type=msg_type,
+            payload={
+                'foo': 'bar'
+            }
+        ))
+
+        self.provider.save_user_notification(UserNotification(user_id=1, msg=msg))
+        self.provider.bulk_create_user_notification([UserNotification(user_id=2, msg=msg)])
+        self.provider.bulk_create_user_notifications_for_message(msg.id, [3])
+
+        self.assertEqual(SQLUserNotification.objects.filter(namespace='namespace1').count(), 3)
+
+        with self.assertNumQueries(1) as ctx:
+            self.assertEqual(
+                self.provider.get_num_notifications_for_user(3, filters={'namespace': 'namespace1'}),
+                1
+            )
+
+        self.assertNotIn('JOIN', ctx.captured_queries[0]['sql'])
+
+        # moving the message to another namespace moves its user notifications as well
+        msg.namespace = 'namespace2'
+        self.provider.save_notification_message(msg)
+
+        self.assertEqual(SQLUserNotification.objects.filter(namespace='namespace2').count(), 3)
+        self.assertEqual(
+            self.provider.get_num_notifications_for_user(1, filters={'namespace': 'namespace1'}),
+            0
+        )
+
+    def test_unread_counters(self):
+        """
+        Make sure the unread counters are kept up to date on all write
+        paths and are used to count unread notifications
+        """
+
+        msg_type = self._save_notification_type()
+
+        msgs = [
+            self.provider.save_notification_message(NotificationMessage(
+                namespace=namespace,
+                msg_type=msg_type,
+                payload={
+                    'foo': 'bar'
+                }
+            ))
+            for namespace in ('namespace1', 'namespace1', 'namespace2', None)
+        ]
+
+        def _assert_unread(user_id, expected, namespace=None):
+            """
+            Compare the counter against an actual COUNT(*)
+            """
+
+            filters = {'read': False, 'namespace': namespace}
+
+            with self.assertNumQueries(1) as ctx:
+                self.assertEqual(self.provider.get_num_notifications_for_user(user_id, filters=filters), expected)
+
+            self.assertIn('usernotificationcounter', ctx.captured_queries[0]['sql'])
+
+            # an additional filter makes us go to the actual notifications
+            filters['type_name'] = msg_type.name
+            self.assertEqual(self.provider.get_num_notifications_for_user(user_id, filters=filters), expected)
+
+        user_msg = self.provider.save_user_notification(UserNotification(user_id=1, msg=msgs[0]))
+        self.provider.bulk_create_user_notification([
+            UserNotification(user_id=1, msg=msgs[1]),
+            UserNotification(user_id=1, msg=msgs[2]),
+            UserNotification(user_id=1, msg=msgs[3]),
+            UserNotification(user_id=2, msg=msgs[2]),
+        ])
+        self.provider.bulk_create_user_notifications_for_message(msgs[3].id, [2, 3])
+
+        _assert_unread(1, 4)
+        _assert_unread(1, 2, namespace='namespace1')
+        _assert_unread(1, 1, namespace='namespace2')
+        _assert_unread(2, 2)
+        _assert_unread(3, 1)
+        _assert_unread(3, 0, namespace='namespace1')
+        _assert_unread(4, 0)
+
+        # read and unread a single notification
+        user_msg.read_at = datetime.now(pytz.UTC)
+        self.provider.save_user_notification(user_msg)
+        _assert_unread(1, 3)
+        _assert_unread(1, 1, namespace='namespace1')
+
+        user_msg.read_at = None
+        self.provider.save_user_notification(user_msg)
+        _assert_unread(1, 4)
+        _assert_unread(1, 2, namespace='namespace1')
+
+        # mark all as read in a namespace, then everything
+        self.provider.mark_user_notifications_read(1, filters={'namespace': 'namespace1'})
+        _assert_unread(1, 2)
+        _assert_unread(1, 0, namespace='namespace1')
+        _assert_unread(1, 1, namespace='namespace2')
+
+        self.provider.mark_user_notifications_read(1)
+        _assert_unread(1, 0)
+        _assert_unread(1, 0, namespace='namespace2')
+
+        # purge the unread notifications
+        self.provider.purge_expired_notifications(
+            purge_unread_messages_older_than=datetime.now(pytz.UTC) + timedelta(days=1)
+        )
+        _assert_unread(2, 0)
+        _assert_unread(2, 0, namespace='namespace2')
+
+        # without counters, we always go to the notifications
+        with mock.patch('edx_notifications.const.NOTIFICATION_UNREAD_COUNTERS_ENABLED', False):
+            self.provider.save_user_notification(UserNotification(user_id=4, msg=msgs[0]))
+            self.assertEqual(self.provider.get_num_notifications_for_user(4, filters={'read': False}), 1)
+
+        # ... which leaves the counters out of sync, until they are rebuilt
+        self.assertEqual(self.provider.get_num_notifications_for_user(4, filters={'read': False}), 0)
+
+        # users 1-3 keep their (zeroed) counters across all namespaces
+        self.assertEqual(self.provider.rebuild_unread_notification_counters(), 5)
+        _assert_unread(4, 1)
+        _assert_unread(4, 1, namespace='namespace1')
+
+    def test_rebuild_counters_empty_namespace(self):
+        """
+        Notifications with an empty namespace only count towards the
+        counter across all namespaces, which is keyed by the empty namespace
+        """
+
+        msg_type = self._save_notification_type()
+
+        for namespace in ('', None, 'namespace1'):
+            msg = self.provider.save_notification_message(
+                NotificationMessage(namespace=namespace, msg_type=msg_type, payload={'foo': 'bar'})
+            )
+            self.provider.save_user_notification(UserNotification(user_id=1, msg=msg))
+
+        self.assertEqual(self.provider.rebuild_unread_notification_counters(user_ids=[1]), 2)
+        self.assertEqual(self.provider.get_num_notifications_for_user(1, filters={'read': False}), 3)
+        self.assertEqual(
+            self.provider.get_num_notifications_for_user(1, filters={'read': False, 'namespace': 'namespace1'}),
+            1
+        )
+
+        # which is what marking notifications as read by msg_ids falls back to
+        self.provider.mark_user_notifications_read_by_msg_ids(1, [msg.id])
+        self.assertEqual(self.provider.get_num_notifications_for_user(1, filters={'read': False}), 2)
+
+    def test_mark_read_by_msg_ids(self):
+        """
+        Make sure we can flip the read state of a list of notifications in one go
+        """
+
+        msg_type = self._save_notification_type()
+
+        msgs = [
+            self.provider.save_notification_message(NotificationMessage(
+                namespace=namespace,
+                msg_type=msg_type,
+                payload={
+                    'foo': 'bar'
+                }
+            ))
+            for namespace in ('namespace1', 'namespace1', 'namespace2')
+        ]
+        msg_ids = [msg.id for msg in msgs]
+
+        self.provider.bulk_create_user_notifications_for_message(msgs[0].id, [1, 2])
+        self.provider.bulk_create_user_notifications_for_message(msgs[1].id, [1])
+        self.provider.bulk_create_user_notifications_for_message(msgs[2].id, [1])
+
+        def _num_unread(user_id, namespace=None):
+            """
+            Helper to get the (counted) number of unread notifications
+            """
+            return self.provider.get_num_notifications_for_user(
+                user_id,
+                filters={'read': False, 'namespace': namespace}
+            )
+
+        # one query to group by namespace, the UPDATE, plus one per namespace for the counters
+        with self.assertNumQueries(3):
+            self.assertEqual(self.provider.mark_user_notifications_read_by_msg_ids(1, msg_ids[:2]), 2)
+
+        self.assertEqual(_num_unread(1), 1)
+        self.assertEqual(_num_unread(1, namespace='namespace1'), 0)
+        self.assertEqual(_num_unread(2), 1)
+
+        # notifications already in that state - or that do not exist - are left alone
+        with self.assertNumQueries(1):
+            self.assertEqual(self.provider.mark_user_notifications_read_by_msg_ids(1, msg_ids[:2] + [9999]), 0)
+
+        self.assertEqual(self.provider.mark_user_notifications_read_by_msg_ids(1, msg_ids), 1)
+        self.assertEqual(_num_unread(1), 0)
+
+        self.assertEqual(self.provider.mark_user_notifications_read_by_msg_ids(1, msg_ids[1:], read=False), 2)
+        self.assertEqual(_num_unread(1), 2)
+        self.assertEqual(_num_unread(1, namespace='namespace1'), 1)
+        self.assertEqual(_num_unread(1, namespace='namespace2'), 1)
+
+        notifications = self.provider.get_notifications_for_user(1)
+        self.assertEqual([user_msg.read_at is None for user_msg in notifications], [True, True, False])
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.provider.mark_user_notifications_read_by_msg_ids(1, []), 0)
+
+        # without the counters, it is just the UPDATE
+        with mock.patch('edx_notifications.const.NOTIFICATION_UNREAD_COUNTERS_ENABLED', False):
+            with self.assertNumQueries(1):
+                self.assertEqual(self.provider.mark_user_notifications_read_by_msg_ids(2, msg_ids), 1)
+
+        with self.assertRaises(BulkOperationTooLarge):
+            self.provider.mark_user_notifications_read_by_msg_ids(
+                1,
+                range(1, const.NOTIFICATION_MAX_LIST_SIZE + 2)
+            )
+
+    def test_mark_read_by_msg_ids_race(self):
+        """
+        If the notifications change between us counting them and flipping them,
+        the counters are recounted
+        """
+
+        msg_type = self._save_notification_type()
+        msg = self.provider.save_notification_message(NotificationMessage(
+            namespace='namespace1',
+            msg_type=msg_type,
+            payload={'foo': 'bar'}
+        ))
+        self.provider.bulk_create_user_notifications_for_message(msg.id, [1])
+
+        with mock.patch('django.db.models.query.QuerySet.update', return_value=0):
+            self.assertEqual(self.provider.mark_user_notifications_read_by_msg_ids(1, [msg.id]), 0)
+
+        self.assertEqual(self.provider.get_num_notifications_for_user(1, filters={'read': False}), 1)
+
     def test_mark_read_namespaced(self):
         """
         Test user notification has been marked as read in namespace
@@ -339,6 +598,73 @@ class TestSQLStoreProvider(TestCase):
         self.assertEqual(msg.payload, fetched_msg.payload)
         self.assertEqual(msg.msg_type.name, fetched_msg.msg_type.name)
 
+        # unless the notification type comes from the registry, which is shared by all messages
+        load_notification_type_registry()
+        with self.assertNumQueries(1):
+            fetched_msg = self.provider.get_notification_message_by_id(
+                msg.id,
+                options={
+                    'select_related': False,
+                }
+            )
+
+        self.assertEqual(msg.msg_type, fetched_msg.msg_type)
+        self.assertIs(fetched_msg.msg_type, self.provider.get_notification_message_by_id(msg.id).msg_type)
+
+    def test_load_notifications_by_ids(self):
+        """
+        Fetch a number of notifications in one go
+        """
+
+        msg1 = self._save_new_notification()
+        msg2 = self._save_new_notification()
+
+        with self.assertNumQueries(1):
+            msgs = self.provider.get_notification_messages_by_ids([msg1.id, msg2.id, 0])
+
+        self.assertEqual(msgs, {msg1.id: msg1, msg2.id: msg2})
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.provider.get_notification_messages_by_ids([]), {})
+
+        # messages don't get cached by default
+        with self.assertNumQueries(1):
+            self.provider.get_notification_messages_by_ids([msg1.id])
+
+    def test_cached_notifications_by_ids(self):
+        """
+        Make sure messages get served from the LRU cache, if there is one
+        """
+
+        provider = SQLNotificationStoreProvider(MAX_MSG_CACHE_SIZE=10)
+        msg1 = self._save_new_notification()
+        msg2 = self._save_new_notification()
+
+        with self.assertNumQueries(1):
+            self.assertEqual(provider.get_notification_messages_by_ids([msg1.id]), {msg1.id: msg1})
+
+        # only the message which we haven't seen before gets fetched
+        with self.assertNumQueries(1):
+            msgs = provider.get_notification_messages_by_ids([msg1.id, msg2.id])
+
+        self.assertEqual(msgs, {msg1.id: msg1, msg2.id: msg2})
+
+        with self.assertNumQueries(0):
+            msgs = provider.get_notification_messages_by_ids([msg1.id, msg2.id])
+            self.assertEqual(provider.get_notification_message_by_id(msg2.id), msg2)
+
+        # what we hand out are copies
+        msgs[msg1.id].payload['foo'] = 'changed'
+        self.assertEqual(provider.get_notification_message_by_id(msg1.id).payload['foo'], 'bar')
+
+        # updating a message evicts it from the cache
+        msg1.namespace = 'changed'
+        provider.save_notification_message(msg1)
+        self.assertEqual(provider.get_notification_message_by_id(msg1.id).namespace, 'changed')
+
+        with self.assertRaises(ItemNotFoundError):
+            provider.get_notification_message_by_id(0)
+
     def test_load_nonexisting_notification(self):
         """
         Negative testing when trying to load a notification that does not exist
@@ -363,8 +689,20 @@ class TestSQLStoreProvider(TestCase):
         Negative test for loading notification type
         """
 
-        with self.assertRaises(ItemNotFoundError):
-            self.provider.get_notification_type('non-existing')
+        load_notification_type_registry()
+
+        # only the one row gets looked up, rather than the registry being reloaded
+        with self.assertNumQueries(1):
+            with self.assertRaises(ItemNotFoundError):
+                self.provider.get_notification_type('non-existing')
+
+        # whereas types the registry doesn't know about yet make it reload
+        SQLNotificationType.objects.create(name='foo.bar.baz', renderer='foo.renderer')
+        with self.assertNumQueries(2):
+            self.assertEqual(self.provider.get_notification_type('foo.bar.baz').renderer, 'foo.renderer')
+
+        with self.assertNumQueries(0):
+            self.provider.get_notification_type('foo.bar.baz')
 
     def test_update_notification_type(self):
         """
@@ -379,11 +717,22 @@ class TestSQLStoreProvider(TestCase):
         with self.assertNumQueries(3):
             self.provider.save_notification_type(notification_type)
 
-        # This should be fine saving again, since nothing is changing
+        # This should be fine saving again, since nothing is changing,
+        # and nothing gets written
+
+        with self.assertNumQueries(1):
+            self.provider.save_notification_type(notification_type)
+
+        # whereas changes are written, and make it into the registry
+        load_notification_type_registry()
+        notification_type.renderer_context = {'foo': 'bar'}
 
         with self.assertNumQueries(2):
             self.provider.save_notification_type(notification_type)
 
+        with self.assertNumQueries(0):
+            self.assertEqual(self.provider.get_notification_type(notification_type.name), notification_type)
+
     def test_get_no_notifications_for_user(self):
         """
         Make sure that get_num_notifications_for_user and get_notifications_for_user
@@ -489,6 +838,58 @@ class TestSQLStoreProvider(TestCase):
 
         return map1, msg1, map2, msg2
 
+    def test_get_notifications_change_token(self):
+        """
+        Make sure the change token changes whenever the user's notifications do
+        """
+
+        with self.assertNumQueries(1):
+            tokens = [self.provider.get_notifications_change_token(self.test_user_id)]
+
+        map1, msg1, __, __ = self._setup_user_notifications()
+        msg3 = self.provider.save_notification_message(NotificationMessage(
+            namespace=msg1.namespace,
+            msg_type=msg1.msg_type,
+            payload={'foo': 'bar'}
+        ))
+        tokens.append(self.provider.get_notifications_change_token(self.test_user_id))
+
+        # nothing changed
+        self.assertEqual(self.provider.get_notifications_change_token(self.test_user_id), tokens[-1])
+
+        map1.read_at = datetime.now(pytz.UTC)
+        self.provider.save_user_notification(map1)
+        tokens.append(self.provider.get_notifications_change_token(self.test_user_id))
+
+        self.provider.mark_user_notifications_read(self.test_user_id)
+        tokens.append(self.provider.get_notifications_change_token(self.test_user_id))
+
+        self.provider.save_user_notification(UserNotification(user_id=self.test_user_id, msg=msg3))
+        tokens.append(self.provider.get_notifications_change_token(self.test_user_id))
+
+        # changes which leave the unread counts alone
+        map1 = self.provider.get_notification_for_user(self.test_user_id, msg1.id)
+        map1.user_context = {'foo': 'bar'}
+        self.provider.save_user_notification(map1)
+        tokens.append(self.provider.get_notifications_change_token(self.test_user_id))
+
+        self.provider.purge_expired_notifications(
+            purge_read_messages_older_than=datetime.now(pytz.UTC) + timedelta(days=1)
+        )
+        tokens.append(self.provider.get_notifications_change_token(self.test_user_id))
+
+        # a recount does not take the token back to what it was before
+        self.provider.rebuild_unread_notification_counters()
+        tokens.append(self.provider.get_notifications_change_token(self.test_user_id))
+
+        self.assertEqual(len(set(tokens)), len(tokens))
+
+        # other users are not affected
+        self.assertEqual(
+            self.provider.get_notifications_change_token(self.test_user_id + 1),
+            tokens[0]
+        )
+
     def test_get_notifications_for_user(self):
         """
         Test retrieving notifications for a user
@@ -729,6 +1130,7 @@ class TestSQLStoreProvider(TestCase):
         # mark one as read
         map1.read_at = datetime.utcnow()
 
+        # save only the read_at column and decrement the unread counters
         with self.assertNumQueries(2):
             self.provider.save_user_notification(map1)
 
@@ -836,6 +1238,96 @@ class TestSQLStoreProvider(TestCase):
             # most recent one should be first, so msg1 should be 2nd
             self.assertEqual(notifications[0].msg, msg1)
 
+    def test_get_notifications_keyset_paging(self):
+        """
+        Page through a user's notifications with a cursor, rather than an offset
+        """
+
+        msg_type = self._save_notification_type()
+
+        # notifications which are created at the exact same time should
+        # neither get skipped over nor returned twice
+        with freeze_time('2026-01-01 00:00:00'):
+            for __ in range(4):
+                msg = self.provider.save_notification_message(NotificationMessage(msg_type=msg_type, payload={'foo': 'bar'}))
+                self.provider.save_user_notification(UserNotification(user_id=self.test_user_id, msg=msg))
+
+        for __ in range(4):
+            msg = self.provider.save_notification_message(NotificationMessage(msg_type=msg_type, payload={'foo': 'bar'}))
+            self.provider.save_user_notification(UserNotification(user_id=self.test_user_id, msg=msg))
+
+        expected = self.provider.get_notifications_for_user(self.test_user_id)
+        self.assertEqual(len(expected), 8)
+
+        results = []
+        options = {'limit': 3}
+        while True:
+            with self.assertNumQueries(1):
+                page = self.provider.get_notifications_for_user(self.test_user_id, options=options)
+
+            results.extend(page)
+            if len(page) < 3:
+                break
+
+            options = {'limit': 3, 'before': encode_notification_cursor(page[-1])}
+
+        self.assertEqual([item.id for item in results], [item.id for item in expected])
+
+        with self.assertRaises(ValueError):
+            self.provider.get_notifications_for_user(
+                self.test_user_id,
+                options={'offset': 1, 'before': encode_notification_cursor(expected[0])}
+            )
+
+        with self.assertRaises(ValueError):
+            self.provider.get_notifications_for_user(self.test_user_id, options={'before': 'not-a-cursor'})
+
+    def test_get_notification_dicts(self):
+        """
+        Make sure the projection of the notifications matches the fields of the
+        data objects exactly, and that it doesn't join in the notification types
+        """
+
+        map1, __, __, __ = self._setup_user_notifications()
+
+        map1.read_at = datetime.now(pytz.UTC)
+        map1.user_context = {'foo': 'bar', 'when': datetime.now(pytz.UTC)}
+        self.provider.save_user_notification(map1)
+
+        # the notification types come from the registry, which is only loaded the first time around
+        with self.assertNumQueries(2):
+            self.assertEqual(len(self.provider.get_notification_dicts_for_user(self.test_user_id)), 2)
+
+        for filters, options in [
+                (None, None),
+                ({'read': False}, None),
+                ({'namespace': 'namespace2'}, None),
+                ({'type_name': map1.msg.msg_type.name}, None),
+                (None, {'limit': 1}),
+                (None, {'limit': 1, 'offset': 1}),
+                (None, {'limit': 1, 'before': encode_notification_cursor(map1)}),
+        ]:
+            expected = [
+                user_msg.get_fields()
+                for user_msg in self.provider.get_notifications_for_user(
+                    self.test_user_id,
+                    filters=filters,
+                    options=options
+                )
+            ]
+
+            with self.assertNumQueries(1):
+                result = self.provider.get_notification_dicts_for_user(
+                    self.test_user_id,
+                    filters=filters,
+                    options=options
+                )
+
+            self.assertEqual(result, expected)
+
+        with self.assertRaises(ValueError):
+            self.provider.get_notification_dicts_for_user(self.test_user_id, options={'before': 'not-a-cursor'})
+
     def test_bulk_user_notification_create(self):
         """
         Test that we can create new UserNotifications using an optimized
@@ -865,8 +1357,8 @@ class TestSQLStoreProvider(TestCase):
             )
 
         # assert that this only takes one round-trip to the database
-        # to insert all of them
-        with self.assertNumQueries(1):
+        # to insert all of them, plus two to bump their unread counters
+        with self.assertNumQueries(3):
             self.provider.bulk_create_user_notification(user_msgs)
 
         # now make sure that we can query each one
@@ -884,50 +1376,242 @@ class TestSQLStoreProvider(TestCase):
         with self.assertRaises(BulkOperationTooLarge):
             self.provider.bulk_create_user_notification(user_msgs)
 
-    def test_save_timer(self):
+    def test_bulk_create_user_notifications_for_message(self):
         """
-        Save, update, and get a simple timer object
+        Test that we can stream a fan-out of an already saved message
+        to a large number of users in just a few round trips
         """
 
-        timer = NotificationCallbackTimer(
-            name='timer1',
-            callback_at=datetime.now(pytz.UTC) - timedelta(0, 1),
-            class_name='foo.bar',
-            context={
-                'one': 'two'
-            },
-            is_active=True,
-            periodicity_min=120,
-        )
-        timer_saved = self.provider.save_notification_timer(timer)
+        msg_type = self._save_notification_type()
 
-        timer_executed = NotificationCallbackTimer(
-            name='timer2',
-            callback_at=datetime.now(pytz.UTC) - timedelta(0, 2),
-            class_name='foo.bar',
-            context={
-                'one': 'two'
-            },
-            is_active=True,
-            periodicity_min=120,
-            executed_at=datetime.now(pytz.UTC),
-            err_msg='ooops',
-        )
-        timer_executed_saved = self.provider.save_notification_timer(timer_executed)
+        msg = self.provider.save_notification_message(NotificationMessage(
+            namespace='namespace1',
+            msg_type=msg_type,
+            payload={
+                'foo': 'bar',
+            }
+        ))
 
-        timer_read = self.provider.get_notification_timer(timer_saved.name)
-        self.assertEqual(timer_saved, timer_read)
-        self.assertTrue(isinstance(timer_read.context, dict))
+        def _user_id_generator():
+            """
+            Spit out more user_ids than fit into a single chunk
+            """
+            yield from range(1, const.NOTIFICATION_BULK_PUBLISH_CHUNK_SIZE * 3 + 1)
 
-        timer_executed_read = self.provider.get_notification_timer(timer_executed_saved.name)
-        self.assertEqual(timer_executed_saved, timer_executed_read)
+        num_created = self.provider.bulk_create_user_notifications_for_message(msg.id, _user_id_generator())
+        self.assertEqual(num_created, const.NOTIFICATION_BULK_PUBLISH_CHUNK_SIZE * 3)
 
-        timers_not_executed = self.provider.get_all_active_timers()
-        self.assertEqual(len(timers_not_executed), 1)
+        for user_id in (1, const.NOTIFICATION_BULK_PUBLISH_CHUNK_SIZE * 3):
+            notifications = self.provider.get_notifications_for_user(user_id)
+
+            self.assertEqual(len(notifications), 1)
+            self.assertEqual(notifications[0].msg, msg)
+            self.assertIsNone(notifications[0].read_at)
+            self.assertIsNotNone(notifications[0].created)
+
+        # one lookup of the message's namespace, then per batch one multi-row INSERT
+        # plus an INSERT and an UPDATE of the unread counters
+        with mock.patch('edx_notifications.const.NOTIFICATION_BULK_INSERT_BATCH_SIZE', 10):
+            with self.assertNumQueries(10):
+                num_created = self.provider.bulk_create_user_notifications_for_message(
+                    msg.id,
+                    range(10000, 10025)
+                )
+
+        self.assertEqual(num_created, 25)
+
+        # nothing to do
+        with self.assertNumQueries(0):
+            self.assertEqual(self.provider.bulk_create_user_notifications_for_message(msg.id, []), 0)
+
+    def test_bulk_create_user_notifications_for_messages(self):
+        """
+        Test that we can fan out several messages to the same users in one pass
+        """
+
+        msg_type = self._save_notification_type()
+
+        msgs = [
+            self.provider.save_notification_message(NotificationMessage(
+                namespace=namespace,
+                msg_type=msg_type,
+                payload={
+                    'foo': 'bar'
+                }
+            ))
+            for namespace in ('namespace1', 'namespace1', 'namespace2')
+        ]
+        msg_ids = [msg.id for msg in msgs]
+
+        # one lookup of the messages' namespaces, then per batch one multi-row INSERT plus an
+        # INSERT and an UPDATE of the unread counters for each namespace/count combination
+        with mock.patch('edx_notifications.const.NOTIFICATION_BULK_INSERT_BATCH_SIZE', 6):
+            with self.assertNumQueries(6):
+                num_created = self.provider.bulk_create_user_notifications_for_messages(
+                    msg_ids,
+                    (user_id for user_id in (1, 2))
+                )
+
+        self.assertEqual(num_created, 6)
+
+        for user_id in (1, 2):
+            notifications = self.provider.get_notifications_for_user(user_id)
+            self.assertEqual(sorted(user_msg.msg.id for user_msg in notifications), sorted(msg_ids))
+
+            self.assertEqual(
+                self.provider.get_num_notifications_for_user(user_id, filters={'read': False}),
+                3
+            )
+            self.assertEqual(
+                self.provider.get_num_notifications_for_user(
+                    user_id,
+                    filters={'read': False, 'namespace': 'namespace1'}
+                ),
+                2
+            )
+
+        # all of the messages need to exist
+        with self.assertRaises(ItemNotFoundError):
+            self.provider.bulk_create_user_notifications_for_messages([msgs[0].id, 9999], [3])
+
+        self.assertEqual(self.provider.get_num_notifications_for_user(3), 0)
+
+    def test_save_timer(self):
+        """
+        Save, update, and get a simple timer object
+        """
+
+        timer = NotificationCallbackTimer(
+            name='timer1',
+            callback_at=datetime.now(pytz.UTC) - timedelta(0, 1),
+            class_name='foo.bar',
+            context={
+                'one': 'two'
+            },
+            is_active=True,
+            periodicity_min=120,
+        )
+        timer_saved = self.provider.save_notification_timer(timer)
+
+        timer_executed = NotificationCallbackTimer(
+            name='timer2',
+            callback_at=datetime.now(pytz.UTC) - timedelta(0, 2),
+            class_name='foo.bar',
+            context={
+                'one': 'two'
+            },
+            is_active=True,
+            periodicity_min=120,
+            executed_at=datetime.now(pytz.UTC),
+            err_msg='ooops',
+        )
+        timer_executed_saved = self.provider.save_notification_timer(timer_executed)
+
+        timer_read = self.provider.get_notification_timer(timer_saved.name)
+        self.assertEqual(timer_saved, timer_read)
+        self.assertTrue(isinstance(timer_read.context, dict))
+
+        timer_executed_read = self.provider.get_notification_timer(timer_executed_saved.name)
+        self.assertEqual(timer_executed_saved, timer_executed_read)
+
+        timers_not_executed = self.provider.get_all_active_timers()
+        self.assertEqual(len(timers_not_executed), 1)
 
         timers_incl_executed = self.provider.get_all_active_timers(include_executed=True)
         self.assertEqual(len(timers_incl_executed), 2)
 
+    def test_partial_user_notification_updates(self):
+        """
+        User notifications which have been read from the store only get the
+        columns written which have been changed, without reading the row first
+        """
+
+        map1, __, __, __ = self._setup_user_notifications()
+
+        # nothing has changed, so nothing gets written
+        with self.assertNumQueries(0):
+            self.assertEqual(self.provider.save_user_notification(map1), map1)
+
+        # the UPDATE of the row, plus the one that bumps the version of the user's notifications
+        map1.user_context = {'foo': 'bar'}
+        with self.assertNumQueries(2):
+            self.provider.save_user_notification(map1)
+
+        self.assertEqual(self.provider.get_num_notifications_for_user(self.test_user_id, filters={'read': False}), 2)
+
+        # flipping the read state also touches the unread counters
+        map1.read_at = datetime.now(pytz.UTC)
+        with self.assertNumQueries(2):
+            self.provider.save_user_notification(map1)
+
+        self.assertEqual(self.provider.get_num_notifications_for_user(self.test_user_id, filters={'read': False}), 1)
+
+        # whereas re-reading a read notification does not, it only bumps the version
+        map1.read_at = datetime.now(pytz.UTC)
+        with self.assertNumQueries(3):
+            self.provider.save_user_notification(map1)
+
+        self.assertEqual(self.provider.get_num_notifications_for_user(self.test_user_id, filters={'read': False}), 1)
+
+        map1.read_at = None
+        self.provider.save_user_notification(map1)
+        self.assertEqual(self.provider.get_num_notifications_for_user(self.test_user_id, filters={'read': False}), 2)
+
+        notification = self.provider.get_notification_for_user(self.test_user_id, map1.msg.id)
+        self.assertEqual(notification, map1)
+        self.assertEqual(notification.user_context, {'foo': 'bar'})
+
+        SQLUserNotification.objects.filter(id=map1.id).delete()
+        map1.read_at = datetime.now(pytz.UTC)
+        with self.assertRaises(ItemNotFoundError):
+            self.provider.save_user_notification(map1)
+
+    def test_partial_timer_updates(self):
+        """
+        Timers which have been read from the store get updated in a single statement
+        """
+
+        self.provider.save_notification_timer(NotificationCallbackTimer(
+            name='timer1',
+            callback_at=datetime.now(pytz.UTC) - timedelta(0, 1),
+            class_name='foo.bar',
+            context={
+                'one': 'two'
+            },
+            is_active=True,
+        ))
+
+        timer = self.provider.get_all_active_timers()[0]
+
+        timer.executed_at = datetime.now(pytz.UTC)
+        timer.context['three'] = 'four'
+        with self.assertNumQueries(1):
+            self.provider.save_notification_timer(timer)
+
+        timer_read = self.provider.get_notification_timer('timer1')
+        self.assertEqual(timer_read, timer)
+        self.assertEqual(timer_read.context, {'one': 'two', 'three': 'four'})
+        self.assertEqual(self.provider.get_all_active_timers(), [])
+
+    def test_partial_user_preference_updates(self):
+        """
+        User preferences which have been read from the store get updated in a single statement
+        """
+
+        self._save_user_notification_preference(
+            number_of_queries=2,
+            preference_name='test_preference',
+            user_id=1,
+            value='foo'
+        )
+
+        user_preference = self.provider.get_user_preference(1, 'test_preference')
+        user_preference.value = 'bar'
+        with self.assertNumQueries(1):
+            self.provider.set_user_preference(user_preference)
+
+        self.assertEqual(self.provider.get_user_preference(1, 'test_preference').value, 'bar')
+
     def test_save_update_time(self):
         """
         Verify the update case of saving a timer
@@ -989,12 +1673,296 @@ class TestSQLStoreProvider(TestCase):
         with self.assertRaises(ItemNotFoundError):
             self.provider.get_notification_timer('foo')
 
+    def _save_due_timers(self, num_timers):
+        """
+        Helper to save timers which were due, one minute apart
+        """
+
+        now = datetime.now(pytz.UTC)
+        return [
+            self.provider.save_notification_timer(
+                NotificationCallbackTimer(
+                    name=f'timer{idx}',
+                    class_name='foo.bar',
+                    callback_at=now - timedelta(minutes=num_timers - idx),
+                    context={},
+                    is_active=True
+                )
+            )
+            for idx in range(num_timers)
+        ]
+
+    def test_claim_due_timers(self):
+        """
+        Make sure timers are handed out to one worker at a time, and handed
+        out again once the worker's lease has run out
+        """
+
+        timers = self._save_due_timers(3)
+
+        # timers which aren't due yet, or not active, aren't handed out
+        self.provider.save_notification_timer(
+            NotificationCallbackTimer(
+                name='future',
+                class_name='foo.bar',
+                callback_at=datetime.now(pytz.UTC) + timedelta(days=1),
+                is_active=True
+            )
+        )
+        self.provider.save_notification_timer(
+            NotificationCallbackTimer(
+                name='inactive',
+                class_name='foo.bar',
+                callback_at=datetime.now(pytz.UTC) - timedelta(days=1),
+                is_active=False
+            )
+        )
+
+        claimed = self.provider.claim_due_notification_timers('worker1', 60, max_timers=2)
+        self.assertEqual([timer.name for timer in claimed], [timers[0].name, timers[1].name])
+        self.assertEqual({timer.worker_id for timer in claimed}, {'worker1'})
+        self.assertTrue(all(timer.executed_at and timer.lease_expires_at for timer in claimed))
+
+        # another worker gets what is left
+        claimed2 = self.provider.claim_due_notification_timers('worker2', 600)
+        self.assertEqual([timer.name for timer in claimed2], [timers[2].name])
+        self.assertEqual(self.provider.claim_due_notification_timers('worker2', 60), [])
+
+        # worker1 finishes one timer, and crashes on the other
+        claimed[0].worker_id = None
+        claimed[0].lease_expires_at = None
+        self.provider.save_notification_timer(claimed[0])
+
+        with freeze_time(datetime.now(pytz.UTC) + timedelta(seconds=61)):
+            reclaimed = self.provider.claim_due_notification_timers('worker2', 60)
+
+        self.assertEqual([timer.name for timer in reclaimed], [timers[1].name])
+        self.assertEqual(reclaimed[0].worker_id, 'worker2')
+
+    def test_claim_due_timers_skip_locked(self):
+        """
+        Make sure we lock the candidates rather than claim them one by one,
+        where the database supports it
+        """
+
+        self._save_due_timers(3)
+
+        features = connection.features
+        with mock.patch.object(features, 'has_select_for_update_skip_locked', True):
+            with CaptureQueriesContext(connection) as queries:
+                claimed = self.provider.claim_due_notification_timers('worker1', 60)
+
+        self.assertEqual(len(claimed), 3)
+        self.assertEqual(len([query for query in queries if query['sql'].startswith('UPDATE')]), 1)
+
+    def test_claim_due_timers_by_class(self):
+        """
+        Make sure timers can be left out, and handed out by priority, by their class_name
+        """
+
+        timers = self._save_due_timers(3)
+        timers[2].class_name = 'foo.urgent'
+        self.provider.save_notification_timer(timers[2])
+
+        claimed = self.provider.claim_due_notification_timers(
+            'worker1',
+            60,
+            max_timers=2,
+            priorities={'foo.urgent': 1}
+        )
+        self.assertEqual([timer.name for timer in claimed], [timers[2].name, timers[0].name])
+
+        self.assertEqual(
+            self.provider.claim_due_notification_timers('worker1', 60, exclude_class_names=['foo.bar']),
+            []
+        )
+
+    def test_iter_active_timers(self):
+        """
+        Make sure we can stream through the due timers in order, in batches
+        """
+
+        timers = self._save_due_timers(4)
+        timers[3].is_active = False
+        self.provider.save_notification_timer(timers[3])
+
+        # with the same callback_at, timers are ordered by name
+        self.provider.save_notification_timer(
+            NotificationCallbackTimer(
+                name='timer2a',
+                class_name='foo.bar',
+                callback_at=timers[2].callback_at,
+                is_active=True
+            )
+        )
+
+        # the last batch comes back empty
+        with self.assertNumQueries(3):
+            self.assertEqual(
+                [timer.name for timer in self.provider.iter_active_timers(batch_size=2)],
+                ['timer0', 'timer1', 'timer2', 'timer2a']
+            )
+
+        self.assertEqual(
+            [timer.name for timer in self.provider.iter_active_timers(after=(timers[2].callback_at, 'timer2'))],
+            ['timer2a']
+        )
+
+        self.assertEqual(len(self.provider.get_all_active_timers()), 4)
+
+    def test_archive_timers(self):
+        """
+        Make sure that only the timers which are done with get archived
+        """
+
+        now = datetime.now(pytz.UTC)
+        timers = self._save_due_timers(5)
+
+        # timer0 stays due, timer1 has been executed, timer2 is periodic, timer3 has been
+        # cancelled and timer4 is still being executed
+        timers[1].executed_at = now
+        timers[2].executed_at = now
+        timers[2].periodicity_min = 60
+        timers[3].is_active = False
+        timers[4].executed_at = now
+        timers[4].lease_expires_at = now + timedelta(minutes=1)
+        for timer in timers[1:]:
+            self.provider.save_notification_timer(timer)
+
+        self.assertEqual(self.provider.archive_notification_timers(now - timedelta(days=1)), 0)
+
+        with mock.patch.object(const, 'NOTIFICATION_PURGE_BATCH_SIZE', 1):
+            self.assertEqual(self.provider.archive_notification_timers(now + timedelta(seconds=1)), 2)
+
+        self.assertEqual(
+            sorted(SQLNotificationCallbackTimer.objects.values_list('name', flat=True)),
+            ['timer0', 'timer2', 'timer4']
+        )
+
+        archived = SQLNotificationCallbackTimerArchive.objects.order_by('name')
+        self.assertEqual([obj.name for obj in archived], ['timer1', 'timer3'])
+        self.assertEqual(archived[0].executed_at, now)
+        self.assertFalse(archived[1].is_active)
+
+        # names can be used again, and archived again
+        self.provider.save_notification_timer(
+            NotificationCallbackTimer(name='timer1', class_name='foo.bar', callback_at=now, is_active=False)
+        )
+        self.assertEqual(self.provider.archive_notification_timers(now + timedelta(seconds=1)), 1)
+        self.assertEqual(SQLNotificationCallbackTimerArchive.objects.filter(name='timer1').count(), 2)
+
+    def test_timer_schedule(self):
+        """
+        Make sure we know when each timer is next claimable
+        """
+
+        timers = self._save_due_timers(3)
+        self.provider.save_notification_timer(
+            NotificationCallbackTimer(
+                name='inactive',
+                class_name='foo.bar',
+                callback_at=datetime.now(pytz.UTC),
+                is_active=False
+            )
+        )
+
+        before = datetime.now(pytz.UTC)
+        self.assertEqual(
+            self.provider.get_notification_timer_schedule(),
+            {timer.name: timer.callback_at for timer in timers}
+        )
+
+        claimed = self.provider.claim_due_notification_timers('worker1', 60, max_timers=2)
+
+        # the first timer is done, the second one is still running
+        claimed[0].worker_id = None
+        claimed[0].lease_expires_at = None
+        self.provider.save_notification_timer(claimed[0])
+
+        with self.assertNumQueries(1):
+            schedule = self.provider.get_notification_timer_schedule(modified_since=before)
+
+        self.assertEqual(
+            schedule,
+            {
+                timers[0].name: None,
+                timers[1].name: claimed[1].lease_expires_at,
+            }
+        )
+
+    def test_fanout_jobs(self):
+        """
+        Save, update, claim and checkpoint fan-out jobs
+        """
+
+        msg = self._save_new_notification()
+
+        with self.assertNumQueries(1):
+            self.assertIsNone(self.provider.claim_notification_fanout_job('worker1', 60))
+
+        job = self.provider.save_notification_fanout_job(
+            NotificationFanoutJob(
+                msg_id=msg.id,
+                scope_name='list_scope',
+                scope_context={'range': 10},
+                context={'exclude_user_ids': [1, 2]}
+            )
+        )
+
+        self.assertIsNotNone(job.id)
+        self.assertEqual(job.status, const.NOTIFICATION_FANOUT_JOB_STATUS_PENDING)
+        self.assertEqual(job, self.provider.get_notification_fanout_job(job.id))
+
+        job.scope_context = {'range': 20}
+        job = self.provider.save_notification_fanout_job(job)
+        self.assertEqual(self.provider.get_notification_fanout_job(job.id).scope_context, {'range': 20})
+
+        with self.assertRaises(ItemNotFoundError):
+            self.provider.get_notification_fanout_job(job.id + 1)
+
+        with self.assertRaises(ItemNotFoundError):
+            self.provider.save_notification_fanout_job(NotificationFanoutJob(id=job.id + 1, msg_id=msg.id))
+
+        # select candidates, claim one and read it back
+        with self.assertNumQueries(3):
+            claimed = self.provider.claim_notification_fanout_job('worker1', 60)
+
+        self.assertEqual(claimed.id, job.id)
+        self.assertEqual(claimed.status, const.NOTIFICATION_FANOUT_JOB_STATUS_RUNNING)
+        self.assertEqual(claimed.worker_id, 'worker1')
+        self.assertEqual(claimed.attempts, 1)
+        self.assertEqual(claimed.context, {'exclude_user_ids': [1, 2]})
+
+        # no one else can claim it
+        self.assertIsNone(self.provider.claim_notification_fanout_job('worker2', 60))
+
+        claimed.num_processed = 5
+        with self.assertNumQueries(1):
+            self.provider.checkpoint_notification_fanout_job(claimed, 60)
+
+        self.assertEqual(self.provider.get_notification_fanout_job(job.id).num_processed, 5)
+
+        # let the lease run out, now someone else can take over
+        self.provider.checkpoint_notification_fanout_job(claimed, -1)
+        reclaimed = self.provider.claim_notification_fanout_job('worker2', 60)
+        self.assertEqual(reclaimed.worker_id, 'worker2')
+        self.assertEqual(reclaimed.attempts, 2)
+        self.assertEqual(reclaimed.num_processed, 5)
+
+        with self.assertRaises(FanoutJobLeaseExpired):
+            self.provider.checkpoint_notification_fanout_job(claimed, 60)
+
+        reclaimed.status = const.NOTIFICATION_FANOUT_JOB_STATUS_COMPLETED
+        reclaimed = self.provider.checkpoint_notification_fanout_job(reclaimed, 60)
+        self.assertIsNone(reclaimed.lease_expires_at)
+        self.assertIsNone(self.provider.claim_notification_fanout_job('worker3', 60))
+
     def test_save_notification_preference(self):
         """
         test save notification preference in the store provide.
         """
         notification_preference = self._save_notification_preference(
-            number_of_queries=3,
+            number_of_queries=2,
             name='test_notification_preference',
             display_name="Test Preference",
             display_description="This is the test preference"
@@ -1010,16 +1978,17 @@ class TestSQLStoreProvider(TestCase):
         """
         test update the saved notification preference
         """
-        with self.assertNumQueries(3):
+        with self.assertNumQueries(2):
             notification_preference = self._save_notification_preference(
-                number_of_queries=3,
+                number_of_queries=2,
                 name='test_notification_preference',
                 display_name="Test Preference",
                 display_description="This is the test preference"
             )
 
+        # only the display_name column gets written
         notification_preference.display_name = 'Updated Test Preference'
-        with self.assertNumQueries(2):
+        with self.assertNumQueries(1):
             notification_preference_saved_twice = self.provider.save_notification_preference(notification_preference)
 
         with self.assertNumQueries(1):
@@ -1033,14 +2002,14 @@ class TestSQLStoreProvider(TestCase):
         test to get all the user notification preferences.
         """
         test_notification_preference = self._save_notification_preference(
-            number_of_queries=3,
+            number_of_queries=2,
             name='test_notification_preference,',
             display_name="Test Preference",
             display_description="This is the test preference"
         )
 
         test2_notification_preference = self._save_notification_preference(
-            number_of_queries=3,
+            number_of_queries=2,
             name='notification_preference2',
             display_name="Test Preference 2",
             display_description="This is the second test preference"
@@ -1067,7 +2036,7 @@ class TestSQLStoreProvider(TestCase):
         test to get the saved the user preference.
         """
         user_notification_preference = self._save_user_notification_preference(
-            number_of_queries=3,
+            number_of_queries=2,
             preference_name='Test Preference 1',
             user_id=1,
             value='User Preference 1'
@@ -1084,7 +2053,7 @@ class TestSQLStoreProvider(TestCase):
         test to get the updated user preference
         """
         user_notification_preferences = self._save_user_notification_preference(
-            number_of_queries=3,
+            number_of_queries=2,
             preference_name='Test Preference 1',
             user_id=1,
             value='User Preference 1')
@@ -1117,7 +2086,7 @@ class TestSQLStoreProvider(TestCase):
         user_id = 1
         for i in range(5):
             self._save_user_notification_preference(
-                number_of_queries=3,
+                number_of_queries=2,
                 preference_name='test_preference{i}'.format(i=i + 1),
                 user_id=user_id,
                 value='User Preferences'
@@ -1131,7 +2100,7 @@ class TestSQLStoreProvider(TestCase):
         Test all user preferences with name
         """
         user_preference1 = self._save_user_notification_preference(
-            number_of_queries=3,
+            number_of_queries=2,
             preference_name='test_preference',
             user_id=1,
             value='User-Preferences'
@@ -1139,7 +2108,7 @@ class TestSQLStoreProvider(TestCase):
 
         # SQLNotificationPreference with this name already created above so one less query than user_preference1
         user_preference2 = self._save_user_notification_preference(
-            number_of_queries=2,
+            number_of_queries=1,
             preference_name='test_preference',
             user_id=2,
             value='User-Preferences'
@@ -1386,6 +2355,250 @@ class TestSQLStoreProvider(TestCase):
         self.assertEqual(archived_notification.msg_id, user_notification.msg.id)
         self.assertEqual(archived_notification.user_id, user_notification.user_id)
 
+    def _save_expired_notifications(self, num_notifications):
+        """
+        Helper to save read notifications, each with their own message, which are 7 days old
+        """
+
+        msg_type = self._save_notification_type()
+
+        user_msgs = []
+        with freeze_time(datetime.now(pytz.UTC) - timedelta(days=7)):
+            for __ in range(num_notifications):
+                msg = self.provider.save_notification_message(NotificationMessage(
+                    namespace='namespace1',
+                    msg_type=msg_type,
+                    payload={'foo': 'bar'}
+                ))
+                user_msgs.append(self.provider.save_user_notification(UserNotification(
+                    user_id=self.test_user_id,
+                    msg=msg,
+                    read_at=datetime.now(pytz.UTC)
+                )))
+
+        return user_msgs
+
+    @mock.patch('edx_notifications.const.NOTIFICATION_PURGE_BATCH_SIZE', 2)
+    @mock.patch('edx_notifications.const.NOTIFICATION_PURGE_BATCH_PAUSE_SECS', 0)
+    def test_purge_in_batches(self):
+        """
+        Make sure purging goes through the notifications in batches, checkpointing as it goes,
+        and deletes the messages which no one has been sent any more
+        """
+
+        user_msgs = self._save_expired_notifications(5)
+
+        # a message which has yet to be sent out is kept
+        with freeze_time(datetime.now(pytz.UTC) - timedelta(days=7)):
+            timed_msg = self.provider.save_notification_message(NotificationMessage(
+                msg_type=user_msgs[0].msg.msg_type,
+                payload={'foo': 'bar'},
+                deliver_no_earlier_than=datetime.now(pytz.UTC) + timedelta(days=30)
+            ))
+
+        checkpoints = []
+        self.provider.purge_expired_notifications(
+            purge_read_messages_older_than=datetime.now(pytz.UTC) - timedelta(days=6),
+            options={'on_checkpoint': checkpoints.append}
+        )
+
+        self.assertEqual(SQLUserNotification.objects.count(), 0)
+        self.assertEqual([checkpoint['read'] for checkpoint in checkpoints[:3]], [
+            user_msgs[1].id, user_msgs[3].id, user_msgs[4].id
+        ])
+        self.assertEqual(checkpoints[-1]['read'], user_msgs[4].id)
+        self.assertIn('orphans', checkpoints[-1])
+
+        self.assertEqual(list(SQLNotificationMessage.objects.values_list('id', flat=True)), [timed_msg.id])
+
+    def test_purge_keeps_unfired_timed_notifications(self):
+        """
+        A timed notification which is overdue, but whose timer has yet to fire
+        (or is firing right now), keeps its message
+        """
+
+        msg_type = self._save_notification_type()
+
+        with freeze_time(datetime.now(pytz.UTC) - timedelta(days=7)):
+            timed_msg = self.provider.save_notification_message(NotificationMessage(
+                msg_type=msg_type,
+                payload={'foo': 'bar'},
+                deliver_no_earlier_than=datetime.now(pytz.UTC) + timedelta(days=1)
+            ))
+
+        timer = self.provider.save_notification_timer(
+            NotificationCallbackTimer(
+                name='timed-msg',
+                callback_at=timed_msg.deliver_no_earlier_than,
+                class_name='edx_notifications.callbacks.NotificationDispatchMessageCallback',
+                context={
+                    'msg_id': timed_msg.id,
+                    'distribution_scope': {
+                        'scope_name': 'user',
+                        'scope_context': {'user_id': 1},
+                    },
+                },
+                is_active=True,
+            )
+        )
+
+        def _purge():
+            """
+            Purge everything which is older than a day
+            """
+            self.provider.purge_expired_notifications(
+                purge_read_messages_older_than=datetime.now(pytz.UTC) - timedelta(days=1)
+            )
+            return list(SQLNotificationMessage.objects.values_list('id', flat=True))
+
+        self.assertEqual(_purge(), [timed_msg.id])
+
+        # being executed right now
+        claimed = self.provider.claim_due_notification_timers('worker1', 60)
+        self.assertEqual([claimed_timer.name for claimed_timer in claimed], [timer.name])
+        self.assertEqual(_purge(), [timed_msg.id])
+
+        # whereas once it has fired, the message can go
+        claimed[0].worker_id = None
+        claimed[0].lease_expires_at = None
+        self.provider.save_notification_timer(claimed[0])
+        self.assertEqual(_purge(), [])
+
+    @mock.patch('edx_notifications.const.NOTIFICATION_PURGE_BATCH_SIZE', 2)
+    @mock.patch('edx_notifications.const.NOTIFICATION_PURGE_BATCH_PAUSE_SECS', 0)
+    @mock.patch('edx_notifications.const.NOTIFICATION_ARCHIVE_ENABLED', True)
+    def test_purge_and_archive_in_batches(self):
+        """
+        Make sure that the purged notifications are archived as a whole,
+        without going through the pre_delete signal for each of them
+        """
+
+        user_msgs = self._save_expired_notifications(5)
+
+        with mock.patch.object(SQLUserNotificationArchive, 'save') as mock_save:
+            with CaptureQueriesContext(connection) as queries:
+                self.provider.purge_expired_notifications(
+                    purge_read_messages_older_than=datetime.now(pytz.UTC) - timedelta(days=6)
+                )
+
+        self.assertFalse(mock_save.called)
+
+        # one INSERT ... SELECT for each batch
+        self.assertEqual(len([query for query in queries if query['sql'].startswith('INSERT')]), 3)
+        self.assertEqual(SQLUserNotification.objects.count(), 0)
+
+        archived = SQLUserNotificationArchive.objects.order_by('id')
+        self.assertEqual(
+            [(user_msg.id, user_msg.msg.id, user_msg.read_at) for user_msg in user_msgs],
+            [(archived_msg.id, archived_msg.msg_id, archived_msg.read_at) for archived_msg in archived]
+        )
+
+        # archived notifications still need their messages
+        self.assertEqual(SQLNotificationMessage.objects.count(), 5)
+
+    @mock.patch('edx_notifications.const.NOTIFICATION_PURGE_BATCH_SIZE', 2)
+    @mock.patch('edx_notifications.const.NOTIFICATION_PURGE_BATCH_PAUSE_SECS', 0)
+    def test_resume_purge(self):
+        """
+        Make sure a purge picks up from a checkpoint
+        """
+
+        user_msgs = self._save_expired_notifications(5)
+
+        self.provider.purge_expired_notifications(
+            purge_read_messages_older_than=datetime.now(pytz.UTC) - timedelta(days=6),
+            options={'checkpoint': {'read': user_msgs[1].id}}
+        )
+
+        self.assertEqual(
+            list(SQLUserNotification.objects.order_by('id').values_list('id', flat=True)),
+            [user_msgs[0].id, user_msgs[1].id]
+        )
+
+    @mock.patch('edx_notifications.const.NOTIFICATION_ARCHIVE_ENABLED', True)
+    def test_purge_expired_partitions(self):
+        """
+        Make sure purging drops the partitions which only hold expired notifications, after
+        archiving them, and leaves the others to be purged row by row
+        """
+
+        msg_type = self._save_notification_type()
+        this_month = get_month(datetime.now(pytz.UTC))
+
+        partitions = [
+            UserNotificationPartition('p_old', None, add_months(this_month, -2)),
+            UserNotificationPartition('p_read', add_months(this_month, -2), add_months(this_month, -1)),
+            UserNotificationPartition('p_last', add_months(this_month, -1), this_month),
+            UserNotificationPartition('p_future', this_month, None),
+        ]
+
+        def _save_user_msg(created, read_at=None):
+            """
+            Save a notification, with its own message, as created at some time
+            """
+
+            with freeze_time(created):
+                msg = self.provider.save_notification_message(NotificationMessage(
+                    namespace='namespace1',
+                    msg_type=msg_type,
+                    payload={'foo': 'bar'}
+                ))
+                return self.provider.save_user_notification(UserNotification(
+                    user_id=self.test_user_id,
+                    msg=msg,
+                    read_at=read_at
+                ))
+
+        def _drop_partition(partition):
+            """
+            Drop a partition like the database would, without going through the ORM
+            """
+
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'DELETE FROM edx_notifications_usernotification WHERE created < %s',
+                    [connection.ops.adapt_datetimefield_value(partition.end)]
+                )
+
+        old_unread = _save_user_msg(add_months(this_month, -3))
+        old_read = _save_user_msg(add_months(this_month, -3), read_at=add_months(this_month, -3))
+        recently_read = _save_user_msg(add_months(this_month, -2), read_at=datetime.now(pytz.UTC))
+        current = _save_user_msg(datetime.now(pytz.UTC))
+
+        self.provider._partitions = mock.Mock()  # pylint: disable=protected-access
+        self.provider._partitions.get_partitions.return_value = partitions  # pylint: disable=protected-access
+        self.provider._partitions.drop_partition.side_effect = _drop_partition  # pylint: disable=protected-access
+
+        self.provider.purge_expired_notifications(
+            purge_read_messages_older_than=datetime.now(pytz.UTC) - timedelta(days=1),
+            purge_unread_messages_older_than=add_months(this_month, -1)
+        )
+
+        # the partitions are always added ahead
+        self.provider._partitions.add_partitions.assert_called_once_with(  # pylint: disable=protected-access
+            add_months(this_month, const.NOTIFICATION_PARTITION_MONTHS_AHEAD)
+        )
+        self.provider._partitions.drop_partition.assert_called_once_with(  # pylint: disable=protected-access
+            partitions[0]
+        )
+
+        self.assertEqual(
+            list(SQLUserNotification.objects.order_by('id').values_list('id', flat=True)),
+            [recently_read.id, current.id]
+        )
+        self.assertEqual(
+            sorted(SQLUserNotificationArchive.objects.values_list('id', flat=True)),
+            [old_unread.id, old_read.id]
+        )
+        self.assertEqual(self.provider.get_num_notifications_for_user(self.test_user_id, filters={'read': False}), 1)
+
+        # no one is left to purge row by row, and archiving again doesn't trip over what is archived already
+        self.provider.purge_expired_notifications(
+            purge_read_messages_older_than=datetime.now(pytz.UTC) - timedelta(days=1),
+            purge_unread_messages_older_than=add_months(this_month, -1)
+        )
+        self.assertEqual(SQLUserNotificationArchive.objects.count(), 2)
+
     def test_get_all_namespaces(self):
         """
         Verify that we can get a list of all namespaces
@@ -68,6 +68,14 @@ class BaseNotificationStoreProvider(metaclass=abc.ABCMeta):
     no state stored in the instance of the provider class.
     """
 
+    def get_write_database_alias(self):  # pylint: disable=no-self-use
+        """
+        Returns the alias of the Django database which the store provider writes to, so that
+        callers can have their transactions - and on_commit() hooks - cover those writes.
+        Defaults to None, i.e. Django's default database
+        """
+        return None
+
     @abc.abstractmethod
     def get_notification_message_by_id(self, msg_id, options=None):
         """
@@ -82,6 +90,24 @@ class BaseNotificationStoreProvider(metaclass=abc.ABCMeta):
         """
         raise NotImplementedError()
 
+    @abc.abstractmethod
+    def get_notification_messages_by_ids(self, msg_ids, options=None):
+        """
+        Returns the notification messages (of NotificationMessage type) for
+        a number of primary keys, all in one go
+
+        ARGS:
+            - msg_ids: list of primary keys of NotificationMessages
+            - options: dictionary of options. Possible choices:
+                * 'select_related': whether to fully fetch any related objects
+                * 'analytics': whether this is a batch read, which stores with
+                  replicas may serve from a dedicated one
+
+        RETURNS: dict of NotificationMessages by their ids. Ids which can't
+        be found are left out
+        """
+        raise NotImplementedError()
+
     @abc.abstractmethod
     def save_notification_message(self, msg):
         """
@@ -115,6 +141,35 @@ class BaseNotificationStoreProvider(metaclass=abc.ABCMeta):
         """
         raise NotImplementedError()
 
+    @abc.abstractmethod
+    def bulk_create_user_notifications_for_message(self, msg_id, user_ids):  # pylint: disable=invalid-name
+        """
+        Streaming fan-out of an already persisted NotificationMessage to a
+        (potentially very large) set of users. Unlike bulk_create_user_notification
+        callers do not build a UserNotification per recipient, store providers
+        are expected to write only the (user_id, msg_id) mapping in large batches.
+
+        ARGS:
+            - msg_id: the primary key of the already saved NotificationMessage
+            - user_ids: an iterable of user_ids, e.g. a list, generator or ORM resultset
+
+        RETURNS: the number of UserNotifications that were created
+
+        NOTE: This method cannot update existing UserNotifications, only create them
+        """
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    def bulk_create_user_notifications_for_messages(self, msg_ids, user_ids):  # pylint: disable=invalid-name
+        """
+        Like bulk_create_user_notifications_for_message(), but fans out several already
+        persisted NotificationMessages to the same users in one pass over user_ids, i.e.
+        every user gets a UserNotification for each of the msg_ids
+
+        RETURNS: the number of UserNotifications that were created
+        """
+        raise NotImplementedError()
+
     @abc.abstractmethod
     def get_notification_type(self, name):
         """
@@ -179,11 +234,38 @@ class BaseNotificationStoreProvider(metaclass=abc.ABCMeta):
             - options: a dict containing some optional parameters
                 - limit: max number to return (up to some system defined max)
                 - offset: offset into the list, to implement paging
+                - before: an opaque cursor - see edx_notifications.utils.encode_notification_cursor() -
+                          pointing at the last notification of the previous page. Can not
+                          be combined with 'offset'
+                - analytics: whether this is a batch read (e.g. for digests), which stores
+                             with replicas may serve from a dedicated one
 
         RETURNS: type list   i.e. []
         """
         raise NotImplementedError()
 
+    @abc.abstractmethod
+    def get_notification_dicts_for_user(self, user_id, filters=None, options=None):
+        """
+        Same as get_notifications_for_user(), but returns what get_fields() would
+        return for each of the UserNotifications, i.e. JSON-ready dicts, which stores
+        may be able to produce without building the data objects first
+
+        RETURNS: type list   i.e. []
+        """
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    def get_notifications_change_token(self, user_id):
+        """
+        Returns an opaque string which changes whenever any of the user's notifications
+        are added, changed (e.g. marked as read) or removed. This is meant to be much
+        cheaper than querying for the notifications themselves
+
+        RETURNS: string
+        """
+        raise NotImplementedError()
+
     @abc.abstractmethod
     def mark_user_notifications_read(self, user_id, filters=None):
         """
@@ -191,6 +273,28 @@ class BaseNotificationStoreProvider(metaclass=abc.ABCMeta):
         """
         raise NotImplementedError()
 
+    @abc.abstractmethod
+    def mark_user_notifications_read_by_msg_ids(self, user_id, msg_ids, read=True):  # pylint: disable=invalid-name
+        """
+        Marks the user's notifications for all of the msg_ids as read - or unread if read
+        is False - in one go. msg_ids which the user has no notification for are ignored.
+        Must raise BulkOperationTooLarge if there are more than NOTIFICATION_MAX_LIST_SIZE msg_ids
+
+        RETURNS: the number of notifications whose read state changed
+        """
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    def rebuild_unread_notification_counters(self, user_ids=None):  # pylint: disable=invalid-name
+        """
+        Recompute any denormalized counts of unread notifications the store keeps
+        from the user notifications themselves, either for the passed in user_ids or,
+        if None, for all users
+
+        RETURNS: the number of counters that were written
+        """
+        raise NotImplementedError()
+
     @abc.abstractmethod
     def save_notification_timer(self, timer):
         """
@@ -216,6 +320,100 @@ class BaseNotificationStoreProvider(metaclass=abc.ABCMeta):
         """
         raise NotImplementedError()
 
+    @abc.abstractmethod
+    def iter_active_timers(self, until_time=None, include_executed=False, after=None, batch_size=None):
+        """
+        Generator of the active timers which are due by until_time (defaults to now), in the
+        order of their (callback_at, name). They are read batch_size (defaults to
+        NOTIFICATION_TIMER_SCAN_BATCH_SIZE) at a time, so that a large backlog of timers is never
+        held in memory all at once. Pass in the (callback_at, name) of the last timer seen
+        as after, to pick up where a previous scan left off
+        """
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    def archive_notification_timers(self, older_than):
+        """
+        Move the timers which are done with - one-shot timers which have been executed, and
+        inactive timers - and which have not been changed since older_than into the archive
+
+        RETURNS: the number of timers archived
+        """
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    def claim_due_notification_timers(self, worker_id, lease_secs, until_time=None, max_timers=None,
+                                      exclude_class_names=None, priorities=None):
+        """
+        Atomically hand out (up to max_timers of) the active timers which are due by until_time
+        (defaults to now) to worker_id for lease_secs seconds, and mark them as executed. Timers whose
+        lease has expired (i.e. the worker executing them presumably crashed) are handed out again.
+
+        Timers whose class_name is in exclude_class_names are not handed out. Timers are handed
+        out in the order of their priority - a dict of class_name to an int, where higher goes
+        first and classes which are not in there have a priority of 0 - and then their callback_at.
+
+        No two workers can be handed the same timer at the same time. Workers should clear
+        worker_id and lease_expires_at of the timers when they are done with them.
+
+        RETURNS: list of the claimed NotificationCallbackTimers
+        """
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    def get_notification_timer_schedule(self, modified_since=None):
+        """
+        Returns when each timer - which has been modified since modified_since, or every timer if
+        that is None - is next going to be claimable by claim_due_notification_timers(). That is
+        its callback_at, or when its lease runs out if it is being executed right now. Timers which
+        are not going to be claimable again (i.e. inactive ones, or ones which have been executed
+        and not been rescheduled) are included with None, when modified_since is passed in
+
+        RETURNS: dict of timer name to datetime (or None)
+        """
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    def save_notification_fanout_job(self, job):
+        """
+        Will save (create or update) a NotificationFanoutJob in the
+        StorageProvider
+        """
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    def get_notification_fanout_job(self, job_id):
+        """
+        Will return a single NotificationFanoutJob, or raise
+        ItemNotFoundError
+        """
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    def claim_notification_fanout_job(self, worker_id, lease_secs):
+        """
+        Atomically hand out the oldest NotificationFanoutJob that is either
+        pending or whose lease has expired (i.e. the worker that was processing
+        it presumably crashed) to worker_id, for lease_secs seconds.
+
+        No two workers can be handed the same job at the same time.
+
+        RETURNS: the claimed NotificationFanoutJob, or None if there is nothing to do
+        """
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    def checkpoint_notification_fanout_job(self, job, lease_secs):
+        """
+        Persist the progress (and status) of a NotificationFanoutJob
+        and extend the lease on it by lease_secs seconds. This is conditional on
+        job.worker_id still holding the lease, otherwise FanoutJobLeaseExpired
+        is raised
+
+        RETURNS: the updated NotificationFanoutJob
+        """
+        raise NotImplementedError()
+
     @abc.abstractmethod
     def get_notification_preference(self, name):
         """
@@ -273,7 +471,8 @@ class BaseNotificationStoreProvider(metaclass=abc.ABCMeta):
         raise NotImplementedError()
 
     @abc.abstractmethod
-    def purge_expired_notifications(self, purge_read_messages_older_than, purge_unread_messages_older_than):  # pylint: disable=invalid-name
+    def purge_expired_notifications(self, purge_read_messages_older_than, purge_unread_messages_older_than,  # pylint: disable=invalid-name
+                                    options=None):
         """
         Will purge all the unread and read messages that is in the
         db for a period of time.
@@ -290,6 +489,12 @@ class BaseNotificationStoreProvider(metaclass=abc.ABCMeta):
 
         where as purge_unread_messages_older_than will compare against the "created" column.
 
+        options: dictionary of options. Possible choices:
+            * 'checkpoint': the last checkpoint of an earlier purge which got interrupted,
+              to pick up where it left off
+            * 'on_checkpoint': callable which gets passed a checkpoint (a JSON serializable
+              dict) whenever some progress has been made
+
         """
         raise NotImplementedError()
 
@@ -25,12 +25,14 @@ class BadImplementationStoreProvider(BaseNotificationStoreProvider):
     raises the correct methods
     """
 
-    def purge_expired_notifications(self, purge_read_messages_older_than, purge_unread_messages_older_than):
+    def purge_expired_notifications(self, purge_read_messages_older_than, purge_unread_messages_older_than,
+                                    options=None):
         """
         Fake implementation of method which calls base class, which should throw NotImplementedError
         """
         super().purge_expired_notifications(purge_read_messages_older_than,
-                                                                                purge_unread_messages_older_than)
+                                            purge_unread_messages_older_than,
+                                            options=options)
 
     def get_all_user_preferences_for_user(self, user_id):
         """
@@ -80,6 +82,12 @@ class BadImplementationStoreProvider(BaseNotificationStoreProvider):
         """
         super().get_notification_message_by_id(msg_id, options=options)
 
+    def get_notification_messages_by_ids(self, msg_ids, options=None):
+        """
+        Fake implementation of method which calls base class, which should throw NotImplementedError
+        """
+        super().get_notification_messages_by_ids(msg_ids, options=options)
+
     def save_notification_message(self, msg):
         """
         Fake implementation of method which calls base class, which should throw NotImplementedError
@@ -98,6 +106,18 @@ class BadImplementationStoreProvider(BaseNotificationStoreProvider):
         """
         super().bulk_create_user_notification(user_msgs)
 
+    def bulk_create_user_notifications_for_message(self, msg_id, user_ids):
+        """
+        Fake implementation
+        """
+        super().bulk_create_user_notifications_for_message(msg_id, user_ids)
+
+    def bulk_create_user_notifications_for_messages(self, msg_ids, user_ids):
+        """
+        Fake implementation
+        """
+        super().bulk_create_user_notifications_for_messages(msg_ids, user_ids)
+
     def get_notification_type(self, name):
         """
         Fake implementation of method which calls base class, which should throw NotImplementedError
@@ -138,6 +158,22 @@ class BadImplementationStoreProvider(BaseNotificationStoreProvider):
             options=options
         )
 
+    def get_notification_dicts_for_user(self, user_id, filters=None, options=None):
+        """
+        Fake implementation
+        """
+        super().get_notification_dicts_for_user(
+            user_id,
+            filters=filters,
+            options=options
+        )
+
+    def get_notifications_change_token(self, user_id):
+        """
+        Fake implementation
+        """
+        super().get_notifications_change_token(user_id)
+
     def mark_user_notifications_read(self, user_id, filters=None):
         """
         Marks all notifications for user (with any filtering criteria) as read
@@ -147,6 +183,18 @@ class BadImplementationStoreProvider(BaseNotificationStoreProvider):
             filters=filters,
         )
 
+    def mark_user_notifications_read_by_msg_ids(self, user_id, msg_ids, read=True):
+        """
+        Fake implementation
+        """
+        super().mark_user_notifications_read_by_msg_ids(user_id, msg_ids, read=read)
+
+    def rebuild_unread_notification_counters(self, user_ids=None):
+        """
+        Fake implementation
+        """
+        super().rebuild_unread_notification_counters(user_ids=user_ids)
+
     def save_notification_timer(self, timer):
         """
         Will save (create or update) a NotificationCallbackTimer in the
@@ -169,6 +217,67 @@ class BadImplementationStoreProvider(BaseNotificationStoreProvider):
         """
         super().get_all_active_timers(until_time=until_time)
 
+    def iter_active_timers(self, until_time=None, include_executed=False, after=None, batch_size=None):
+        """
+        Fake implementation
+        """
+        super().iter_active_timers(
+            until_time=until_time,
+            include_executed=include_executed,
+            after=after,
+            batch_size=batch_size
+        )
+
+    def archive_notification_timers(self, older_than):
+        """
+        Fake implementation
+        """
+        super().archive_notification_timers(older_than)
+
+    def claim_due_notification_timers(self, worker_id, lease_secs, until_time=None, max_timers=None,
+                                      exclude_class_names=None, priorities=None):
+        """
+        Fake implementation
+        """
+        super().claim_due_notification_timers(
+            worker_id,
+            lease_secs,
+            until_time=until_time,
+            max_timers=max_timers,
+            exclude_class_names=exclude_class_names,
+            priorities=priorities
+        )
+
+    def get_notification_timer_schedule(self, modified_since=None):
+        """
+        Fake implementation
+        """
+        super().get_notification_timer_schedule(modified_since=modified_since)
+
+    def save_notification_fanout_job(self, job):
+        """
+        Fake implementation
+        """
+        super().save_notification_fanout_job(job)
+
+    def get_notification_fanout_job(self, job_id):
+        """
+        Fake implementation
+        """
+        super().get_notification_fanout_job(job_id)
+
+    def claim_notification_fanout_job(self, worker_id, lease_secs):
+        """
+        Fake implementation
+        """
+        super().claim_notification_fanout_job(worker_id, lease_secs)
+
+    def checkpoint_notification_fanout_job(self, job, lease_secs):
+        """
+        Fake implementation
+        """
+        super().checkpoint_notification_fanout_job(job, lease_secs)
+
     def get_all_namespaces(self, start_datetime=None, end_datetime=None):
         """
         This will return all unique namespaces that have been used
@@ -236,6 +345,9 @@ class TestBaseNotificationDataProvider(TestCase):
         with self.assertRaises(NotImplementedError):
             bad_provider.get_notification_message_by_id(None)
 
+        with self.assertRaises(NotImplementedError):
+            bad_provider.get_notification_messages_by_ids(None)
+
         with self.assertRaises(NotImplementedError):
             bad_provider.save_notification_message(None)
 
@@ -245,6 +357,15 @@ class TestBaseNotificationDataProvider(TestCase):
         with self.assertRaises(NotImplementedError):
             bad_provider.bulk_create_user_notification(None)
 
+        with self.assertRaises(NotImplementedError):
+            bad_provider.bulk_create_user_notifications_for_message(None, None)
+
+        with self.assertRaises(NotImplementedError):
+            bad_provider.bulk_create_user_notifications_for_messages(None, None)
+
+        # which writes to the default database
+        self.assertIsNone(bad_provider.get_write_database_alias())
+
         with self.assertRaises(NotImplementedError):
             bad_provider.get_notification_type(None)
 
@@ -260,9 +381,21 @@ class TestBaseNotificationDataProvider(TestCase):
         with self.assertRaises(NotImplementedError):
             bad_provider.get_notifications_for_user(None)
 
+        with self.assertRaises(NotImplementedError):
+            bad_provider.get_notification_dicts_for_user(None)
+
+        with self.assertRaises(NotImplementedError):
+            bad_provider.get_notifications_change_token(None)
+
         with self.assertRaises(NotImplementedError):
             bad_provider.mark_user_notifications_read(None)
 
+        with self.assertRaises(NotImplementedError):
+            bad_provider.mark_user_notifications_read_by_msg_ids(None, None)
+
+        with self.assertRaises(NotImplementedError):
+            bad_provider.rebuild_unread_notification_counters()
+
         with self.assertRaises(NotImplementedError):
             bad_provider.save_notification_timer(None)
 
@@ -272,6 +405,30 @@ class TestBaseNotificationDataProvider(TestCase):
         with self.assertRaises(NotImplementedError):
             bad_provider.get_all_active_timers()
 
+        with self.assertRaises(NotImplementedError):
+            bad_provider.iter_active_timers()
+
+        with self.assertRaises(NotImplementedError):
+            bad_provider.archive_notification_timers(None)
+
+        with self.assertRaises(NotImplementedError):
+            bad_provider.claim_due_notification_timers(None, None)
+
+        with self.assertRaises(NotImplementedError):
+            bad_provider.get_notification_timer_schedule()
+
+        with self.assertRaises(NotImplementedError):
+            bad_provider.save_notification_fanout_job(None)
+
+        with self.assertRaises(NotImplementedError):
+            bad_provider.get_notification_fanout_job(None)
+
+        with self.assertRaises(NotImplementedError):
+            bad_provider.claim_notification_fanout_job(None, None)
+
+        with self.assertRaises(NotImplementedError):
+            bad_provider.checkpoint_notification_fanout_job(None, None)
+
         with self.assertRaises(NotImplementedError):
             bad_provider.get_notification_preference(None)
 
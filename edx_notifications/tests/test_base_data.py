@@ -4,9 +4,15 @@ Unit tests to exercise code implemented in data.py
 
 
 
+import json
+from unittest import mock
+from datetime import datetime
+
 import six
+import pytz
 from django.test import TestCase
 
+from edx_notifications import base_data
 from edx_notifications.data import NotificationType, NotificationMessage
 from edx_notifications.base_data import DictField, EnumField, IntegerField, BaseDataObject, RelatedObjectField
 
@@ -284,3 +290,92 @@ class BaseDataObjectTests(TestCase):
         )
 
         self.assertNotEqual(obj1, obj2)
+
+    def test_dirty_fields(self):
+        """
+        Make sure we keep track of which fields have been set since the object was marked clean
+        """
+
+        obj = DataObjectWithTypedFields(id=1, test_int_field=100)
+
+        # we can't tell what has changed until we've been marked clean
+        self.assertIsNone(obj.get_dirty_fields())
+
+        obj.mark_clean()
+        self.assertEqual(obj.get_dirty_fields(), set())
+
+        obj.test_int_field = 200
+        obj.test_enum_field = 'foo'
+        self.assertEqual(obj.get_dirty_fields(), {'test_int_field', 'test_enum_field'})
+
+        # dicts can be changed in place, so they are always dirty
+        obj.mark_clean()
+        obj.test_dict_field = {'foo': 'bar'}
+        obj.mark_clean()
+        self.assertEqual(obj.get_dirty_fields(), {'test_dict_field'})
+
+        # dirty state doesn't carry over to clones, and isn't part of equality
+        clone = DataObjectWithTypedFields.clone(obj)
+        self.assertIsNone(clone.get_dirty_fields())
+        self.assertEqual(clone, obj)
+
+    def test_tagged_json(self):
+        """
+        Make sure datetimes survive a round trip through the tagged JSON format,
+        without strings that look like datetimes being turned into ones
+        """
+
+        now = datetime.now(pytz.UTC)
+        data = {
+            'foo': 'bar',
+            'one': 1,
+            'when': now,
+            'looks-like-a-datetime': '2015-01-01T00:00:00',
+            'nested': {'when': now},
+        }
+
+        self.assertIsNone(DictField.to_tagged_json({}))
+        self.assertIsNone(DictField.from_json(None))
+
+        value = DictField.to_tagged_json(data)
+        self.assertEqual(json.loads(value)[0], DictField.TAGGED_JSON_VERSION)
+
+        result = DictField.from_json(value)
+        self.assertEqual(result['when'], now)
+        self.assertEqual(result['looks-like-a-datetime'], '2015-01-01T00:00:00')
+        self.assertEqual(result['nested'], {'when': now.isoformat()})
+
+        # we don't write datetimes in place
+        self.assertEqual(data['when'], now)
+
+        with self.assertRaises(ValueError):
+            DictField.from_json(json.dumps([DictField.TAGGED_JSON_VERSION + 1, {}, []]))
+
+    def test_legacy_json(self):
+        """
+        Plain JSON, as dicts used to be stored, still has its datetimes guessed at
+        """
+
+        now = datetime.now(pytz.UTC)
+        result = DictField.from_json(DictField.to_json({'when': now, 'fakeout': '--T::'}))
+
+        self.assertEqual(result['when'], now)
+        self.assertEqual(result['fakeout'], '--T::')
+
+    def test_json_backends(self):
+        """
+        Make sure we use the faster JSON backends when they are installed
+        """
+
+        now = datetime.now(pytz.UTC)
+        data = {'foo': 'bar', 'when': now}
+
+        with mock.patch.object(base_data, 'ujson', json):
+            self.assertEqual(DictField.from_json(DictField.to_tagged_json(data)), data)
+
+        fake_orjson = mock.Mock(
+            dumps=lambda data, **kwargs: json.dumps(data, default=kwargs['default']).encode('utf-8'),
+            loads=json.loads
+        )
+        with mock.patch.object(base_data, 'orjson', fake_orjson):
+            self.assertEqual(DictField.from_json(DictField.to_tagged_json(data)), data)
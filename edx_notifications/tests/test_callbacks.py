@@ -4,11 +4,14 @@ Tests for the callback.py
 
 
 
+from unittest import mock
+
 from django.test import TestCase
 
 from edx_notifications.data import NotificationType, NotificationMessage, NotificationCallbackTimer
 from edx_notifications.scopes import register_user_scope_resolver
 from edx_notifications.callbacks import NotificationDispatchMessageCallback
+from edx_notifications.channels.channel import get_notification_channel
 from edx_notifications.stores.store import notification_store
 from edx_notifications.tests.test_scopes import TestListScopeResolver
 
@@ -193,3 +196,62 @@ class CallbackTests(TestCase):
         self.assertEqual(results['num_dispatched'], 0)
         self.assertEqual(len(results['errors']), 1)
         self.assertIsNone(results['reschedule_in_mins'])
+
+    def test_coalesced_failures(self):
+        """
+        Coalesced timers only fail for their own invalid message, or for
+        the channel which their message went out over
+        """
+
+        failing_msg_type = self.store.save_notification_type(
+            NotificationType(
+                name='foo.failing',
+                renderer='foo',
+            )
+        )
+        failing_msg = self.store.save_notification_message(
+            NotificationMessage(
+                msg_type=failing_msg_type,
+                payload={'foo': 'bar'},
+            )
+        )
+
+        # a message without a msg_type does not validate
+        invalid_msg = NotificationMessage(id=9999, payload={'foo': 'bar'})
+
+        timers = [
+            NotificationCallbackTimer(
+                context={
+                    'msg_id': msg_id,
+                    'distribution_scope': self.timer_for_group.context['distribution_scope'],
+                }
+            )
+            for msg_id in (self.msg.id, failing_msg.id, invalid_msg.id)
+        ]
+
+        channel = get_notification_channel(None, self.msg_type)
+        failing_channel = mock.Mock()
+        failing_channel.name = 'failing-channel'
+        failing_channel.bulk_dispatch_notifications.side_effect = Exception('Channel is down')
+
+        with mock.patch(
+            'edx_notifications.callbacks.get_notification_channel',
+            side_effect=lambda user_id, msg_type, preferred_channel=None: (
+                failing_channel if msg_type.name == failing_msg_type.name else channel
+            )
+        ):
+            results = NotificationDispatchMessageCallback(
+                msgs={invalid_msg.id: invalid_msg}
+            ).notification_timers_callback(timers)
+
+        self.assertEqual(results[0]['num_dispatched'], 5)
+        self.assertEqual(results[0]['errors'], [])
+
+        self.assertEqual(results[1]['num_dispatched'], 0)
+        self.assertEqual(results[1]['errors'], ['Channel is down'])
+
+        self.assertEqual(results[2]['num_dispatched'], 0)
+        self.assertEqual(len(results[2]['errors']), 1)
+
+        for user_id in range(5):
+            self.assertEqual(self.store.get_num_notifications_for_user(user_id), 1)
@@ -0,0 +1,110 @@
+"""
+Micro-benchmark of building and inspecting the data objects in data.py, which
+happens for every row that the Notification Store hands out
+"""
+
+
+
+import time
+import inspect
+import logging
+from unittest import mock
+from datetime import datetime
+
+import pytz
+from django.test import TestCase
+
+from edx_notifications import data
+from edx_notifications.base_data import (
+    EnumField,
+    DictField,
+    StringField,
+    BooleanField,
+    IntegerField,
+    DateTimeField,
+    BaseDataObject,
+    RelatedObjectField
+)
+
+log = logging.getLogger(__name__)
+
+# how many times each operation is run per data object class
+NUM_ITERATIONS = 1000
+
+# generous upper bound on the average time of each operation, so that this only
+# catches data objects going back to reflecting on their class every time
+MAX_SECS_PER_OPERATION = 0.001
+
+
+def _get_sample_kwargs(data_class):
+    """
+    Returns a value for each field of data_class, including
+    fully built related objects
+    """
+
+    kwargs = {}
+    for name, field in data_class._fields.items():  # pylint: disable=protected-access
+        if isinstance(field, EnumField):
+            value = field._allowed_values[0]  # pylint: disable=protected-access
+        elif isinstance(field, RelatedObjectField):
+            related_class = field._expected_types[0]  # pylint: disable=protected-access
+            value = related_class(**_get_sample_kwargs(related_class))
+        elif isinstance(field, DictField):
+            value = {'foo': 'bar'}
+        elif isinstance(field, DateTimeField):
+            value = datetime.now(pytz.UTC)
+        elif isinstance(field, BooleanField):
+            value = True
+        elif isinstance(field, IntegerField):
+            value = 1
+        elif isinstance(field, StringField):
+            value = 'foo'
+        else:
+            continue
+
+        kwargs[name] = value
+
+    return kwargs
+
+
+class DataObjectBenchmarkTests(TestCase):
+    """
+    Times construction, get_fields() and clone() of all data objects
+    """
+
+    def _time(self, name, operation):
+        """
+        Run operation NUM_ITERATIONS times and make sure it's reasonably fast
+        """
+
+        start = time.time()
+        for __ in range(NUM_ITERATIONS):
+            operation()
+        secs_per_operation = (time.time() - start) / NUM_ITERATIONS
+
+        log.info('%s: %.1f us', name, secs_per_operation * 1000000)
+        self.assertLess(secs_per_operation, MAX_SECS_PER_OPERATION)
+
+    def test_benchmark(self):
+        """
+        Go through all data objects in data.py
+        """
+
+        data_classes = [
+            data_class
+            for __, data_class in inspect.getmembers(data, inspect.isclass)
+            if issubclass(data_class, BaseDataObject) and data_class is not BaseDataObject
+        ]
+        self.assertIn(data.UserNotification, data_classes)
+
+        for data_class in data_classes:
+            kwargs = _get_sample_kwargs(data_class)
+            obj = data_class(**kwargs)
+
+            # the schema is worked out when the class is defined, not per object
+            with mock.patch('inspect.getmembers', side_effect=AssertionError('reflection on a hot path')):
+                self._time(f'{data_class.__name__}()', lambda: data_class(**kwargs))  # pylint: disable=cell-var-from-loop
+                self._time(f'{data_class.__name__}.get_fields()', obj.get_fields)
+                self._time(f'{data_class.__name__}.clone()', lambda: data_class.clone(obj))  # pylint: disable=cell-var-from-loop
+
+            self.assertEqual(data_class.clone(obj), obj)
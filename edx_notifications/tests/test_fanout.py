@@ -0,0 +1,267 @@
+"""
+Unit tests for fanout.py
+"""
+
+
+
+from unittest import mock
+from datetime import datetime, timedelta
+
+import pytz
+from django.db import transaction
+from django.test import TestCase
+from django.test.utils import override_settings
+from django.contrib.auth.models import User
+from django.core.exceptions import ImproperlyConfigured
+
+from edx_notifications import const
+from edx_notifications.data import NotificationType, NotificationMessage
+from edx_notifications.fanout import (
+    process_fanout_job,
+    enqueue_fanout_job,
+    process_fanout_jobs,
+    notification_fanout_queue,
+    StoreNotificationFanoutQueue,
+    reset_notification_fanout_queue,
+    _get_ordered_user_ids
+)
+from edx_notifications.scopes import register_user_scope_resolver
+from edx_notifications.exceptions import ItemNotFoundError, FanoutJobLeaseExpired
+from edx_notifications.lib.publisher import register_notification_type
+from edx_notifications.lib.consumer import get_notifications_count_for_user
+from edx_notifications.stores.store import notification_store
+from edx_notifications.tests.test_scopes import TestListScopeResolver
+
+
+class TestFanout(TestCase):
+    """
+    Test cases for fanout.py
+    """
+
+    def setUp(self):
+        """
+        Harnessing
+        """
+
+        reset_notification_fanout_queue()
+        register_user_scope_resolver('list_scope', TestListScopeResolver())
+
+        self.store = notification_store()
+
+        self.msg_type = NotificationType(
+            name='open-edx.edx_notifications.tests.test_fanout',
+            renderer='edx_notifications.renderers.basic.JsonRenderer',
+        )
+        register_notification_type(self.msg_type)
+
+        self.msg = NotificationMessage(
+            namespace='test-runner',
+            msg_type=self.msg_type,
+            payload={
+                'foo': 'bar'
+            }
+        )
+
+    def tearDown(self):
+        """
+        Don't leave any configuration behind
+        """
+
+        reset_notification_fanout_queue()
+
+    def _enqueue(self, num_users=25, exclude_user_ids=None):
+        """
+        Helper to put a fan-out job on the queue for user_ids 1 through num_users
+        """
+
+        return enqueue_fanout_job(
+            self.msg,
+            'list_scope',
+            {'range': num_users + 1},
+            exclude_user_ids=[0] + (exclude_user_ids if exclude_user_ids else [])
+        )
+
+    def test_default_queue(self):
+        """
+        Make sure we get the store backed queue out of the box
+        """
+
+        self.assertTrue(isinstance(notification_fanout_queue(), StoreNotificationFanoutQueue))
+
+    @override_settings(NOTIFICATION_FANOUT_QUEUE_PROVIDER={'class': 'foo'})
+    def test_bad_queue_config(self):
+        """
+        Make sure we are throwing exceptions on poor configuration
+        """
+
+        with self.assertRaises(ImproperlyConfigured):
+            notification_fanout_queue()
+
+    def test_process_jobs(self):
+        """
+        Happy path: enqueue a couple of jobs and have a worker go through them
+        """
+
+        first = self._enqueue(exclude_user_ids=[5])
+        second = self._enqueue(num_users=3)
+
+        self.assertEqual(process_fanout_jobs(worker_id='worker'), 2)
+        self.assertEqual(process_fanout_jobs(worker_id='worker'), 0)
+
+        first = self.store.get_notification_fanout_job(first.id)
+        self.assertEqual(first.status, const.NOTIFICATION_FANOUT_JOB_STATUS_COMPLETED)
+        self.assertEqual(first.num_processed, 24)
+        self.assertEqual(first.num_dispatched, 24)
+        self.assertEqual(first.attempts, 1)
+        self.assertIsNotNone(first.completed_at)
+        self.assertIsNone(first.lease_expires_at)
+
+        second = self.store.get_notification_fanout_job(second.id)
+        self.assertEqual(second.num_dispatched, 3)
+
+        self.assertEqual(get_notifications_count_for_user(1), 2)
+        self.assertEqual(get_notifications_count_for_user(5), 0)
+        self.assertEqual(get_notifications_count_for_user(25), 1)
+
+    def test_max_jobs(self):
+        """
+        Make sure a worker can be asked to only take on so many jobs
+        """
+
+        self._enqueue()
+        self._enqueue()
+
+        self.assertEqual(process_fanout_jobs(max_jobs=1), 1)
+        self.assertEqual(process_fanout_jobs(max_jobs=1), 1)
+        self.assertEqual(process_fanout_jobs(max_jobs=1), 0)
+
+    def test_resume_from_checkpoint(self):
+        """
+        Simulate a worker that died after having committed a few slices,
+        and make sure another worker picks up right where it left off
+        """
+
+        job = self._enqueue()
+        queue = notification_fanout_queue()
+
+        job = queue.claim('crashed-worker')
+        job.last_user_id = 10
+        job.num_processed = 10
+        job.num_dispatched = 10
+        queue.checkpoint(job)
+
+        # nobody can take over while the lease is still valid
+        self.assertIsNone(queue.claim('other-worker'))
+
+        with mock.patch.object(queue, 'lease_secs', -1):
+            queue.checkpoint(job)
+
+        job = queue.claim('other-worker')
+        self.assertEqual(job.attempts, 2)
+
+        # in the meantime, a couple of users have left the scope, which
+        # is no longer returned in any particular order either
+        user_ids = [user_id for user_id in range(25, 0, -1) if user_id not in (3, 5)]
+        with mock.patch('edx_notifications.fanout.resolve_user_scope', return_value=user_ids):
+            job = process_fanout_job(job, slice_size=4)
+
+        self.assertEqual(job.status, const.NOTIFICATION_FANOUT_JOB_STATUS_COMPLETED)
+        self.assertEqual(job.last_user_id, 25)
+        self.assertEqual(job.num_processed, 25)
+        self.assertEqual(job.num_dispatched, 25)
+
+        # only users after the checkpoint get the notification
+        self.assertEqual(get_notifications_count_for_user(10), 0)
+        self.assertEqual(get_notifications_count_for_user(11), 1)
+        self.assertEqual(get_notifications_count_for_user(25), 1)
+
+        # and the crashed worker, should it come back, can't overwrite anything
+        job.worker_id = 'crashed-worker'
+        with self.assertRaises(FanoutJobLeaseExpired):
+            queue.checkpoint(job)
+
+    def test_failed_slice_is_rolled_back(self):
+        """
+        Make sure that a slice which fails to checkpoint does not leave
+        any notifications behind, nor any progress on the job
+        """
+
+        job = self._enqueue(num_users=5)
+
+        with mock.patch.object(StoreNotificationFanoutQueue, 'checkpoint', side_effect=Exception('boom')):
+            job = notification_fanout_queue().claim('worker')
+            with mock.patch('edx_notifications.fanout.transaction.atomic', wraps=transaction.atomic) as mock_atomic:
+                with self.assertRaises(Exception):
+                    process_fanout_job(job)
+
+        # the slice is rolled back on the database that the store writes to
+        self.assertEqual(mock_atomic.call_args_list[0], mock.call(using=self.store.get_write_database_alias()))
+        self.assertEqual(job.num_processed, 0)
+        self.assertIsNone(job.last_user_id)
+        self.assertEqual(get_notifications_count_for_user(1), 0)
+
+    def test_retries(self):
+        """
+        Make sure that jobs which raise are retried, up to a point
+        """
+
+        job = self._enqueue()
+        queue = notification_fanout_queue()
+
+        with mock.patch('edx_notifications.fanout.resolve_user_scope', side_effect=Exception('boom')):
+            # a failed job is not retried before its lease runs out
+            self.assertEqual(process_fanout_jobs(), 1)
+            self.assertEqual(process_fanout_jobs(), 0)
+
+            job = self.store.get_notification_fanout_job(job.id)
+            self.assertEqual(job.status, const.NOTIFICATION_FANOUT_JOB_STATUS_RUNNING)
+            self.assertEqual(job.err_msg, 'boom')
+
+            with mock.patch.object(queue, 'lease_secs', -1):
+                queue.checkpoint(job)
+                self.assertEqual(process_fanout_jobs(), const.NOTIFICATION_FANOUT_JOB_MAX_ATTEMPTS - 1)
+
+        job = self.store.get_notification_fanout_job(job.id)
+        self.assertEqual(job.status, const.NOTIFICATION_FANOUT_JOB_STATUS_FAILED)
+        self.assertEqual(job.attempts, const.NOTIFICATION_FANOUT_JOB_MAX_ATTEMPTS)
+        self.assertEqual(process_fanout_jobs(), 0)
+
+    def test_ordered_user_ids(self):
+        """
+        ORM resultsets get ordered - and resumed - by the database, anything else in memory
+        """
+
+        user_ids = [User.objects.create(username=f'user{idx}').id for idx in range(3)]
+
+        self.assertEqual(
+            list(_get_ordered_user_ids(User.objects.values_list('id', flat=True).order_by('-id'))),
+            user_ids
+        )
+        self.assertEqual(
+            list(_get_ordered_user_ids(User.objects.values_list('id', flat=True), after=user_ids[0])),
+            user_ids[1:]
+        )
+        self.assertEqual(_get_ordered_user_ids((user_id for user_id in [3, 1, 2]), after=1), [2, 3])
+
+    def test_purge_finished_jobs(self):
+        """
+        Finished jobs get purged along with the notifications, so that their messages can go too
+        """
+
+        finished = self._enqueue(num_users=3)
+        process_fanout_jobs()
+        pending = self._enqueue(num_users=3)
+
+        self.store.purge_expired_notifications(
+            purge_read_messages_older_than=datetime.now(pytz.UTC) + timedelta(days=1),
+            purge_unread_messages_older_than=datetime.now(pytz.UTC) + timedelta(days=1)
+        )
+
+        with self.assertRaises(ItemNotFoundError):
+            self.store.get_notification_fanout_job(finished.id)
+        with self.assertRaises(ItemNotFoundError):
+            self.store.get_notification_message_by_id(finished.msg_id)
+
+        pending = self.store.get_notification_fanout_job(pending.id)
+        self.assertEqual(pending.status, const.NOTIFICATION_FANOUT_JOB_STATUS_PENDING)
+        self.assertEqual(self.store.get_notification_message_by_id(pending.msg_id).id, pending.msg_id)
@@ -0,0 +1,65 @@
+"""
+Tests for the data migrations
+"""
+
+
+
+from importlib import import_module
+
+from django.apps import apps
+from django.test import TestCase
+
+from edx_notifications.stores.sql.models import (
+    SQLNotificationType,
+    SQLUserNotification,
+    SQLNotificationMessage,
+    SQLUserNotificationCounter
+)
+
+
+class UserNotificationCounterMigrationTests(TestCase):
+    """
+    Tests for the backfill of the unread counters
+    """
+
+    def setUp(self):
+        """
+        Set up some unread notifications, with and without a namespace
+        """
+
+        msg_type = SQLNotificationType.objects.create(name='foo.bar', renderer='foo.renderer')
+
+        for namespace, num_users in (('foo/bar', 2), ('', 3), (None, 1)):
+            msg = SQLNotificationMessage.objects.create(namespace=namespace, msg_type=msg_type, payload='{}')
+            for user_id in range(1, num_users + 1):
+                SQLUserNotification.objects.create(user_id=user_id, msg=msg, namespace=namespace)
+
+        SQLUserNotificationCounter.objects.all().delete()
+
+        self.backfill_counters = import_module(
+            'edx_notifications.migrations.0008_usernotificationcounter'
+        ).backfill_counters
+
+    def test_backfill_counters(self):
+        """
+        Notifications without a namespace - be it NULL or empty - only count towards
+        the counter across all namespaces
+        """
+
+        self.backfill_counters(apps, None)
+
+        counters = {
+            (counter.user_id, counter.namespace): counter.unread_count
+            for counter in SQLUserNotificationCounter.objects.all()
+        }
+
+        self.assertEqual(
+            counters,
+            {
+                (1, ''): 3,
+                (2, ''): 2,
+                (3, ''): 1,
+                (1, 'foo/bar'): 1,
+                (2, 'foo/bar'): 1,
+            }
+        )
@@ -0,0 +1,240 @@
+"""
+Unit tests for pubsub.py
+"""
+
+
+
+import sys
+import time
+import threading
+from unittest import mock
+
+from django.test import TestCase
+from django.test.utils import override_settings
+from django.core.exceptions import ImproperlyConfigured
+
+from edx_notifications import const
+from edx_notifications.data import NotificationType, NotificationMessage
+from edx_notifications.pubsub import (
+    notification_pubsub,
+    RedisNotificationPubSub,
+    PollingNotificationPubSub,
+    reset_notification_pubsub,
+    publish_notification_wakeups,
+    watch_notifications_change_token
+)
+from edx_notifications.lib.publisher import (
+    register_notification_type,
+    publish_notification_to_user,
+    bulk_publish_notification_to_users
+)
+from edx_notifications.stores.store import notification_store
+
+
+class TestPubSub(TestCase):
+    """
+    Test cases for pubsub.py
+    """
+
+    def setUp(self):
+        """
+        Harnessing
+        """
+
+        reset_notification_pubsub()
+
+        self.msg_type = NotificationType(
+            name='open-edx.edx_notifications.tests.test_pubsub',
+            renderer='edx_notifications.renderers.basic.JsonRenderer',
+        )
+        register_notification_type(self.msg_type)
+
+        self.msg = NotificationMessage(
+            namespace='test-runner',
+            msg_type=self.msg_type,
+            payload={
+                'foo': 'bar'
+            }
+        )
+
+    def tearDown(self):
+        """
+        Don't leave any configuration behind
+        """
+
+        reset_notification_pubsub()
+
+    def test_default_provider(self):
+        """
+        Make sure we get the polling provider out of the box
+        """
+
+        self.assertTrue(isinstance(notification_pubsub(), PollingNotificationPubSub))
+
+    @override_settings(NOTIFICATION_PUBSUB_PROVIDER={'class': 'foo'})
+    def test_bad_provider_config(self):
+        """
+        Make sure we are throwing exceptions on poor configuration
+        """
+
+        with self.assertRaises(ImproperlyConfigured):
+            notification_pubsub()
+
+    def test_wake_ups(self):
+        """
+        Make sure that subscribers get woken up for their own user only
+        """
+
+        provider = PollingNotificationPubSub(POLL_PERIOD_SECS=60)
+
+        with provider.subscribe(1) as subscription1, provider.subscribe(2) as subscription2:
+            provider.publish([1])
+            self.assertTrue(subscription1.wait(1))
+            self.assertFalse(subscription2.wait(0.01))
+
+            # the wake-up has been used up
+            self.assertFalse(subscription1.wait(0.01))
+
+            provider.publish(None)
+            self.assertTrue(subscription1.wait(1))
+            self.assertTrue(subscription2.wait(1))
+
+        # closed subscriptions are cleaned up
+        self.assertEqual(len(provider._subscriptions), 0)  # pylint: disable=protected-access
+
+    def test_wake_up_from_another_thread(self):
+        """
+        Make sure a subscriber which is blocked waiting gets woken up
+        """
+
+        provider = PollingNotificationPubSub(POLL_PERIOD_SECS=60)
+
+        with provider.subscribe(1) as subscription:
+            timer = threading.Timer(0.05, provider.publish, args=[[1]])
+            timer.start()
+
+            start = time.time()
+            self.assertTrue(subscription.wait(10))
+            self.assertLess(time.time() - start, 5)
+
+            timer.join()
+
+    def test_poll_period(self):
+        """
+        Subscribers never wait longer than the poll period
+        """
+
+        provider = PollingNotificationPubSub(POLL_PERIOD_SECS=0.01)
+
+        with provider.subscribe(1) as subscription:
+            start = time.time()
+            self.assertFalse(subscription.wait(10))
+            self.assertLess(time.time() - start, 5)
+
+    def test_watch(self):
+        """
+        Make sure we get a new change token whenever the notifications change,
+        and heartbeats when they don't
+        """
+
+        store = notification_store()
+
+        # without a change token, we get the current one right away
+        tokens = watch_notifications_change_token(1, None, 10, 10)
+        token = next(tokens)
+        self.assertEqual(token, store.get_notifications_change_token(1))
+        tokens.close()
+
+        tokens = watch_notifications_change_token(1, token, 10, 0.01)
+        self.assertIsNone(next(tokens))
+
+        publish_notification_to_user(1, self.msg)
+
+        # we're within a transaction, and wake-ups are only published on commit,
+        # so we only find out when we next look - at the latest after a heartbeat
+        new_token = next(token for token in tokens if token is not None)
+
+        self.assertNotEqual(new_token, token)
+        tokens.close()
+
+        # we stop after max_secs
+        self.assertEqual(list(watch_notifications_change_token(1, new_token, 0.01, 10)), [])
+
+        # even when asked to wait forever, or for NaN secs, which ends up as a heartbeat right away
+        with mock.patch.object(store, 'get_notifications_change_token', return_value=new_token) as mock_token:
+            self.assertEqual(list(watch_notifications_change_token(1, new_token, float('nan'), float('nan'))), [None])
+            self.assertEqual(list(watch_notifications_change_token(1, new_token, float('inf'), -1)), [None])
+
+        self.assertEqual(mock_token.call_count, 2)
+
+    def test_publish_on_commit(self):
+        """
+        Make sure dispatching notifications wakes up their recipients
+        """
+
+        with mock.patch('edx_notifications.pubsub.transaction.on_commit', side_effect=lambda func, using=None: func()):
+            with mock.patch.object(notification_pubsub(), 'publish') as mock_publish:
+                publish_notification_to_user(1, self.msg)
+                mock_publish.assert_called_with([1])
+
+                bulk_publish_notification_to_users([1, 2, 3], self.msg)
+                mock_publish.assert_called_with([1, 2, 3])
+
+                with mock.patch.object(const, 'NOTIFICATION_PUSH_MAX_TARGETED_USERS', 2):
+                    bulk_publish_notification_to_users([4, 5, 6], self.msg)
+                    mock_publish.assert_called_with(None)
+
+            # errors are logged rather than raised
+            with mock.patch.object(notification_pubsub(), 'publish', side_effect=Exception('boom')):
+                publish_notification_wakeups([1])
+
+
+class TestRedisPubSub(TestCase):
+    """
+    Test cases for the RedisNotificationPubSub
+    """
+
+    def test_missing_redis(self):
+        """
+        Make sure we complain if the redis package is not installed
+        """
+
+        with mock.patch.dict(sys.modules, {'redis': None}):
+            with self.assertRaises(ImproperlyConfigured):
+                RedisNotificationPubSub()
+
+    def test_publish_and_subscribe(self):
+        """
+        Go through publishing and receiving wake-ups against a mocked out Redis client
+        """
+
+        mock_redis = mock.MagicMock()
+        with mock.patch.dict(sys.modules, {'redis': mock_redis}):
+            provider = RedisNotificationPubSub(URL='redis://foo:6379/1', PUBLISH_BATCH_SIZE=2)
+
+        mock_redis.Redis.from_url.assert_called_with('redis://foo:6379/1')
+        client = provider.client
+
+        provider.publish(None)
+        client.publish.assert_called_with('edx_notifications.all', '')
+
+        provider.publish([1, 2, 3])
+        self.assertEqual(client.pipeline.return_value.publish.call_count, 3)
+        self.assertEqual(client.pipeline.return_value.execute.call_count, 2)
+
+        with provider.subscribe(1) as subscription1, provider.subscribe(2) as subscription2:
+            # only one listener per process
+            provider.subscribe(3).close()
+            client.pubsub.return_value.psubscribe.assert_called_once()
+
+            provider._on_message({'channel': b'edx_notifications.1'})  # pylint: disable=protected-access
+            self.assertTrue(subscription1.wait(1))
+            self.assertFalse(subscription2.wait(0.01))
+
+            provider._on_message({'channel': 'edx_notifications.all'})  # pylint: disable=protected-access
+            self.assertTrue(subscription1.wait(1))
+            self.assertTrue(subscription2.wait(1))
+
+            # garbage is ignored
+            provider._on_message({'channel': 'edx_notifications.foo'})  # pylint: disable=protected-access
+            self.assertFalse(subscription1.wait(0.01))
@@ -0,0 +1,116 @@
+"""
+Unit tests for recipients.py
+"""
+
+
+
+from django.test import TestCase
+from django.contrib.auth.models import User
+
+from edx_notifications.recipients import RecipientStream, partition_user_ids
+
+
+class TestRecipientStream(TestCase):
+    """
+    Test cases for recipients.py
+    """
+
+    def test_no_exclusions(self):
+        """
+        Make sure all user_ids pass through, in order, when there is nothing to filter
+        """
+
+        recipients = RecipientStream([3, 1, 2])
+
+        self.assertEqual(list(recipients), [3, 1, 2])
+        self.assertEqual(recipients.num_recipients, 3)
+        self.assertEqual(recipients.num_excluded, 0)
+        self.assertEqual(recipients.num_duplicates, 0)
+
+    def test_exclusions_and_duplicates(self):
+        """
+        Make sure excluded and duplicate user_ids are dropped and counted
+        """
+
+        recipients = RecipientStream(
+            [1, 2, 2, 3, 4, 4, 4, 5],
+            exclude_user_ids=[4, 5, 6]
+        )
+
+        self.assertEqual(list(recipients), [1, 2, 3])
+        self.assertEqual(recipients.num_recipients, 3)
+        self.assertEqual(recipients.num_excluded, 4)
+        self.assertEqual(recipients.num_duplicates, 1)
+
+    def test_generators(self):
+        """
+        Make sure both user_ids and exclude_user_ids can be generators
+        """
+
+        def _user_id_generator(start, end):
+            """
+            Just spit out a range of user_ids
+            """
+            yield from range(start, end)
+
+        recipients = RecipientStream(
+            _user_id_generator(1, 11),
+            exclude_user_ids=_user_id_generator(6, 100)
+        )
+
+        self.assertEqual(list(recipients), [1, 2, 3, 4, 5])
+        self.assertEqual(recipients.num_excluded, 5)
+
+    def test_querysets(self):
+        """
+        Make sure we can pass in ORM resultsets
+        """
+
+        for idx in range(1, 6):
+            User.objects.create(username='user{idx}'.format(idx=idx))
+
+        user_ids = User.objects.values_list('id', flat=True).order_by('id')
+        exclude_user_ids = User.objects.filter(username='user1').values_list('id', flat=True)
+
+        expected = list(user_ids)[1:]
+
+        with self.assertNumQueries(2):
+            recipients = RecipientStream(user_ids, exclude_user_ids=exclude_user_ids)
+            self.assertEqual(list(recipients), expected)
+
+        self.assertEqual(recipients.num_recipients, 4)
+        self.assertEqual(recipients.num_excluded, 1)
+
+    def test_modulo_partitions(self):
+        """
+        Make sure user_ids are partitioned on user_id modulo the number of partitions
+        """
+
+        partitions = partition_user_ids(RecipientStream(range(10)), 3)
+
+        self.assertEqual(partitions, [[0, 3, 6, 9], [1, 4, 7], [2, 5, 8]])
+
+        # empty partitions are dropped
+        self.assertEqual(partition_user_ids([3, 6], 3), [[3, 6]])
+
+    def test_range_partitions(self):
+        """
+        Make sure user_ids are partitioned into evenly sized, sorted ranges
+        """
+
+        partitions = partition_user_ids([9, 1, 5, 3, 7, 2, 8, 4, 6, 0], 3, strategy='range')
+
+        self.assertEqual(partitions, [[0, 1, 2, 3], [4, 5, 6], [7, 8, 9]])
+
+        self.assertEqual(partition_user_ids([1, 2], 4, strategy='range'), [[1], [2]])
+
+    def test_bad_partitions(self):
+        """
+        Make sure we reject bad arguments
+        """
+
+        with self.assertRaises(ValueError):
+            partition_user_ids([1, 2], 0)
+
+        with self.assertRaises(ValueError):
+            partition_user_ids([1, 2], 2, strategy='foo')
@@ -0,0 +1,152 @@
+"""
+Tests for the resident timer scheduler
+"""
+
+
+
+from unittest import mock
+from datetime import datetime, timedelta
+
+import pytz
+from freezegun import freeze_time
+from django.test import TestCase
+
+from edx_notifications import const
+from edx_notifications.data import NotificationType, NotificationMessage, NotificationCallbackTimer
+from edx_notifications.pubsub import TIMER_WAKEUP_KEY, notification_pubsub, reset_notification_pubsub
+from edx_notifications.scheduler import NotificationTimerScheduler
+from edx_notifications.stores.store import notification_store
+from edx_notifications.lib.publisher import cancel_timed_notification, publish_timed_notification
+
+
+class NotificationTimerSchedulerTests(TestCase):
+    """
+    Go through the scheduling and executing of timers
+    """
+
+    def setUp(self):
+        """
+        Harnessing
+        """
+
+        reset_notification_pubsub()
+        self.store = notification_store()
+        self.scheduler = NotificationTimerScheduler(worker_id='scheduler1')
+
+    def _save_timer(self, name, callback_at, is_active=True):
+        """
+        Helper to save a timer which does nothing
+        """
+
+        return self.store.save_notification_timer(
+            NotificationCallbackTimer(
+                name=name,
+                class_name='edx_notifications.tests.test_timer.NullNotificationCallbackTimerHandler',
+                callback_at=callback_at,
+                context={},
+                is_active=is_active,
+            )
+        )
+
+    def test_refresh(self):
+        """
+        Make sure the schedule follows the timers in the store
+        """
+
+        now = datetime.now(pytz.UTC)
+        self.assertIsNone(self.scheduler.get_next_due())
+
+        self._save_timer('later', now + timedelta(hours=2))
+        soon = self._save_timer('soon', now + timedelta(hours=1))
+        self._save_timer('inactive', now - timedelta(hours=1), is_active=False)
+
+        self.scheduler.refresh()
+        self.assertEqual(self.scheduler.get_next_due(), soon.callback_at)
+
+        # a cancelled timer drops out, and a new one is picked up
+        cancel_timed_notification('soon')
+        sooner = self._save_timer('sooner', now + timedelta(minutes=30))
+
+        self.scheduler.refresh()
+        self.assertEqual(self.scheduler.get_next_due(), sooner.callback_at)
+
+        cancel_timed_notification('sooner')
+        self.scheduler.refresh()
+        self.assertEqual(self.scheduler.get_next_due(), now + timedelta(hours=2))
+
+        # everything is reloaded every now and then
+        with mock.patch.object(self.store, 'get_notification_timer_schedule', return_value={}) as mock_schedule:
+            self.scheduler.refresh()
+            mock_schedule.assert_called_once_with(modified_since=mock.ANY)
+
+            with mock.patch.object(const, 'NOTIFICATION_SCHEDULER_RESYNC_SECS', 0):
+                self.scheduler.refresh()
+            mock_schedule.assert_called_with()
+
+        self.assertIsNone(self.scheduler.get_next_due())
+
+    def test_run_due_timers(self):
+        """
+        Only timers which are due get executed, and their lag is reported
+        """
+
+        now = datetime.now(pytz.UTC)
+        self._save_timer('due', now - timedelta(seconds=30))
+        self._save_timer('future', now + timedelta(hours=1))
+
+        self.scheduler.refresh()
+        self.assertEqual(self.scheduler.run_due_timers(), 1)
+        self.assertEqual(self.scheduler.run_due_timers(), 0)
+
+        self.assertIsNotNone(self.store.get_notification_timer('due').executed_at)
+        self.assertIsNone(self.store.get_notification_timer('future').executed_at)
+
+        stats = self.scheduler.report()
+        self.assertEqual(stats['num_executed'], 1)
+        self.assertGreaterEqual(stats['max_lag_secs'], 30)
+        self.assertEqual(stats['num_scheduled'], 1)
+
+        self.assertEqual(self.scheduler.report()['num_executed'], 0)
+
+        # the future timer gets executed once its time has come
+        with freeze_time(now + timedelta(hours=1, seconds=1)):
+            self.assertEqual(self.scheduler.run_due_timers(), 1)
+
+    def test_run(self):
+        """
+        Go through the main loop, which stops when asked to
+        """
+
+        self._save_timer('due', datetime.now(pytz.UTC) - timedelta(seconds=1))
+
+        self.scheduler.run(max_secs=0)
+        self.assertIsNotNone(self.store.get_notification_timer('due').executed_at)
+
+        # a failing scan doesn't bring the scheduler down
+        with mock.patch.object(self.scheduler, 'refresh', side_effect=Exception('boom')):
+            self.scheduler.run(max_secs=0)
+
+        # stopping wakes up the scheduler
+        with mock.patch.object(self.scheduler, 'report', side_effect=self.scheduler.stop) as mock_report:
+            with mock.patch.object(const, 'NOTIFICATION_SCHEDULER_REPORT_SECS', 0):
+                self.scheduler.run()
+
+        self.assertEqual(mock_report.call_count, 2)
+
+    def test_wake_up(self):
+        """
+        The scheduler is woken up when a timed notification is published
+        """
+
+        msg_type = self.store.save_notification_type(NotificationType(name='foo.bar', renderer='foo'))
+
+        with notification_pubsub().subscribe(TIMER_WAKEUP_KEY) as subscription:
+            with mock.patch('edx_notifications.pubsub.transaction.on_commit', side_effect=lambda func, using=None: func()):
+                publish_timed_notification(
+                    msg=NotificationMessage(msg_type=msg_type, payload={'foo': 'bar'}),
+                    send_at=datetime.now(pytz.UTC) + timedelta(minutes=1),
+                    scope_name='user',
+                    scope_context={'user_id': 1}
+                )
+
+            self.assertTrue(subscription.wait(0))
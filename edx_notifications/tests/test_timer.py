@@ -4,17 +4,20 @@ Tests for the timer.py
 
 
 
+import time
+import threading
+from unittest import mock
 from datetime import datetime, timedelta
 
 import pytz
 from freezegun import freeze_time
 from django.test import TestCase
 
-from edx_notifications import startup
-from edx_notifications.data import NotificationType, NotificationMessage, NotificationCallbackTimer
-from edx_notifications.timer import poll_and_execute_timers
-from edx_notifications.scopes import register_user_scope_resolver
-from edx_notifications.callbacks import NotificationCallbackTimerHandler
+from edx_notifications import const, startup
+from edx_notifications.data import NotificationType, UserNotification, NotificationMessage, NotificationCallbackTimer
+from edx_notifications.timer import TimerCallbackPool, poll_and_execute_timers
+from edx_notifications.scopes import resolve_user_scope, register_user_scope_resolver
+from edx_notifications.callbacks import NotificationCallbackTimerHandler, PurgeNotificationsCallbackHandler
 from edx_notifications.exceptions import ItemNotFoundError
 from edx_notifications.stores.store import notification_store
 from edx_notifications.lib.publisher import cancel_timed_notification, publish_timed_notification
@@ -59,6 +62,83 @@ class ExceptionNotificationCallbackTimerHandler(NotificationCallbackTimerHandler
         raise Exception('This did not work!')
 
 
+class SlowNotificationCallbackTimerHandler(NotificationCallbackTimerHandler):
+    """
+    Takes a while, and keeps track of how many are running at the same time
+    """
+
+    lock = threading.Lock()
+    num_running = 0
+    max_running = 0
+
+    def notification_timer_callback(self, timer):
+        """
+        Sleep a bit
+        """
+
+        cls = SlowNotificationCallbackTimerHandler
+        with cls.lock:
+            cls.num_running += 1
+            cls.max_running = max(cls.max_running, cls.num_running)
+
+        time.sleep(0.05)
+
+        with cls.lock:
+            cls.num_running -= 1
+
+        return {'context_update': {'slept': True}}
+
+
+class PairedNotificationCallbackTimerHandler(NotificationCallbackTimerHandler):
+    """
+    Only returns once another one is running at the same time
+    """
+
+    barrier = threading.Barrier(2)
+
+    def notification_timer_callback(self, timer):
+        """
+        Wait for the other one
+        """
+
+        self.barrier.wait(timeout=5)
+        return {}
+
+
+class HangingNotificationCallbackTimerHandler(NotificationCallbackTimerHandler):
+    """
+    Does not return until released
+    """
+
+    release = threading.Event()
+
+    def notification_timer_callback(self, timer):
+        """
+        Wait to be released
+        """
+
+        self.release.wait(timeout=5)
+        return {}
+
+
+class BlockingNotificationCallbackTimerHandler(NotificationCallbackTimerHandler):
+    """
+    Counts how many times it has been started, and does not return until released
+    """
+
+    num_started = 0
+    release = threading.Event()
+
+    def notification_timer_callback(self, timer):
+        """
+        Wait to be released
+        """
+
+        type(self).num_started += 1
+        self.release.wait(timeout=5)
+        return {}
+
+
 class TimerTests(TestCase):
     """
     Test cases for timer.py
@@ -110,6 +190,42 @@ class TimerTests(TestCase):
         self.assertIsNone(timer1.err_msg)
         self.assertNotEqual(timer.callback_at, timer1.callback_at)  # verify the callback time is incremented
 
+    def test_concurrent_schedulers(self):
+        """
+        Make sure a timer is executed by one scheduler process only, and executed
+        again should that process crash while executing it
+        """
+
+        timer = NotificationCallbackTimer(
+            name='foo',
+            class_name='edx_notifications.tests.test_timer.NullNotificationCallbackTimerHandler',
+            callback_at=datetime.now(pytz.UTC) - timedelta(days=1),
+            context={},
+            is_active=True
+        )
+        self.store.save_notification_timer(timer)
+
+        # another process has claimed the timer, and then crashed
+        claimed = self.store.claim_due_notification_timers('crashed-worker', 60)
+        self.assertEqual([claimed_timer.name for claimed_timer in claimed], [timer.name])
+
+        with mock.patch.object(NullNotificationCallbackTimerHandler, 'notification_timer_callback') as mock_callback:
+            mock_callback.return_value = {}
+
+            poll_and_execute_timers(worker_id='worker')
+            self.assertFalse(mock_callback.called)
+
+            with freeze_time(datetime.now(pytz.UTC) + timedelta(seconds=61)):
+                poll_and_execute_timers(worker_id='worker')
+
+            self.assertEqual(mock_callback.call_count, 1)
+
+        # and we've let go of it
+        updated_timer = self.store.get_notification_timer(timer.name)
+        self.assertIsNotNone(updated_timer.executed_at)
+        self.assertIsNone(updated_timer.worker_id)
+        self.assertIsNone(updated_timer.lease_expires_at)
+
     def test_bad_handler(self):
         """
         Make sure that a timer with a bad class_name doesn't operate
@@ -155,6 +271,119 @@ class TimerTests(TestCase):
         self.assertIsNotNone(updated_timer.err_msg)
 
 
+    def _save_due_timer(self, name, class_name, periodicity_min=None):
+        """
+        Helper to save a timer which is due
+        """
+
+        return self.store.save_notification_timer(
+            NotificationCallbackTimer(
+                name=name,
+                class_name=f'edx_notifications.tests.test_timer.{class_name}',
+                callback_at=datetime.now(pytz.UTC) - timedelta(minutes=1),
+                context={'name': name},
+                is_active=True,
+                periodicity_min=periodicity_min
+            )
+        )
+
+    def test_timed_out_callback_keeps_its_slot(self):
+        """
+        A callback which has timed out still counts against the concurrency of its class
+        (and the threads) until it actually returns, also in the next runs of the pool
+        """
+
+        class_name = 'edx_notifications.tests.test_timer.BlockingNotificationCallbackTimerHandler'
+
+        BlockingNotificationCallbackTimerHandler.num_started = 0
+        BlockingNotificationCallbackTimerHandler.release.clear()
+
+        for idx in range(2):
+            self._save_due_timer(f'digest{idx}', 'BlockingNotificationCallbackTimerHandler')
+
+        try:
+            with mock.patch.multiple(
+                const,
+                NOTIFICATION_TIMER_MAX_WORKERS=2,
+                NOTIFICATION_TIMER_CONCURRENCY={class_name: 1},
+                NOTIFICATION_TIMER_TIMEOUT_SECS={class_name: 0.2}
+            ):
+                lags = poll_and_execute_timers()
+                self.assertEqual(len(lags), 1)
+
+                timed_out = [
+                    timer for timer in (self.store.get_notification_timer(f'digest{idx}') for idx in range(2))
+                    if timer.executed_at
+                ]
+                self.assertEqual(len(timed_out), 1)
+                self.assertIn('Timed out', timed_out[0].err_msg)
+                self.assertIsNone(timed_out[0].worker_id)
+
+                # the first one is still going, so the second one has to wait
+                self.assertEqual(poll_and_execute_timers(), [])
+                self.assertEqual(BlockingNotificationCallbackTimerHandler.num_started, 1)
+
+                # until the first one has finished
+                BlockingNotificationCallbackTimerHandler.release.set()
+                for future in list(TimerCallbackPool._timed_out):  # pylint: disable=protected-access
+                    future.result(timeout=5)
+
+                self.assertEqual(len(poll_and_execute_timers()), 1)
+                self.assertEqual(BlockingNotificationCallbackTimerHandler.num_started, 2)
+        finally:
+            BlockingNotificationCallbackTimerHandler.release.set()
+
+    def test_callback_pool(self):
+        """
+        Make sure timer callbacks run alongside each other, within the concurrency limits
+        of their classes, and that their results are recorded like when run one by one
+        """
+
+        slow_class_name = 'edx_notifications.tests.test_timer.SlowNotificationCallbackTimerHandler'
+        hanging_class_name = 'edx_notifications.tests.test_timer.HangingNotificationCallbackTimerHandler'
+
+        for idx in range(3):
+            self._save_due_timer(f'slow{idx}', 'SlowNotificationCallbackTimerHandler', periodicity_min=60)
+        for idx in range(2):
+            self._save_due_timer(f'paired{idx}', 'PairedNotificationCallbackTimerHandler')
+        self._save_due_timer('hanging', 'HangingNotificationCallbackTimerHandler')
+        self._save_due_timer('exception', 'ExceptionNotificationCallbackTimerHandler')
+
+        try:
+            with mock.patch.multiple(
+                const,
+                NOTIFICATION_TIMER_MAX_WORKERS=4,
+                NOTIFICATION_TIMER_CONCURRENCY={slow_class_name: 1},
+                NOTIFICATION_TIMER_TIMEOUT_SECS={hanging_class_name: 0.5}
+            ):
+                lags = poll_and_execute_timers()
+        finally:
+            HangingNotificationCallbackTimerHandler.release.set()
+
+        self.assertEqual(len(lags), 7)
+        self.assertEqual(SlowNotificationCallbackTimerHandler.max_running, 1)
+
+        for idx in range(3):
+            timer = self.store.get_notification_timer(f'slow{idx}')
+            self.assertIsNone(timer.executed_at)
+            self.assertGreater(timer.callback_at, datetime.now(pytz.UTC))
+            self.assertEqual(timer.context, {'name': f'slow{idx}', 'slept': True})
+            self.assertIsNone(timer.worker_id)
+
+        for idx in range(2):
+            timer = self.store.get_notification_timer(f'paired{idx}')
+            self.assertIsNotNone(timer.executed_at)
+            self.assertIsNone(timer.err_msg)
+
+        timer = self.store.get_notification_timer('hanging')
+        self.assertIn('Timed out', timer.err_msg)
+        self.assertTrue(timer.is_active)
+
+        timer = self.store.get_notification_timer('exception')
+        self.assertEqual(timer.err_msg, 'This did not work!')
+        self.assertFalse(timer.is_active)
+
+
 class TimedNotificationsTests(TestCase):
     """
     Tests the creating of timed notifications
@@ -223,6 +452,32 @@ class TimedNotificationsTests(TestCase):
         self.assertEqual(read_user_msg.msg.payload, self.msg.get_payload())
         self.assertNotIn('extra', read_user_msg.msg.payload)
 
+    def test_batched_message_lookups(self):
+        """
+        Make sure that the messages of all timed notifications that are due
+        get fetched in one go, rather than one at a time
+        """
+
+        for user_id in range(1, 4):
+            publish_timed_notification(
+                msg=NotificationMessage(msg_type=self.msg_type, payload={'foo': user_id}),
+                send_at=datetime.now(pytz.UTC) - timedelta(seconds=1),
+                scope_name='user',
+                scope_context={'user_id': user_id}
+            )
+
+        get_msgs = self.store.get_notification_messages_by_ids
+        with mock.patch.object(self.store, 'get_notification_messages_by_ids', wraps=get_msgs) as mock_get_msgs:
+            with mock.patch.object(self.store, 'get_notification_message_by_id') as mock_get_msg:
+                poll_and_execute_timers()
+
+        self.assertEqual(mock_get_msgs.call_count, 1)
+        self.assertEqual(len(mock_get_msgs.call_args[0][0]), 3)
+        self.assertFalse(mock_get_msg.called)
+
+        for user_id in range(1, 4):
+            self.assertEqual(self.store.get_num_notifications_for_user(user_id), 1)
+
     def test_bad_scope(self):
         """
         Make sure we can't register a timer on a user scope that
@@ -297,6 +552,123 @@ class TimedNotificationsTests(TestCase):
         for user_id in range(timer.context['distribution_scope']['scope_context']['range']):
             self.assertEqual(self.store.get_num_notifications_for_user(user_id), 1)
 
+    def test_coalesced_broadcasts(self):
+        """
+        Make sure that timed notifications which go out to the same scope at the
+        same time resolve the scope once and get dispatched together
+        """
+
+        send_at = datetime.now(pytz.UTC) - timedelta(seconds=1)
+
+        timers = [
+            publish_timed_notification(
+                msg=NotificationMessage(msg_type=self.msg_type, payload={'foo': index}),
+                send_at=send_at,
+                scope_name='list_scope',
+                scope_context={'range': 5}
+            )
+            for index in range(3)
+        ]
+
+        # a different audience
+        excluding_timer = publish_timed_notification(
+            msg=NotificationMessage(msg_type=self.msg_type, payload={'foo': 'bar'}),
+            send_at=send_at,
+            scope_name='list_scope',
+            scope_context={'range': 5, 'exclude_user_ids': [0]}
+        )
+
+        # a message which has gone missing only fails its own timer
+        missing_timer = self.store.save_notification_timer(
+            NotificationCallbackTimer(
+                name='missing-msg',
+                callback_at=send_at,
+                class_name='edx_notifications.callbacks.NotificationDispatchMessageCallback',
+                context={
+                    'msg_id': 9999,
+                    'distribution_scope': {
+                        'scope_name': 'list_scope',
+                        'scope_context': {'range': 5},
+                    },
+                },
+                is_active=True,
+            )
+        )
+
+        with mock.patch('edx_notifications.callbacks.resolve_user_scope', wraps=resolve_user_scope) as mock_resolve:
+            with mock.patch.object(
+                self.store,
+                'bulk_create_user_notifications_for_messages',
+                wraps=self.store.bulk_create_user_notifications_for_messages
+            ) as mock_create:
+                poll_and_execute_timers()
+
+        self.assertEqual(mock_resolve.call_count, 2)
+        self.assertEqual(sorted(len(call[0][0]) for call in mock_create.call_args_list), [1, 3])
+
+        for timer in timers:
+            updated_timer = self.store.get_notification_timer(timer.name)
+            self.assertIsNone(updated_timer.err_msg)
+            self.assertEqual(updated_timer.results['num_dispatched'], 5)
+
+        self.assertEqual(self.store.get_notification_timer(excluding_timer.name).results['num_dispatched'], 4)
+
+        updated_timer = self.store.get_notification_timer(missing_timer.name)
+        self.assertIsNotNone(updated_timer.err_msg)
+        self.assertEqual(updated_timer.results['num_dispatched'], 0)
+
+        self.assertEqual(self.store.get_num_notifications_for_user(0), 3)
+        for user_id in range(1, 5):
+            self.assertEqual(self.store.get_num_notifications_for_user(user_id), 4)
+
+        # which can be turned off
+        timers = [
+            publish_timed_notification(
+                msg=NotificationMessage(msg_type=self.msg_type, payload={'foo': index}),
+                send_at=send_at,
+                scope_name='list_scope',
+                scope_context={'range': 5}
+            )
+            for index in range(2)
+        ]
+
+        with mock.patch('edx_notifications.callbacks.resolve_user_scope', wraps=resolve_user_scope) as mock_resolve:
+            with mock.patch.object(const, 'NOTIFICATION_TIMER_COALESCE_DISPATCH', False):
+                poll_and_execute_timers()
+
+        self.assertEqual(mock_resolve.call_count, 2)
+        self.assertEqual(self.store.get_num_notifications_for_user(1), 6)
+
+    def test_coalesced_broadcasts_on_threads(self):
+        """
+        Timed notifications are coalesced when running the callbacks on a pool of threads too,
+        as long as they are claimed together, i.e. there are enough free threads
+        """
+
+        timers = [
+            publish_timed_notification(
+                msg=NotificationMessage(msg_type=self.msg_type, payload={'foo': index}),
+                send_at=datetime.now(pytz.UTC) - timedelta(seconds=1),
+                scope_name='list_scope',
+                scope_context={'range': 5}
+            )
+            for index in range(3)
+        ]
+
+        # the test database can't be written to from other threads
+        with mock.patch(
+            'edx_notifications.callbacks._bulk_send_to_scoped_users',
+            side_effect=lambda msgs, *args, **kwargs: ([5] * len(msgs), [None] * len(msgs))
+        ) as mock_send:
+            with mock.patch('edx_notifications.timer.connections'):
+                poll_and_execute_timers(max_workers=3)
+
+        self.assertEqual(mock_send.call_count, 1)
+        self.assertEqual(len(mock_send.call_args[0][0]), 3)
+
+        for timer in timers:
+            self.assertEqual(self.store.get_notification_timer(timer.name).results['num_dispatched'], 5)
+
     def test_wait_for_correct_time(self):
         """
         Make sure timers don't fire too early and they can be rescheduled
@@ -591,3 +963,77 @@ class PurgeNotificationsTests(TestCase):
             actual_callback_at = (reset_time + timedelta(days=1)).replace(second=0, microsecond=0)
 
             self.assertEqual(expected_callback_at, actual_callback_at)
+
+    @mock.patch('edx_notifications.const.NOTIFICATION_PURGE_READ_OLDER_THAN_DAYS', 6)
+    @mock.patch('edx_notifications.const.NOTIFICATION_PURGE_BATCH_SIZE', 1)
+    @mock.patch('edx_notifications.const.NOTIFICATION_PURGE_BATCH_PAUSE_SECS', 1)
+    def test_resume_interrupted_purge(self):
+        """
+        Make sure a purge which gets killed midway picks up where it left off
+        """
+
+        msg_type = self.store.save_notification_type(NotificationType(name='foo.bar', renderer='foo'))
+
+        with freeze_time(datetime.now(pytz.UTC) - timedelta(days=7)):
+            for user_id in range(1, 4):
+                msg = self.store.save_notification_message(NotificationMessage(msg_type=msg_type, payload={'foo': 'bar'}))
+                self.store.save_user_notification(
+                    UserNotification(user_id=user_id, msg=msg, read_at=datetime.now(pytz.UTC))
+                )
+
+        timer = self.store.get_notification_timer(self.purge_notifications_timer_name)
+        handler = PurgeNotificationsCallbackHandler()
+
+        # get killed after the first batch
+        with mock.patch('edx_notifications.stores.sql.store_provider.time.sleep', side_effect=KeyboardInterrupt):
+            with self.assertRaises(KeyboardInterrupt):
+                handler.notification_timer_callback(timer)
+
+        self.assertEqual(self.store.get_num_notifications_for_user(1), 0)
+        self.assertEqual(self.store.get_num_notifications_for_user(2), 1)
+
+        timer = self.store.get_notification_timer(self.purge_notifications_timer_name)
+        checkpoint = timer.context['purge_checkpoint']
+        self.assertIsNotNone(checkpoint['read_older_than'])
+        self.assertIn('read', checkpoint['progress'])
+
+        # the next time around, the purge picks up from the checkpoint
+        with mock.patch.object(self.store, 'purge_expired_notifications', wraps=self.store.purge_expired_notifications) as mock_purge:
+            with mock.patch('edx_notifications.stores.sql.store_provider.time.sleep'):
+                handler.notification_timer_callback(timer)
+
+        self.assertEqual(mock_purge.call_args[1]['options']['checkpoint'], checkpoint['progress'])
+        self.assertEqual(mock_purge.call_args[1]['purge_read_messages_older_than'], checkpoint['read_older_than'])
+
+        for user_id in range(1, 4):
+            self.assertEqual(self.store.get_num_notifications_for_user(user_id), 0)
+
+        timer = self.store.get_notification_timer(self.purge_notifications_timer_name)
+        self.assertNotIn('purge_checkpoint', timer.context or {})
+
+    @mock.patch('edx_notifications.const.NOTIFICATION_TIMER_ARCHIVE_AFTER_DAYS', 1)
+    def test_archive_timers(self):
+        """
+        Make sure purging archives the timers which are done with, but not the purge timer
+        """
+
+        with freeze_time(datetime.now(pytz.UTC) - timedelta(days=2)):
+            timer = publish_timed_notification(
+                msg=NotificationMessage(
+                    msg_type=self.store.save_notification_type(NotificationType(name='foo.bar', renderer='foo')),
+                    payload={'foo': 'bar'}
+                ),
+                send_at=datetime.now(pytz.UTC) + timedelta(days=1),
+                scope_name='user',
+                scope_context={'user_id': 1}
+            )
+            cancel_timed_notification(timer.name)
+
+        PurgeNotificationsCallbackHandler().notification_timer_callback(
+            self.store.get_notification_timer(self.purge_notifications_timer_name)
+        )
+
+        with self.assertRaises(ItemNotFoundError):
+            self.store.get_notification_timer(timer.name)
+
+        self.assertIsNotNone(self.store.get_notification_timer(self.purge_notifications_timer_name))
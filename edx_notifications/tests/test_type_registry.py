@@ -0,0 +1,179 @@
+"""
+Unit tests for type_registry.py
+"""
+
+
+
+from unittest import mock
+
+from django.test import TestCase
+from django.core.cache import cache
+from django.test.utils import override_settings
+
+from edx_notifications import const, startup
+from edx_notifications.data import NotificationType
+from edx_notifications.lib.publisher import register_notification_type
+from edx_notifications.stores.store import notification_store
+from edx_notifications.type_registry import (
+    VERSION_KEY,
+    notification_type_saved,
+    is_same_notification_type,
+    load_notification_type_registry,
+    reset_notification_type_registry,
+    get_registered_notification_type,
+    check_notification_type_registry_cache
+)
+from edx_notifications.stores.sql.models import SQLNotificationType
+
+
+class TestTypeRegistry(TestCase):
+    """
+    Test cases for the process-wide registry of NotificationTypes
+    """
+
+    def setUp(self):
+        """
+        Harnessing
+        """
+
+        cache.delete(VERSION_KEY)
+        reset_notification_type_registry()
+
+        self.msg_type = NotificationType(
+            name='open-edx.edx_notifications.tests.test_type_registry',
+            renderer='edx_notifications.renderers.basic.JsonRenderer',
+        )
+        register_notification_type(self.msg_type)
+
+    def tearDown(self):
+        """
+        Don't leave a registry behind which knows about our types
+        """
+
+        reset_notification_type_registry()
+
+    def _change_in_other_process(self, renderer):
+        """
+        Change our NotificationType like another process would, by writing
+        it and bumping the version stamp
+        """
+
+        SQLNotificationType.objects.filter(name=self.msg_type.name).update(renderer=renderer)
+        cache.incr(VERSION_KEY)
+
+    def test_not_loaded(self):
+        """
+        Nothing is found until the registry gets loaded
+        """
+
+        self.assertIsNone(get_registered_notification_type(self.msg_type.name))
+
+        with self.assertNumQueries(1):
+            load_notification_type_registry()
+
+        with self.assertNumQueries(0):
+            self.assertEqual(get_registered_notification_type(self.msg_type.name), self.msg_type)
+            self.assertIsNone(get_registered_notification_type('non-existing'))
+
+    def test_startup_loads_registry(self):
+        """
+        Make sure startup loads the registry, so that registering unchanged types
+        does not write to the database
+        """
+
+        startup.initialize()
+        self.assertEqual(get_registered_notification_type(self.msg_type.name), self.msg_type)
+
+        with mock.patch.object(SQLNotificationType, 'save') as mock_save:
+            startup.initialize()
+            register_notification_type(self.msg_type)
+
+        self.assertFalse(mock_save.called)
+
+    def test_version_stamp(self):
+        """
+        Make sure we pick up changes made by other processes, the next time that we check
+        """
+
+        load_notification_type_registry()
+        self._change_in_other_process('foo.renderer')
+
+        # we don't check on every lookup
+        self.assertEqual(get_registered_notification_type(self.msg_type.name).renderer, self.msg_type.renderer)
+
+        with mock.patch.object(const, 'NOTIFICATION_TYPE_REGISTRY_CHECK_SECS', 0):
+            self.assertEqual(get_registered_notification_type(self.msg_type.name).renderer, 'foo.renderer')
+
+            # and don't reload if nothing has changed since
+            with self.assertNumQueries(0):
+                get_registered_notification_type(self.msg_type.name)
+
+            # or an evicted version stamp makes us reload
+            cache.delete(VERSION_KEY)
+            with self.assertNumQueries(1):
+                get_registered_notification_type(self.msg_type.name)
+
+    def test_saving(self):
+        """
+        Saving a NotificationType updates our registry in place, unless
+        another process has changed any type as well
+        """
+
+        load_notification_type_registry()
+        version = cache.get(VERSION_KEY)
+
+        self.msg_type.renderer_context = {'foo': 'bar'}
+        with self.assertNumQueries(2):
+            notification_store().save_notification_type(self.msg_type)
+
+        self.assertEqual(cache.get(VERSION_KEY), version + 1)
+        self.assertEqual(get_registered_notification_type(self.msg_type.name), self.msg_type)
+
+        self._change_in_other_process('foo.renderer')
+        with self.assertNumQueries(1):
+            notification_type_saved(self.msg_type)
+
+        self.assertEqual(get_registered_notification_type(self.msg_type.name).renderer, 'foo.renderer')
+
+    def test_check_cache(self):
+        """
+        Make sure we warn about a version stamp which is not shared between processes
+        """
+
+        with mock.patch('edx_notifications.type_registry.log') as mock_log:
+            check_notification_type_registry_cache()
+            self.assertTrue(mock_log.warning.called)
+
+        caches = {
+            'default': {
+                'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+            }
+        }
+        with override_settings(CACHES=caches), mock.patch('edx_notifications.type_registry.log') as mock_log:
+            check_notification_type_registry_cache()
+            self.assertFalse(mock_log.warning.called)
+
+    def test_same_notification_type(self):
+        """
+        Make sure we only compare what gets stored
+        """
+
+        self.assertTrue(is_same_notification_type(self.msg_type, self.msg_type.clone(self.msg_type)))
+        self.assertTrue(
+            is_same_notification_type(
+                NotificationType(name='foo', renderer='bar', renderer_context={}),
+                NotificationType(name='foo', renderer='bar')
+            )
+        )
+        self.assertFalse(
+            is_same_notification_type(
+                NotificationType(name='foo', renderer='bar', renderer_context={'foo': 'bar'}),
+                NotificationType(name='foo', renderer='bar')
+            )
+        )
+        self.assertFalse(
+            is_same_notification_type(
+                NotificationType(name='foo', renderer='bar'),
+                NotificationType(name='foo', renderer='baz')
+            )
+        )
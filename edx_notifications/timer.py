@@ -6,17 +6,23 @@ a callback when the timer expires
 
 
 import copy
+import time
 import logging
+import collections
 from datetime import datetime, timedelta
 from importlib import import_module
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 
 import pytz
+from django.db import connections
 from django.dispatch import receiver
 
 from edx_notifications import const
 from edx_notifications.data import NotificationCallbackTimer
+from edx_notifications.utils import get_worker_id
 from edx_notifications.signals import perform_notification_scan, perform_timer_registrations
 from edx_notifications.exceptions import ItemNotFoundError
+from edx_notifications.callbacks import NotificationDispatchMessageCallback
 from edx_notifications.stores.store import notification_store
 
 PURGE_NOTIFICATIONS_TIMER_NAME = 'purge-notifications-timer'
@@ -25,72 +31,424 @@ log = logging.getLogger(__name__)
 
 
 @receiver(perform_notification_scan)  # tie into the background_check management command execution
-def poll_and_execute_timers(**kwargs):  # pylint: disable=unused-argument
+def poll_and_execute_timers(**kwargs):
     """
     Will look in our registry of timers and see which should be executed now. It is not
     advised to call this method on any webservers that are serving HTTP traffic as
     this can take an arbitrary amount of time
+
+    Any number of processes can do this at the same time: each timer is claimed by one of them,
+    which holds a lease on it for NOTIFICATION_TIMER_LEASE_SECS. Should that process crash,
+    the timer gets executed again once the lease has run out
+
+    With NOTIFICATION_TIMER_MAX_WORKERS (or max_workers) above 1, the timer callbacks run
+    on a pool of threads, see TimerCallbackPool
+
+    Timed notifications which are claimed together and go out to the same distribution
+    scope are dispatched in one go, see NOTIFICATION_TIMER_COALESCE_DISPATCH
+
+    A should_stop callable can be passed in, which is asked between batches of timers
+    whether we ought to stop, e.g. because the process is shutting down
+
+    RETURNS: how late - in seconds - each of the timers that we have executed was claimed
     """
 
     log.info('Starting poll_and_execute_timers()...')
     store = notification_store()
+    worker_id = kwargs.get('worker_id') or get_worker_id()
+    max_workers = kwargs.get('max_workers') or const.NOTIFICATION_TIMER_MAX_WORKERS
+    should_stop = kwargs.get('should_stop')
 
-    timers_not_executed = store.get_all_active_timers()
+    if max_workers > 1:
+        lags = TimerCallbackPool(store, worker_id, max_workers).run(should_stop=should_stop)
+    else:
+        lags = []
 
-    for timer in timers_not_executed:
-        log.info('Executing timer: %s...', str(timer))
+        while not (should_stop and should_stop()):
+            timers = store.claim_due_notification_timers(
+                worker_id,
+                const.NOTIFICATION_TIMER_LEASE_SECS,
+                priorities=const.NOTIFICATION_TIMER_PRIORITIES
+            )
+            if not timers:
+                break
 
-        timer.executed_at = datetime.now(pytz.UTC)
-        store.save_notification_timer(timer)
+            # fetch the messages of all timed notifications which are due in one go,
+            # rather than having each timer callback fetch its own
+            msgs = _get_timed_notification_messages(store, timers)
+
+            for group in _coalesce_timers(timers):
+                lags.extend(_get_timer_lag(timer) for timer in group)
+                _execute_timers(store, group, msgs)
+
+    log.info('Ending poll_and_execute_timers()...')
+    return lags
+
+
+class TimerCallbackPool:
+    """
+    Runs the callbacks of the due timers on a bounded pool of threads, so that a slow
+    callback - e.g. sending out the digests - doesn't hold up all the others. The callbacks
+    of a class_name only get up to NOTIFICATION_TIMER_CONCURRENCY of the threads, and we only
+    claim timers when there are threads to run them on. Their results are recorded on the
+    thread which runs the pool, in the same way as when running the callbacks one by one
+    """
+
+    # callbacks which have timed out, but can't be interrupted, so they are still running:
+    # future -> class_name. They keep counting against the threads and the concurrency of
+    # their class until they are done, also in the pools which are run after this one
+    _timed_out = {}
+
+    def __init__(self, store, worker_id, max_workers):
+        """
+        Initializer
+        """
+
+        self.store = store
+        self.worker_id = worker_id
+        self.max_workers = max_workers
+
+        # future -> (timers, when to give up on them). Coalesced timers share a future
+        self._running = {}
+        self._num_running = collections.Counter()
+
+    def _get_concurrency(self, class_name):
+        """
+        Returns how many timers of class_name can run at the same time
+        """
+
+        return min(const.NOTIFICATION_TIMER_CONCURRENCY.get(class_name, self.max_workers), self.max_workers)
+
+    def _get_num_running(self, class_name):
+        """
+        Returns how many timers of class_name are running, including the ones which have timed out
+        """
+
+        num_timed_out = sum(1 for _class_name in self._timed_out.values() if _class_name == class_name)
+        return self._num_running[class_name] + num_timed_out
+
+    def _get_num_free(self):
+        """
+        Returns how many threads are free to run timers on
+        """
+
+        # let go of the callbacks which have timed out, and have finished since
+        for future in [future for future in self._timed_out if future.done()]:
+            del self._timed_out[future]
+
+        return max(self.max_workers - len(self._running) - len(self._timed_out), 0)
+
+    def _get_saturated_class_names(self):
+        """
+        Returns the class_names which can't have any more timers running
+        """
+
+        return [
+            class_name
+            for class_name in set(self._num_running) | set(self._timed_out.values())
+            if self._get_num_running(class_name) >= self._get_concurrency(class_name)
+        ]
+
+    def _submit_timers(self, executor, timers):
+        """
+        Hand the claimed timers over to the threads, bar the ones which would exceed
+        the concurrency of their class, which we let go of again
+
+        RETURNS: the lags of the submitted timers
+        """
+
+        msgs = _get_timed_notification_messages(self.store, timers)
+        lags = []
+
+        for group in _coalesce_timers(timers):
+            class_name = group[0].class_name
+
+            if self._get_num_running(class_name) >= self._get_concurrency(class_name):
+                for timer in group:
+                    timer.worker_id = None
+                    timer.lease_expires_at = None
+                    timer.executed_at = None
+                    self.store.save_notification_timer(timer)
+                continue
+
+            for timer in group:
+                log.info('Executing timer: %s...', str(timer))
+
+            timeout_secs = const.NOTIFICATION_TIMER_TIMEOUT_SECS.get(class_name)
+            future = executor.submit(_call_timer_callbacks_in_thread, group, msgs)
+
+            self._running[future] = (group, time.time() + timeout_secs if timeout_secs else None)
+            self._num_running[class_name] += 1
+            lags.extend(_get_timer_lag(timer) for timer in group)
+
+        return lags
+
+    def _finish(self, future):
+        """
+        Stop tracking the timers of future, which are done with, one way or another
+        """
+
+        timers, __ = self._running.pop(future)
+        self._num_running[timers[0].class_name] -= 1
+        return timers
+
+    def run(self, should_stop=None):
+        """
+        Claim and execute timers until no more are due, or should_stop() says so
+
+        RETURNS: the lags of the timers that we have executed
+        """
+
+        lags = []
+        claim = True
+        executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='notification-timer')
 
         try:
-            module_path, _, name = timer.class_name.rpartition('.')
-            log.info('Creating TimerCallback at class_name "%s"', timer.class_name)
+            while True:
+                num_free = self._get_num_free()
+                if claim and num_free and not (should_stop and should_stop()):
+                    timers = self.store.claim_due_notification_timers(
+                        self.worker_id,
+                        const.NOTIFICATION_TIMER_LEASE_SECS,
+                        max_timers=num_free,
+                        exclude_class_names=self._get_saturated_class_names(),
+                        priorities=const.NOTIFICATION_TIMER_PRIORITIES
+                    )
+                    if timers:
+                        lags.extend(self._submit_timers(executor, timers))
+                        continue
 
-            class_ = getattr(import_module(module_path), name)
-            handler = class_()
+                    # nothing more to claim until a thread frees up
+                    claim = False
 
-            results = handler.notification_timer_callback(timer)
+                if not self._running:
+                    break
 
-            # store a copy of the results in the database record
-            # for the timer
-            timer.results = copy.deepcopy(results)
+                deadlines = [deadline for __, deadline in self._running.values() if deadline]
+                timeout = max(min(deadlines) - time.time(), 0) if deadlines else None
 
-            # successful, see if we should reschedule
-            rerun_delta = results.get('reschedule_in_mins')
-            rerun_delta = rerun_delta if rerun_delta else timer.periodicity_min
+                done, __ = wait(list(self._running), timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    timers = self._finish(future)
+                    error = future.exception()
+                    _finish_timers(self.store, timers, results=None if error else future.result(), error=error)
+                    claim = True
 
-            if rerun_delta:
-                min_delta = const.NOTIFICATION_MINIMUM_PERIODICITY_MINS
-                rerun_delta = rerun_delta if rerun_delta >= min_delta else min_delta
+                now = time.time()
+                for future, (timers, deadline) in list(self._running.items()):
+                    if deadline and deadline <= now and not future.done():
+                        timeout_secs = const.NOTIFICATION_TIMER_TIMEOUT_SECS[timers[0].class_name]
 
-                timer.callback_at = timer.callback_at + timedelta(minutes=rerun_delta)
+                        # we give up on the results, but the callback still occupies its thread
+                        self._finish(future)
+                        self._timed_out[future] = timers[0].class_name
 
-                # is the rescheduling still in the past?
-                if timer.callback_at < datetime.now(pytz.UTC):
-                    timer.callback_at = datetime.now(pytz.UTC) + timedelta(minutes=rerun_delta)
+                        for timer in timers:
+                            log.error('Timer %s timed out after %s secs', timer.name, timeout_secs)
+                            _finish_timer(
+                                self.store,
+                                timer,
+                                results={'errors': [f'Timed out after {timeout_secs} secs']}
+                            )
+                        claim = True
+        finally:
+            # don't wait for callbacks which have timed out
+            executor.shutdown(wait=False)
 
-                timer.executed_at = None  # need to reset this or it won't get picked up again
+        return lags
 
-            if results.get('errors'):
-                timer.err_msg = str(results['errors'])
 
-            # see if the callback returned a 'context_update'
-            # which means that we should persist this in
-            # the timer context
-            if 'context_update' in results:
-                timer.context.update(results['context_update'])
+def _get_timer_lag(timer):
+    """
+    Returns how late - in seconds - a timer was claimed
+    """
 
-            store.save_notification_timer(timer)
-        except Exception as ex:  # pylint: disable=broad-except
-            # generic error (possibly couldn't create class_name instance?)
-            timer.err_msg = str(ex)
-            timer.is_active = False
-            store.save_notification_timer(timer)
+    return (timer.executed_at - timer.callback_at).total_seconds()
 
-            log.exception(ex)
 
-    log.info('Ending poll_and_execute_timers()...')
+def _get_dispatch_class_name():
+    """
+    Returns the class_name of the timers of timed notifications
+    """
+
+    return '{module}.{name}'.format(
+        module=NotificationDispatchMessageCallback.__module__,
+        name=NotificationDispatchMessageCallback.__name__
+    )
+
+
+def _coalesce_timers(timers):
+    """
+    Split up the claimed timers into the groups of them which are executed together: timed
+    notifications which go out to the same distribution scope (see
+    NotificationDispatchMessageCallback.get_coalescing_key()) and any other timer on its own
+
+    RETURNS: a list of lists of timers, in the order the timers were passed in
+    """
+
+    if not const.NOTIFICATION_TIMER_COALESCE_DISPATCH:
+        return [[timer] for timer in timers]
+
+    dispatch_class_name = _get_dispatch_class_name()
+
+    groups = collections.OrderedDict()
+    for timer in timers:
+        key = None
+        if timer.class_name == dispatch_class_name:
+            key = NotificationDispatchMessageCallback.get_coalescing_key(timer)
+
+        groups.setdefault(('scope', key) if key else ('timer', timer.name), []).append(timer)
+
+    return list(groups.values())
+
+
+def _call_timer_callback(timer, msgs):
+    """
+    Create the handler of a timer and call it
+
+    RETURNS: the results of the handler
+    """
+
+    module_path, _, name = timer.class_name.rpartition('.')
+    log.info('Creating TimerCallback at class_name "%s"', timer.class_name)
+
+    class_ = getattr(import_module(module_path), name)
+    if issubclass(class_, NotificationDispatchMessageCallback):
+        handler = class_(msgs=msgs)
+    else:
+        handler = class_()
+
+    return handler.notification_timer_callback(timer)
+
+
+def _call_timer_callbacks(timers, msgs):
+    """
+    Call the handler of a single timer, or dispatch a group of coalesced timed notifications
+
+    RETURNS: the list of the results of each of the timers
+    """
+
+    if len(timers) == 1:
+        return [_call_timer_callback(timers[0], msgs)]
+
+    log.info('Dispatching %d coalesced timed notifications', len(timers))
+    return NotificationDispatchMessageCallback(msgs=msgs).notification_timers_callback(timers)
+
+
+def _call_timer_callbacks_in_thread(timers, msgs):
+    """
+    Call the handler(s) of timers on a pool thread
+    """
+
+    try:
+        return _call_timer_callbacks(timers, msgs)
+    finally:
+        # each thread has its own database connections, which nothing else would close
+        connections.close_all()
+
+
+def _execute_timers(store, timers, msgs):
+    """
+    Run the callback(s) of timers which we have claimed, reschedule them (if need be)
+    and let go of them
+    """
+
+    for timer in timers:
+        log.info('Executing timer: %s...', str(timer))
+
+    try:
+        results = _call_timer_callbacks(timers, msgs)
+    except Exception as ex:  # pylint: disable=broad-except
+        _finish_timers(store, timers, error=ex)
+    else:
+        _finish_timers(store, timers, results=results)
+
+
+def _finish_timers(store, timers, results=None, error=None):
+    """
+    Finish each of the timers with its own results, or the error they all ran into
+    """
+
+    for index, timer in enumerate(timers):
+        _finish_timer(store, timer, results=results[index] if results is not None else None, error=error)
+
+
+def _finish_timer(store, timer, results=None, error=None):
+    """
+    Record the results of a timer's callback - or the error it raised - on the timer,
+    reschedule it (if need be) and let go of it
+    """
+
+    # we are done with the timer one way or another, so that whatever
+    # we save below also releases our lease on it
+    timer.worker_id = None
+    timer.lease_expires_at = None
+
+    try:
+        if error is not None:
+            raise error
+
+        # store a copy of the results in the database record
+        # for the timer
+        timer.results = copy.deepcopy(results)
+
+        # successful, see if we should reschedule
+        rerun_delta = results.get('reschedule_in_mins')
+        rerun_delta = rerun_delta if rerun_delta else timer.periodicity_min
+
+        if rerun_delta:
+            min_delta = const.NOTIFICATION_MINIMUM_PERIODICITY_MINS
+            rerun_delta = rerun_delta if rerun_delta >= min_delta else min_delta
+
+            timer.callback_at = timer.callback_at + timedelta(minutes=rerun_delta)
+
+            # is the rescheduling still in the past?
+            if timer.callback_at < datetime.now(pytz.UTC):
+                timer.callback_at = datetime.now(pytz.UTC) + timedelta(minutes=rerun_delta)
+
+            timer.executed_at = None  # need to reset this or it won't get picked up again
+
+        if results.get('errors'):
+            timer.err_msg = str(results['errors'])
+
+        # see if the callback returned a 'context_update'
+        # which means that we should persist this in
+        # the timer context
+        if 'context_update' in results:
+            timer.context.update(results['context_update'])
+
+        store.save_notification_timer(timer)
+    except Exception as ex:  # pylint: disable=broad-except
+        # generic error (possibly couldn't create class_name instance?)
+        timer.err_msg = str(ex)
+        timer.is_active = False
+        store.save_notification_timer(timer)
+
+        log.exception(ex)
+
+
+def _get_timed_notification_messages(store, timers):
+    """
+    Returns the NotificationMessages, by id, which the NotificationDispatchMessageCallback
+    timers among the passed in timers are going to send out
+    """
+
+    class_name = _get_dispatch_class_name()
+
+    msg_ids = []
+    for timer in timers:
+        if timer.class_name == class_name and timer.context and 'msg_id' in timer.context:
+            try:
+                msg_ids.append(int(timer.context['msg_id']))
+            except (TypeError, ValueError):
+                # leave it to the callback to complain about this
+                pass
+
+    if not msg_ids:
+        return {}
+
+    # this is a batch read of messages which never change, so it can go to the analytics replica
+    return store.get_notification_messages_by_ids(msg_ids, options={'analytics': True})
 
 
 @receiver(perform_timer_registrations)
@@ -0,0 +1,190 @@
+"""
+A process-wide registry of all NotificationTypes, so that the notifications which are read
+from the Notification Store can share their NotificationType data objects, rather than
+every row building (and parsing the renderer_context of) its own.
+
+The registry is loaded with one query by startup.initialize() - or on the first call to
+load_notification_type_registry(). It is never changed in place: it is an immutable
+mapping, which is swapped out whenever a NotificationType gets saved. Saving also bumps a
+version stamp in Django's cache (see NOTIFICATION_TYPE_REGISTRY_CACHE_NAME), which every
+process checks on every NOTIFICATION_TYPE_REGISTRY_CHECK_SECS, and reloads its registry if
+another process has changed a NotificationType in the meantime. For this to work, that
+cache must be shared by all processes (e.g. memcached or Redis) - with a per-process cache
+such as Django's LocMemCache, changes made by other processes are never picked up.
+
+NOTE: the NotificationTypes handed out by the registry are shared, so they must not be changed
+"""
+
+
+
+import time
+import random
+import logging
+import threading
+from types import MappingProxyType
+
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+
+from edx_notifications import const
+from edx_notifications.base_data import DictField
+from edx_notifications.stores.store import notification_store
+
+log = logging.getLogger(__name__)
+
+VERSION_KEY = 'edx_notifications.type_registry.version'
+
+# the NotificationTypes by name, or None if the registry has not been loaded (yet)
+_REGISTRY = None
+
+# the version stamp that the registry was loaded with, and when it was last checked
+_REGISTRY_VERSION = None
+_REGISTRY_CHECKED_AT = 0
+
+_REGISTRY_LOCK = threading.Lock()
+
+
+def _get_cache():
+    """
+    The Django cache which holds the version stamp. Look this up on every access,
+    as caches are per thread
+    """
+
+    return caches[const.NOTIFICATION_TYPE_REGISTRY_CACHE_NAME]
+
+
+def check_notification_type_registry_cache():
+    """
+    Warns if the version stamp is kept in a per-process cache, in which case
+    processes won't find out about NotificationTypes changed by others
+    """
+
+    if isinstance(_get_cache(), LocMemCache):
+        log.warning(
+            "NOTIFICATION_TYPE_REGISTRY_CACHE_NAME '%s' is a per-process LocMemCache, so "
+            "changes to NotificationTypes won't be picked up by other processes. Configure "
+            "a cache which all processes share instead",
+            const.NOTIFICATION_TYPE_REGISTRY_CACHE_NAME
+        )
+
+
+def _get_version():
+    """
+    Returns the current version stamp, initializing it if it doesn't exist (yet). The stamp
+    starts out at a random value, so that an evicted stamp does not come back with a value
+    which some process has already seen
+    """
+
+    cache = _get_cache()
+    cache.add(VERSION_KEY, random.randint(0, 2 ** 30), timeout=None)
+    return cache.get(VERSION_KEY)
+
+
+def _install_registry(registry, version):
+    """
+    Swap in a new registry
+    """
+
+    global _REGISTRY, _REGISTRY_VERSION, _REGISTRY_CHECKED_AT  # pylint: disable=global-statement
+
+    _REGISTRY = MappingProxyType(registry)
+    _REGISTRY_VERSION = version
+    _REGISTRY_CHECKED_AT = time.time()
+
+
+def load_notification_type_registry():
+    """
+    (Re)loads all NotificationTypes from the Notification Store
+    """
+
+    with _REGISTRY_LOCK:
+        # get the version stamp first, so that we don't miss any change
+        # which is made while we're loading
+        version = _get_version()
+        msg_types = notification_store().get_all_notification_types()
+        _install_registry({msg_type.name: msg_type for msg_type in msg_types}, version)
+
+
+def reset_notification_type_registry():
+    """
+    Forgets about the loaded registry. This is useful for testing.
+    """
+
+    global _REGISTRY, _REGISTRY_VERSION  # pylint: disable=global-statement
+
+    with _REGISTRY_LOCK:
+        _REGISTRY = None
+        _REGISTRY_VERSION = None
+
+
+def is_notification_type_registry_loaded():
+    """
+    Returns whether the registry has been loaded (yet)
+    """
+
+    return _REGISTRY is not None
+
+
+def get_registered_notification_type(name):
+    """
+    Returns the NotificationType registered by name, or None if the registry has
+    not been loaded or does not know about it. This never loads the registry
+    """
+
+    global _REGISTRY_CHECKED_AT  # pylint: disable=global-statement
+
+    registry = _REGISTRY
+    if registry is None:
+        return None
+
+    if time.time() - _REGISTRY_CHECKED_AT >= const.NOTIFICATION_TYPE_REGISTRY_CHECK_SECS:
+        if _get_cache().get(VERSION_KEY) == _REGISTRY_VERSION:
+            _REGISTRY_CHECKED_AT = time.time()
+        else:
+            load_notification_type_registry()
+            registry = _REGISTRY
+
+    return registry.get(name)
+
+
+def is_same_notification_type(msg_type, other_msg_type):
+    """
+    Returns whether two NotificationTypes have the same definition, i.e. whether saving one
+    over the other would change what is in the Notification Store
+    """
+
+    return (
+        msg_type.name == other_msg_type.name and
+        msg_type.renderer == other_msg_type.renderer and
+        DictField.to_tagged_json(msg_type.renderer_context) ==
+        DictField.to_tagged_json(other_msg_type.renderer_context)
+    )
+
+
+def notification_type_saved(msg_type):
+    """
+    To be called by the Notification Store whenever it has written a NotificationType, so
+    that this process updates its registry, and all other processes reload theirs
+    """
+
+    with _REGISTRY_LOCK:
+        cache = _get_cache()
+        try:
+            version = cache.incr(VERSION_KEY)
+        except ValueError:
+            cache.add(VERSION_KEY, random.randint(0, 2 ** 30), timeout=None)
+            version = cache.incr(VERSION_KEY)
+
+        if _REGISTRY is None:
+            return
+
+        # if some other process has changed a NotificationType as well since
+        # we loaded, then we'll have to reload to find out what it was
+        needs_reload = version != _REGISTRY_VERSION + 1
+        if not needs_reload:
+            registry = dict(_REGISTRY)
+            registry[msg_type.name] = msg_type
+            _install_registry(registry, version)
+
+    if needs_reload:
+        load_notification_type_registry()
@@ -1,3 +1,63 @@
 """
 Helpful utilities and base classes
 """
+
+
+
+import os
+import uuid
+import base64
+import socket
+import binascii
+from datetime import datetime
+
+import pytz
+
+
+def encode_notification_cursor(user_msg):
+    """
+    Returns an opaque cursor which points just past the passed in UserNotification
+    (or the dict of its fields) in the (most recent first) listing of a user's notifications.
+    Pass this in as the 'before' option to get_notifications_for_user() to get the next page
+    """
+
+    if isinstance(user_msg, dict):
+        created, _id = user_msg['created'], user_msg['id']
+    else:
+        created, _id = user_msg.created, user_msg.id
+
+    created = created.astimezone(pytz.UTC)
+    raw = '{created}|{id}'.format(created=created.strftime('%Y-%m-%dT%H:%M:%S.%f'), id=_id)
+
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+
+def decode_notification_cursor(cursor):
+    """
+    Inverse of encode_notification_cursor()
+
+    RETURNS: a tuple of (created, id)
+
+    Raises ValueError if the cursor is malformed
+    """
+
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8')
+        created, _id = raw.split('|')
+        created = datetime.strptime(created, '%Y-%m-%dT%H:%M:%S.%f').replace(tzinfo=pytz.UTC)
+        return created, int(_id)
+    except (binascii.Error, UnicodeError, ValueError) as ex:
+        raise ValueError(f"Malformed cursor '{cursor}'") from ex
+
+
+def get_worker_id():
+    """
+    Generate an id that is unique to this worker (process), e.g. to hold leases on
+    fan-out jobs or timers with
+    """
+
+    return '{host}:{pid}:{uid}'.format(
+        host=socket.gethostname(),
+        pid=os.getpid(),
+        uid=uuid.uuid4().hex[:8]
+    )
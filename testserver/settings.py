@@ -125,7 +125,13 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'notifications.db'),
-    }
+    },
+    # a stand-in for a read replica, which nothing ever gets replicated to,
+    # to test the read/write splitting of the SQL Notification Store with
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, 'notifications_replica.db'),
+    },
 }
 
 
@@ -230,17 +230,17 @@ def index(request):
             'always_show_dates_on_unread': True,
             'notification_preference_tab_is_visible': settings.NOTIFICATION_PREFERENCES_IS_VISIBLE,
         },
-        # for test purposes, set up a short-poll which contacts the server
-        # every 10 seconds to see if there is a new notification
+        # have the server let us know when there is a new notification, over
+        # Server-Sent Events (or long-poll, in browsers without EventSource)
         #
-        # NOTE: short-poll technique should not be used in a production setting with
-        # any reasonable number of concurrent users. This is just for
-        # testing purposes.
+        # NOTE: this holds a connection - and with the runserver, a thread - open
+        # per page. Use a 'short-poll' watcher, with a 'poll_period_secs' arg, to
+        # have the page ask the server every so often instead.
         #
         'refresh_watcher': {
-            'name': 'short-poll',
+            'name': 'server-push',
             'args': {
-                'poll_period_secs': 10,
+                'transport': 'sse',
             },
         },
         'include_framework_js': True,